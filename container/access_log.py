@@ -0,0 +1,320 @@
+"""
+Streaming analytics over Squid's native access.log.
+
+The entrypoint follows access.log (log_follower) and feeds every line into
+RollingAccessStats, which keeps a rolling window of fixed-size time buckets.
+Each bucket holds counters, a QuantileSketch of response times and a
+SpaceSaving summary of bytes per domain, so memory is bounded no matter how
+many requests or distinct domains pass through. Buckets are merged only when
+/metrics or /access-log is read.
+
+Native format (logformat squid):
+    time elapsed remotehost code/status bytes method URL rfc931 peerstatus/peerhost type
+    1700000000.123     45 10.0.0.1 TCP_MISS/200 1234 GET http://example.com/ - HIER_DIRECT/93.184.216.34 text/html
+"""
+
+import math
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional
+
+from log_follower import LogFollower
+from metrics import REGISTRY, Metric, Registry
+from sketches import QuantileSketch, SpaceSaving
+from squid_config import SquidConfig
+
+
+ACCESS_LOG = Path('/var/log/squid/access.log')
+
+ANALYTICS_ENABLED = os.getenv('ACCESS_LOG_ANALYTICS', 'true').lower() == 'true'
+
+# Rolling window length and bucket granularity (seconds)
+WINDOW_SECONDS = float(os.getenv('ACCESS_LOG_WINDOW', '60'))
+BUCKET_SECONDS = 5.0
+
+QUANTILES = (0.5, 0.95, 0.99)
+TOP_DOMAINS = 10
+DOMAIN_CAPACITY = 64  # SpaceSaving counters per bucket
+
+
+class AccessRecord(NamedTuple):
+    """One parsed native-format access.log line (text fields stay bytes)."""
+
+    timestamp: float
+    elapsed_ms: int
+    client: bytes
+    result_code: bytes
+    status: bytes
+    size: int
+    method: bytes
+    url: bytes
+
+
+def parse_line(line: bytes) -> Optional[AccessRecord]:
+    """
+    Parse one native-format access.log line.
+
+    Args:
+        line: Raw log line (bytes, with or without trailing newline)
+
+    Returns:
+        AccessRecord, or None if the line is not in the native format
+    """
+    fields = line.split(None, 7)
+    if len(fields) < 7:
+        return None
+    code, _, status = fields[3].partition(b'/')
+    try:
+        return AccessRecord(float(fields[0]), int(fields[1]), fields[2], code, status,
+                            int(fields[4]), fields[5], fields[6])
+    except ValueError:
+        return None
+
+
+def url_domain(url: bytes) -> bytes:
+    """
+    Host part of a logged URL.
+
+    Handles absolute URLs (scheme://[user@]host[:port]/path) and CONNECT
+    authorities (host:port), including bracketed IPv6 literals.
+    """
+    start = url.find(b'://')
+    start = start + 3 if start >= 0 else 0
+    end = len(url)
+    for sep in (b'/', b'?', b'#'):
+        pos = url.find(sep, start, end)
+        if pos >= 0:
+            end = pos
+    authority = url[start:end]
+    at = authority.rfind(b'@')
+    if at >= 0:
+        authority = authority[at + 1:]
+    if authority.startswith(b'['):
+        return authority[:authority.find(b']') + 1]
+    return authority.split(b':', 1)[0].lower()
+
+
+def is_hit(result_code: str) -> bool:
+    """Whether a Squid result code was served from cache."""
+    return 'HIT' in result_code or result_code.startswith('TCP_REFRESH_UNMODIFIED')
+
+
+class _Bucket:
+    """Aggregates for one BUCKET_SECONDS slice of the window."""
+
+    __slots__ = ('start', 'requests', 'bytes', 'results', 'statuses', 'latency', 'domains')
+
+    def __init__(self, start: float):
+        self.start = start
+        self.requests = 0
+        self.bytes = 0
+        self.results: Dict[bytes, int] = {}
+        self.statuses: Dict[bytes, int] = {}
+        self.latency = QuantileSketch()
+        self.domains = SpaceSaving(DOMAIN_CAPACITY)
+
+
+class RollingAccessStats:
+    """
+    Rolling-window access.log aggregates in bounded memory.
+
+    Args:
+        window: Window length in seconds
+        bucket_seconds: Bucket granularity in seconds
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(self, window: float = WINDOW_SECONDS, bucket_seconds: float = BUCKET_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.started = clock()
+        self.lines_total = 0
+        self.parse_errors_total = 0
+        self._buckets: Deque[_Bucket] = deque()
+
+    def _bucket(self, now: float) -> _Bucket:
+        buckets = self._buckets
+        if not buckets or now - buckets[-1].start >= self.bucket_seconds:
+            buckets.append(_Bucket(now))
+        while now - buckets[0].start > self.window:
+            buckets.popleft()
+        return buckets[-1]
+
+    def add_lines(self, lines: Iterable[bytes]) -> None:
+        """Account a batch of access.log lines at the current time."""
+        bucket = self._bucket(self.clock())
+        results = bucket.results
+        statuses = bucket.statuses
+        latency = bucket.latency
+        domains = bucket.domains
+        parsed = 0
+        errors = 0
+
+        for line in lines:
+            record = parse_line(line)
+            if record is None:
+                if line.strip():
+                    errors += 1
+                continue
+            parsed += 1
+            bucket.bytes += record.size
+            results[record.result_code] = results.get(record.result_code, 0) + 1
+            statuses[record.status] = statuses.get(record.status, 0) + 1
+            latency.add(record.elapsed_ms)
+            domains.add(url_domain(record.url), record.size)
+
+        bucket.requests += parsed
+        self.lines_total += parsed + errors
+        self.parse_errors_total += errors
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        Merge the buckets in the window into a JSON-serializable summary.
+
+        Returns:
+            Dictionary with request/byte rates, hit ratio, per result code and
+            status counts, latency quantiles (seconds) and top domains by bytes
+        """
+        now = self.clock()
+        buckets = [b for b in self._buckets if now - b.start <= self.window]
+        span = min(self.window, max(now - (buckets[0].start if buckets else self.started), 1.0))
+
+        requests = 0
+        total_bytes = 0
+        results: Dict[str, int] = {}
+        statuses: Dict[str, int] = {}
+        latency = QuantileSketch()
+        domains = SpaceSaving(DOMAIN_CAPACITY)
+        for bucket in buckets:
+            requests += bucket.requests
+            total_bytes += bucket.bytes
+            for code, count in bucket.results.items():
+                key = code.decode('ascii', errors='replace')
+                results[key] = results.get(key, 0) + count
+            for status, count in bucket.statuses.items():
+                key = status.decode('ascii', errors='replace')
+                statuses[key] = statuses.get(key, 0) + count
+            latency.merge(bucket.latency)
+            domains.merge(bucket.domains)
+
+        hits = sum(count for code, count in results.items() if is_hit(code))
+        return {
+            'window_seconds': round(span, 3),
+            'requests': requests,
+            'requests_per_second': requests / span,
+            'bytes': total_bytes,
+            'bytes_per_second': total_bytes / span,
+            'hit_ratio': hits / requests if requests else None,
+            'results': results,
+            'statuses': statuses,
+            'latency_seconds': {
+                str(q): (None if math.isnan(v) else v / 1000)
+                for q, v in ((q, latency.quantile(q)) for q in QUANTILES)
+            },
+            'top_domains': [
+                {'domain': domain.decode('utf-8', errors='replace'), 'bytes': weight}
+                for domain, weight in domains.top(TOP_DOMAINS)
+            ],
+            'lines_total': self.lines_total,
+            'parse_errors_total': self.parse_errors_total,
+        }
+
+
+def access_log_path(config: SquidConfig) -> Optional[Path]:
+    """
+    The first access_log in Squid's native format that is a local file.
+
+    Args:
+        config: Parsed Squid configuration
+
+    Returns:
+        Log file path, or None if no access_log can be analysed
+    """
+    for log in config.access_logs:
+        log_format = log.options[0] if log.options and '=' not in log.options[0] else 'squid'
+        if log.module in ('stdio', 'daemon') and log.path is not None and log_format == 'squid':
+            return log.path
+    if not config.get('access_log'):
+        return ACCESS_LOG  # Squid's default
+    return None
+
+
+class AccessLogAnalytics:
+    """
+    Follows access.log and publishes rolling aggregates.
+
+    Args:
+        path: access.log to follow
+        window: Rolling window length in seconds
+        registry: Registry to publish metrics into
+    """
+
+    def __init__(self, path: Path = ACCESS_LOG, window: float = WINDOW_SECONDS,
+                 registry: Registry = REGISTRY):
+        self.stats = RollingAccessStats(window)
+        self.follower = LogFollower(path, self.stats.add_lines)
+        registry.register_collector(self.metrics)
+
+    def snapshot(self) -> Dict[str, object]:
+        snapshot = self.stats.snapshot()
+        snapshot['rotations'] = self.follower.rotations
+        snapshot['truncations'] = self.follower.truncations
+        return snapshot
+
+    def metrics(self) -> List[Metric]:
+        """Metric families computed from the current window."""
+        snapshot = self.stats.snapshot()
+        families = []
+
+        def family(name, documentation, metric_type='gauge', labelnames=()):
+            metric = Metric(name, documentation, metric_type, labelnames)
+            families.append(metric)
+            return metric
+
+        family('squid_access_requests_per_second',
+               'Requests per second over the rolling window.').set(snapshot['requests_per_second'])
+        family('squid_access_bytes_per_second',
+               'Bytes sent per second over the rolling window.').set(snapshot['bytes_per_second'])
+        if snapshot['hit_ratio'] is not None:
+            family('squid_access_hit_ratio',
+                   'Fraction of requests served from cache over the rolling window.').set(
+                       snapshot['hit_ratio'])
+
+        results = family('squid_access_results', 'Requests by result code over the rolling window.',
+                         labelnames=('result_code',))
+        for code, count in snapshot['results'].items():
+            results.set(count, result_code=code)
+        statuses = family('squid_access_responses', 'Responses by HTTP status over the rolling window.',
+                          labelnames=('status',))
+        for status, count in snapshot['statuses'].items():
+            statuses.set(count, status=status)
+
+        latency = family('squid_access_latency_seconds',
+                         'Response time quantiles over the rolling window.', labelnames=('quantile',))
+        for quantile, seconds in snapshot['latency_seconds'].items():
+            if seconds is not None:
+                latency.set(seconds, quantile=quantile)
+
+        domains = family('squid_access_top_domain_bytes',
+                         'Bytes sent for the busiest domains over the rolling window.',
+                         labelnames=('domain',))
+        for entry in snapshot['top_domains']:
+            domains.set(entry['bytes'], domain=entry['domain'])
+
+        family('squid_access_log_lines_total', 'access.log lines processed.',
+               'counter').set(snapshot['lines_total'])
+        family('squid_access_log_parse_errors_total', 'access.log lines not in native format.',
+               'counter').set(snapshot['parse_errors_total'])
+        family('squid_access_log_rotations_total', 'access.log rotations followed.',
+               'counter').set(self.follower.rotations)
+        family('squid_access_log_truncations_total', 'access.log truncations detected.',
+               'counter').set(self.follower.truncations)
+        return families
+
+    async def run(self) -> None:
+        """Follow access.log until cancelled."""
+        await self.follower.run()
@@ -0,0 +1,404 @@
+"""
+Forward Squid's access log to container stdout through a named pipe.
+
+Writing access.log to a file and tailing it to stdout costs every byte a
+disk write, a read and a second write. Instead squid.conf can point an
+access_log at a FIFO the entrypoint creates before Squid starts:
+
+    access_log stdio:/var/run/squid/access.pipe squid
+
+The entrypoint holds the FIFO open read-write, so Squid reopening it on
+reconfigure, rotate or restart never produces EOF, and Squid's open() never
+blocks waiting for a reader. Data is read in large non-blocking chunks on the
+event loop and appended to a bounded buffer; a writer thread drains the
+buffer to stdout in batches of up to WRITE_SIZE bytes (or every
+FLUSH_INTERVAL seconds), optionally reformatted as JSON lines. If stdout
+cannot keep up, whole lines that do not fit into the buffer are dropped and
+counted rather than blocking Squid's writes to the pipe.
+
+Each line-aligned chunk of up to LOCKED_WRITE_SIZE bytes is written holding
+the lock of the stdout logging handler, so access log lines and the
+entrypoint's own log records never interleave mid-line. The lock is released
+between chunks: a batch blocked on a slow stdout holds up logging on the
+event loop for one chunk at most, not the whole batch.
+
+Exported metrics:
+    squid_access_log_forwarded_lines_total   lines written to stdout
+    squid_access_log_forwarded_bytes_total   bytes written to stdout
+    squid_access_log_forward_writes_total    write batches
+    squid_access_log_forward_dropped_lines_total  dropped (buffer full)
+    squid_access_log_forward_buffer_bytes    bytes waiting for the writer
+"""
+
+import asyncio
+import errno
+import json
+import logging
+import os
+import stat
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, ContextManager, Deque, List, Optional
+
+from metrics import REGISTRY, Metric, Registry
+from squid_config import SquidConfig
+
+
+ACCESS_LOG_PIPE = Path(os.getenv('ACCESS_LOG_PIPE', '/var/run/squid/access.pipe'))
+
+# 'raw' forwards Squid's lines unchanged, 'json' writes one object per line
+FORWARD_FORMAT = os.getenv('ACCESS_LOG_FORWARD_FORMAT', 'raw').lower()
+
+# Bytes waiting for the writer before lines are dropped
+BUFFER_BYTES = int(os.getenv('ACCESS_LOG_FORWARD_BUFFER_KB', '8192')) * 1024
+
+FORMATS = ('raw', 'json')
+
+READ_SIZE = 256 * 1024
+
+# Reads per event loop callback before yielding to other tasks
+READS_PER_CALLBACK = 8
+
+# Writer batches: flush when this much is buffered, or after FLUSH_INTERVAL
+WRITE_SIZE = 1024 * 1024
+FLUSH_INTERVAL = 0.1
+
+# Largest write made while holding the stdout lock
+LOCKED_WRITE_SIZE = 64 * 1024
+
+# Longest line kept while waiting for its newline; longer ones are dropped
+MAX_LINE_BYTES = 64 * 1024
+
+# Minimum seconds between "lines dropped" warnings
+DROP_REPORT_INTERVAL = 5.0
+
+SOURCE = 'squid-access'
+
+
+def pipe_configured(config: SquidConfig, path: Path = ACCESS_LOG_PIPE) -> bool:
+    """
+    Whether an access_log writes to the forwarder's pipe.
+
+    Args:
+        config: Parsed Squid configuration
+        path: FIFO path
+
+    Returns:
+        True if a stdio or daemon access_log names path
+    """
+    return any(log.module in ('stdio', 'daemon') and log.path == path for log in config.access_logs)
+
+
+def stdout_lock() -> Optional[ContextManager]:
+    """Lock of the root logging handler writing to stdout, if there is one."""
+    for handler in logging.getLogger().handlers:
+        if getattr(handler, 'stream', None) is sys.stdout and handler.lock is not None:
+            return handler.lock
+    return None
+
+
+class JsonLines:
+    """
+    Converts native-format access.log lines into JSON lines.
+
+    Lines that are not in the native format are wrapped as {"msg": ...}.
+    """
+
+    def __init__(self):
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'),
+                                        check_circular=False).encode
+        self._second = -1
+        self._second_text = ''
+
+    def _timestamp(self, field: str) -> str:
+        # Squid writes seconds.milliseconds; keep the digits instead of float rounding
+        seconds, _, fraction = field.partition('.')
+        second = int(seconds)
+        if second != self._second:
+            self._second_text = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self._second = second
+        return f'{self._second_text}.{fraction[:3]:0<3}Z'
+
+    def line(self, line: bytes) -> str:
+        """Format one line (without newline)."""
+        text = line.decode('utf-8', errors='replace')
+        fields = text.split()
+        try:
+            if len(fields) < 10:
+                raise ValueError(text)
+            timestamp = self._timestamp(fields[0])
+            elapsed = int(fields[1])
+            size = int(fields[4])
+        except ValueError:
+            return self._encode({'source': SOURCE, 'msg': text})
+
+        result, _, status = fields[3].partition('/')
+        hierarchy, _, peer = fields[8].partition('/')
+        return self._encode({
+            'ts': timestamp,
+            'source': SOURCE,
+            'elapsed_ms': elapsed,
+            'client': fields[2],
+            'result': result,
+            'status': int(status) if status.isdigit() else status,
+            'bytes': size,
+            'method': fields[5],
+            'url': fields[6],
+            'user': None if fields[7] == '-' else fields[7],
+            'hierarchy': hierarchy,
+            'peer': None if peer in ('', '-') else peer,
+            'content_type': None if fields[9] == '-' else ' '.join(fields[9:]),
+        })
+
+    def batch(self, data: bytes) -> bytes:
+        """Format a chunk of complete lines."""
+        line = self.line
+        return ''.join(f'{line(raw)}\n' for raw in data.split(b'\n') if raw.strip()).encode()
+
+
+class AccessLogForwarder:
+    """
+    Reads Squid's access log from a FIFO and writes it to stdout in batches.
+
+    Args:
+        path: FIFO Squid's access_log points at (created by open())
+        output: File descriptor to forward to
+        log_format: 'raw' or 'json'
+        buffer_bytes: Buffer size; lines that do not fit are dropped
+        flush_interval: Longest time a line waits for a batch
+        lock: Held while writing (default: the stdout logging handler's lock)
+        registry: Registry to publish metrics into
+
+    Raises:
+        ValueError: If log_format is unknown
+    """
+
+    def __init__(self, path: Path = ACCESS_LOG_PIPE, output: int = 1, log_format: str = FORWARD_FORMAT,
+                 buffer_bytes: int = BUFFER_BYTES, flush_interval: float = FLUSH_INTERVAL,
+                 lock: Optional[ContextManager] = None, registry: Registry = REGISTRY):
+        if log_format not in FORMATS:
+            raise ValueError(f"Unknown ACCESS_LOG_FORWARD_FORMAT: {log_format}")
+        self.path = Path(path)
+        self.output = output
+        self.log_format = log_format
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.lock = lock
+        # Called on the event loop with each batch of lines read (analytics)
+        self.on_lines: Optional[Callable[[List[bytes]], None]] = None
+
+        self.lines = 0
+        self.bytes = 0
+        self.writes = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self._reported_drops = 0
+        self._last_report = 0.0
+
+        self._fd: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._partial = b''
+        self._chunks: Deque[bytes] = deque()
+        self._buffered = 0
+        self._ready = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        registry.register_collector(self.metrics)
+
+    @property
+    def buffered(self) -> int:
+        """Bytes read but not yet written."""
+        return self._buffered
+
+    def open(self) -> None:
+        """
+        Create the FIFO if needed and open it.
+
+        Must run before Squid starts: Squid would otherwise create a regular
+        file at the path.
+
+        Raises:
+            OSError: If the FIFO cannot be created or opened
+            ValueError: If the path exists and is not a FIFO
+        """
+        try:
+            os.mkfifo(self.path, 0o600)
+        except FileExistsError:
+            if not stat.S_ISFIFO(os.stat(self.path).st_mode):
+                raise ValueError(f"{self.path} exists and is not a named pipe")
+        # Read-write: there is always a writer, so Squid closing its end is not EOF
+        self._fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK | os.O_CLOEXEC)
+
+    def start(self) -> None:
+        """
+        Start reading on the running event loop and start the writer thread.
+
+        Does nothing if already running; after stop() the FIFO is reopened.
+        """
+        if self._thread is not None:
+            return
+        if self._fd is None:
+            self.open()
+        self._stopping = False
+        if self.lock is None:
+            self.lock = stdout_lock() or threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._fd, self._read)
+        self._thread = threading.Thread(target=self._writer, name='access-log-forwarder', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Forward what Squid has written so far, then stop."""
+        if self._fd is None:
+            return
+        if self._loop is not None:
+            self._loop.remove_reader(self._fd)
+        while self._read_once():
+            pass
+        with self._ready:
+            self._stopping = True
+            self._ready.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        os.close(self._fd)
+        self._fd = None
+        self._report_drops(force=True)
+
+    def _read(self) -> None:
+        for _ in range(READS_PER_CALLBACK):
+            if not self._read_once():
+                break
+
+    def _read_once(self) -> bool:
+        """Read one chunk; False when the pipe is empty."""
+        try:
+            chunk = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return False
+        except OSError as e:
+            logging.warning(f"Error reading {self.path}: {e}")
+            return False
+        if not chunk:
+            return False
+
+        data = self._partial + chunk if self._partial else chunk
+        cut = data.rfind(b'\n') + 1
+        self._partial = data[cut:]
+        if len(self._partial) > MAX_LINE_BYTES:
+            self._partial = b''
+            self.dropped += 1
+        if cut:
+            complete = data[:cut] if cut < len(data) else data
+            if self.on_lines is not None:
+                self.on_lines(complete.split(b'\n')[:-1])
+            self._append(complete)
+        return len(chunk) == READ_SIZE
+
+    def _append(self, data: bytes) -> None:
+        with self._ready:
+            room = self.buffer_bytes - self._buffered
+            if len(data) > room:
+                cut = data.rfind(b'\n', 0, max(room, 0)) + 1
+                self.dropped += data.count(b'\n', cut)
+                data = data[:cut]
+                if not data:
+                    return
+            self._chunks.append(data)
+            self._buffered += len(data)
+            if self._buffered >= WRITE_SIZE:
+                self._ready.notify()
+
+    def _take(self) -> Optional[bytes]:
+        """Wait for a batch; None once stopped and drained."""
+        with self._ready:
+            self._ready.wait_for(lambda: self._buffered >= WRITE_SIZE or self._stopping,
+                                 self.flush_interval)
+            if not self._chunks:
+                return None if self._stopping else b''
+            data = b''.join(self._chunks)
+            self._chunks.clear()
+            self._buffered = 0
+            return data
+
+    def _writer(self) -> None:
+        formatter = JsonLines() if self.log_format == 'json' else None
+        while True:
+            data = self._take()
+            if data is None:
+                return
+            if not data:
+                self._report_drops()
+                continue
+            lines = data.count(b'\n')
+            if formatter is not None:
+                data = formatter.batch(data)
+            written = self._write(data)
+            self.writes += 1
+            self.lines += lines
+            self.bytes += written
+            self._report_drops()
+
+    def _write(self, data: bytes) -> int:
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            end = written + LOCKED_WRITE_SIZE
+            if end < len(view):
+                # Split after a newline so no line is interleaved with log records
+                newline = data.rfind(b'\n', written, end)
+                if newline < 0:
+                    newline = data.find(b'\n', end)
+                end = len(view) if newline < 0 else newline + 1
+            with self.lock:
+                chunk = self._write_chunk(view[written:end])
+            written += chunk
+            if written < end:
+                break
+        return written
+
+    def _write_chunk(self, view: memoryview) -> int:
+        written = 0
+        while written < len(view):
+            try:
+                written += os.write(self.output, view[written:])
+            except InterruptedError:
+                continue
+            except OSError as e:
+                self.write_errors += 1
+                if e.errno != errno.EPIPE or self.write_errors == 1:
+                    logging.warning(f"Cannot forward access log: {e}")
+                break
+        return written
+
+    def _report_drops(self, force: bool = False) -> None:
+        dropped = self.dropped - self._reported_drops
+        if not dropped:
+            return
+        if not force and time.monotonic() - self._last_report < DROP_REPORT_INTERVAL:
+            return
+        self._reported_drops += dropped
+        self._last_report = time.monotonic()
+        logging.warning(f"Access log forwarder dropped {dropped} lines (buffer full)")
+
+    def metrics(self) -> List[Metric]:
+        """Forwarder counters."""
+        lines = Metric('squid_access_log_forwarded_lines_total',
+                       'Access log lines forwarded to stdout.', 'counter')
+        lines.set(self.lines)
+        forwarded = Metric('squid_access_log_forwarded_bytes_total',
+                           'Access log bytes written to stdout.', 'counter')
+        forwarded.set(self.bytes)
+        writes = Metric('squid_access_log_forward_writes_total',
+                        'Batched writes of access log lines to stdout.', 'counter')
+        writes.set(self.writes)
+        dropped = Metric('squid_access_log_forward_dropped_lines_total',
+                         'Access log lines dropped because the forward buffer was full.', 'counter')
+        dropped.set(self.dropped)
+        buffered = Metric('squid_access_log_forward_buffer_bytes',
+                          'Access log bytes waiting to be written to stdout.')
+        buffered.set(self._buffered)
+        return [lines, forwarded, writes, dropped, buffered]
@@ -0,0 +1,658 @@
+"""
+Offline http_access evaluation against a captured access.log.
+
+AccessEvaluator compiles the http_access rules and the acls they use from
+the parsed configuration, replays native-format access.log lines through
+them and counts, per rule, how many requests reached it, how many it
+decided and how many acl checks it cost, using Squid's own order:
+rules top to bottom, acls left to right, stopping at the first acl that
+does not match.
+
+Requests are evaluated in batches. Each batch is indexed per request field
+(client, domain, port, ...) into {value: bitmask of the requests carrying
+it}, every acl is checked once per distinct value and the results are
+combined with integer AND/OR over the whole batch, so replaying a million
+lines costs one check per distinct value instead of one per request and
+acl.
+
+Supported acl types: src, dst, dstdomain, port, method, time, url_regex,
+urlpath_regex and dstdom_regex, plus the predefined all, localhost,
+to_localhost and manager acls. dst uses the server address logged in the
+hierarchy field (no DNS lookups). Other acl types never match and are
+reported.
+
+The cost of an acl check is a relative estimate of Squid's work: one unit
+for port, method and time checks, log2 of the entry count for the tree
+lookups of src, dst and dstdomain, and REGEX_COST per pattern for regex
+types, which Squid tries one by one.
+
+Usage:
+    python3 acl_eval.py [--config /etc/squid/squid.conf] access.log
+"""
+
+import argparse
+import bisect
+import functools
+import math
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from access_log import url_domain
+from acl_optimizer import merge_ranges, normalize_domain, parse_network, read_entries
+from squid_config import SQUID_CONF, Acl, Directive, SquidConfig, load_squid_config
+
+
+# Requests evaluated together (bits per mask)
+BATCH_SIZE = 4096
+
+# Relative cost of trying one regex pattern
+REGEX_COST = 8.0
+
+# Per-acl memo of results by field value, cleared when full
+MATCH_CACHE_SIZE = 65536
+
+# A rule is flagged as slow above this share of the total cost when it
+# decides less than SLOW_HIT_SHARE of the requests
+SLOW_COST_SHARE = 0.25
+SLOW_HIT_SHARE = 0.05
+
+DEFAULT_PORTS = {b'http': 80, b'https': 443, b'ftp': 21}
+
+# Squid day letters -> time.struct_time.tm_wday
+_DAYS = {'M': 0, 'T': 1, 'W': 2, 'H': 3, 'F': 4, 'A': 5, 'S': 6}
+
+_TIME_RANGE = re.compile(r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$')
+
+_AUTHORITY_END = re.compile(rb'[/?#]')
+
+# Acls Squid defines itself (acl type, values)
+BUILTIN_ACLS = {
+    'all': ('src', ['0.0.0.0/0', '::/0']),
+    'localhost': ('src', ['127.0.0.1/32', '::1']),
+    'to_localhost': ('dst', ['127.0.0.0/8', '0.0.0.0/32', '::1', '::']),
+    'manager': ('url_regex', ['-i', '^cache_object://', '^https?://[^/]+/squid-internal-mgr/']),
+}
+
+
+class Request(NamedTuple):
+    """The fields of an access.log line that acls look at (bytes as logged)."""
+
+    timestamp: float
+    client: bytes
+    method: bytes
+    url: bytes
+    server: bytes
+
+
+def parse_request(line: bytes) -> Optional[Request]:
+    """
+    Parse one native-format access.log line for replay.
+
+    Args:
+        line: Raw log line
+
+    Returns:
+        Request, or None if the line is not in the native format
+    """
+    fields = line.split(None, 9)
+    if len(fields) < 7:
+        return None
+    try:
+        timestamp = float(fields[0])
+    except ValueError:
+        return None
+    server = fields[8].partition(b'/')[2] if len(fields) > 8 else b''
+    return Request(timestamp, fields[2], fields[5], fields[6], server or b'-')
+
+
+def _authority_end(url: bytes, start: int) -> int:
+    end = _AUTHORITY_END.search(url, start)
+    return end.start() if end else len(url)
+
+
+def url_port(url: bytes) -> int:
+    """Port of a logged URL or CONNECT authority (-1 if unknown)."""
+    scheme_end = url.find(b'://')
+    start = scheme_end + 3 if scheme_end >= 0 else 0
+    authority = url[start:_authority_end(url, start)]
+    host_end = authority.rfind(b']') + 1
+    colon = authority.rfind(b':', host_end)
+    if colon >= 0:
+        try:
+            return int(authority[colon + 1:])
+        except ValueError:
+            return -1
+    if scheme_end < 0:
+        return -1
+    return DEFAULT_PORTS.get(url[:scheme_end].lower(), 80)
+
+
+def url_path(url: bytes) -> bytes:
+    """Path and query of a logged URL (empty for CONNECT authorities)."""
+    scheme_end = url.find(b'://')
+    if scheme_end < 0:
+        return b''
+    return url[_authority_end(url, scheme_end + 3):]
+
+
+def _server(request: Request) -> bytes:
+    if request.server != b'-':
+        return request.server
+    # Not forwarded (denied, cache hit): only an IP literal host is known
+    return url_domain(request.url).strip(b'[]')
+
+
+# Request field -> extractor; acls are evaluated on these values
+FIELDS: Dict[str, Callable[[Request], object]] = {
+    'client': lambda r: r.client,
+    'server': _server,
+    'domain': lambda r: url_domain(r.url),
+    'port': lambda r: url_port(r.url),
+    'method': lambda r: r.method,
+    'minute': lambda r: int(r.timestamp) // 60,
+    'url': lambda r: r.url,
+    'path': lambda r: url_path(r.url),
+}
+
+
+class AclMatcher:
+    """
+    One named acl, checked against a single request field.
+
+    Subclasses set field and cost and implement _match.
+    """
+
+    field: Optional[str] = None
+    cost: float = 1.0
+
+    def __init__(self, name: str, acl_type: str):
+        self.name = name
+        self.acl_type = acl_type
+        self._cache: Dict[object, bool] = {}
+
+    def matches(self, value) -> bool:
+        """Whether a field value matches (memoized)."""
+        result = self._cache.get(value)
+        if result is None:
+            if len(self._cache) >= MATCH_CACHE_SIZE:
+                self._cache.clear()
+            result = self._cache[value] = self._match(value)
+        return result
+
+    def _match(self, value) -> bool:
+        return False
+
+
+class UnsupportedMatcher(AclMatcher):
+    """Undefined acls and acl types the evaluator cannot check; never match."""
+
+    cost = 0.0
+
+
+@functools.lru_cache(maxsize=MATCH_CACHE_SIZE)
+def _address(value: bytes) -> Optional[Tuple[int, int, int]]:
+    """Parsed client/server address, shared by all src and dst acls."""
+    return parse_network(value.decode('ascii', errors='replace'))
+
+
+class NetworkMatcher(AclMatcher):
+    """src / dst: address ranges searched with bisect."""
+
+    def __init__(self, name: str, acl_type: str, entries: Iterable[str]):
+        super().__init__(name, acl_type)
+        self.field = 'client' if acl_type == 'src' else 'server'
+        ranges: Tuple[List[Tuple[int, int]], ...] = ([], [])
+        for entry in entries:
+            parsed = parse_network(entry)
+            if parsed is not None:
+                ranges[parsed[0]].append(parsed[1:])
+        count = sum(len(family) for family in ranges)
+        self.cost = 1 + math.log2(count + 1)
+        self._starts: List[List[int]] = []
+        self._ends: List[List[int]] = []
+        for family in ranges:
+            merged, _, _ = merge_ranges(sorted(family))
+            self._starts.append([first for first, _ in merged])
+            self._ends.append([last for _, last in merged])
+
+    def _match(self, value: bytes) -> bool:
+        parsed = _address(value)
+        if parsed is None:
+            return False
+        family, address, _ = parsed
+        i = bisect.bisect_right(self._starts[family], address) - 1
+        return i >= 0 and address <= self._ends[family][i]
+
+
+class DomainMatcher(AclMatcher):
+    """dstdomain: exact names and .wildcards, checked label by label."""
+
+    field = 'domain'
+
+    def __init__(self, name: str, acl_type: str, entries: Iterable[str]):
+        super().__init__(name, acl_type)
+        self._exact = set()
+        self._wildcards = set()
+        for entry in entries:
+            domain = normalize_domain(entry)
+            if domain is None:
+                continue
+            if domain.startswith('.'):
+                self._wildcards.add(domain[1:])
+            else:
+                self._exact.add(domain)
+        self.cost = 1 + math.log2(len(self._exact) + len(self._wildcards) + 1)
+
+    def _match(self, value: bytes) -> bool:
+        name = value.decode('utf-8', errors='replace').rstrip('.')
+        if name in self._exact:
+            return True
+        while name:
+            if name in self._wildcards:
+                return True
+            name = name.partition('.')[2]
+        return False
+
+
+class PortMatcher(AclMatcher):
+    """port: numbers and lo-hi ranges."""
+
+    field = 'port'
+
+    def __init__(self, name: str, acl_type: str, entries: Iterable[str]):
+        super().__init__(name, acl_type)
+        self._ranges = []
+        for entry in entries:
+            low, _, high = entry.partition('-')
+            try:
+                self._ranges.append((int(low), int(high or low)))
+            except ValueError:
+                continue
+
+    def _match(self, value: int) -> bool:
+        return any(low <= value <= high for low, high in self._ranges)
+
+
+class MethodMatcher(AclMatcher):
+    """method: request method names."""
+
+    field = 'method'
+
+    def __init__(self, name: str, acl_type: str, entries: Iterable[str]):
+        super().__init__(name, acl_type)
+        self._methods = {entry.upper().encode('ascii', errors='replace') for entry in entries}
+
+    def _match(self, value: bytes) -> bool:
+        return value.upper() in self._methods
+
+
+class TimeMatcher(AclMatcher):
+    """time: [day letters] [hh:mm-hh:mm] per acl line, in local time."""
+
+    field = 'minute'
+
+    def __init__(self, name: str, acl_type: str, lines: Iterable[List[str]]):
+        super().__init__(name, acl_type)
+        self._specs = []
+        for values in lines:
+            days = set(range(7))
+            start, end = 0, 24 * 60 - 1
+            for value in values:
+                span = _TIME_RANGE.match(value)
+                if span:
+                    h1, m1, h2, m2 = (int(g) for g in span.groups())
+                    start, end = h1 * 60 + m1, h2 * 60 + m2
+                elif all(c in _DAYS for c in value.upper()):
+                    days = {_DAYS[c] for c in value.upper()}
+            self._specs.append((days, start, end))
+
+    def _match(self, value: int) -> bool:
+        local = time.localtime(value * 60)
+        minute = local.tm_hour * 60 + local.tm_min
+        return any(local.tm_wday in days and start <= minute <= end
+                   for days, start, end in self._specs)
+
+
+class RegexMatcher(AclMatcher):
+    """url_regex / urlpath_regex / dstdom_regex; -i and +i toggle case."""
+
+    _TYPE_FIELDS = {'url_regex': 'url', 'urlpath_regex': 'path', 'dstdom_regex': 'domain'}
+
+    def __init__(self, name: str, acl_type: str, entries: Iterable[str]):
+        super().__init__(name, acl_type)
+        self.field = self._TYPE_FIELDS[acl_type]
+        self._patterns = []
+        flags = 0
+        for entry in entries:
+            if entry == '-i':
+                flags = re.IGNORECASE
+            elif entry == '+i':
+                flags = 0
+            else:
+                self._patterns.append(re.compile(entry.encode('utf-8'), flags))
+        self.cost = REGEX_COST * max(len(self._patterns), 1)
+
+    def _match(self, value: bytes) -> bool:
+        return any(pattern.search(value) for pattern in self._patterns)
+
+
+MATCHERS: Dict[str, type] = {
+    'src': NetworkMatcher,
+    'dst': NetworkMatcher,
+    'dstdomain': DomainMatcher,
+    'port': PortMatcher,
+    'method': MethodMatcher,
+    'url_regex': RegexMatcher,
+    'urlpath_regex': RegexMatcher,
+    'dstdom_regex': RegexMatcher,
+}
+
+
+def _acl_values(acl: Acl) -> List[str]:
+    values = list(acl.flags) + list(acl.values)
+    for path in acl.files:
+        try:
+            values.extend(read_entries(path))
+        except OSError:
+            continue
+    return values
+
+
+def build_matchers(config: SquidConfig) -> Dict[str, AclMatcher]:
+    """
+    Matchers for every acl in the configuration (plus predefined ones).
+
+    acl lines sharing a name are combined, as Squid does.
+
+    Args:
+        config: Parsed configuration
+
+    Returns:
+        acl name -> matcher
+    """
+    lines: Dict[str, List[Acl]] = {}
+    for acl in config.acls:
+        lines.setdefault(acl.name, []).append(acl)
+    for name, (acl_type, values) in BUILTIN_ACLS.items():
+        lines.setdefault(name, [Acl(name=name, acl_type=acl_type, values=values)])
+
+    matchers: Dict[str, AclMatcher] = {}
+    for name, acls in lines.items():
+        acl_type = acls[0].acl_type
+        if acl_type == 'time':
+            matchers[name] = TimeMatcher(name, acl_type, (_acl_values(acl) for acl in acls))
+        elif acl_type in MATCHERS:
+            values = [value for acl in acls for value in _acl_values(acl)]
+            matchers[name] = MATCHERS[acl_type](name, acl_type, values)
+        else:
+            matchers[name] = UnsupportedMatcher(name, acl_type)
+    return matchers
+
+
+@dataclass
+class Rule:
+    """One http_access line and what replaying requests through it cost."""
+
+    index: int
+    action: str
+    acls: List[Tuple[AclMatcher, bool]]
+    directive: Directive
+    reached: int = 0
+    hits: int = 0
+    evaluations: int = 0
+    cost: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return ' '.join(['http_access'] + self.directive.args)
+
+    @property
+    def location(self) -> str:
+        return f"{self.directive.source.name}:{self.directive.line}"
+
+    @property
+    def unit_cost(self) -> float:
+        """Cost of checking every acl of the rule once."""
+        return sum(matcher.cost for matcher, _ in self.acls)
+
+
+class _Batch:
+    """Requests evaluated together, with per-field value -> bitmask indexes."""
+
+    def __init__(self, requests: Sequence[Request]):
+        self.requests = requests
+        self.full = (1 << len(requests)) - 1
+        self._indexes: Dict[str, Dict[object, int]] = {}
+        self._masks: Dict[int, int] = {}
+
+    def index(self, name: str) -> Dict[object, int]:
+        index = self._indexes.get(name)
+        if index is None:
+            extract = FIELDS[name]
+            index = {}
+            bit = 1
+            for request in self.requests:
+                value = extract(request)
+                index[value] = index.get(value, 0) | bit
+                bit <<= 1
+            self._indexes[name] = index
+        return index
+
+    def mask(self, matcher: AclMatcher) -> int:
+        """Bitmask of the requests matching an acl."""
+        mask = self._masks.get(id(matcher))
+        if mask is None:
+            mask = 0
+            if matcher.field is not None:
+                for value, positions in self.index(matcher.field).items():
+                    if matcher.matches(value):
+                        mask |= positions
+            self._masks[id(matcher)] = mask
+        return mask
+
+
+class AccessEvaluator:
+    """
+    Replays requests through the http_access rules of a configuration.
+
+    Args:
+        config: Parsed configuration
+
+    Example:
+        evaluator = AccessEvaluator(load_squid_config())
+        with open('access.log', 'rb') as f:
+            evaluator.replay(f)
+        print(format_report(evaluator))
+    """
+
+    def __init__(self, config: SquidConfig):
+        self.matchers = build_matchers(config)
+        self.rules: List[Rule] = []
+        self.warnings: List[str] = []
+        for directive in config.get('http_access'):
+            if not directive.args or directive.args[0] not in ('allow', 'deny'):
+                self.warnings.append(f"{directive.source.name}:{directive.line}: "
+                                     f"ignoring malformed http_access")
+                continue
+            acls = []
+            for token in directive.args[1:]:
+                negated = token.startswith('!')
+                name = token.lstrip('!')
+                if name not in self.matchers:
+                    self.warnings.append(f"acl {name} is not defined (treated as not matching)")
+                    self.matchers[name] = UnsupportedMatcher(name, 'undefined')
+                acls.append((self.matchers[name], negated))
+            self.rules.append(Rule(len(self.rules) + 1, directive.args[0], acls, directive))
+
+        for matcher in self.matchers.values():
+            if type(matcher) is UnsupportedMatcher and matcher.acl_type != 'undefined' \
+                    and any(m is matcher for rule in self.rules for m, _ in rule.acls):
+                self.warnings.append(f"acl {matcher.name}: type {matcher.acl_type} is not supported "
+                                     f"(treated as not matching)")
+
+        # Squid applies the opposite of the last rule when none matches
+        self.default = 'deny'
+        if self.rules and self.rules[-1].action == 'deny':
+            self.default = 'allow'
+
+        self.requests = 0
+        self.allowed = 0
+        self.implicit = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    def _evaluate(self, batch: _Batch) -> int:
+        """Evaluate a batch; returns the bitmask of allowed requests."""
+        undecided = batch.full
+        allowed = 0
+        for rule in self.rules:
+            if not undecided:
+                break
+            matched = undecided
+            rule.reached += undecided.bit_count()
+            for matcher, negated in rule.acls:
+                checks = matched.bit_count()
+                rule.evaluations += checks
+                rule.cost += checks * matcher.cost
+                mask = batch.mask(matcher)
+                matched &= (batch.full ^ mask) if negated else mask
+                if not matched:
+                    break
+            if matched:
+                rule.hits += matched.bit_count()
+                if rule.action == 'allow':
+                    allowed |= matched
+                undecided &= ~matched
+
+        self.implicit += undecided.bit_count()
+        if self.default == 'allow':
+            allowed |= undecided
+        self.requests += len(batch.requests)
+        self.allowed += allowed.bit_count()
+        return allowed
+
+    def evaluate(self, requests: Sequence[Request]) -> List[str]:
+        """
+        Decide a batch of requests.
+
+        Args:
+            requests: Requests to evaluate together
+
+        Returns:
+            'allow' or 'deny' for each request, in order
+        """
+        allowed = self._evaluate(_Batch(requests))
+        return ['allow' if allowed >> i & 1 else 'deny' for i in range(len(requests))]
+
+    def replay(self, lines: Iterable[bytes], batch_size: int = BATCH_SIZE) -> None:
+        """
+        Replay access.log lines, accumulating decisions and rule statistics.
+
+        Args:
+            lines: Native-format access.log lines (bytes)
+            batch_size: Requests evaluated together
+        """
+        start = time.perf_counter()
+        batch: List[Request] = []
+        for line in lines:
+            request = parse_request(line)
+            if request is None:
+                if line.strip():
+                    self.skipped += 1
+                continue
+            batch.append(request)
+            if len(batch) >= batch_size:
+                self._evaluate(_Batch(batch))
+                batch = []
+        if batch:
+            self._evaluate(_Batch(batch))
+        self.seconds += time.perf_counter() - start
+
+    def findings(self) -> List[str]:
+        """
+        Rules worth a look: never reached, never matching, expensive for
+        what they decide, or cheaper rules that could move up.
+
+        Returns:
+            Human-readable findings, configuration warnings first
+        """
+        findings = list(self.warnings)
+        if not self.requests:
+            return findings
+        total_cost = sum(rule.cost for rule in self.rules) or 1.0
+
+        for rule in self.rules:
+            label = f"rule {rule.index} ({rule.location})"
+            if not rule.reached:
+                findings.append(f"{label} is never reached: earlier rules decide every request")
+            elif not rule.hits:
+                findings.append(f"{label} never matched any of the {rule.reached:,} requests reaching it")
+            cost_share = rule.cost / total_cost
+            hit_share = rule.hits / self.requests
+            if cost_share >= SLOW_COST_SHARE and hit_share < SLOW_HIT_SHARE:
+                findings.append(f"{label} is slow: {cost_share:.0%} of the estimated evaluation cost "
+                                f"for {hit_share:.1%} of the decisions")
+
+        # Rules with the same action can be reordered without changing any
+        # decision, as long as no rule with the other action sits between them
+        run_start = 0
+        for i, rule in enumerate(self.rules):
+            if rule.action != self.rules[run_start].action:
+                run_start = i
+            for earlier in self.rules[run_start:i]:
+                if rule.unit_cost < earlier.unit_cost and rule.hits > earlier.hits:
+                    findings.append(f"rule {rule.index} ({rule.location}) is cheaper than rule "
+                                    f"{earlier.index} and decides more requests; moving it before "
+                                    f"rule {earlier.index} does not change any decision")
+                    break
+        return findings
+
+
+def format_report(evaluator: AccessEvaluator) -> str:
+    """Text report of a replay: decisions, per-rule statistics and findings."""
+    requests = evaluator.requests
+    denied = requests - evaluator.allowed
+    rate = requests / evaluator.seconds if evaluator.seconds else 0.0
+    lines = [
+        f"Replayed {requests:,} requests in {evaluator.seconds:.2f}s ({rate:,.0f} requests/s): "
+        f"{evaluator.allowed:,} allowed, {denied:,} denied, {evaluator.implicit:,} by the implicit "
+        f"default ({evaluator.default})",
+    ]
+    if evaluator.skipped:
+        lines.append(f"Skipped {evaluator.skipped:,} lines not in the native access.log format")
+
+    total_cost = sum(rule.cost for rule in evaluator.rules) or 1.0
+    lines.append('')
+    lines.append(f"{'#':>3} {'reached':>10} {'hits':>10} {'checks':>11} {'cost':>6}  rule")
+    for rule in evaluator.rules:
+        lines.append(f"{rule.index:>3} {rule.reached:>10,} {rule.hits:>10,} {rule.evaluations:>11,} "
+                     f"{rule.cost / total_cost:>6.1%}  {rule.text}  [{rule.location}]")
+
+    findings = evaluator.findings()
+    if findings:
+        lines.append('')
+        lines.append('Findings:')
+        lines.extend(f"  - {finding}" for finding in findings)
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay an access.log through the http_access rules.')
+    parser.add_argument('access_log', type=Path)
+    parser.add_argument('--config', type=Path, default=SQUID_CONF)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    evaluator = AccessEvaluator(load_squid_config(args.config))
+    with open(args.access_log, 'rb') as f:
+        evaluator.replay(f, args.batch_size)
+    print(format_report(evaluator))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
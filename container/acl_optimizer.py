@@ -0,0 +1,501 @@
+"""
+Startup compiler for large dstdomain, src and dst ACL files.
+
+Squid loads dstdomain lists into a splay tree one entry at a time, warns
+about every entry made redundant by another, and keeps all of them in
+memory. Production block lists (millions of lines) are unsorted and full of
+subdomains already covered by a parent wildcard (.example.com covers
+ads.example.com and example.com), so the load is slow, memory-hungry and
+floods cache.log.
+
+optimize_domain_file() streams a list once and:
+
+- normalizes entries (lowercase, trailing dot removed, IDNA-encoded)
+- sorts them by reversed labels (com.example.ads), which is the depth-first
+  order of a reversed-label trie: every name follows its parent
+  immediately, so a single scan drops duplicates and every entry covered by
+  a preceding wildcard without building the trie in memory
+- writes the minimal list, cached under ACL_CACHE_DIR by content hash
+
+optimize_network_file() does the same for src/dst address lists, which
+are typically generated with tens of thousands of overlapping CIDRs: each
+entry becomes an integer interval, the sorted intervals are merged when
+they overlap or touch, and every merged interval is written as the fewest
+CIDR blocks covering it exactly. Entries that are not literal addresses
+(host names, 'all') are kept unchanged.
+
+optimize_config() applies these to every file the configuration's
+dstdomain, src and dst acls reference and writes a runtime copy of
+squid.conf (includes inlined) that points at the optimized files. The
+original configuration is not touched.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import socket
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from squid_config import Directive, SquidConfig
+
+
+ACL_OPTIMIZE = os.getenv('ACL_OPTIMIZE', 'false').lower() == 'true'
+
+# Optimized lists, named by the hash of their source (persists across restarts)
+ACL_CACHE_DIR = Path(os.getenv('ACL_CACHE_DIR', '/var/lib/squid/acl-cache'))
+
+# Flattened squid.conf pointing at the optimized lists
+RUNTIME_CONFIG = Path('/var/run/squid/squid.runtime.conf')
+
+# Bump when the output format or rules change, to invalidate cached lists
+OPTIMIZER_VERSION = b'1'
+
+_HASH_BLOCK = 1024 * 1024
+
+# Separates reversed labels in sort keys. It sorts below every character
+# allowed in a host name, so all names below a domain sort directly after it
+_SEP = '\x00'
+
+# Characters that cannot appear in a host name (URLs, quoted paths, comments)
+_INVALID = re.compile(r'[\s/#"]|\.\.')
+
+
+@dataclass
+class OptimizeStats:
+    """
+    Outcome of optimizing one list.
+
+    covered counts entries made redundant by a wildcard or absorbed into a
+    wider or adjacent network; invalid counts dropped domain entries and
+    unchanged counts network entries that are not addresses.
+    """
+
+    source: Path
+    output: Path
+    entries_in: int = 0
+    entries_out: int = 0
+    duplicates: int = 0
+    covered: int = 0
+    invalid: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+    cached: bool = False
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of entries removed."""
+        return 1 - self.entries_out / self.entries_in if self.entries_in else 0.0
+
+    def summary(self) -> str:
+        if self.cached:
+            return f"{self.source}: using cached optimized list ({self.output.name})"
+        skipped = f"{self.unchanged:,} not addresses" if self.unchanged else f"{self.invalid:,} invalid"
+        return (f"{self.source}: {self.entries_in:,} -> {self.entries_out:,} entries "
+                f"({self.reduction:.1%} smaller: {self.duplicates:,} duplicates, "
+                f"{self.covered:,} covered by wider entries, {skipped}) "
+                f"in {self.seconds:.2f}s")
+
+
+def normalize_domain(entry: str) -> Optional[str]:
+    """
+    Canonical form of a dstdomain entry.
+
+    Args:
+        entry: Raw list entry, e.g. '.Example.COM.' or 'bücher.de'
+
+    Returns:
+        Lowercase, IDNA-encoded entry keeping a leading '.' (wildcard), or
+        None if it is not a valid domain name
+    """
+    wildcard = entry.startswith('.')
+    name = entry.strip('.').lower()
+    if not name:
+        return None
+    if not name.isascii():
+        try:
+            name = name.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    if _INVALID.search(name):
+        return None
+    return '.' + name if wildcard else name
+
+
+def sort_key(domain: str) -> str:
+    """
+    Reversed-label sort key of a normalized entry.
+
+    A wildcard sorts immediately before the same name without the wildcard
+    (whose key ends in an empty label), and both before every subdomain.
+    """
+    if domain.startswith('.'):
+        return _SEP.join(reversed(domain[1:].split('.')))
+    return _SEP.join(reversed(domain.split('.'))) + _SEP
+
+
+def _from_key(key: str) -> str:
+    if key.endswith(_SEP):
+        return '.'.join(reversed(key[:-1].split(_SEP)))
+    return '.' + '.'.join(reversed(key.split(_SEP)))
+
+
+def minimize(keys: Iterable[str]) -> Tuple[List[str], int, int]:
+    """
+    Drop duplicates and entries covered by a wildcard.
+
+    Args:
+        keys: sort_key() values, sorted
+
+    Returns:
+        (kept entries in sorted order, duplicates, covered)
+    """
+    kept: List[str] = []
+    duplicates = covered = 0
+    previous = None
+    cover = None  # key of the wildcard covering the current run, plus _SEP
+
+    for key in keys:
+        if key == previous:
+            duplicates += 1
+            continue
+        previous = key
+        if cover is not None and key.startswith(cover):
+            covered += 1
+            continue
+        # Wildcard keys never end in the separator; exact names always do
+        cover = key + _SEP if not key.endswith(_SEP) else None
+        kept.append(_from_key(key))
+    return kept, duplicates, covered
+
+
+def read_entries(path: Path) -> Iterator[str]:
+    """Whitespace-separated entries of an acl list file, '#' comments skipped."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            yield from line.split()
+
+
+def _source_hash(path: Path, kind: str) -> str:
+    digest = hashlib.sha256(OPTIMIZER_VERSION + b'\0' + kind.encode() + b'\0')
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def optimize_domain_file(source: Path, cache_dir: Path = ACL_CACHE_DIR) -> OptimizeStats:
+    """
+    Write a minimal, sorted copy of a dstdomain list (or reuse a cached one).
+
+    Args:
+        source: dstdomain list file
+        cache_dir: Directory for optimized lists
+
+    Returns:
+        OptimizeStats with the output path
+
+    Raises:
+        OSError: If the source cannot be read or the output written
+    """
+    output = _output_path(source, cache_dir, 'dstdomain')
+    stats = OptimizeStats(source=source, output=output)
+    if output.exists():
+        stats.cached = True
+        return stats
+
+    start = time.monotonic()
+    keys = []
+    for entry in read_entries(source):
+        stats.entries_in += 1
+        domain = normalize_domain(entry)
+        if domain is None:
+            stats.invalid += 1
+            logging.debug(f"{source}: ignoring invalid dstdomain entry {entry!r}")
+            continue
+        keys.append(sort_key(domain))
+    keys.sort()
+
+    kept, stats.duplicates, stats.covered = minimize(keys)
+    del keys
+    stats.entries_out = len(kept)
+
+    _write_list(output, stats, kept)
+    stats.seconds = time.monotonic() - start
+    return stats
+
+
+def _output_path(source: Path, cache_dir: Path, kind: str) -> Path:
+    return cache_dir / f'{source.stem}-{kind}-{_source_hash(source, kind)[:16]}.acl'
+
+
+def _write_list(output: Path, stats: OptimizeStats, lines: List[str]) -> None:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(f'# Optimized from {stats.source} ({stats.entries_in} entries)\n')
+        f.write('\n'.join(lines))
+        f.write('\n')
+    os.replace(tmp, output)
+
+
+_FAMILIES = ((socket.AF_INET, 32), (socket.AF_INET6, 128))
+
+
+def _parse_address(text: str) -> Optional[Tuple[int, int]]:
+    """(family index, integer address), or None if text is not an address."""
+    for index, (family, _) in enumerate(_FAMILIES):
+        try:
+            return index, int.from_bytes(socket.inet_pton(family, text), 'big')
+        except OSError:
+            continue
+    return None
+
+
+def parse_network(entry: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Address range of a src/dst acl entry.
+
+    Args:
+        entry: Address, CIDR ('10.0.0.0/8', '10.0.0.0/255.0.0.0',
+               'fe80::/10') or range ('10.0.0.1-10.0.0.9')
+
+    Returns:
+        (family index: 0 for IPv4, 1 for IPv6, first address, last address)
+        as integers, or None if entry is not in one of these forms
+    """
+    if '-' in entry:
+        low, _, high = entry.partition('-')
+        first, last = _parse_address(low), _parse_address(high)
+        if first is None or last is None or first[0] != last[0] or first[1] > last[1]:
+            return None
+        return first[0], first[1], last[1]
+
+    address, _, mask = entry.partition('/')
+    parsed = _parse_address(address)
+    if parsed is None:
+        return None
+    index, value = parsed
+    bits = _FAMILIES[index][1]
+    if not mask:
+        return index, value, value
+
+    if mask.isdigit():
+        prefix = int(mask)
+        if prefix > bits:
+            return None
+        host = (1 << (bits - prefix)) - 1
+    else:
+        netmask = _parse_address(mask)
+        if netmask is None or netmask[0] != index:
+            return None
+        host = netmask[1] ^ ((1 << bits) - 1)
+        if host & (host + 1):
+            return None  # not a contiguous netmask
+    first = value & ~host
+    return index, first, first | host
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> Tuple[List[Tuple[int, int]], int, int]:
+    """
+    Merge overlapping and adjacent address ranges.
+
+    Args:
+        ranges: (first, last) integer ranges of one address family, sorted
+
+    Returns:
+        (merged ranges, duplicates, ranges absorbed into another)
+    """
+    merged: List[Tuple[int, int]] = []
+    duplicates = covered = 0
+    previous = None
+    for first, last in ranges:
+        if (first, last) == previous:
+            duplicates += 1
+            continue
+        previous = (first, last)
+        if merged and first <= merged[-1][1] + 1:
+            covered += 1
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+            continue
+        merged.append((first, last))
+    return merged, duplicates, covered
+
+
+def range_to_cidrs(first: int, last: int, bits: int) -> Iterator[Tuple[int, int]]:
+    """
+    Fewest CIDR blocks exactly covering an address range.
+
+    Yields:
+        (network address, prefix length)
+    """
+    while first <= last:
+        # Largest block aligned at first that does not extend past last
+        aligned = (first & -first).bit_length() - 1 if first else bits
+        fits = (last - first + 1).bit_length() - 1
+        host_bits = min(aligned, fits)
+        yield first, bits - host_bits
+        first += 1 << host_bits
+
+
+def _format_cidr(index: int, address: int, prefix: int) -> str:
+    family, bits = _FAMILIES[index]
+    text = socket.inet_ntop(family, address.to_bytes(bits // 8, 'big'))
+    return text if prefix == bits else f'{text}/{prefix}'
+
+
+def optimize_network_file(source: Path, cache_dir: Path = ACL_CACHE_DIR) -> OptimizeStats:
+    """
+    Write the minimal CIDR list covering a src/dst address list (or reuse a
+    cached one).
+
+    Args:
+        source: src or dst acl list file
+        cache_dir: Directory for optimized lists
+
+    Returns:
+        OptimizeStats with the output path
+
+    Raises:
+        OSError: If the source cannot be read or the output written
+    """
+    output = _output_path(source, cache_dir, 'network')
+    stats = OptimizeStats(source=source, output=output)
+    if output.exists():
+        stats.cached = True
+        return stats
+
+    start = time.monotonic()
+    ranges: Tuple[List[Tuple[int, int]], ...] = ([], [])
+    kept: List[str] = []
+    unchanged = set()
+    for entry in read_entries(source):
+        stats.entries_in += 1
+        parsed = parse_network(entry)
+        if parsed is None:
+            stats.unchanged += 1
+            if entry in unchanged:
+                stats.duplicates += 1
+            else:
+                unchanged.add(entry)
+                kept.append(entry)
+            continue
+        ranges[parsed[0]].append(parsed[1:])
+
+    for index, family_ranges in enumerate(ranges):
+        family_ranges.sort()
+        merged, duplicates, covered = merge_ranges(family_ranges)
+        stats.duplicates += duplicates
+        stats.covered += covered
+        bits = _FAMILIES[index][1]
+        for first, last in merged:
+            kept.extend(_format_cidr(index, address, prefix)
+                        for address, prefix in range_to_cidrs(first, last, bits))
+    stats.entries_out = len(kept)
+
+    _write_list(output, stats, kept)
+    stats.seconds = time.monotonic() - start
+    return stats
+
+
+# acl type -> list optimizer
+OPTIMIZERS: Dict[str, Callable[[Path, Path], OptimizeStats]] = {
+    'dstdomain': optimize_domain_file,
+    'src': optimize_network_file,
+    'dst': optimize_network_file,
+}
+
+
+def _render(directive: Directive, replacements: Dict[Tuple[str, Path], Path]) -> str:
+    args = directive.args
+    if directive.name == 'acl' and len(args) > 2 and args[1] in OPTIMIZERS:
+        args = list(args)
+        for i, value in enumerate(args[2:], 2):
+            if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+                path = Path(value[1:-1])
+                if not path.is_absolute():
+                    path = directive.source.parent / path
+                if (args[1], path) in replacements:
+                    args[i] = f'"{replacements[args[1], path]}"'
+    return ' '.join([directive.name] + args)
+
+
+def write_runtime_config(config: SquidConfig, replacements: Dict[Tuple[str, Path], Path],
+                         output: Path = RUNTIME_CONFIG) -> Path:
+    """
+    Write a flattened copy of the configuration using replacement acl files.
+
+    Includes are inlined in order and continuation lines joined, so the
+    copy is self-contained.
+
+    Args:
+        config: Parsed source configuration
+        replacements: (acl type, source acl file) -> optimized file
+        output: Runtime configuration path
+
+    Returns:
+        output
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(f'# Generated from {config.path} with optimized acl lists; do not edit\n')
+        for directive in config.directives:
+            f.write(_render(directive, replacements) + '\n')
+    os.replace(tmp, output)
+    return output
+
+
+def optimizable_files(config: SquidConfig) -> List[Tuple[str, Path]]:
+    """(acl type, file) for every list an optimizer exists for, in config order."""
+    files: List[Tuple[str, Path]] = []
+    for acl in config.acls:
+        if acl.acl_type in OPTIMIZERS:
+            files.extend((acl.acl_type, path) for path in acl.files
+                         if (acl.acl_type, path) not in files)
+    return files
+
+
+def optimize_config(config: SquidConfig, cache_dir: Path = ACL_CACHE_DIR,
+                    output: Path = RUNTIME_CONFIG) -> Tuple[Path, List[OptimizeStats]]:
+    """
+    Optimize every dstdomain, src and dst list and write the runtime
+    configuration.
+
+    Lists that cannot be read are left for Squid to report.
+
+    Args:
+        config: Parsed source configuration
+        cache_dir: Directory for optimized lists
+        output: Runtime configuration path
+
+    Returns:
+        (runtime configuration path, per-list statistics)
+
+    Raises:
+        OSError: If the runtime configuration cannot be written
+    """
+    replacements: Dict[Tuple[str, Path], Path] = {}
+    results: List[OptimizeStats] = []
+    optimized: Dict[Tuple[Callable, Path], OptimizeStats] = {}
+    for acl_type, path in optimizable_files(config):
+        optimizer = OPTIMIZERS[acl_type]
+        stats = optimized.get((optimizer, path))
+        if stats is None:
+            try:
+                stats = optimizer(path, cache_dir)
+            except OSError as e:
+                logging.warning(f"Cannot optimize {acl_type} list {path}: {e}")
+                continue
+            optimized[optimizer, path] = stats
+            results.append(stats)
+        replacements[acl_type, path] = stats.output
+
+    # Written even without replacements: Squid re-reads the file it was
+    # started with on reconfigure, so lists added later still get optimized
+    return write_runtime_config(config, replacements, output), results
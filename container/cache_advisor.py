@@ -0,0 +1,529 @@
+"""
+Cache volume sizing advisor.
+
+Recommends cache_dir size, L1/L2 fan-out and store type from what the
+cache filesystem and the cached objects actually look like:
+
+- statvfs: free blocks and free inodes of every filesystem holding a
+  cache_dir, shared by all cache_dirs on it (weighted by configured size)
+- objects: sizes (apparent and allocated) sampled from the existing swap
+  directories in a bounded, parallel walk; the share of files in the
+  visited directories also estimates the current object count
+- memory: cache_mem plus Squid's in-memory index (one StoreEntry per cached
+  object) against the container memory limit
+
+ufs, aufs and diskd store one file per object, so a filesystem with many
+small objects runs out of inodes long before it runs out of blocks; such a
+cache_dir is reported as inode-bound and rock (one database file) is
+recommended instead. A ufs-style cache_dir also holds at most 2^24 objects.
+
+Squid assumes store_avg_object_size (13 KB) when nothing was sampled.
+
+Usage:
+    python3 cache_advisor.py [--config /etc/squid/squid.conf] [--sample N] [--apply]
+"""
+
+import argparse
+import logging
+import math
+import os
+import random
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cache_integrity import SAMPLE_DIRS, UFS_STORE_TYPES, swap_layout
+from squid_config import SQUID_CONF, CacheDir, SquidConfig, load_squid_config
+
+
+MB = 1024 * 1024
+
+# Files whose size is sampled per cache_dir (0 disables the advisor in init-squid)
+SAMPLE_FILES = int(os.getenv('CACHE_ADVISOR_SAMPLE', '20000'))
+
+# Threads listing swap directories while sampling
+SAMPLE_WORKERS = min(16, (os.cpu_count() or 1) * 4)
+
+# Space kept free: 10% of the filesystem (Squid's recommendation), at most 5 GB
+HEADROOM_RATIO = 0.10
+HEADROOM_MAX_MB = 5120
+
+# Inodes kept free for swap.state rewrites, logs and other files
+INODE_HEADROOM_RATIO = 0.05
+
+# Squid's store_avg_object_size default
+DEFAULT_OBJECT_SIZE = 13 * 1024
+
+# Squid's cache_mem default
+DEFAULT_CACHE_MEM_MB = 256
+
+# Memory per indexed object (StoreEntry, key and hash table slot, 64-bit)
+INDEX_BYTES_PER_OBJECT = 160
+
+# Warn when cache_mem and the index exceed this share of the memory limit
+MEMORY_LIMIT_RATIO = 0.8
+
+# Objects per L2 directory Squid's layout guidance aims for
+OBJECTS_PER_DIR = 256
+
+# Largest swap file number of a ufs-style cache_dir
+MAX_UFS_OBJECTS = (1 << 24) - 1
+
+# L1 and L2 counts are two hex digits
+MAX_FANOUT = 256
+
+# cache_mem and size units
+_UNITS = {'bytes': 1, 'kb': 1024, 'mb': MB, 'gb': 1024 * MB}
+
+_CGROUP_LIMITS = (Path('/sys/fs/cgroup/memory.max'),
+                  Path('/sys/fs/cgroup/memory/memory.limit_in_bytes'))
+
+
+@dataclass
+class FilesystemUsage:
+    """Blocks and inodes of the filesystem holding a cache_dir (from statvfs)."""
+
+    device: int
+    total_bytes: int
+    free_bytes: int
+    block_size: int
+    inodes_total: int
+    inodes_free: int
+
+    @classmethod
+    def from_path(cls, path: Path) -> 'FilesystemUsage':
+        """
+        Args:
+            path: Any path on the filesystem
+
+        Raises:
+            OSError: If the filesystem cannot be inspected
+        """
+        st = os.statvfs(path)
+        return cls(device=os.stat(path).st_dev,
+                   total_bytes=st.f_blocks * st.f_frsize,
+                   free_bytes=st.f_bavail * st.f_frsize,
+                   block_size=st.f_frsize,
+                   inodes_total=st.f_files,
+                   inodes_free=st.f_favail)
+
+    @property
+    def headroom_bytes(self) -> int:
+        return min(int(self.total_bytes * HEADROOM_RATIO), HEADROOM_MAX_MB * MB)
+
+    @property
+    def inodes_limited(self) -> bool:
+        """False for filesystems without a fixed inode table (btrfs reports 0)."""
+        return self.inodes_total > 0
+
+
+@dataclass
+class ObjectSample:
+    """Object sizes sampled from one cache_dir's swap directories."""
+
+    sizes: List[int] = field(default_factory=list)
+    disk_bytes: int = 0
+    files_seen: int = 0
+    dirs_visited: int = 0
+    dirs_total: int = 0
+
+    @property
+    def estimated_objects(self) -> int:
+        """Objects in the whole cache_dir, extrapolated from the visited directories."""
+        if not self.dirs_visited:
+            return 0
+        return round(self.files_seen * self.dirs_total / self.dirs_visited)
+
+    @property
+    def mean_size(self) -> Optional[float]:
+        return sum(self.sizes) / len(self.sizes) if self.sizes else None
+
+    @property
+    def mean_disk_size(self) -> Optional[float]:
+        """Mean allocated size: blocks are allocated per file."""
+        return self.disk_bytes / len(self.sizes) if self.sizes else None
+
+    def percentile(self, q: float) -> Optional[int]:
+        if not self.sizes:
+            return None
+        ordered = sorted(self.sizes)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _scan_dir(path: Path, limit: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """Count files in a swap directory and stat up to limit of them."""
+    files = 0
+    sampled: List[Tuple[int, int]] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                files += 1
+                if len(sampled) < limit:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    sampled.append((st.st_size, st.st_blocks * 512))
+    except OSError:
+        pass
+    return files, sampled
+
+
+def sample_objects(cache_dir: CacheDir, limit: int = SAMPLE_FILES,
+                   workers: int = SAMPLE_WORKERS, seed: int = 0,
+                   max_dirs: int = SAMPLE_DIRS) -> ObjectSample:
+    """
+    Sample object sizes from a ufs-style cache_dir.
+
+    At most max_dirs L2 directories are visited, in random order and
+    workers at a time, and up to limit / max_dirs files are stat()ed in
+    each until limit sizes are collected. The sample is spread over the
+    whole tree, and the object count is extrapolated from the directories
+    visited rather than listing all of them.
+
+    Args:
+        cache_dir: ufs, aufs or diskd cache_dir
+        limit: Number of object sizes to collect
+        workers: Directories listed concurrently
+        seed: Seed for the directory order
+        max_dirs: Most L2 directories to visit
+
+    Returns:
+        ObjectSample (empty for a new cache)
+    """
+    l1, l2 = swap_layout(cache_dir)
+    dirs = [cache_dir.path / f'{i:02X}' / f'{j:02X}' for i in range(l1) for j in range(l2)]
+    random.Random(seed).shuffle(dirs)
+    sample = ObjectSample(dirs_total=len(dirs))
+    if limit <= 0:
+        return sample
+
+    max_dirs = min(len(dirs), max_dirs)
+    per_dir = max(4, math.ceil(limit / max_dirs))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-advisor') as executor:
+        for start in range(0, max_dirs, workers):
+            batch = dirs[start:min(start + workers, max_dirs)]
+            for files, sampled in executor.map(_scan_dir, batch, [per_dir] * len(batch)):
+                sample.files_seen += files
+                sample.sizes.extend(size for size, _ in sampled)
+                sample.disk_bytes += sum(blocks for _, blocks in sampled)
+            sample.dirs_visited += len(batch)
+            if len(sample.sizes) >= limit or sample.dirs_visited >= max_dirs:
+                break
+    return sample
+
+
+def parse_size(args: Sequence[str], default_unit: str = 'mb') -> Optional[int]:
+    """Bytes of a "<number> [unit]" directive value (e.g. cache_mem 64 MB)."""
+    if not args:
+        return None
+    try:
+        value = float(args[0])
+    except ValueError:
+        return None
+    unit = args[1].lower() if len(args) > 1 else default_unit
+    return int(value * _UNITS.get(unit, _UNITS[default_unit]))
+
+
+def cache_mem_mb(config: SquidConfig) -> int:
+    """Configured cache_mem in MB (the last directive wins, as in Squid)."""
+    size = None
+    for directive in config.directives:
+        if directive.name == 'cache_mem':
+            size = parse_size(directive.args)
+    return DEFAULT_CACHE_MEM_MB if size is None else size // MB
+
+
+def memory_limit_mb() -> Optional[int]:
+    """Container memory limit from the cgroup (None if unlimited or unknown)."""
+    for path in _CGROUP_LIMITS:
+        try:
+            value = path.read_text().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // MB
+        return None
+    return None
+
+
+def swap_fanout(objects: int) -> Tuple[int, int]:
+    """L1 and L2 counts keeping about OBJECTS_PER_DIR objects per directory."""
+    l2 = MAX_FANOUT
+    l1 = math.ceil(objects / (l2 * OBJECTS_PER_DIR))
+    return max(16, min(MAX_FANOUT, l1)), l2
+
+
+@dataclass
+class Recommendation:
+    """Recommended cache_dir settings and why."""
+
+    cache_dir: CacheDir
+    store_type: str
+    size_mb: int
+    l1: Optional[int] = None
+    l2: Optional[int] = None
+    limited_by: str = 'space'
+    objects: int = 0
+    sample: Optional[ObjectSample] = None
+    warnings: List[str] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def directive(self) -> str:
+        """The recommended cache_dir line (options kept)."""
+        parts = ['cache_dir', self.store_type, str(self.cache_dir.path), str(self.size_mb)]
+        if self.l1 and self.l2:
+            parts += [str(self.l1), str(self.l2)]
+        return ' '.join(parts + list(self.cache_dir.options))
+
+
+@dataclass
+class SizingReport:
+    """Recommendations for every cache_dir plus memory findings."""
+
+    recommendations: List[Recommendation] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    index_mb: float = 0.0
+
+
+def _recommend(cache_dir: CacheDir, fs: FilesystemUsage, share: float, space_budget: int,
+               inode_budget: Optional[int], sample: Optional[ObjectSample]) -> Recommendation:
+    mean_size = (sample.mean_size if sample else None) or DEFAULT_OBJECT_SIZE
+    disk_size = (sample.mean_disk_size if sample else None) \
+        or math.ceil(mean_size / fs.block_size) * fs.block_size
+    ufs = cache_dir.store_type in UFS_STORE_TYPES
+
+    # Content bytes that fit in this cache_dir's share of the free blocks
+    space_bytes = int(share * space_budget * mean_size / disk_size)
+    size_bytes, limited_by = space_bytes, 'space'
+    if ufs:
+        l1, l2 = swap_layout(cache_dir)
+        max_objects = MAX_UFS_OBJECTS
+        if inode_budget is not None:
+            max_objects = min(max_objects, int(share * inode_budget) - l1 * (l2 + 1))
+        if max_objects * mean_size < space_bytes:
+            size_bytes = max(0, int(max_objects * mean_size))
+            limited_by = 'object-count' if max_objects == MAX_UFS_OBJECTS else 'inode'
+
+    recommendation = Recommendation(cache_dir, cache_dir.store_type, size_bytes // MB,
+                                    limited_by=limited_by, sample=sample)
+    fits_mb = size_bytes // MB
+    if (cache_dir.size_mb or 0) > fits_mb:
+        reason = {
+            'space': f"{share * space_budget // MB:,.0f} MB free after headroom",
+            'inode': f"{max(0, max_objects) if ufs else 0:,} inodes free",
+            'object-count': f"{MAX_UFS_OBJECTS:,} objects per cache_dir",
+        }[limited_by]
+        recommendation.warnings.append(
+            f"cache_dir {cache_dir.path}: {cache_dir.size_mb:,} MB configured but only {fits_mb:,} MB "
+            f"of {mean_size / 1024:.1f} KB objects fit ({limited_by}-bound: {reason})")
+
+    if limited_by == 'inode':
+        recommendation.store_type = 'rock'
+        recommendation.size_mb = space_bytes // MB
+        recommendation.notes.append(
+            f"inode-bound: rock keeps all objects in one file; staying on {cache_dir.store_type} "
+            f"means at most {fits_mb:,} MB")
+    elif limited_by == 'object-count':
+        recommendation.notes.append(
+            f"a {cache_dir.store_type} cache_dir holds at most {MAX_UFS_OBJECTS:,} objects; "
+            f"split the remaining {(space_bytes - size_bytes) // MB:,} MB into another cache_dir")
+    elif cache_dir.store_type == 'ufs':
+        recommendation.store_type = 'aufs'
+        recommendation.notes.append("ufs does disk I/O in Squid's main loop, aufs in threads")
+
+    recommendation.objects = int(recommendation.size_mb * MB / mean_size)
+    if recommendation.store_type in UFS_STORE_TYPES:
+        recommendation.l1, recommendation.l2 = swap_fanout(recommendation.objects)
+    return recommendation
+
+
+def advise(cache_dirs: Sequence[CacheDir], cache_mem: int = DEFAULT_CACHE_MEM_MB,
+           memory_limit: Optional[int] = None, sample_files: int = SAMPLE_FILES) -> SizingReport:
+    """
+    Recommend settings for every cache_dir.
+
+    cache_dirs on one filesystem share its free space and inodes in
+    proportion to their configured sizes; what the caches already use
+    counts as available to them. Blocking (walks the swap directories).
+
+    Args:
+        cache_dirs: Configured cache_dirs
+        cache_mem: cache_mem in MB
+        memory_limit: Container memory limit in MB (None: unlimited)
+        sample_files: Object sizes to sample per cache_dir
+
+    Returns:
+        SizingReport
+
+    Raises:
+        OSError: If a cache_dir's filesystem cannot be inspected
+    """
+    report = SizingReport()
+    groups: Dict[int, Tuple[FilesystemUsage, List[CacheDir]]] = {}
+    for cache_dir in cache_dirs:
+        fs = FilesystemUsage.from_path(cache_dir.path)
+        groups.setdefault(fs.device, (fs, []))[1].append(cache_dir)
+
+    recommendations: Dict[int, Recommendation] = {}
+    for fs, members in groups.values():
+        samples = {id(cd): sample_objects(cd, sample_files) if cd.store_type in UFS_STORE_TYPES else None
+                   for cd in members}
+        used_bytes = used_inodes = 0
+        for sample in samples.values():
+            if sample and sample.sizes:
+                used_bytes += int(sample.estimated_objects * sample.mean_disk_size)
+                used_inodes += sample.estimated_objects
+
+        space_budget = max(0, fs.free_bytes + used_bytes - fs.headroom_bytes)
+        inode_budget = None
+        if fs.inodes_limited:
+            inode_budget = max(0, fs.inodes_free + used_inodes
+                               - int(fs.inodes_total * INODE_HEADROOM_RATIO))
+
+        weights = [cd.size_mb or 1 for cd in members]
+        for cd, weight in zip(members, weights):
+            recommendations[id(cd)] = _recommend(cd, fs, weight / sum(weights), space_budget,
+                                                 inode_budget, samples[id(cd)])
+
+    report.recommendations = [recommendations[id(cd)] for cd in cache_dirs]
+    for recommendation in report.recommendations:
+        report.warnings.extend(recommendation.warnings)
+
+    # The index covers what is configured, not what is recommended
+    report.index_mb = sum((cd.size_mb or 0) * MB / ((r.sample.mean_size if r.sample else None)
+                                                    or DEFAULT_OBJECT_SIZE)
+                          for cd, r in zip(cache_dirs, report.recommendations)) \
+        * INDEX_BYTES_PER_OBJECT / MB
+    if memory_limit and cache_mem + report.index_mb > memory_limit * MEMORY_LIMIT_RATIO:
+        report.warnings.append(
+            f"cache_mem {cache_mem} MB plus ~{report.index_mb:.0f} MB of store index exceeds "
+            f"{MEMORY_LIMIT_RATIO:.0%} of the {memory_limit} MB memory limit")
+    return report
+
+
+def format_report(report: SizingReport) -> str:
+    """Text report: per cache_dir findings and the recommended lines."""
+    lines = []
+    for r in report.recommendations:
+        lines.append(f"{r.cache_dir.path} ({r.cache_dir.store_type}, {r.cache_dir.size_mb or 0:,} MB configured)")
+        sample = r.sample
+        if sample and sample.sizes:
+            lines.append(f"  objects: ~{sample.estimated_objects:,}, mean {sample.mean_size / 1024:.1f} KB "
+                         f"({sample.mean_disk_size / 1024:.1f} KB on disk), median "
+                         f"{sample.percentile(0.5) / 1024:.1f} KB, p90 {sample.percentile(0.9) / 1024:.1f} KB "
+                         f"({len(sample.sizes):,} sampled in {sample.dirs_visited:,}/{sample.dirs_total:,} dirs)")
+        else:
+            lines.append(f"  objects: none sampled, assuming {DEFAULT_OBJECT_SIZE // 1024} KB")
+        lines.extend(f"  warning: {warning}" for warning in r.warnings)
+        lines.extend(f"  note: {note}" for note in r.notes)
+        lines.append(f"  recommended: {r.directive}  ({r.limited_by}-bound, ~{r.objects:,} objects)")
+    lines.append(f"store index: ~{report.index_mb:.0f} MB of memory")
+    lines.extend(f"warning: {warning}" for warning in report.warnings
+                 if not any(warning in r.warnings for r in report.recommendations))
+    return '\n'.join(lines)
+
+
+def _initialized(path: Path) -> bool:
+    try:
+        return any(path.iterdir())
+    except OSError:
+        return False
+
+
+def apply_recommendations(config: SquidConfig, report: SizingReport) -> List[str]:
+    """
+    Rewrite cache_dir lines in the configuration files they come from.
+
+    The size is always updated. Store type and L1/L2 change the on-disk
+    layout, so they are only updated for cache_dirs that are still empty.
+    Lines continued with a backslash are left alone. Files are replaced
+    atomically, keeping their mode and (where permitted) ownership.
+
+    Args:
+        config: Parsed configuration the report was made for
+        report: advise() result
+
+    Returns:
+        The rewritten lines
+
+    Raises:
+        OSError: If a configuration file cannot be rewritten
+    """
+    edits: Dict[Path, Dict[int, str]] = {}
+    for recommendation in report.recommendations:
+        cache_dir = recommendation.cache_dir
+        if recommendation.size_mb <= 0:
+            continue
+        directive = next((d for d in config.directives if d.name == 'cache_dir' and len(d.args) > 1
+                          and Path(d.args[1]) == cache_dir.path), None)
+        if directive is None:
+            continue
+        if not _initialized(cache_dir.path):
+            line = recommendation.directive
+        else:
+            args = list(directive.args)
+            args[2:3] = [str(recommendation.size_mb)]
+            line = ' '.join(['cache_dir'] + args)
+        edits.setdefault(directive.source, {})[directive.line] = line
+
+    rewritten = []
+    for source, lines in edits.items():
+        text = source.read_text(encoding='utf-8').splitlines(keepends=True)
+        for number, line in lines.items():
+            original = text[number - 1]
+            if original.rstrip().endswith('\\') or not original.lstrip().startswith('cache_dir'):
+                logging.warning(f"{source}:{number}: not a single-line cache_dir, left unchanged")
+                continue
+            indent = original[:len(original) - len(original.lstrip())]
+            text[number - 1] = f'{indent}{line}\n'
+            rewritten.append(line)
+        st = source.stat()
+        tmp = source.with_name(source.name + '.tmp')
+        try:
+            tmp.write_text(''.join(text), encoding='utf-8')
+            os.chmod(tmp, stat.S_IMODE(st.st_mode))
+            try:
+                os.chown(tmp, st.st_uid, st.st_gid)
+            except PermissionError:
+                pass  # not root: the file stays owned by us
+            os.replace(tmp, source)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
+    return rewritten
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Recommend cache_dir size, fan-out and store type.')
+    parser.add_argument('--config', type=Path, default=SQUID_CONF)
+    parser.add_argument('--sample', type=int, default=SAMPLE_FILES or 20000,
+                        help='object sizes to sample per cache_dir')
+    parser.add_argument('--apply', action='store_true', help='rewrite the cache_dir lines')
+    args = parser.parse_args(argv)
+
+    config = load_squid_config(args.config)
+    if not config.cache_dirs:
+        print(f"No cache_dir in {args.config}")
+        return 0
+    report = advise(config.cache_dirs, cache_mem_mb(config), memory_limit_mb(), args.sample)
+    print(format_report(report))
+    if args.apply:
+        try:
+            rewritten = apply_recommendations(config, report)
+        except OSError as e:
+            print(f"ERROR: Cannot rewrite cache_dir lines: {e}", file=sys.stderr)
+            return 1
+        for line in rewritten:
+            print(f"rewrote: {line}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,468 @@
+"""
+Integrity checks for ufs-style cache_dirs and a warm-store readiness gate.
+
+Squid refuses to start when any L1/L2 swap directory of a ufs, aufs or diskd
+cache_dir is missing, and on every start it rebuilds its in-memory store
+index from the cache_dir's swap.state journal:
+
+- clean log: swap.state.last-clean is at least as new as swap.state (Squid
+  wrote a clean journal on shutdown); records are replayed quickly
+- dirty log: Squid was killed, or a rebuild was interrupted; every record is
+  replayed and objects are validated
+- no log: swap.state is missing or unusable; Squid opens every cache file
+  (minutes on large caches)
+
+verify_cache_dir checks the complete L1/L2 layout, the swap.state header and
+that its size is a whole number of records, detects a dirty shutdown and
+estimates how long the rebuild will take. While Squid rebuilds it serves
+every request as a miss, so StoreRebuildMonitor follows cache.log and holds
+readiness until Squid reports "Finished rebuilding storage from disk".
+
+swap.state layout (Squid 3.3+, 64-bit):
+    header:  op (char, SWAP_LOG_VERSION=3), version (int, 2), record_size
+             (int), padded to record_size bytes
+    records: op (char, ADD=1/DEL=2), swap_filen (int32), timestamp, lastref,
+             expires, lastmod (int64), swap_file_sz (uint64), refcount,
+             flags (uint16), MD5 key (16 bytes), padded to 72 bytes
+"""
+
+import logging
+import os
+import random
+import re
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from log_follower import LogFollower
+from metrics import REGISTRY, Metric, Registry
+from squid_config import SQUID_CONF, CacheDir, load_squid_config
+
+
+# cache_dir types whose swap directories are plain L1/L2 trees
+UFS_STORE_TYPES = ('ufs', 'aufs', 'diskd')
+DEFAULT_L1 = 16
+DEFAULT_L2 = 256
+
+SWAP_STATE = 'swap.state'
+
+SWAP_LOG_NOP = 0
+SWAP_LOG_ADD = 1
+SWAP_LOG_DEL = 2
+SWAP_LOG_VERSION = 3
+SWAP_LOG_FORMAT = 2
+RECORD_SIZE = 72
+HEADER = struct.Struct('=b3xii')
+
+# Records read per chunk when checking swap.state
+READ_RECORDS = 64 * 1024
+
+# L2 directories listed to estimate the number of objects in a cache_dir
+SAMPLE_DIRS = 256
+
+# Rough Squid rebuild rates (entries per second) used for the estimate
+REBUILD_RATES = {
+    'clean log': 200000.0,
+    'dirty log': 50000.0,
+    'no log': 3000.0,
+}
+
+DEFAULT_CACHE_LOG = Path('/var/log/squid/cache.log')
+
+# Hold readiness until the store is rebuilt (in-process health server only)
+WARM_GATE = os.getenv('CACHE_WARM_GATE', 'false').lower() == 'true'
+
+# Stop waiting for a rebuild that has not started this many seconds after
+# Squid started (raised debug_options or store types that log no rebuild)
+WARM_GRACE = float(os.getenv('CACHE_WARM_GRACE', '30'))
+
+# Stop holding readiness after this many seconds of rebuilding
+WARM_TIMEOUT = float(os.getenv('CACHE_WARM_TIMEOUT', '900'))
+
+_REBUILD_START = re.compile(rb'Rebuilding storage in (\S+) \(([a-z ]+)\)')
+_REBUILD_PROGRESS = re.compile(rb'Store rebuilding is\s+([\d.]+)% complete')
+_REBUILD_DONE = b'Finished rebuilding storage from disk'
+_SQUID_START = b'Starting Squid Cache version'
+
+
+def swap_layout(cache_dir: CacheDir) -> Tuple[int, int]:
+    """L1 and L2 directory counts of a ufs-style cache_dir (Squid's defaults if omitted)."""
+    return cache_dir.l1 or DEFAULT_L1, cache_dir.l2 or DEFAULT_L2
+
+
+def missing_swap_dirs(cache_dir: CacheDir) -> List[Path]:
+    """
+    L1 and L2 swap directories that do not exist.
+
+    Args:
+        cache_dir: ufs, aufs or diskd cache_dir
+
+    Returns:
+        Missing directories (an L1 directory stands for its whole subtree)
+    """
+    l1, l2 = swap_layout(cache_dir)
+    expected = {f'{j:02X}' for j in range(l2)}
+    missing = []
+    for i in range(l1):
+        path = cache_dir.path / f'{i:02X}'
+        try:
+            with os.scandir(path) as entries:
+                present = {entry.name for entry in entries if entry.is_dir(follow_symlinks=False)}
+        except (FileNotFoundError, NotADirectoryError):
+            missing.append(path)
+            continue
+        missing.extend(path / name for name in sorted(expected - present))
+    return missing
+
+
+def estimate_cache_files(cache_dir: CacheDir, max_dirs: int = SAMPLE_DIRS, seed: int = 0) -> int:
+    """
+    Estimate the object files in the swap directories (what a rebuild without log opens).
+
+    Lists up to max_dirs randomly chosen L2 directories and extrapolates to
+    the whole tree, so at most max_dirs directories are listed however large
+    the cache is.
+
+    Args:
+        cache_dir: ufs, aufs or diskd cache_dir
+        max_dirs: L2 directories to list
+        seed: Seed for the directory choice
+
+    Returns:
+        Estimated number of object files
+    """
+    l1, l2 = swap_layout(cache_dir)
+    total = l1 * l2
+    chosen = random.Random(seed).sample(range(total), min(total, max_dirs))
+    files = 0
+    for n in chosen:
+        try:
+            with os.scandir(cache_dir.path / f'{n // l2:02X}' / f'{n % l2:02X}') as entries:
+                files += sum(1 for entry in entries if entry.is_file(follow_symlinks=False))
+        except OSError:
+            continue
+    return round(files * total / len(chosen)) if chosen else 0
+
+
+@dataclass
+class SwapState:
+    """Result of checking one swap.state file."""
+
+    path: Path
+    size: int = 0
+    record_size: int = 0
+    records: int = 0
+    adds: int = 0
+    deletes: int = 0
+    invalid: int = 0
+    trailing_bytes: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def usable(self) -> bool:
+        """Whether Squid can rebuild from this journal."""
+        return not self.errors
+
+
+def read_swap_state(path: Path) -> SwapState:
+    """
+    Check a swap.state header and records.
+
+    Only the op byte of each record is inspected (sliced out per chunk), so
+    multi-million entry journals are checked at disk speed.
+
+    Args:
+        path: swap.state file
+
+    Returns:
+        SwapState; errors list what makes it unusable
+
+    Raises:
+        OSError: If the file cannot be read
+    """
+    state = SwapState(path, size=path.stat().st_size)
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            state.errors.append('header truncated')
+            return state
+        op, version, record_size = HEADER.unpack(header)
+        if op != SWAP_LOG_VERSION or version != SWAP_LOG_FORMAT or record_size < HEADER.size:
+            state.errors.append(f'unsupported header (op {op}, version {version}, record size {record_size})')
+            return state
+        if record_size != RECORD_SIZE:
+            state.errors.append(f'record size {record_size} (this Squid build writes {RECORD_SIZE})')
+            return state
+        state.record_size = record_size
+
+        f.seek(record_size)
+        while True:
+            chunk = f.read(record_size * READ_RECORDS)
+            if not chunk:
+                break
+            whole = len(chunk) - len(chunk) % record_size
+            state.trailing_bytes = len(chunk) - whole
+            ops = chunk[:whole:record_size]
+            adds = ops.count(SWAP_LOG_ADD)
+            deletes = ops.count(SWAP_LOG_DEL)
+            state.records += len(ops)
+            state.adds += adds
+            state.deletes += deletes
+            state.invalid += len(ops) - adds - deletes - ops.count(SWAP_LOG_NOP)
+
+    if state.trailing_bytes:
+        state.errors.append(f'size is not a whole number of records ({state.trailing_bytes} trailing bytes)')
+    if state.invalid:
+        state.errors.append(f'{state.invalid} records with an invalid op')
+    return state
+
+
+def clean_shutdown(cache_path: Path) -> bool:
+    """
+    Whether Squid will treat swap.state as clean (Squid's own test).
+
+    Args:
+        cache_path: cache_dir directory
+
+    Returns:
+        True if swap.state.last-clean is at least as new as swap.state and
+        no interrupted rebuild or clean write left temporary journals
+    """
+    journal = cache_path / SWAP_STATE
+    try:
+        clean_mtime = (cache_path / f'{SWAP_STATE}.last-clean').stat().st_mtime
+        if clean_mtime < journal.stat().st_mtime:
+            return False
+    except OSError:
+        return False
+    return not any((cache_path / f'{SWAP_STATE}.{suffix}').exists() for suffix in ('new', 'clean'))
+
+
+@dataclass
+class CacheDirReport:
+    """Integrity and expected rebuild of one cache_dir."""
+
+    path: Path
+    missing: List[Path] = field(default_factory=list)
+    swap_state: Optional[SwapState] = None
+    rebuild: str = 'no log'
+    entries: int = 0
+    expected_seconds: float = 0.0
+    problems: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (f"cache_dir {self.path}: rebuild from {self.rebuild}, {self.entries:,} entries, "
+                f"expected {self.expected_seconds:.1f}s")
+
+
+def verify_cache_dir(cache_dir: CacheDir) -> CacheDirReport:
+    """
+    Check a ufs-style cache_dir and estimate Squid's store rebuild.
+
+    Blocking (lists the swap directories); meant for a worker thread.
+
+    Args:
+        cache_dir: ufs, aufs or diskd cache_dir
+
+    Returns:
+        CacheDirReport
+    """
+    report = CacheDirReport(cache_dir.path, missing=missing_swap_dirs(cache_dir))
+    if report.missing:
+        report.problems.append(f"{len(report.missing)} swap directories missing (first: {report.missing[0]})")
+
+    journal = cache_dir.path / SWAP_STATE
+    try:
+        report.swap_state = read_swap_state(journal)
+    except FileNotFoundError:
+        report.problems.append(f"{SWAP_STATE} missing")
+    except OSError as e:
+        report.problems.append(f"{SWAP_STATE} unreadable: {e}")
+
+    state = report.swap_state
+    if state is not None and state.usable:
+        if clean_shutdown(cache_dir.path):
+            report.rebuild = 'clean log'
+        else:
+            report.rebuild = 'dirty log'
+            report.problems.append("dirty shutdown (no clean swap.state written)")
+        report.entries = state.records
+    else:
+        if state is not None:
+            report.problems.extend(f"{SWAP_STATE}: {error}" for error in state.errors)
+        report.entries = estimate_cache_files(cache_dir)
+
+    report.expected_seconds = report.entries / REBUILD_RATES[report.rebuild]
+    return report
+
+
+def record_metrics(report: CacheDirReport, registry: Registry = REGISTRY) -> None:
+    """Publish a verification report as squid_cache_dir_* gauges."""
+    label = str(report.path)
+    registry.gauge('squid_cache_dir_expected_rebuild_seconds',
+                   'Estimated store rebuild time at startup.', ('cache_dir',)).set(
+                       report.expected_seconds, cache_dir=label)
+    registry.gauge('squid_cache_dir_rebuild_entries',
+                   'swap.state records (or object files without a usable swap.state) to rebuild.',
+                   ('cache_dir',)).set(report.entries, cache_dir=label)
+    registry.gauge('squid_cache_dir_dirty', '1 if the store rebuilds without a clean swap.state.',
+                   ('cache_dir',)).set(0 if report.rebuild == 'clean log' else 1, cache_dir=label)
+
+
+class StoreRebuildMonitor:
+    """
+    Follows cache.log and fails readiness while Squid rebuilds its store.
+
+    Args:
+        config_file: squid.conf (for cache_log and whether cache_dirs exist)
+        timeout: Seconds after which a rebuild no longer holds readiness
+        grace: Seconds after Squid's start to wait for a rebuild to begin
+        clock: Monotonic time source (for tests)
+        registry: Registry to publish metrics into
+    """
+
+    def __init__(self, config_file: Path = SQUID_CONF, timeout: float = WARM_TIMEOUT,
+                 grace: float = WARM_GRACE, clock: Callable[[], float] = time.monotonic,
+                 registry: Registry = REGISTRY):
+        self.config_file = Path(config_file)
+        self.timeout = timeout
+        self.grace = grace
+        self.clock = clock
+        self.following = False
+        self.rebuilding = False
+        self.rebuilds = 0
+        self.progress = 0.0
+        self.sources: Dict[str, str] = {}
+        self.last_duration: Optional[float] = None
+        self._started: Optional[float] = None
+        self._waiting_since: Optional[float] = None
+        self._timed_out = False
+        registry.register_collector(self.metrics)
+
+    def cache_log(self) -> Optional[Path]:
+        """Local cache.log file, or None if Squid logs elsewhere."""
+        try:
+            cache_log = load_squid_config(self.config_file).cache_log
+        except (OSError, ValueError):
+            return DEFAULT_CACHE_LOG
+        if cache_log is None:
+            return DEFAULT_CACHE_LOG
+        if cache_log.module == 'stdio' and cache_log.path is not None \
+                and not str(cache_log.path).startswith('/dev/'):
+            return cache_log.path
+        return None
+
+    def _expects_rebuild(self) -> bool:
+        try:
+            return bool(load_squid_config(self.config_file).cache_dirs)
+        except (OSError, ValueError):
+            return False
+
+    def on_lines(self, lines: List[bytes]) -> None:
+        """Track rebuild start, progress and completion."""
+        for line in lines:
+            if _SQUID_START in line:
+                self._waiting_since = self.clock()
+                self._timed_out = False
+                continue
+            if b'ebuild' not in line:
+                continue
+            match = _REBUILD_START.search(line)
+            if match:
+                if not self.rebuilding:
+                    self.rebuilding = True
+                    self.progress = 0.0
+                    self.sources = {}
+                    self._started = self.clock()
+                    self._timed_out = False
+                self.sources[match.group(1).decode(errors='replace')] = match.group(2).decode()
+                continue
+            match = _REBUILD_PROGRESS.search(line)
+            if match:
+                self.progress = float(match.group(1)) / 100
+                continue
+            if _REBUILD_DONE in line:
+                if self._started is not None:
+                    self.last_duration = self.clock() - self._started
+                self.rebuilding = False
+                self.rebuilds += 1
+                self.progress = 1.0
+                logging.info(f"Squid store rebuilt in {self.last_duration or 0:.1f}s, cache is warm")
+
+    def check(self) -> List[str]:
+        """
+        Readiness failures while the store is not rebuilt.
+
+        Returns:
+            Empty list when warm, when no cache_dir is configured, when
+            cache.log cannot be followed, when no rebuild started within
+            the grace period or after the timeout
+        """
+        if not self.following or not self._expects_rebuild():
+            return []
+        if not self.rebuilding:
+            if self.rebuilds:
+                return []
+            # Squid not started yet, or it logs no rebuild start
+            if self._waiting_since is None:
+                self._waiting_since = self.clock()
+            waited = self.clock() - self._waiting_since
+            if waited > self.grace:
+                if not self._timed_out:
+                    self._timed_out = True
+                    logging.info(f"No Squid store rebuild seen within {self.grace:.0f}s, "
+                                 f"not holding readiness (CACHE_WARM_GRACE)")
+                return []
+            return ['Cache store rebuild not started']
+
+        elapsed = self.clock() - self._started
+        if elapsed > self.timeout:
+            if not self._timed_out:
+                self._timed_out = True
+                logging.warning(f"Squid store not rebuilt after {elapsed:.0f}s, "
+                                f"no longer holding readiness (CACHE_WARM_TIMEOUT)")
+            return []
+        message = f'Cache store rebuilding ({self.progress:.0%} complete, {elapsed:.0f}s'
+        if self.progress > 0.01:
+            message += f', ~{elapsed * (1 - self.progress) / self.progress:.0f}s left'
+        return [message + ')']
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            'following': self.following,
+            'rebuilding': self.rebuilding,
+            'progress': self.progress,
+            'sources': self.sources,
+            'rebuilds': self.rebuilds,
+            'last_rebuild_seconds': self.last_duration,
+            'readiness_errors': self.check(),
+        }
+
+    def metrics(self) -> List[Metric]:
+        """Rebuild state."""
+        rebuilding = Metric('squid_cache_store_rebuilding', '1 while Squid rebuilds its store index.')
+        rebuilding.set(1 if self.rebuilding else 0)
+        progress = Metric('squid_cache_store_rebuild_progress_ratio',
+                          'Progress of the current (or last) store rebuild.')
+        progress.set(self.progress)
+        families = [rebuilding, progress]
+        if self.last_duration is not None:
+            duration = Metric('squid_cache_store_last_rebuild_seconds',
+                              'Duration of the last completed store rebuild.')
+            duration.set(self.last_duration)
+            families.append(duration)
+        return families
+
+    async def run(self) -> None:
+        """Follow cache.log until cancelled."""
+        path = self.cache_log()
+        if path is None:
+            logging.info("Cache warm-up gate disabled: cache_log is not a local file")
+            return
+        self.following = True
+        try:
+            await LogFollower(path, self.on_lines).run()
+        finally:
+            self.following = False
@@ -0,0 +1,539 @@
+"""
+Squid cache manager polling and parsing.
+
+Polls the cache manager pages info, counters and 5min (squidclient
+mgr:info, mgr:counters, mgr:5min) through the local proxy port, which the
+default configuration allows via 'http_access allow localhost manager'.
+Requests reuse one keep-alive connection whenever Squid keeps it open.
+
+The pages are parsed into a CacheManagerStats snapshot that is exported as
+Prometheus metrics (squid_*) and served as JSON. Parsers are pure functions
+over the page text, so they are tested against captured fixtures.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from metrics import REGISTRY, Metric, Registry
+from squid_readiness import proxy_address
+
+
+CONFIG_FILE = Path('/etc/squid/squid.conf')
+
+# Seconds between cache manager polls (0 disables polling)
+POLL_INTERVAL = float(os.getenv('CACHEMGR_POLL_INTERVAL', '30'))
+REQUEST_TIMEOUT = float(os.getenv('CACHEMGR_TIMEOUT', '5'))
+
+PAGES = ('info', 'counters', '5min')
+
+MAX_RESPONSE_BYTES = 1024 * 1024
+
+# "Median Service Times" rows in mgr:info -> metric label
+_SERVICE_TIME_ROWS = {
+    'HTTP Requests (All)': 'http_all',
+    'Cache Misses': 'cache_misses',
+    'Cache Hits': 'cache_hits',
+    'Near Hits': 'near_hits',
+    'Not-Modified Replies': 'not_modified',
+    'DNS Lookups': 'dns_lookups',
+    'ICP Queries': 'icp_queries',
+}
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_WINDOW_PERCENT = re.compile(r'(\d+min):\s*(-?[\d.]+)%')
+
+
+class CacheManagerError(Exception):
+    """Cache manager request failed (connection, HTTP status or protocol)."""
+
+
+def parse_key_values(text: str) -> Dict[str, float]:
+    """
+    Parse 'name = value[unit]' pages (mgr:counters, mgr:5min).
+
+    Units such as '/sec', ' seconds', '%' and trailing date comments are
+    dropped; lines without a numeric value are skipped.
+
+    Args:
+        text: Page body
+
+    Returns:
+        Dictionary of counter name to value
+
+    Example:
+        'client_http.requests = 5.496667/sec' -> {'client_http.requests': 5.496667}
+    """
+    values = {}
+    for line in text.splitlines():
+        name, sep, rest = line.partition('=')
+        if not sep:
+            continue
+        match = _NUMBER.match(rest.strip())
+        if match:
+            values[name.strip()] = float(match.group())
+    return values
+
+
+def parse_info(text: str) -> Dict[str, object]:
+    """
+    Parse the mgr:info page.
+
+    The page is a list of sections ('Cache information for squid:') with
+    tab-indented 'label: value' rows. Rows are keyed by their label;
+    percentages with 5min/60min windows become {'5min': x, '60min': y}
+    dictionaries, and the median service time table becomes
+    {'median_service_times': {row: {'5min': s, '60min': s}}}.
+
+    Args:
+        text: Page body
+
+    Returns:
+        Dictionary of parsed rows (numeric where possible)
+    """
+    info: Dict[str, object] = {}
+    service_times: Dict[str, Dict[str, float]] = {}
+    section = ''
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+
+        if not line[0].isspace():
+            section = line.strip()
+            if section.startswith('Squid Object Cache: Version'):
+                info['version'] = section.rsplit(' ', 1)[-1]
+            continue
+
+        row = line.strip()
+
+        if section.startswith('Median Service Times'):
+            label, _, numbers = row.partition(':')
+            parts = numbers.split()
+            if label in _SERVICE_TIME_ROWS and len(parts) >= 2:
+                service_times[_SERVICE_TIME_ROWS[label]] = {
+                    '5min': float(parts[0]), '60min': float(parts[1])
+                }
+            continue
+
+        if section == 'Internal Data Structures:':
+            count, _, label = row.partition(' ')
+            if count.isdigit():
+                info[label.strip()] = int(count)
+            continue
+
+        label, sep, value = row.partition(':')
+        if not sep:
+            continue
+        value = value.strip()
+
+        windows = _WINDOW_PERCENT.findall(value)
+        if windows:
+            info[label] = {window: round(float(number) / 100, 6) for window, number in windows}
+            continue
+
+        match = _NUMBER.search(value)
+        if match:
+            number = float(match.group())
+            # Sizes are reported in KB; capacities as "73.2% used"
+            if value.endswith(' KB'):
+                number *= 1024
+            elif '% used' in value:
+                number = round(number / 100, 6)
+            info[label] = number
+
+    info['median_service_times'] = service_times
+    return info
+
+
+@dataclass
+class CacheManagerStats:
+    """Structured view of one poll of the cache manager pages."""
+
+    version: Optional[str] = None
+    uptime_seconds: Optional[float] = None
+    clients: Optional[float] = None
+
+    # Cumulative counters (mgr:counters)
+    requests_total: Optional[float] = None
+    hits_total: Optional[float] = None
+    errors_total: Optional[float] = None
+    bytes_in_total: Optional[float] = None
+    bytes_out_total: Optional[float] = None
+
+    # Rates over the last 5 minutes (mgr:5min)
+    request_rate: Optional[float] = None
+    hit_rate: Optional[float] = None
+
+    # Ratios (0-1) and median service times (seconds) per window
+    hit_ratio: Dict[str, float] = field(default_factory=dict)
+    byte_hit_ratio: Dict[str, float] = field(default_factory=dict)
+    median_service_times: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    # File descriptors
+    fd_max: Optional[float] = None
+    fd_in_use: Optional[float] = None
+    fd_available: Optional[float] = None
+    fd_reserved: Optional[float] = None
+
+    # Store
+    store_swap_bytes: Optional[float] = None
+    store_swap_used_ratio: Optional[float] = None
+    store_mem_bytes: Optional[float] = None
+    store_mem_used_ratio: Optional[float] = None
+    store_entries: Optional[float] = None
+    mean_object_bytes: Optional[float] = None
+
+    cpu_seconds: Optional[float] = None
+    sampled_at: float = 0.0  # time.time() of the poll
+
+    def to_dict(self) -> Dict[str, object]:
+        return dataclasses.asdict(self)
+
+
+def build_stats(info: Dict[str, object], counters: Dict[str, float],
+                five_min: Dict[str, float]) -> CacheManagerStats:
+    """
+    Combine parsed info, counters and 5min pages into CacheManagerStats.
+
+    Args:
+        info: Result of parse_info()
+        counters: Result of parse_key_values() on mgr:counters
+        five_min: Result of parse_key_values() on mgr:5min
+
+    Returns:
+        CacheManagerStats (fields missing from the pages stay None)
+    """
+    def kbytes(value: Optional[float]) -> Optional[float]:
+        return value * 1024 if value is not None else None
+
+    return CacheManagerStats(
+        version=info.get('version'),
+        uptime_seconds=info.get('UP Time'),
+        clients=info.get('Number of clients accessing cache'),
+        requests_total=counters.get('client_http.requests'),
+        hits_total=counters.get('client_http.hits'),
+        errors_total=counters.get('client_http.errors'),
+        bytes_in_total=kbytes(counters.get('client_http.kbytes_in')),
+        bytes_out_total=kbytes(counters.get('client_http.kbytes_out')),
+        request_rate=five_min.get('client_http.requests'),
+        hit_rate=five_min.get('client_http.hits'),
+        hit_ratio=info.get('Hits as % of all requests', {}),
+        byte_hit_ratio=info.get('Hits as % of bytes sent', {}),
+        median_service_times=info.get('median_service_times', {}),
+        fd_max=info.get('Maximum number of file descriptors'),
+        fd_in_use=info.get('Number of file desc currently in use'),
+        fd_available=info.get('Available number of file descriptors'),
+        fd_reserved=info.get('Reserved number of file descriptors'),
+        store_swap_bytes=info.get('Storage Swap size'),
+        store_swap_used_ratio=info.get('Storage Swap capacity'),
+        store_mem_bytes=info.get('Storage Mem size'),
+        store_mem_used_ratio=info.get('Storage Mem capacity'),
+        store_entries=info.get('StoreEntries'),
+        mean_object_bytes=info.get('Mean Object Size'),
+        cpu_seconds=counters.get('cpu_time', info.get('CPU Time')),
+        sampled_at=time.time(),
+    )
+
+
+def stats_metrics(stats: CacheManagerStats) -> List[Metric]:
+    """Metric families for one CacheManagerStats snapshot."""
+    families = []
+
+    def family(name, documentation, metric_type='gauge', labelnames=()):
+        metric = Metric(name, documentation, metric_type, labelnames)
+        families.append(metric)
+        return metric
+
+    def scalar(name, documentation, value, metric_type='gauge'):
+        if value is not None:
+            family(name, documentation, metric_type).set(value)
+
+    scalar('squid_uptime_seconds', 'Seconds since Squid started.', stats.uptime_seconds)
+    scalar('squid_clients', 'Number of clients accessing the cache.', stats.clients)
+    scalar('squid_client_http_requests_total', 'HTTP requests received from clients.',
+           stats.requests_total, 'counter')
+    scalar('squid_client_http_hits_total', 'Client HTTP requests served from cache.',
+           stats.hits_total, 'counter')
+    scalar('squid_client_http_errors_total', 'Client HTTP requests that failed.',
+           stats.errors_total, 'counter')
+    scalar('squid_client_http_received_bytes_total', 'Bytes received from clients.',
+           stats.bytes_in_total, 'counter')
+    scalar('squid_client_http_sent_bytes_total', 'Bytes sent to clients.',
+           stats.bytes_out_total, 'counter')
+    scalar('squid_client_http_request_rate', 'Client HTTP requests per second (5 minute average).',
+           stats.request_rate)
+    scalar('squid_cpu_seconds_total', 'CPU time consumed by Squid.', stats.cpu_seconds, 'counter')
+
+    for name, documentation, ratios in (
+        ('squid_hit_ratio', 'Fraction of requests served from cache.', stats.hit_ratio),
+        ('squid_byte_hit_ratio', 'Fraction of bytes served from cache.', stats.byte_hit_ratio),
+    ):
+        if ratios:
+            metric = family(name, documentation, labelnames=('window',))
+            for window, ratio in ratios.items():
+                metric.set(ratio, window=window)
+
+    if stats.median_service_times:
+        metric = family('squid_median_service_time_seconds',
+                        'Median service time by request type.',
+                        labelnames=('request_type', 'window'))
+        for request_type, windows in stats.median_service_times.items():
+            for window, seconds in windows.items():
+                metric.set(seconds, request_type=request_type, window=window)
+
+    fds = [(state, value) for state, value in (
+        ('max', stats.fd_max), ('in_use', stats.fd_in_use),
+        ('available', stats.fd_available), ('reserved', stats.fd_reserved),
+    ) if value is not None]
+    if fds:
+        metric = family('squid_file_descriptors', 'Squid file descriptor usage.',
+                        labelnames=('state',))
+        for state, value in fds:
+            metric.set(value, state=state)
+
+    scalar('squid_store_swap_size_bytes', 'Size of the disk cache.', stats.store_swap_bytes)
+    scalar('squid_store_swap_used_ratio', 'Fraction of the disk cache in use.',
+           stats.store_swap_used_ratio)
+    scalar('squid_store_mem_size_bytes', 'Size of the memory cache.', stats.store_mem_bytes)
+    scalar('squid_store_mem_used_ratio', 'Fraction of the memory cache in use.',
+           stats.store_mem_used_ratio)
+    scalar('squid_store_entries', 'Number of StoreEntries.', stats.store_entries)
+    scalar('squid_store_mean_object_size_bytes', 'Mean cached object size.',
+           stats.mean_object_bytes)
+
+    return families
+
+
+class CacheManagerClient:
+    """
+    HTTP client for cache manager pages over a reusable local connection.
+
+    Args:
+        address: (host, port) of the proxy; defaults to the first http_port
+        timeout: Seconds allowed for connect and each read
+    """
+
+    def __init__(self, address: Optional[Tuple[str, int]] = None,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+
+    def close(self) -> None:
+        """Close the pooled connection, if any."""
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = None
+            self._reader = None
+
+    def _connect(self) -> None:
+        if self._sock is None:
+            address = self.address or proxy_address(CONFIG_FILE)
+            self._sock = socket.create_connection(address, timeout=self.timeout)
+            self._reader = self._sock.makefile('rb')
+            self.connections_opened += 1
+
+    def fetch(self, page: str) -> str:
+        """
+        Fetch one cache manager page.
+
+        A request on a pooled connection that Squid has meanwhile closed is
+        retried once on a fresh connection.
+
+        Args:
+            page: Page name (e.g. 'info', 'counters', '5min')
+
+        Returns:
+            Page body
+
+        Raises:
+            CacheManagerError: On connection failure, non-200 status or a
+                               malformed response
+        """
+        while True:
+            reused = self._sock is not None
+            try:
+                return self._request(page)
+            except OSError as e:
+                self.close()
+                if not reused:
+                    raise CacheManagerError(f"mgr:{page}: {e}")
+            except CacheManagerError as e:
+                self.close()
+                raise CacheManagerError(f"mgr:{page}: {e}")
+
+    def _request(self, page: str) -> str:
+        self._connect()
+        self._sock.sendall(
+            f'GET cache_object://localhost/{page} HTTP/1.1\r\n'
+            'Host: localhost\r\n'
+            'Connection: keep-alive\r\n'
+            '\r\n'.encode('ascii')
+        )
+
+        status_line = self._reader.readline(1024)
+        if not status_line:
+            raise ConnectionResetError('Connection closed by proxy')
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+            raise CacheManagerError(f"malformed status line {status_line!r}")
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = self._reader.readline(8192)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            body = self._read_body(headers)
+        except ValueError as e:
+            raise CacheManagerError(f"malformed response framing: {e}")
+        keep_alive = (parts[0] == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                      and ('content-length' in headers or 'chunked' in headers.get('transfer-encoding', '')))
+        if not keep_alive:
+            self.close()
+
+        if status != 200:
+            raise CacheManagerError(f"proxy returned {status}")
+        return body.decode('utf-8', errors='replace')
+
+    def _read_body(self, headers: Dict[str, str]) -> bytes:
+        if 'chunked' in headers.get('transfer-encoding', ''):
+            chunks = []
+            size = 0
+            while True:
+                length = int(self._reader.readline(1024).split(b';')[0].strip() or b'0', 16)
+                if length == 0:
+                    # Trailers end with an empty line
+                    while self._reader.readline(8192) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                size += length
+                if size > MAX_RESPONSE_BYTES:
+                    raise CacheManagerError('Response too large')
+                chunks.append(self._reader.read(length))
+                self._reader.readline(1024)
+
+        if 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length < 0:
+                raise ValueError(f"negative Content-Length {length}")
+            if length > MAX_RESPONSE_BYTES:
+                raise CacheManagerError('Response too large')
+            body = self._reader.read(length)
+            if len(body) < length:
+                raise CacheManagerError('Connection closed mid-response')
+            return body
+
+        # No framing: body runs until Squid closes the connection
+        body = self._reader.read(MAX_RESPONSE_BYTES + 1)
+        if len(body) > MAX_RESPONSE_BYTES:
+            raise CacheManagerError('Response too large')
+        return body
+
+
+class CacheManagerPoller:
+    """
+    Background poller publishing cache manager stats as metrics and JSON.
+
+    Args:
+        client: CacheManagerClient to poll with
+        interval: Seconds between polls
+        registry: Registry to publish into
+    """
+
+    def __init__(self, client: Optional[CacheManagerClient] = None,
+                 interval: float = POLL_INTERVAL, registry: Registry = REGISTRY):
+        self.client = client or CacheManagerClient()
+        self.interval = interval
+        self.stats: Optional[CacheManagerStats] = None
+        self.last_error: Optional[str] = None
+        self._families: List[Metric] = []
+        self._thread: Optional[threading.Thread] = None
+        registry.register_collector(self.families)
+
+    def families(self) -> List[Metric]:
+        """Families from the most recent poll."""
+        return self._families
+
+    def poll(self) -> Optional[CacheManagerStats]:
+        """
+        Fetch and parse all pages now.
+
+        Returns:
+            New stats, or None if Squid could not be queried (squid_up is 0
+            and the previous stats are kept for JSON consumers)
+        """
+        started = time.monotonic()
+        up = Metric('squid_up', 'Whether the last cache manager poll succeeded.')
+        duration = Metric('squid_cachemgr_poll_seconds', 'Time spent polling the cache manager.')
+
+        try:
+            pages = {page: self.client.fetch(page) for page in PAGES}
+        except CacheManagerError as e:
+            if self.last_error != str(e):
+                logging.warning(f"Cache manager poll failed: {e}")
+            self.last_error = str(e)
+            up.set(0)
+            duration.set(time.monotonic() - started)
+            self._families = [up, duration]
+            return None
+
+        self.last_error = None
+        stats = build_stats(parse_info(pages['info']), parse_key_values(pages['counters']),
+                            parse_key_values(pages['5min']))
+        up.set(1)
+        duration.set(time.monotonic() - started)
+        self.stats = stats
+        self._families = [up] + stats_metrics(stats) + [duration]
+        return stats
+
+    def snapshot(self) -> Dict[str, object]:
+        """JSON-serializable view of the last successful poll."""
+        return {
+            'up': self.last_error is None and self.stats is not None,
+            'error': self.last_error,
+            'stats': self.stats.to_dict() if self.stats else None,
+        }
+
+    async def run(self) -> None:
+        """Poll every interval in a worker thread (asyncio mode)."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    await loop.run_in_executor(None, self.poll)
+                except Exception as e:
+                    logging.warning(f"Cache manager poll failed: {e}")
+                await asyncio.sleep(self.interval)
+        finally:
+            self.client.close()
+
+    def start_thread(self) -> None:
+        """Poll every interval in a daemon thread (http.server mode)."""
+        def loop():
+            while True:
+                try:
+                    self.poll()
+                except Exception as e:
+                    logging.warning(f"Cache manager poll failed: {e}")
+                time.sleep(self.interval)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=loop, name='cachemgr-poll', daemon=True)
+            self._thread.start()
@@ -0,0 +1,308 @@
+"""
+Zero-downtime Squid configuration reload.
+
+ConfigReloader watches the directories holding squid.conf, every included
+file and every acl file with inotify. Watching directories rather than
+files follows Kubernetes ConfigMap updates, which swap the ..data symlink in
+the mount directory instead of writing the files. Bursts of events are
+debounced, then:
+
+1. the content digest of the configuration is compared with the applied
+   one (touches and unrelated files in the same directory are ignored)
+2. the new configuration is validated with squid -k parse; Squid keeps
+   running the old configuration if this fails
+3. the digest is taken again, so files that changed during validation are
+   validated again instead of being reloaded unchecked
+4. squid -k reconfigure tells the running Squid to re-read it
+
+An optional prepare hook turns the parsed configuration into the file Squid
+actually loads (e.g. the runtime copy with optimized acl lists). It writes
+a scratch copy next to that runtime file. The scratch copy is validated and
+only replaces the runtime file once it passed and the source stayed stable,
+so a rejected change never touches the file Squid runs from (and would
+re-read on squid -k rotate or a restart). Change detection keeps using the
+source configuration.
+
+Squid is never restarted for a reload, so connections and the memory cache
+survive. SIGHUP to the entrypoint forces a reload without a file change.
+
+Exported metrics:
+    squid_config_reloads_total{result}          success, invalid, failed
+    squid_config_last_reload_seconds            change detected -> reconfigured
+    squid_config_reload_seconds_total           summed over successful reloads
+    squid_config_last_reload_timestamp_seconds  wall clock of the last success
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from config_validator import validate_squid_config
+from inotify_watch import (
+    IN_ATTRIB,
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MODIFY,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    Inotify,
+    inotify_available,
+)
+from metrics import REGISTRY, Registry
+from squid_config import SQUID_CONF, SquidConfig, config_digest, load_squid_config
+
+
+WATCH_ENABLED = os.getenv('CONFIG_WATCH', 'true').lower() == 'true'
+
+# Quiet period after the last change before reloading (seconds)
+DEBOUNCE = float(os.getenv('CONFIG_RELOAD_DEBOUNCE', '2'))
+
+# Re-check interval without inotify
+POLL_INTERVAL = 5.0
+
+# Validation retries when files keep changing underneath it
+MAX_ATTEMPTS = 3
+
+RECONFIGURE_TIMEOUT = 30.0
+
+SQUID_BINARY = '/usr/sbin/squid'
+
+WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE
+              | IN_MODIFY | IN_ATTRIB)
+
+
+class ConfigReloader:
+    """
+    Validates and applies configuration changes to a running Squid.
+
+    Args:
+        config_file: squid.conf to watch and reload
+        applied_digest: config_digest of the configuration Squid is running
+        on_applied: Called with the new digest after each successful reload
+        debounce: Quiet period before reloading after a change
+        squid_binary: Squid executable used for -k reconfigure
+        registry: Registry to publish reload metrics into
+        prepare: Called in a worker thread with the parsed configuration
+                 and the scratch path to write Squid's configuration to
+                 (default: Squid loads config_file itself)
+        runtime_file: File Squid runs from when prepare is set
+    """
+
+    def __init__(self, config_file: Path = SQUID_CONF, applied_digest: Optional[str] = None,
+                 on_applied: Optional[Callable[[str], None]] = None, debounce: float = DEBOUNCE,
+                 squid_binary: str = SQUID_BINARY, registry: Registry = REGISTRY,
+                 prepare: Optional[Callable[[SquidConfig, Path], None]] = None,
+                 runtime_file: Optional[Path] = None):
+        self.config_file = Path(config_file)
+        self.applied_digest = applied_digest
+        self.on_applied = on_applied
+        self.prepare = prepare
+        self.runtime_file = Path(runtime_file) if runtime_file else None
+        if prepare and self.runtime_file is None:
+            raise ValueError("prepare requires runtime_file")
+        self.debounce = debounce
+        self.squid_binary = squid_binary
+        self._rejected_digest: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._watches: Dict[Path, int] = {}
+        self.reloads = registry.counter('squid_config_reloads_total',
+                                        'Squid configuration reloads by result.', ('result',))
+        self.last_duration = registry.gauge(
+            'squid_config_last_reload_seconds',
+            'Time from detecting the latest change to Squid reconfigured.')
+        self.duration_total = registry.counter(
+            'squid_config_reload_seconds_total',
+            'Time from change detected to Squid reconfigured, summed over successful reloads.')
+        self.last_success = registry.gauge(
+            'squid_config_last_reload_timestamp_seconds',
+            'Unix time of the last successful configuration reload.')
+
+    def watch_dirs(self) -> Set[Path]:
+        """
+        Directories whose changes can affect the configuration.
+
+        Returns:
+            Existing parent directories of squid.conf, included files, acl
+            files and include glob patterns
+        """
+        dirs = {self.config_file.parent}
+        try:
+            config = load_squid_config(self.config_file)
+        except (OSError, ValueError):
+            return dirs
+
+        for path in config.files + config.acl_files:
+            dirs.add(path.parent)
+        for pattern in config.include_patterns:
+            # Deepest directory without wildcards, so new matches are seen
+            parent = Path(pattern).parent
+            while glob.has_magic(str(parent)):
+                parent = parent.parent
+            dirs.add(parent)
+        return {d for d in dirs if d.is_dir()}
+
+    async def reload(self, force: bool = False, detected_at: Optional[float] = None) -> str:
+        """
+        Validate the configuration and reconfigure Squid if it changed.
+
+        Args:
+            force: Reload even if the digest matches the applied one (SIGHUP)
+            detected_at: Monotonic time the change was first seen (for the
+                         latency metric; default now)
+
+        Returns:
+            'success', 'invalid', 'failed' or 'unchanged'
+        """
+        detected_at = detected_at or time.monotonic()
+        async with self._lock:
+            result = await self._reload(force)
+        if result == 'unchanged':
+            return result
+
+        self.reloads.inc(result=result)
+        if result == 'success':
+            elapsed = time.monotonic() - detected_at
+            self.last_duration.set(elapsed)
+            self.duration_total.inc(elapsed)
+            self.last_success.set(time.time())
+            logging.info(f"Squid configuration reloaded in {elapsed:.2f}s")
+        return result
+
+    async def _reload(self, force: bool) -> str:
+        if self.prepare is None:
+            return await self._reload_attempts(force, None)
+
+        scratch = self.runtime_file.with_name(self.runtime_file.name + '.new')
+        try:
+            return await self._reload_attempts(force, scratch)
+        finally:
+            scratch.unlink(missing_ok=True)
+
+    def _read(self) -> Tuple[SquidConfig, str]:
+        """Parse and hash the configuration (blocking: run in a worker thread)."""
+        config = load_squid_config(self.config_file)
+        return config, config_digest(config)
+
+    async def _reload_attempts(self, force: bool, scratch: Optional[Path]) -> str:
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                config, digest = await asyncio.to_thread(self._read)
+            except (OSError, ValueError) as e:
+                logging.error(f"Cannot read changed Squid configuration: {e}")
+                return 'invalid'
+
+            if not force and digest in (self.applied_digest, self._rejected_digest):
+                return 'unchanged'
+
+            squid_file = self.config_file
+            if scratch is not None:
+                try:
+                    await asyncio.to_thread(self.prepare, config, scratch)
+                except OSError as e:
+                    logging.error(f"Cannot prepare changed Squid configuration: {e}")
+                    return 'failed'
+                squid_file = scratch
+
+            logging.info("Squid configuration changed, validating...")
+            success, error = await validate_squid_config(squid_file)
+            if not success:
+                self._rejected_digest = digest
+                logging.error(f"New Squid configuration is invalid, keeping the running one:\n{error}")
+                return 'invalid'
+
+            try:
+                stable = (await asyncio.to_thread(self._read))[1] == digest
+            except (OSError, ValueError):
+                stable = False
+            if stable:
+                break
+            logging.info("Squid configuration changed during validation, validating again")
+        else:
+            logging.warning("Squid configuration kept changing during validation, reload postponed")
+            return 'failed'
+
+        if scratch is not None:
+            try:
+                os.replace(scratch, self.runtime_file)
+            except OSError as e:
+                logging.error(f"Cannot install the validated Squid configuration: {e}")
+                return 'failed'
+            squid_file = self.runtime_file
+
+        if not await self._reconfigure(squid_file):
+            return 'failed'
+
+        self.applied_digest = digest
+        self._rejected_digest = None
+        if self.on_applied:
+            self.on_applied(digest)
+        return 'success'
+
+    async def _reconfigure(self, squid_file: Path) -> bool:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.squid_binary, '-k', 'reconfigure', '-f', str(squid_file),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await asyncio.wait_for(process.communicate(), RECONFIGURE_TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as e:
+            logging.error(f"squid -k reconfigure failed: {e or 'timed out'}")
+            return False
+
+        if process.returncode != 0:
+            output = (stderr or stdout).decode('utf-8', errors='replace').strip()
+            logging.error(f"squid -k reconfigure exited with code {process.returncode}: {output}")
+            return False
+        return True
+
+    async def _update_watches(self, watcher: Inotify) -> None:
+        wanted = await asyncio.to_thread(self.watch_dirs)
+        for path in set(self._watches) - wanted:
+            watcher.rm_watch(self._watches.pop(path))
+        for path in wanted - set(self._watches):
+            try:
+                self._watches[path] = watcher.add_watch(path, WATCH_MASK)
+            except OSError as e:
+                logging.debug(f"Cannot watch {path}: {e}")
+
+    async def _changes(self, watcher: Optional[Inotify], timeout: Optional[float]) -> bool:
+        """Wait for filesystem events; False if timeout passed without any."""
+        try:
+            if watcher is None:
+                await asyncio.sleep(POLL_INTERVAL if timeout is None else timeout)
+                return timeout is None
+            await asyncio.wait_for(watcher.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(self) -> None:
+        """Watch the configuration and reload on change until cancelled."""
+        watcher = None
+        if inotify_available():
+            try:
+                watcher = Inotify()
+            except OSError as e:
+                logging.debug(f"inotify unavailable, polling configuration: {e}")
+
+        try:
+            while True:
+                if watcher:
+                    await self._update_watches(watcher)
+                await self._changes(watcher, None)
+                detected_at = time.monotonic()
+
+                # Debounce: wait until the files have been quiet for a while
+                while await self._changes(watcher, self.debounce):
+                    pass
+
+                await self.reload(detected_at=detected_at)
+        finally:
+            if watcher:
+                watcher.close()
@@ -3,12 +3,36 @@ Squid configuration validation module.
 
 Validates Squid configuration files by executing 'squid -k parse'
 and capturing output/errors.
+
+validate_squid_config_cached() skips squid -k parse on warm restarts: the
+fingerprint of the last configuration that passed (content hash of
+squid.conf, included files, acl files, TLS files referenced by ports and the
+Squid version) is stored on the writable /var/lib/squid volume, and an
+identical fingerprint means the same input would be parsed again.
 """
 
 import asyncio
+import hashlib
+import json
 import logging
+import os
+import time
 from pathlib import Path
-from typing import Tuple
+from typing import List, Tuple
+
+from squid_config import SquidConfig, config_digest, load_squid_config
+
+
+SQUID_BINARY = '/usr/sbin/squid'
+
+# Fingerprint of the last configuration that passed squid -k parse
+VALIDATION_CACHE = Path(os.getenv('SQUID_VALIDATION_CACHE', '/var/lib/squid/.config-validated'))
+
+FORCE_VALIDATE = os.getenv('SQUID_FORCE_VALIDATE', 'false').lower() == 'true'
+
+# http_port/https_port options naming files squid -k parse loads
+PORT_FILE_OPTIONS = ('cert', 'key', 'tls-cert', 'tls-key', 'cafile', 'tls-cafile',
+                     'clientca', 'dhparams', 'tls-dh', 'crlfile')
 
 
 async def validate_squid_config(config_file: Path = Path("/etc/squid/squid.conf")) -> Tuple[bool, str]:
@@ -56,27 +80,150 @@ async def validate_squid_config(config_file: Path = Path("/etc/squid/squid.conf"
         return False, f"Unexpected error during validation: {str(e)}"
 
 
+def port_files(config: SquidConfig) -> List[Path]:
+    """
+    Certificate, key and CA files referenced by http_port/https_port options.
+
+    Args:
+        config: Parsed configuration
+
+    Returns:
+        Referenced paths in config order, without duplicates
+    """
+    files: List[Path] = []
+    for port in config.http_ports + config.https_ports:
+        for option in port.options:
+            name, sep, value = option.partition('=')
+            if sep and name in PORT_FILE_OPTIONS:
+                # tls-dh=[curve:]file
+                path = Path(value.rsplit(':', 1)[-1]) if name == 'tls-dh' else Path(value)
+                if path not in files:
+                    files.append(path)
+    return files
+
+
+async def squid_version(squid_binary: str = SQUID_BINARY) -> str:
+    """
+    Output of squid -v (version and build options), '' if unavailable.
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            squid_binary, '-v',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+    except OSError:
+        return ''
+    return stdout.decode('utf-8', errors='replace') if process.returncode == 0 else ''
+
+
+async def validation_fingerprint(config_file: Path, squid_binary: str = SQUID_BINARY) -> str:
+    """
+    Fingerprint of everything squid -k parse reads.
+
+    Args:
+        config_file: Path to squid.conf file
+        squid_binary: Squid executable (its version is part of the fingerprint)
+
+    Returns:
+        Hex SHA-256 digest
+
+    Raises:
+        OSError: If the configuration cannot be read
+        ValueError: If includes are nested too deeply
+    """
+    config = load_squid_config(config_file)
+    digest = hashlib.sha256(config_digest(config).encode())
+    for path in port_files(config):
+        digest.update(str(path).encode() + b'\0')
+        try:
+            digest.update(path.read_bytes())
+        except OSError:
+            digest.update(b'<missing>')
+    digest.update(b'\0' + (await squid_version(squid_binary)).encode())
+    return digest.hexdigest()
+
+
+def _read_cache(cache_file: Path) -> dict:
+    try:
+        with open(cache_file) as f:
+            entry = json.load(f)
+        return entry if isinstance(entry, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache_file: Path, fingerprint: str, seconds: float) -> None:
+    tmp = cache_file.with_name(cache_file.name + '.tmp')
+    try:
+        tmp.write_text(json.dumps({'fingerprint': fingerprint, 'seconds': round(seconds, 3)}))
+        os.replace(tmp, cache_file)
+    except OSError as e:
+        logging.debug(f"Could not store validation fingerprint in {cache_file}: {e}")
+
+
+async def validate_squid_config_cached(config_file: Path = Path("/etc/squid/squid.conf"),
+                                       cache_file: Path = VALIDATION_CACHE,
+                                       force: bool = FORCE_VALIDATE,
+                                       squid_binary: str = SQUID_BINARY) -> Tuple[bool, str]:
+    """
+    Validate like validate_squid_config, skipping unchanged configurations.
+
+    Only successful validations are cached; a failing configuration is
+    parsed again on every start.
+
+    Args:
+        config_file: Path to squid.conf file
+        cache_file: Where the last successful fingerprint is stored
+        force: Always run squid -k parse (SQUID_FORCE_VALIDATE)
+        squid_binary: Squid executable used for the version fingerprint
+
+    Returns:
+        Tuple of (success: bool, error_message: str)
+    """
+    try:
+        fingerprint = await validation_fingerprint(config_file, squid_binary)
+    except (OSError, ValueError) as e:
+        logging.debug(f"Cannot fingerprint {config_file}: {e}")
+        fingerprint = None
+
+    cached = _read_cache(cache_file)
+    if fingerprint and not force and cached.get('fingerprint') == fingerprint:
+        saved = cached.get('seconds', 0)
+        logging.info(f"Configuration unchanged since last successful validation, "
+                     f"skipped squid -k parse (saved ~{saved:.2f}s)")
+        return True, ""
+
+    start = time.monotonic()
+    success, error = await validate_squid_config(config_file)
+    elapsed = time.monotonic() - start
+    logging.debug(f"squid -k parse took {elapsed:.2f}s")
+
+    if success and fingerprint:
+        _write_cache(cache_file, fingerprint, elapsed)
+    return success, error
+
+
 def detect_ssl_bump(config_file: Path = Path("/etc/squid/squid.conf")) -> bool:
     """
     Detect if ssl-bump is enabled in Squid configuration.
 
+    Uses the shared squid_config parser, so ssl-bump ports and ssl_bump
+    rules in included files are detected as well.
+
     Args:
         config_file: Path to squid.conf file
 
     Returns:
-        True if ssl-bump directive found, False otherwise
+        True if an ssl-bump port or ssl_bump directive is found, False otherwise
     """
     if not config_file.exists():
         return False
 
     try:
-        with open(config_file, 'r') as f:
-            for line in f:
-                # Strip comments and whitespace
-                line = line.split('#')[0].strip()
-                if 'ssl-bump' in line or 'ssl_bump' in line:
-                    return True
-    except (IOError, PermissionError):
+        return load_squid_config(config_file).ssl_bump_enabled
+    except (OSError, ValueError):
         logging.warning(f"Could not read {config_file} to detect ssl-bump")
 
     return False
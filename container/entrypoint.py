@@ -10,76 +10,118 @@ State Machine:
     INITIALIZING → VALIDATING → STARTING_HEALTH → STARTING_SQUID →
     RUNNING → SHUTTING_DOWN → EXITED
 
+    VALIDATING and STARTING_HEALTH are not strictly sequential: startup
+    phases run as a dependency graph (phase_scheduler), so independent
+    phases overlap and only start_squid waits for all of them.
+
 Architecture:
     - Asyncio-based event loop for signal handling and process management
     - /proc filesystem parsing for process monitoring (no external dependencies)
     - 30-second graceful shutdown timeout with force SIGKILL fallback
     - Fail-fast error handling (immediate exit on validation failures)
 
+Signals:
+    SIGTERM/SIGINT - graceful shutdown
+    SIGHUP         - validate the configuration and squid -k reconfigure
+
 Exit Codes:
     0 - Clean shutdown after SIGTERM/SIGINT
     1 - Validation failure, subprocess start failure, or unexpected death
 """
 
 import asyncio
+import importlib.util
 import logging
 import os
 import signal
+import socket
 import sys
 from pathlib import Path
-from typing import Optional
+from types import ModuleType
+from typing import Optional, Union
 
 # Import utility modules
-from logging_config import setup_logging
-from proc_utils import check_process_running
-from config_validator import validate_squid_config, detect_ssl_bump
+from logging_config import set_phase, setup_logging
+from proc_utils import wait_for_exit
+from config_validator import validate_squid_config_cached, detect_ssl_bump
 from directory_validator import validate_directories
 from ssl_cert_handler import check_ssl_certificates_exist, merge_ssl_certificates
-
+from phase_scheduler import PhaseScheduler
+from squid_config import SQUID_CONF, SquidConfig, config_digest, load_squid_config
+from squid_readiness import ACCEPTING_MARKER, probe_address, wait_for_squid_ready
+from socket_activation import bind_listen_socket, handoff_env
+from health_server import HealthServer, json_handler, metrics_handler
+from cachemgr import POLL_INTERVAL as CACHEMGR_POLL_INTERVAL, CacheManagerPoller
+from log_relay import LogRelay
+from access_log import ANALYTICS_ENABLED as ACCESS_LOG_ANALYTICS, AccessLogAnalytics, access_log_path
+from process_metrics import ProcessCollector
+from squid_supervisor import RestartPolicy, SquidSupervisor
+from config_reload import WATCH_ENABLED as CONFIG_WATCH_ENABLED, ConfigReloader
+from acl_optimizer import ACL_OPTIMIZE, RUNTIME_CONFIG, optimize_config
+from log_rotation import LogRotator
+from access_log_pipe import AccessLogForwarder, pipe_configured
+from cache_integrity import WARM_GATE as CACHE_WARM_GATE, StoreRebuildMonitor
+
+
+# init-squid.py is installed next to this script (/usr/local/bin)
+INIT_SQUID_SCRIPT = Path(__file__).with_name('init-squid.py')
+
+DEFAULT_PID_FILE = Path('/var/run/squid/squid.pid')
+SQUID_START_TIMEOUT = 30.0
 
 # Global process references for signal handlers
 squid_process: Optional[asyncio.subprocess.Process] = None
 health_process: Optional[asyncio.subprocess.Process] = None
+health_server: Optional[HealthServer] = None
+squid_log_relay: Optional[LogRelay] = None
+access_log_forwarder: Optional[AccessLogForwarder] = None
 shutdown_event: Optional[asyncio.Event] = None
+shutdown_task: Optional[asyncio.Task] = None
 
+# Configuration Squid is started with (the runtime copy with ACL_OPTIMIZE)
+squid_config_file: Path = SQUID_CONF
 
-async def run_init_squid() -> None:
-    """
-    Execute init-squid.py to initialize Squid cache directories.
+# Digest of the configuration that last passed squid -k parse
+validated_config_digest: Optional[str] = None
+config_reloader: Optional[ConfigReloader] = None
+config_watch_task: Optional[asyncio.Task] = None
+log_rotator: Optional[LogRotator] = None
+log_rotation_task: Optional[asyncio.Task] = None
 
-    Raises:
-        SystemExit: If init-squid.py fails
+
+def load_init_squid(script: Path = INIT_SQUID_SCRIPT) -> ModuleType:
     """
-    logging.info("Running Squid initialization...")
+    Import init-squid.py as a module (its file name is not a valid identifier).
 
-    try:
-        process = await asyncio.create_subprocess_exec(
-            '/usr/bin/python3',
-            '/usr/local/bin/init-squid.py',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+    Args:
+        script: Path to init-squid.py
 
-        stdout, stderr = await process.communicate()
+    Returns:
+        Loaded init_squid module
+    """
+    spec = importlib.util.spec_from_file_location("init_squid", script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["init_squid"] = module
+    spec.loader.exec_module(module)
+    return module
 
-        # Log init-squid.py output for debugging
-        if stdout:
-            stdout_text = stdout.decode('utf-8').strip()
-            if stdout_text:
-                for line in stdout_text.split('\n'):
-                    logging.info(f"init-squid: {line}")
 
-        if stderr:
-            stderr_text = stderr.decode('utf-8').strip()
-            if stderr_text:
-                for line in stderr_text.split('\n'):
-                    logging.warning(f"init-squid: {line}")
+async def run_init_squid() -> None:
+    """
+    Run init-squid in-process to initialize Squid cache directories.
 
-        if process.returncode != 0:
-            error_msg = stderr.decode('utf-8').strip() if stderr else "Unknown error"
-            logging.error(f"init-squid.py failed with exit code {process.returncode}")
-            sys.exit(1)
+    init-squid's async API shares this event loop, so its squid -z and
+    security_file_certgen subprocesses overlap with other startup work and
+    no second Python interpreter is started.
 
+    Raises:
+        SystemExit: If initialization fails
+    """
+    logging.info("Running Squid initialization...")
+
+    try:
+        init_squid = load_init_squid()
+        await init_squid.initialize()
         logging.info("Squid initialization complete")
 
     except Exception as e:
@@ -87,15 +129,16 @@ async def run_init_squid() -> None:
         sys.exit(1)
 
 
-async def validate_configuration() -> None:
+async def prepare_configuration() -> None:
     """
-    Validate Squid configuration and handle SSL certificate merging.
+    Install the default config if needed and handle SSL certificate merging.
+
+    SSL certificates must be merged before any phase that parses the
+    config (squid -k parse, squid -z), since Squid loads the certificate file.
 
     Raises:
-        SystemExit: If validation fails
+        SystemExit: If SSL-bump is enabled but certificates are unusable
     """
-    logging.info("Validating Squid configuration...")
-
     # Check if custom config exists, otherwise copy default
     config_file = Path('/etc/squid/squid.conf')
     default_config = Path('/etc/squid/squid.conf.default')
@@ -122,12 +165,77 @@ async def validate_configuration() -> None:
             logging.error(f"Failed to merge SSL certificates: {merge_error}")
             sys.exit(1)
 
+
+def compile_acl_lists(config: SquidConfig, output: Path = RUNTIME_CONFIG) -> Path:
+    """
+    Optimize dstdomain, src and dst acl lists and write the runtime configuration.
+
+    Args:
+        config: Parsed source configuration
+        output: Runtime configuration path (a scratch copy on reload)
+
+    Returns:
+        output
+
+    Raises:
+        OSError: If the runtime configuration cannot be written
+    """
+    runtime_config, results = optimize_config(config, output=output)
+    for stats in results:
+        logging.info(f"ACL optimizer: {stats.summary()}")
+    return runtime_config
+
+
+async def optimize_acls() -> None:
+    """
+    Compile large dstdomain/src/dst lists before Squid loads them (ACL_OPTIMIZE).
+
+    Runs in a worker thread so the health server keeps answering meanwhile.
+
+    Raises:
+        SystemExit: If the runtime configuration cannot be written
+    """
+    global squid_config_file
+    if not ACL_OPTIMIZE:
+        return
+
+    try:
+        config = await asyncio.to_thread(load_squid_config, SQUID_CONF)
+        squid_config_file = await asyncio.to_thread(compile_acl_lists, config)
+    except (OSError, ValueError) as e:
+        logging.error(f"Failed to optimize ACL lists: {e}")
+        sys.exit(1)
+
+
+def current_config_digest() -> str:
+    """config_digest of squid.conf and its ACL files (blocking: run in a worker thread)."""
+    return config_digest(load_squid_config(SQUID_CONF))
+
+
+async def validate_configuration() -> None:
+    """
+    Validate Squid configuration with squid -k parse.
+
+    squid -k parse is skipped when the configuration fingerprint matches the
+    last successful validation stored on the /var/lib/squid volume (set
+    SQUID_FORCE_VALIDATE=true to always run it). The digest of the validated
+    configuration is kept so an in-place Squid restart can skip validation
+    when nothing changed.
+
+    Raises:
+        SystemExit: If validation fails
+    """
+    global validated_config_digest
+    logging.info("Validating Squid configuration...")
+
     # Validate configuration (after SSL certificates are merged)
-    success, error = await validate_squid_config(config_file)
+    digest = await asyncio.to_thread(current_config_digest)
+    success, error = await validate_squid_config_cached(squid_config_file)
     if not success:
         logging.error(f"Squid configuration validation failed:\n{error}")
         sys.exit(1)
 
+    validated_config_digest = digest
     logging.info("Configuration validation passed")
 
 
@@ -151,58 +259,155 @@ async def validate_runtime_directories() -> None:
     # pid_filename /var/run/squid/squid.pid
 
 
-async def start_health_server() -> asyncio.subprocess.Process:
+async def spawn_health_process(sock: socket.socket) -> asyncio.subprocess.Process:
     """
-    Start the health check HTTP server as a background process.
+    Run healthcheck.py as a separate process serving on the handed-over socket.
+
+    Args:
+        sock: Listening socket; passed to the child by file descriptor
 
     Returns:
         Process object for health server
-
-    Raises:
-        SystemExit: If health server fails to start
     """
-    health_port = os.getenv('HEALTH_PORT', '8080')
-    logging.info(f"Starting health check server on port {health_port}")
-
     try:
         process = await asyncio.create_subprocess_exec(
             '/usr/bin/python3',
             '/usr/local/bin/healthcheck.py',
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=(sock.fileno(),),
+            env={**os.environ, **handoff_env(sock)}
         )
+    finally:
+        # The child owns the listening socket now
+        sock.close()
 
-        # Wait for health server to start
-        await asyncio.sleep(2.0)
+    logging.info(f"Health check server started (PID: {process.pid})")
+    return process
 
-        # Verify process is still running
-        if not check_process_running(process.pid):
-            logging.error("Health check server failed to start")
-            sys.exit(1)
 
-        logging.info(f"Health check server started (PID: {process.pid})")
-        return process
+async def start_health_server() -> Union[HealthServer, asyncio.subprocess.Process]:
+    """
+    Start the health check HTTP server.
+
+    The entrypoint binds the health port itself (socket_activation), so
+    probes are queued by the kernel immediately and no startup sleep is
+    needed. By default the asyncio HealthServer runs in this event loop;
+    HEALTH_SERVER_MODE=subprocess runs healthcheck.py as a separate process
+    and passes it the socket by file descriptor.
+
+    Returns:
+        HealthServer (in-process) or Process object (subprocess mode)
+
+    Raises:
+        SystemExit: If health server fails to start
+    """
+    health_port = int(os.getenv('HEALTH_PORT', '8080'))
+    mode = os.getenv('HEALTH_SERVER_MODE', 'inprocess').lower()
+    logging.info(f"Starting health check server on port {health_port} ({mode})")
+
+    try:
+        sock = bind_listen_socket(health_port)
+    except OSError as e:
+        logging.error(f"Failed to bind health check port {health_port}: {e}")
+        sys.exit(1)
+
+    try:
+        if mode == 'subprocess':
+            return await spawn_health_process(sock)
+
+        server = HealthServer(sock=sock)
+        collector = ProcessCollector(lambda: squid_process.pid if squid_process else None)
+        server.add_route('/metrics', metrics_handler())
+        server.add_task(collector.run())
+        if CACHEMGR_POLL_INTERVAL > 0:
+            poller = CacheManagerPoller()
+            server.add_route('/cachemgr', json_handler(poller.snapshot))
+            server.add_task(poller.run())
+        if CACHE_WARM_GATE:
+            # Started before Squid so the whole store rebuild is seen
+            monitor = StoreRebuildMonitor()
+            server.probes.add_check(monitor.check)
+            server.add_route('/cache-store', json_handler(monitor.snapshot))
+            server.add_task(monitor.run())
+        await server.start()
+        logging.info("Health check server started in-process")
+        return server
 
     except Exception as e:
         logging.error(f"Failed to start health check server: {str(e)}")
         sys.exit(1)
 
 
-async def log_stream(stream, prefix):
-    """Log output from a subprocess stream."""
-    while True:
-        line = await stream.readline()
-        if not line:
-            break
-        decoded = line.decode('utf-8').rstrip()
-        if decoded:
-            logging.info(f"{prefix}: {decoded}")
+def start_access_log_analytics(server: HealthServer) -> None:
+    """
+    Follow Squid's access.log and serve rolling aggregates.
+
+    Runs on the in-process health server once Squid is up, so the final
+    configuration (after default copy and SSL merge) decides which log is
+    followed. Aggregates are exported on /metrics and as JSON on /access-log.
+
+    Args:
+        server: Running in-process health server
+    """
+    path = access_log_path(load_squid_config(Path('/etc/squid/squid.conf')))
+    if path is None:
+        logging.info("access.log analytics disabled: no local access_log in native squid format")
+        return
+
+    analytics = AccessLogAnalytics(path)
+    server.add_route('/access-log', json_handler(analytics.snapshot))
+    if access_log_forwarder is not None and access_log_forwarder.path == path:
+        # A pipe cannot be followed; analyse the lines as they are forwarded
+        access_log_forwarder.on_lines = analytics.stats.add_lines
+    else:
+        server.add_task(analytics.run())
+    logging.info(f"access.log analytics following {path}")
+
+
+async def start_access_log_pipe() -> None:
+    """
+    Create the access log FIFO; start_squid starts forwarding it to stdout.
+
+    Only runs when an access_log in squid.conf points at ACCESS_LOG_PIPE; the
+    FIFO must exist before Squid starts, or Squid creates a regular file.
+
+    Raises:
+        SystemExit: If the FIFO cannot be created
+    """
+    global access_log_forwarder
+    if not pipe_configured(load_squid_config(SQUID_CONF)):
+        return
+
+    try:
+        forwarder = AccessLogForwarder()
+        forwarder.open()
+    except (OSError, ValueError) as e:
+        logging.error(f"Failed to set up access log pipe: {e}")
+        sys.exit(1)
+    access_log_forwarder = forwarder
+    logging.info(f"Forwarding access log from {forwarder.path} to stdout ({forwarder.log_format})")
+
+
+def flush_squid_logs() -> None:
+    """Write out Squid output still queued in the log relay and access log forwarder and stop them."""
+    if squid_log_relay is not None:
+        squid_log_relay.stop()
+    if access_log_forwarder is not None:
+        access_log_forwarder.stop()
 
 
 async def start_squid() -> asyncio.subprocess.Process:
     """
     Start Squid proxy process in non-daemon mode.
 
+    Readiness is event-driven (see squid_readiness): the PID file directory
+    is watched with inotify, Squid's output is scanned for the listening
+    socket message and the configured http_port is TCP-probed.
+
+    Squid's stdout/stderr go through a LogRelay, so log writes happen on a
+    writer thread instead of blocking the event loop.
+
     Returns:
         Process object for Squid
 
@@ -211,58 +416,71 @@ async def start_squid() -> asyncio.subprocess.Process:
     """
     logging.info("Starting Squid proxy...")
 
+    config_file = squid_config_file
+    config = load_squid_config(config_file)
+    pid_file = config.pid_filename or DEFAULT_PID_FILE
+    listen = None
+    if config.http_ports:
+        port = config.http_ports[0]
+        listen = probe_address(port.address, port.port)
+
+    # Squid's open() of the access log FIFO blocks until there is a reader
+    if access_log_forwarder is not None:
+        access_log_forwarder.start()
+
     try:
         process = await asyncio.create_subprocess_exec(
             '/usr/sbin/squid',
             '-N',  # No daemon mode (foreground)
-            '-f', '/etc/squid/squid.conf',
+            '-f', str(config_file),
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE
         )
 
-        # Start background tasks to log Squid output
-        asyncio.create_task(log_stream(process.stdout, "Squid"))
-        asyncio.create_task(log_stream(process.stderr, "Squid"))
-
-        # Give logging tasks time to start
-        await asyncio.sleep(0.5)
-
-        # Wait for PID file creation
-        pid_file = Path('/var/run/squid/squid.pid')
-        max_attempts = 300  # 30 seconds (300 * 0.1s)
+        # Start background tasks to log Squid output (the relay and its
+        # metrics are kept across in-place restarts)
+        global squid_log_relay
+        if squid_log_relay is None:
+            squid_log_relay = LogRelay()
+        squid_log_relay.pid = process.pid
+        squid_log_relay.start()
+        accepting = asyncio.Event()
+        log_tasks = [
+            asyncio.create_task(squid_log_relay.relay(process.stdout, "Squid", accepting, ACCEPTING_MARKER)),
+            asyncio.create_task(squid_log_relay.relay(process.stderr, "Squid", accepting, ACCEPTING_MARKER)),
+        ]
 
-        for attempt in range(max_attempts):
-            if pid_file.exists():
-                break
-
-            # Check if process already exited
-            if process.returncode is not None:
-                # Wait a bit for log streams to finish reading
-                await asyncio.sleep(1.0)
-                logging.error(f"Squid exited during startup with code {process.returncode}")
-
-                # Print Squid log files for debugging
-                logging.error("Squid cache.log contents:")
-                cache_log = Path('/var/log/squid/cache.log')
-                if cache_log.exists():
-                    try:
-                        with open(cache_log, 'r') as f:
-                            for line in f:
-                                logging.error(f"  {line.rstrip()}")
-                    except Exception as e:
-                        logging.error(f"  Could not read cache.log: {e}")
-                else:
-                    logging.error("  cache.log does not exist")
+        try:
+            signal_name = await wait_for_squid_ready(
+                process, pid_file, listen, accepting, SQUID_START_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logging.error(f"Squid did not become ready within {SQUID_START_TIMEOUT:.0f} seconds")
+            process.kill()
+            sys.exit(1)
 
-                sys.exit(1)
+        if signal_name == 'exited':
+            # Let log streams drain remaining output before reporting
+            await asyncio.wait(log_tasks, timeout=1.0)
+            flush_squid_logs()
+            logging.error(f"Squid exited during startup with code {process.returncode}")
+
+            # Print Squid log files for debugging
+            logging.error("Squid cache.log contents:")
+            cache_log = Path('/var/log/squid/cache.log')
+            if cache_log.exists():
+                try:
+                    with open(cache_log, 'r') as f:
+                        for line in f:
+                            logging.error(f"  {line.rstrip()}")
+                except Exception as e:
+                    logging.error(f"  Could not read cache.log: {e}")
+            else:
+                logging.error("  cache.log does not exist")
 
-            await asyncio.sleep(0.1)
-        else:
-            logging.error("Squid PID file not created within 30 seconds")
-            process.kill()
             sys.exit(1)
 
-        logging.info(f"Squid started with PID {process.pid}")
+        logging.info(f"Squid started with PID {process.pid} (ready via {signal_name})")
         return process
 
     except Exception as e:
@@ -270,45 +488,145 @@ async def start_squid() -> asyncio.subprocess.Process:
         sys.exit(1)
 
 
-async def monitor_squid(process: asyncio.subprocess.Process) -> None:
+async def wait_squid_exit(process: asyncio.subprocess.Process) -> int:
     """
-    Monitor Squid process via /proc filesystem.
+    Wait for Squid to exit and return its exit code.
+
+    Squid's pidfd is registered with the event loop (wait_for_exit), so
+    nothing wakes up while Squid runs. Where pidfds are unavailable, asyncio's
+    child watcher is awaited instead, which is event-driven as well.
+
+    Args:
+        process: Squid process
+
+    Returns:
+        Exit code (negative signal number if killed by a signal)
+    """
+    try:
+        await wait_for_exit(process.pid)
+    except OSError as e:
+        logging.debug(f"pidfd supervision unavailable ({e}), using the child watcher")
+    return await process.wait()
+
+
+async def monitor_squid(process: asyncio.subprocess.Process) -> Optional[int]:
+    """
+    Supervise Squid until it exits or shutdown is requested.
+
+    Squid's exit and the shutdown event are awaited together; there is no
+    periodic polling, and a crash is detected as soon as it happens.
 
     Args:
         process: Squid process to monitor
 
-    Raises:
-        SystemExit: If Squid dies unexpectedly
+    Returns:
+        Squid's exit code if it died unexpectedly, None on shutdown
     """
     global shutdown_event
 
-    while True:
-        # Check if shutdown was requested
-        if shutdown_event and shutdown_event.is_set():
-            # Graceful shutdown in progress
-            return
-
-        # Check if process is still running via /proc
-        if not check_process_running(process.pid):
-            # Process died, check return code
-            returncode = process.returncode
-            logging.error(f"Squid process died with exit code {returncode}")
-            sys.exit(1)
+    exited = asyncio.create_task(wait_squid_exit(process), name='squid-exit')
+    waiters = {exited}
+    if shutdown_event is not None:
+        shutdown = asyncio.create_task(shutdown_event.wait(), name='shutdown-requested')
+        waiters.add(shutdown)
 
-        # Check via wait_for with timeout (non-blocking check)
-        try:
-            await asyncio.wait_for(process.wait(), timeout=1.0)
-            # If we get here, process exited
-            logging.error(f"Squid process exited with code {process.returncode}")
-            sys.exit(1)
-        except asyncio.TimeoutError:
-            # Process still running, continue monitoring
-            pass
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in waiters:
+            task.cancel()
+
+    # Squid also exits during a graceful shutdown; that is not a crash
+    if shutdown_event is not None and shutdown_event.is_set():
+        return None
+
+    returncode = exited.result()
+    flush_squid_logs()
+    logging.error(f"Squid process exited with code {returncode}")
+    return returncode
+
+
+async def restart_squid(supervisor: SquidSupervisor, delay: float) -> Optional[asyncio.subprocess.Process]:
+    """
+    Restart Squid in place after backing off.
+
+    Cache directories initialized at startup are reused. squid -k parse is
+    only run again if the configuration digest changed since it last passed.
+
+    Args:
+        supervisor: Restart supervisor (records the recovery time)
+        delay: Seconds to wait before restarting
+
+    Returns:
+        New Squid process, or None if shutdown was requested meanwhile
+
+    Raises:
+        SystemExit: If the changed configuration is invalid or Squid fails
+                    to start
+    """
+    logging.warning(f"Restarting Squid in {delay:.1f}s "
+                    f"({supervisor.recent_exits}/{supervisor.policy.max_restarts} "
+                    f"restarts in {supervisor.policy.window:.0f}s window)")
+    try:
+        await asyncio.wait_for(shutdown_event.wait(), timeout=delay)
+        return None
+    except asyncio.TimeoutError:
+        pass
+
+    if await asyncio.to_thread(current_config_digest) != validated_config_digest:
+        logging.info("Squid configuration changed since validation")
+        await optimize_acls()
+        await validate_configuration()
+    else:
+        logging.info("Squid configuration unchanged, skipping validation")
+
+    process = await start_squid()
+    if shutdown_event.is_set():
+        # Shutdown arrived while Squid was starting; the handler did not see it
+        process.terminate()
+        await process.wait()
+        return None
+
+    logging.info(f"Squid recovered in {supervisor.record_recovery():.2f}s")
+    return process
+
+
+def config_applied(digest: str) -> None:
+    """Record a configuration reloaded into Squid as validated."""
+    global validated_config_digest
+    validated_config_digest = digest
+
+
+def start_config_reload() -> None:
+    """
+    Set up configuration hot reload.
+
+    SIGHUP forces a reload; with CONFIG_WATCH enabled, changes to squid.conf,
+    included files and acl files are reloaded automatically.
+    """
+    global config_reloader, config_watch_task
+    config_reloader = ConfigReloader(applied_digest=validated_config_digest, on_applied=config_applied,
+                                     prepare=compile_acl_lists if ACL_OPTIMIZE else None,
+                                     runtime_file=squid_config_file if ACL_OPTIMIZE else None)
+    if CONFIG_WATCH_ENABLED:
+        config_watch_task = asyncio.create_task(config_reloader.run(), name='config-watch')
+        logging.info("Watching Squid configuration for changes")
+
+
+async def reload_handler() -> None:
+    """Handle SIGHUP: validate the configuration and reconfigure Squid."""
+    logging.info("Received signal SIGHUP, reloading Squid configuration...")
+    if shutdown_event and shutdown_event.is_set():
+        return
+    if squid_process is None or squid_process.returncode is not None:
+        logging.warning("Squid is not running, reload skipped")
+        return
+    await config_reloader.reload(force=True)
 
 
 async def shutdown_handler(sig: signal.Signals) -> None:
     """
-    Handle graceful shutdown on SIGTERM/SIGINT/SIGHUP.
+    Handle graceful shutdown on SIGTERM/SIGINT.
 
     Asyncio Pattern: Uses asyncio.wait_for() with 30-second timeout to enforce
     graceful shutdown deadline. If Squid doesn't exit within timeout, force
@@ -324,12 +642,23 @@ async def shutdown_handler(sig: signal.Signals) -> None:
     """
     global squid_process, health_process, shutdown_event
 
+    set_phase('shutting_down')
     logging.info(f"Received signal {sig.name}, initiating graceful shutdown...")
 
     # Set shutdown event to stop monitoring
     if shutdown_event:
         shutdown_event.set()
 
+    # No configuration reloads while Squid is stopping
+    if config_watch_task:
+        config_watch_task.cancel()
+
+    # Pending compression is picked up again on the next start
+    if log_rotation_task:
+        log_rotation_task.cancel()
+    if log_rotator:
+        log_rotator.close()
+
     # Send SIGTERM to Squid
     if squid_process and squid_process.returncode is None:
         logging.info(f"Sending SIGTERM to Squid (PID: {squid_process.pid})")
@@ -345,6 +674,9 @@ async def shutdown_handler(sig: signal.Signals) -> None:
             await asyncio.wait_for(squid_process.wait(), timeout=5.0)
 
     # Stop health server
+    if health_server:
+        await health_server.close()
+
     if health_process and health_process.returncode is None:
         health_process.terminate()
         try:
@@ -352,9 +684,25 @@ async def shutdown_handler(sig: signal.Signals) -> None:
         except asyncio.TimeoutError:
             health_process.kill()
 
+    flush_squid_logs()
     logging.info("Shutdown complete")
 
 
+def request_shutdown(sig: signal.Signals) -> None:
+    """
+    Start the graceful shutdown once (further signals are ignored).
+
+    main() awaits the task before returning, so asyncio.run() does not
+    cancel it while Squid is still stopping.
+    """
+    global shutdown_task
+
+    if shutdown_task is None:
+        shutdown_task = asyncio.create_task(shutdown_handler(sig), name='shutdown')
+    else:
+        logging.info(f"Received signal {sig.name}, shutdown already in progress")
+
+
 async def main() -> None:
     """
     Main entrypoint orchestrating all initialization and monitoring.
@@ -363,7 +711,8 @@ async def main() -> None:
         INITIALIZING → VALIDATING → STARTING_HEALTH → STARTING_SQUID →
         RUNNING → SHUTTING_DOWN → EXITED
     """
-    global squid_process, health_process, shutdown_event
+    global squid_process, health_process, health_server, shutdown_event
+    global log_rotator, log_rotation_task
 
     # INITIALIZING State
     setup_logging(os.getenv('LOG_LEVEL', 'INFO'))
@@ -372,16 +721,40 @@ async def main() -> None:
     gid = os.getgid()
     logging.info(f"CephaloProxy entrypoint starting (UID: {uid}, GID: {gid})")
 
-    # VALIDATING State
-    await validate_configuration()  # Must run BEFORE init-squid (copies default config)
-    await run_init_squid()
-    await validate_runtime_directories()
-
-    # STARTING_HEALTH State
-    health_process = await start_health_server()
+    # Fail on a bad restart policy before anything is started
+    policy = RestartPolicy.from_env()
+    try:
+        log_rotator = LogRotator()
+    except ValueError as e:
+        logging.error(str(e))
+        sys.exit(1)
 
-    # STARTING_SQUID State
-    squid_process = await start_squid()
+    # VALIDATING → STARTING_HEALTH → STARTING_SQUID
+    # Independent phases run concurrently; start_squid waits for all of them.
+    scheduler = PhaseScheduler()
+    scheduler.add('prepare_config', prepare_configuration)
+    scheduler.add('optimize_acls', optimize_acls, depends_on=('prepare_config',))
+    scheduler.add('validate_config', validate_configuration, depends_on=('optimize_acls',))
+    scheduler.add('init_squid', run_init_squid, depends_on=('prepare_config',))
+    scheduler.add('validate_directories', validate_runtime_directories)
+    scheduler.add('health_server', start_health_server)
+    scheduler.add('access_log_pipe', start_access_log_pipe, depends_on=('prepare_config',))
+    scheduler.add('start_squid', start_squid, depends_on=(
+        'validate_config', 'init_squid', 'validate_directories', 'health_server', 'access_log_pipe'
+    ))
+
+    results = await scheduler.run()
+    health = results['health_server']
+    if isinstance(health, HealthServer):
+        health_server = health
+    else:
+        health_process = health
+    squid_process = results['start_squid']
+    logging.info(f"Startup phases completed in {scheduler.summary()}")
+    set_phase('running')
+
+    if health_server is not None and ACCESS_LOG_ANALYTICS:
+        start_access_log_analytics(health_server)
 
     # Register signal handlers (must be done in main thread)
     # Asyncio Pattern: loop.add_signal_handler() is the recommended approach for
@@ -390,19 +763,44 @@ async def main() -> None:
     shutdown_event = asyncio.Event()
     loop = asyncio.get_running_loop()
 
-    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
-        loop.add_signal_handler(
-            sig,
-            lambda s=sig: asyncio.create_task(shutdown_handler(s))
-        )
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_shutdown, sig)
+
+    # SIGHUP reloads the configuration instead of stopping the container
+    start_config_reload()
+    loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.create_task(reload_handler()))
+
+    if log_rotator.enabled:
+        log_rotator.config_file = squid_config_file
+        log_rotation_task = asyncio.create_task(log_rotator.run(), name='log-rotation')
 
     # RUNNING State
     logging.info("Container ready, entering monitoring loop")
 
-    # Monitor Squid process
+    # Monitor Squid process, restarting it in place if a policy is set
+    supervisor = SquidSupervisor(policy) if policy is not None else None
+
     try:
-        await monitor_squid(squid_process)
-        # If we get here, shutdown completed gracefully
+        while True:
+            returncode = await monitor_squid(squid_process)
+            if returncode is None:
+                break
+
+            delay = supervisor.record_exit(returncode) if supervisor else None
+            if delay is None:
+                if supervisor:
+                    logging.error(f"Squid exited {supervisor.recent_exits} times within "
+                                  f"{policy.window:.0f}s, giving up")
+                sys.exit(1)
+
+            process = await restart_squid(supervisor, delay)
+            if process is None:
+                break
+            squid_process = process
+
+        # Squid, the health server and the logs are stopped by the handler
+        if shutdown_task is not None:
+            await shutdown_task
         logging.info("Main loop exiting")
     except asyncio.CancelledError:
         # Shutdown initiated
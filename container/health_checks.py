@@ -0,0 +1,315 @@
+"""
+Health check probe logic shared by both health server implementations.
+
+Used by healthcheck.py (standalone http.server process) and health_server.py
+(asyncio server hosted in the entrypoint) so /health and /ready behave
+identically in either mode.
+
+Probe results are cached in a ProbeCache that a background task (or thread)
+refreshes every HEALTH_PROBE_TTL seconds, so request handlers answer from
+memory instead of repeating PID file, /proc and os.access() work per hit.
+
+With HEALTH_DEEP_CHECK enabled, readiness also sends a cache manager
+request through the proxy port (DataPathProbe), so a Squid that is alive
+but wedged (exhausted file descriptors, stuck helpers, saturated disk) is
+taken out of rotation. Deep checks are rate-limited and run on the
+refresher, never on the request path.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from squid_readiness import proxy_address
+
+
+# Configuration
+CACHE_DIR = os.getenv('CACHE_DIR', '/var/spool/squid')
+CONFIG_FILE = '/etc/squid/squid.conf'
+PID_FILE = Path('/var/run/squid/squid.pid')
+
+# Seconds between background probe refreshes
+PROBE_TTL = float(os.getenv('HEALTH_PROBE_TTL', '1.0'))
+
+# Readiness fails if cached results are older than this (refresher stalled)
+PROBE_MAX_AGE = float(os.getenv('HEALTH_PROBE_MAX_AGE', str(PROBE_TTL * 10)))
+
+# Deep data-path check through the proxy port (opt-in)
+DEEP_CHECK = os.getenv('HEALTH_DEEP_CHECK', 'false').lower() == 'true'
+DEEP_CHECK_INTERVAL = float(os.getenv('HEALTH_DEEP_CHECK_INTERVAL', '10'))
+DEEP_CHECK_THRESHOLD_MS = float(os.getenv('HEALTH_DEEP_CHECK_THRESHOLD_MS', '1000'))
+DEEP_CHECK_TIMEOUT = float(os.getenv('HEALTH_DEEP_CHECK_TIMEOUT', '5'))
+
+# Cheapest request that exercises Squid's request path without an origin
+DEEP_CHECK_REQUEST = (
+    b'GET cache_object://localhost/info HTTP/1.0\r\n'
+    b'Host: localhost\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+)
+
+
+def is_squid_running() -> bool:
+    """
+    Check if Squid is running by checking PID file and /proc filesystem.
+
+    Returns:
+        True if Squid process is running, False otherwise
+    """
+    try:
+        # Check if PID file exists
+        if not PID_FILE.exists():
+            return False
+
+        # Read PID from file
+        pid = int(PID_FILE.read_text().strip())
+
+        # Check if process exists in /proc
+        proc_dir = Path(f'/proc/{pid}')
+        if not proc_dir.exists():
+            return False
+
+        # Verify it's actually squid by checking cmdline
+        cmdline_file = proc_dir / 'cmdline'
+        if cmdline_file.exists():
+            cmdline = cmdline_file.read_text()
+            # cmdline has null-separated arguments
+            if 'squid' in cmdline:
+                return True
+
+        return False
+
+    except (ValueError, FileNotFoundError, PermissionError):
+        return False
+
+
+def readiness_errors(squid_running: Optional[bool] = None) -> List[str]:
+    """
+    Readiness checks:
+    - Squid process is running
+    - Cache directory is writable
+    - Configuration file is readable
+
+    Args:
+        squid_running: Result of is_squid_running() if already known
+
+    Returns:
+        List of human-readable failures (empty if ready)
+    """
+    errors = []
+
+    if squid_running is None:
+        squid_running = is_squid_running()
+
+    # Check 1: Squid process running via /proc filesystem
+    if not squid_running:
+        errors.append('Squid process not running')
+
+    # Check 2: Cache directory writable
+    # Check both persistent and ephemeral cache locations
+    cache_dirs = [CACHE_DIR]
+    current_uid = os.getuid()
+    ephemeral_cache = f'/tmp/squid-cache-{current_uid}'
+    if os.path.exists(ephemeral_cache):
+        cache_dirs.append(ephemeral_cache)
+
+    cache_ok = False
+    for cache_dir in cache_dirs:
+        if os.path.isdir(cache_dir) and os.access(cache_dir, os.W_OK):
+            cache_ok = True
+            break
+
+    if not cache_ok:
+        errors.append('Cache directory not writable')
+
+    # Check 3: Configuration file readable
+    if not os.path.isfile(CONFIG_FILE):
+        errors.append('Configuration file not found')
+    elif not os.access(CONFIG_FILE, os.R_OK):
+        errors.append('Configuration file not readable')
+
+    return errors
+
+
+def probe_data_path(address: Tuple[str, int], timeout: float = DEEP_CHECK_TIMEOUT) -> Tuple[bool, str, float]:
+    """
+    Send a cache manager request through the proxy and time the response.
+
+    Any HTTP response below 500 counts as success: a 403 from a config that
+    denies manager access still proves the request was accepted, parsed and
+    answered by Squid.
+
+    Args:
+        address: (host, port) of the proxy listener
+        timeout: Seconds to wait for connect and the status line
+
+    Returns:
+        Tuple of (success, message, latency in milliseconds)
+    """
+    start = time.monotonic()
+    try:
+        with socket.create_connection(address, timeout=timeout) as sock:
+            sock.sendall(DEEP_CHECK_REQUEST)
+            status_line = sock.makefile('rb').readline(256)
+    except OSError as e:
+        return False, f"Data path check failed: {e}", (time.monotonic() - start) * 1000
+
+    latency_ms = (time.monotonic() - start) * 1000
+    parts = status_line.split()
+    if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+        return False, "Data path check failed: no HTTP response from proxy", latency_ms
+
+    status = int(parts[1])
+    if status >= 500:
+        return False, f"Data path check failed: proxy returned {status}", latency_ms
+
+    return True, f"Proxy answered {status} in {latency_ms:.0f}ms", latency_ms
+
+
+class DataPathProbe:
+    """
+    Rate-limited deep readiness check through the proxy port.
+
+    check() runs probe_data_path() at most once per interval and otherwise
+    returns the previous outcome, so it is safe to call on every refresh.
+    """
+
+    def __init__(self, interval: float = DEEP_CHECK_INTERVAL,
+                 threshold_ms: float = DEEP_CHECK_THRESHOLD_MS,
+                 timeout: float = DEEP_CHECK_TIMEOUT,
+                 address: Optional[Tuple[str, int]] = None):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.timeout = timeout
+        self.address = address
+        self.latency_ms: Optional[float] = None
+        self._errors: List[str] = []
+        self._last_run: Optional[float] = None
+
+    def check(self) -> List[str]:
+        """
+        Return deep check failures (empty if the data path is healthy).
+
+        Returns:
+            List of human-readable failures
+        """
+        now = time.monotonic()
+        if self._last_run is not None and now - self._last_run < self.interval:
+            return self._errors
+        self._last_run = now
+
+        address = self.address or proxy_address(Path(CONFIG_FILE))
+        success, message, latency_ms = probe_data_path(address, self.timeout)
+        self.latency_ms = latency_ms
+        if not success:
+            self._errors = [message]
+        elif latency_ms > self.threshold_ms:
+            self._errors = [
+                f'Data path slow ({latency_ms:.0f}ms > {self.threshold_ms:.0f}ms threshold)'
+            ]
+        else:
+            self._errors = []
+        return self._errors
+
+
+@dataclass
+class ProbeResult:
+    """Snapshot of liveness and readiness checks."""
+
+    alive: bool
+    errors: List[str] = field(default_factory=list)
+    checked_at: float = 0.0  # time.monotonic() of the refresh
+
+    @property
+    def age(self) -> float:
+        """Seconds since this result was produced."""
+        return time.monotonic() - self.checked_at
+
+
+class ProbeCache:
+    """
+    Time-bounded cache of probe results, refreshed in the background.
+
+    Example (asyncio):
+        probes = ProbeCache()
+        task = asyncio.create_task(probes.run())
+        result = probes.snapshot()
+    """
+
+    def __init__(self, ttl: float = PROBE_TTL, max_age: float = PROBE_MAX_AGE,
+                 deep: Optional[DataPathProbe] = None):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.deep = deep if deep is not None else (DataPathProbe() if DEEP_CHECK else None)
+        self.checks: List[Callable[[], List[str]]] = []
+        self._result: Optional[ProbeResult] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def add_check(self, check: Callable[[], List[str]]) -> None:
+        """Add a readiness check returning error strings (run on every refresh)."""
+        self.checks.append(check)
+
+    def refresh(self) -> ProbeResult:
+        """Run all checks now and store the result."""
+        alive = is_squid_running()
+        errors = readiness_errors(alive)
+        # Only worth a round trip once the cheap checks pass
+        if self.deep is not None and not errors:
+            errors = self.deep.check()
+        for check in self.checks:
+            errors = errors + check()
+        result = ProbeResult(alive=alive, errors=list(errors),
+                             checked_at=time.monotonic())
+        self._result = result
+        return result
+
+    def snapshot(self) -> ProbeResult:
+        """
+        Return the cached result (constant time).
+
+        The first call before any background refresh probes synchronously.
+        Readiness reports an extra error if the data is older than max_age.
+        """
+        result = self._result
+        if result is None:
+            result = self.refresh()
+
+        age = result.age
+        if age > self.max_age:
+            return ProbeResult(
+                alive=result.alive,
+                errors=result.errors + [f'Probe data stale ({age:.1f}s old)'],
+                checked_at=result.checked_at
+            )
+        return result
+
+    async def run(self) -> None:
+        """Refresh every ttl seconds in a worker thread (asyncio mode)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.refresh)
+            except Exception as e:
+                logging.warning(f"Health probe refresh failed: {e}")
+            await asyncio.sleep(self.ttl)
+
+    def start_thread(self) -> None:
+        """Refresh every ttl seconds in a daemon thread (http.server mode)."""
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f'WARNING: Health probe refresh failed: {e}', file=sys.stderr, flush=True)
+                time.sleep(self.ttl)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=loop, name='probe-refresh', daemon=True)
+            self._thread.start()
@@ -0,0 +1,248 @@
+"""
+Asyncio HTTP/1.1 health check server hosted in the entrypoint event loop.
+
+Serves the same /health and /ready contract as healthcheck.py
+(specs/001-squid-proxy-container/contracts/healthcheck-api.yaml) without a
+second Python interpreter.
+
+Handlers answer from a ProbeCache refreshed by a background task, and
+report the data age in an X-Probe-Age header.
+
+Each connection is handled in its own task, so a slow client cannot block
+other probes; connections support HTTP/1.1 keep-alive, and every request
+read is bounded by a timeout and a header size limit.
+
+Additional endpoints are registered with add_route(); the entrypoint adds
+/metrics via metrics_handler() and JSON endpoints via json_handler().
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from http import HTTPStatus
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from health_checks import ProbeCache, ProbeResult
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, Registry
+
+
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', '8080'))
+
+# Seconds to wait for a complete request head (also the keep-alive idle timeout)
+READ_TIMEOUT = float(os.getenv('HEALTH_READ_TIMEOUT', '5'))
+
+MAX_HEADER_BYTES = 8192
+MAX_BODY_BYTES = 8192
+MAX_KEEPALIVE_REQUESTS = 1000
+
+# (status, content type, body[, extra headers])
+Response = Union[Tuple[int, str, bytes], Tuple[int, str, bytes, Dict[str, str]]]
+Handler = Callable[[], Awaitable[Response]]
+
+
+def probe_age_header(result: ProbeResult) -> Dict[str, str]:
+    """Header reporting how old the cached probe data is, in seconds."""
+    return {'X-Probe-Age': f'{result.age:.3f}'}
+
+
+def metrics_handler(registry: Registry = REGISTRY) -> Handler:
+    """Handler serving registry in Prometheus text format."""
+    async def handle_metrics() -> Response:
+        return 200, METRICS_CONTENT_TYPE, registry.render()
+    return handle_metrics
+
+
+def json_handler(producer: Callable[[], object]) -> Handler:
+    """Handler serving the JSON encoding of producer()."""
+    async def handle_json() -> Response:
+        return 200, 'application/json', json.dumps(producer(), indent=2).encode() + b'\n'
+    return handle_json
+
+
+class HealthServer:
+    """
+    Health check HTTP server running on the current asyncio event loop.
+
+    Example:
+        server = HealthServer(sock=bind_listen_socket(8080))
+        await server.start()
+        ...
+        await server.close()
+    """
+
+    def __init__(self, sock: Optional[socket.socket] = None, port: int = HEALTH_PORT,
+                 read_timeout: float = READ_TIMEOUT, probes: Optional[ProbeCache] = None):
+        self.sock = sock
+        self.port = port
+        self.read_timeout = read_timeout
+        self.probes = probes or ProbeCache()
+        self.routes: Dict[str, Handler] = {
+            '/health': self.handle_health,
+            '/ready': self.handle_ready,
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def handle_health(self) -> Response:
+        """
+        Liveness probe: Is Squid process running?
+        Returns 200 OK if Squid is alive, 503 Service Unavailable otherwise
+        """
+        result = self.probes.snapshot()
+        if result.alive:
+            return 200, 'text/plain', b'OK\n', probe_age_header(result)
+        return 503, 'text/plain', b'Service Unavailable: Squid not running\n', probe_age_header(result)
+
+    async def handle_ready(self) -> Response:
+        """
+        Readiness probe: Is Squid ready to accept traffic?
+        Returns 200 OK if ready, 503 Service Unavailable otherwise
+        """
+        result = self.probes.snapshot()
+        if not result.errors:
+            return 200, 'text/plain', b'READY\n', probe_age_header(result)
+
+        body = 'Service Unavailable:\n' + ''.join(f'  - {error}\n' for error in result.errors)
+        return 503, 'text/plain', body.encode(), probe_age_header(result)
+
+    def add_task(self, coro: Awaitable[None]) -> None:
+        """Run a background coroutine until the server is closed."""
+        self._tasks.append(asyncio.ensure_future(coro))
+
+    def add_route(self, path: str, handler: Handler) -> None:
+        """Register a GET handler for path."""
+        self.routes[path] = handler
+
+    async def start(self) -> None:
+        """
+        Start the probe refresher and accept connections (on the handed-over
+        socket if given).
+        """
+        self.add_task(self.probes.run())
+
+        if self.sock is not None:
+            self._server = await asyncio.start_server(
+                self._handle_connection, sock=self.sock, limit=MAX_HEADER_BYTES
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, port=self.port, limit=MAX_HEADER_BYTES
+            )
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self) -> None:
+        """Stop background tasks and close the listening socket."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _dispatch(self, method: str, target: str) -> Response:
+        path = target.split('?', 1)[0]
+
+        if method not in ('GET', 'HEAD'):
+            return 405, 'text/plain', b'405 Method Not Allowed\n'
+
+        handler = self.routes.get(path)
+        if handler is None:
+            endpoints = ', '.join(self.routes)
+            return 404, 'text/plain', f'404 Not Found\nAvailable endpoints: {endpoints}\n'.encode()
+
+        try:
+            return await handler()
+        except Exception as e:
+            return 500, 'text/plain', f'Internal Server Error: {str(e)}\n'.encode()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str]]]:
+        """Read one request head; None when the client closed or timed out."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.read_timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3:
+            raise ValueError(f"Malformed request line: {lines[0]!r}")
+        method, target, version = parts
+
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        # Probes carry no body; discard one if present (bounded)
+        length = int(headers.get('content-length', '0') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        if length:
+            await asyncio.wait_for(reader.readexactly(length), self.read_timeout)
+
+        return method, target, version, headers
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        try:
+            for _ in range(MAX_KEEPALIVE_REQUESTS):
+                try:
+                    request = await self._read_request(reader)
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, 'text/plain', b'Request Header Fields Too Large\n',
+                                        keep_alive=False)
+                    return
+                except (ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    await self._respond(writer, 400, 'text/plain', b'Bad Request\n', keep_alive=False)
+                    return
+
+                if request is None:
+                    return
+
+                method, target, version, headers = request
+                connection = headers.get('connection', '').lower()
+                if version == 'HTTP/1.1':
+                    keep_alive = connection != 'close'
+                else:
+                    keep_alive = connection == 'keep-alive'
+
+                status, content_type, body, *extra = await self._dispatch(method, target)
+                await self._respond(writer, status, content_type, body, keep_alive,
+                                    head_only=(method == 'HEAD'),
+                                    headers=extra[0] if extra else None)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        except Exception as e:
+            logging.debug(f"Health server connection error: {e}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, content_type: str,
+                       body: bytes, keep_alive: bool, head_only: bool = False,
+                       headers: Optional[Dict[str, str]] = None) -> None:
+        extra = ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+        head = (
+            f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+            f'{extra}'
+            '\r\n'
+        ).encode('latin-1')
+        writer.write(head if head_only else head + body)
+        await writer.drain()
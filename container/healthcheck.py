@@ -2,52 +2,35 @@
 """
 Health Check HTTP Server for Squid Proxy Container
 Provides /health (liveness) and /ready (readiness) endpoints for orchestrators
+
+Standalone process mode (HEALTH_SERVER_MODE=subprocess). By default the
+entrypoint hosts the asyncio implementation in health_server.py instead.
 """
 
+import json
 import os
+import socket
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from pathlib import Path
+from typing import Optional
 import sys
 
+from cachemgr import POLL_INTERVAL as CACHEMGR_POLL_INTERVAL, CacheManagerPoller
+from health_checks import ProbeCache
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from process_metrics import ProcessCollector
+from socket_activation import inherited_listen_socket
+
 # Configuration
 HEALTH_PORT = int(os.getenv('HEALTH_PORT', '8080'))
-CACHE_DIR = os.getenv('CACHE_DIR', '/var/spool/squid')
-CONFIG_FILE = '/etc/squid/squid.conf'
-PID_FILE = Path('/var/run/squid/squid.pid')
 
+# Probe results refreshed by a background thread (see create_server)
+PROBES = ProbeCache()
 
-def is_squid_running() -> bool:
-    """
-    Check if Squid is running by checking PID file and /proc filesystem.
-
-    Returns:
-        True if Squid process is running, False otherwise
-    """
-    try:
-        # Check if PID file exists
-        if not PID_FILE.exists():
-            return False
+# Squid process metrics sampled by a background thread (see create_server)
+COLLECTOR = ProcessCollector()
 
-        # Read PID from file
-        pid = int(PID_FILE.read_text().strip())
-
-        # Check if process exists in /proc
-        proc_dir = Path(f'/proc/{pid}')
-        if not proc_dir.exists():
-            return False
-
-        # Verify it's actually squid by checking cmdline
-        cmdline_file = proc_dir / 'cmdline'
-        if cmdline_file.exists():
-            cmdline = cmdline_file.read_text()
-            # cmdline has null-separated arguments
-            if 'squid' in cmdline:
-                return True
-
-        return False
-
-    except (ValueError, FileNotFoundError, PermissionError):
-        return False
+# Squid cache manager counters polled by a background thread
+CACHEMGR = CacheManagerPoller() if CACHEMGR_POLL_INTERVAL > 0 else None
 
 
 class HealthCheckHandler(BaseHTTPRequestHandler):
@@ -65,12 +48,16 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
             self.handle_health()
         elif self.path == '/ready':
             self.handle_ready()
+        elif self.path == '/metrics':
+            self.handle_metrics()
+        elif self.path == '/cachemgr' and CACHEMGR is not None:
+            self.handle_cachemgr()
         else:
             self.send_response(404)
             self.send_header('Content-Type', 'text/plain')
             self.end_headers()
             self.wfile.write(b'404 Not Found\n')
-            self.wfile.write(b'Available endpoints: /health, /ready\n')
+            self.wfile.write(b'Available endpoints: /health, /ready, /metrics, /cachemgr\n')
 
     def handle_health(self):
         """
@@ -78,17 +65,19 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
         Returns 200 OK if Squid is alive, 503 Service Unavailable otherwise
         """
         try:
-            # Check if Squid process is running via /proc filesystem
-            if is_squid_running():
+            result = PROBES.snapshot()
+            if result.alive:
                 # Squid is running
                 self.send_response(200)
                 self.send_header('Content-Type', 'text/plain')
+                self.send_header('X-Probe-Age', f'{result.age:.3f}')
                 self.end_headers()
                 self.wfile.write(b'OK\n')
             else:
                 # Squid is not running
                 self.send_response(503)
                 self.send_header('Content-Type', 'text/plain')
+                self.send_header('X-Probe-Age', f'{result.age:.3f}')
                 self.end_headers()
                 self.wfile.write(b'Service Unavailable: Squid not running\n')
 
@@ -107,45 +96,21 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
         - Configuration file is readable
         Returns 200 OK if ready, 503 Service Unavailable otherwise
         """
-        errors = []
-
         try:
-            # Check 1: Squid process running via /proc filesystem
-            if not is_squid_running():
-                errors.append('Squid process not running')
-
-            # Check 2: Cache directory writable
-            # Check both persistent and ephemeral cache locations
-            cache_dirs = [CACHE_DIR]
-            current_uid = os.getuid()
-            ephemeral_cache = f'/tmp/squid-cache-{current_uid}'
-            if os.path.exists(ephemeral_cache):
-                cache_dirs.append(ephemeral_cache)
-
-            cache_ok = False
-            for cache_dir in cache_dirs:
-                if os.path.isdir(cache_dir) and os.access(cache_dir, os.W_OK):
-                    cache_ok = True
-                    break
-
-            if not cache_ok:
-                errors.append('Cache directory not writable')
-
-            # Check 3: Configuration file readable
-            if not os.path.isfile(CONFIG_FILE):
-                errors.append('Configuration file not found')
-            elif not os.access(CONFIG_FILE, os.R_OK):
-                errors.append('Configuration file not readable')
+            result = PROBES.snapshot()
+            errors = result.errors
 
             # Return status based on checks
             if not errors:
                 self.send_response(200)
                 self.send_header('Content-Type', 'text/plain')
+                self.send_header('X-Probe-Age', f'{result.age:.3f}')
                 self.end_headers()
                 self.wfile.write(b'READY\n')
             else:
                 self.send_response(503)
                 self.send_header('Content-Type', 'text/plain')
+                self.send_header('X-Probe-Age', f'{result.age:.3f}')
                 self.end_headers()
                 self.wfile.write(b'Service Unavailable:\n')
                 for error in errors:
@@ -158,12 +123,62 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
             self.wfile.write(f'Internal Server Error: {str(e)}\n'.encode())
 
 
+    def handle_metrics(self):
+        """Prometheus metrics from the last background sample."""
+        body = REGISTRY.render()
+        self.send_response(200)
+        self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def handle_cachemgr(self):
+        """Cache manager stats from the last background poll, as JSON."""
+        body = json.dumps(CACHEMGR.snapshot(), indent=2).encode() + b'\n'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(sock: Optional[socket.socket] = None) -> HTTPServer:
+    """
+    Create the health check HTTP server.
+
+    Args:
+        sock: Pre-bound listening socket (socket handoff from the entrypoint,
+              or an in-process caller). If None, an inherited descriptor is
+              used when available, otherwise HEALTH_PORT is bound directly.
+
+    Returns:
+        HTTPServer ready for serve_forever()
+    """
+    PROBES.start_thread()
+    COLLECTOR.start_thread()
+    if CACHEMGR is not None:
+        CACHEMGR.start_thread()
+
+    if sock is None:
+        sock = inherited_listen_socket()
+
+    if sock is None:
+        return HTTPServer(('', HEALTH_PORT), HealthCheckHandler)
+
+    server = HTTPServer(sock.getsockname()[:2], HealthCheckHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.server_address = sock.getsockname()[:2]
+    return server
+
+
 def main():
     """Start the health check HTTP server"""
     try:
-        server = HTTPServer(('', HEALTH_PORT), HealthCheckHandler)
-        print(f'Health check server listening on port {HEALTH_PORT}', flush=True)
-        print(f'Endpoints: /health (liveness), /ready (readiness)', flush=True)
+        server = create_server()
+        print(f'Health check server listening on port {server.server_address[1]}', flush=True)
+        print(f'Endpoints: /health (liveness), /ready (readiness), /metrics (Prometheus), /cachemgr (JSON)', flush=True)
         server.serve_forever()
     except KeyboardInterrupt:
         print('Health check server shutting down', flush=True)
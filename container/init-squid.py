@@ -6,27 +6,33 @@ Handles cache directories, SSL database, and permissions validation.
 Requirements:
 - Parse squid.conf to detect cache_dir and SSL-bump configuration
 - Validate required volumes are mounted and writable
+- Create the swap directories of all cache_dirs in parallel
 - Use Python logging module (INFO level, plain text with timestamps)
 - Fail immediately with clear error messages if required volumes missing
+
+Usage:
+    Standalone:  python3 init-squid.py
+    In-process:  entrypoint.py loads this file and awaits initialize(),
+                 avoiding a second interpreter start on every pod start.
 """
 
+import asyncio
 import logging
 import os
-import re
 import shutil
-import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from cache_advisor import (DEFAULT_CACHE_MEM_MB, SAMPLE_FILES as CACHE_ADVISOR_SAMPLE, advise, cache_mem_mb,
+                           memory_limit_mb)
+from cache_integrity import UFS_STORE_TYPES, record_metrics, swap_layout, verify_cache_dir
+from logging_config import setup_logging
+from squid_config import CacheDir, SquidConfig, load_squid_config
 
 
-# Configure logging (FR-007: INFO level, plain text, timestamps to stdout/stderr)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    stream=sys.stdout
-)
 logger = logging.getLogger(__name__)
 
 
@@ -37,6 +43,68 @@ DEFAULT_SSL_DB_DIR = Path("/var/lib/squid/ssl_db")
 LOG_DIR = Path("/var/log/squid")
 CURRENT_UID = os.getuid()
 
+# Threads creating swap directories (mkdir releases the GIL, so directories
+# on different disks, and on one disk's queue, are created in parallel)
+CACHE_INIT_WORKERS = int(os.getenv('CACHE_INIT_WORKERS', '0')) or min(32, (os.cpu_count() or 1) * 4)
+
+# Seconds between cache initialization progress messages
+PROGRESS_INTERVAL = 2.0
+
+# Group rwx for OpenShift arbitrary UIDs (GID 0)
+SWAP_DIR_MODE = 0o770
+
+# Try both Gentoo/RHEL path (/usr/libexec/squid) and Debian path (/usr/lib/squid)
+CERTGEN_CANDIDATES = [
+    Path("/usr/lib/squid/security_file_certgen"),      # Debian/Ubuntu
+    Path("/usr/libexec/squid/security_file_certgen"),  # Gentoo/RHEL/CentOS
+]
+
+
+async def run_command(args: List[str]) -> Tuple[int, str, str]:
+    """
+    Run a command as an asyncio subprocess and capture its output.
+
+    Args:
+        args: Command and arguments
+
+    Returns:
+        Tuple of (returncode, stdout, stderr)
+
+    Raises:
+        FileNotFoundError: If the executable does not exist
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return (
+        process.returncode,
+        stdout.decode('utf-8', errors='replace'),
+        stderr.decode('utf-8', errors='replace')
+    )
+
+
+def load_config() -> Optional[SquidConfig]:
+    """
+    Load squid.conf through the shared, mtime-cached parser.
+
+    Returns:
+        Parsed SquidConfig, or None if squid.conf does not exist.
+
+    Raises:
+        SystemExit: If squid.conf exists but cannot be parsed.
+    """
+    if not SQUID_CONF.exists():
+        return None
+
+    try:
+        return load_squid_config(SQUID_CONF)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to parse {SQUID_CONF}: {e}")
+        sys.exit(1)
+
 
 def parse_cache_dir_from_config() -> Optional[Path]:
     """
@@ -48,29 +116,33 @@ def parse_cache_dir_from_config() -> Optional[Path]:
     Format: cache_dir <type> <directory> <mbytes> <L1> <L2>
     Example: cache_dir ufs /var/spool/squid 1000 16 256
     """
-    if not SQUID_CONF.exists():
+    config = load_config()
+    if config is None:
         logger.warning(f"Squid configuration not found: {SQUID_CONF}")
         return None
+    if not config.cache_dirs:
+        return None
 
-    try:
-        with open(SQUID_CONF, 'r') as f:
-            for line in f:
-                # Ignore comments and whitespace
-                stripped = line.strip()
-                if stripped.startswith('#') or not stripped:
-                    continue
-
-                # Match cache_dir directive
-                match = re.match(r'^cache_dir\s+\S+\s+(\S+)', stripped)
-                if match:
-                    cache_path = Path(match.group(1))
-                    logger.info(f"Found cache_dir directive: {cache_path}")
-                    return cache_path
-    except Exception as e:
-        logger.error(f"Failed to parse {SQUID_CONF}: {e}")
-        sys.exit(1)
+    cache_path = config.cache_dirs[0].path
+    logger.info(f"Found cache_dir directive: {cache_path}")
+    return cache_path
+
+
+def parse_cache_dirs_from_config() -> List[CacheDir]:
+    """
+    Parse squid.conf to find all cache_dir directives.
+
+    Returns:
+        cache_dir entries in configuration order (empty in pure proxy mode).
+    """
+    config = load_config()
+    if config is None:
+        logger.warning(f"Squid configuration not found: {SQUID_CONF}")
+        return []
 
-    return None
+    for cache_dir in config.cache_dirs:
+        logger.info(f"Found cache_dir directive: {cache_dir.store_type} {cache_dir.path}")
+    return list(config.cache_dirs)
 
 
 def check_ssl_bump_enabled() -> bool:
@@ -80,25 +152,12 @@ def check_ssl_bump_enabled() -> bool:
     Returns:
         True if sslcrtd_program or ssl_crtd directive found, False otherwise.
     """
-    if not SQUID_CONF.exists():
+    config = load_config()
+    if config is None or config.sslcrtd_program is None:
         return False
 
-    try:
-        with open(SQUID_CONF, 'r') as f:
-            for line in f:
-                stripped = line.strip()
-                if stripped.startswith('#') or not stripped:
-                    continue
-
-                # Check for SSL-bump related directives
-                if re.match(r'^(sslcrtd_program|ssl_crtd)', stripped):
-                    logger.info("SSL-bump support detected in configuration")
-                    return True
-    except Exception as e:
-        logger.error(f"Failed to parse {SQUID_CONF}: {e}")
-        sys.exit(1)
-
-    return False
+    logger.info("SSL-bump support detected in configuration")
+    return True
 
 
 def get_cache_size_from_config() -> Optional[int]:
@@ -108,26 +167,13 @@ def get_cache_size_from_config() -> Optional[int]:
     Returns:
         Cache size in MB if found, None otherwise.
     """
-    if not SQUID_CONF.exists():
+    config = load_config()
+    if config is None or not config.cache_dirs:
         return None
 
-    try:
-        with open(SQUID_CONF, 'r') as f:
-            for line in f:
-                stripped = line.strip()
-                if stripped.startswith('#') or not stripped:
-                    continue
-
-                # Match cache_dir directive: cache_dir <type> <directory> <mbytes> <L1> <L2>
-                match = re.match(r'^cache_dir\s+\S+\s+\S+\s+(\d+)', stripped)
-                if match:
-                    cache_mb = int(match.group(1))
-                    logger.debug(f"Configured cache size: {cache_mb} MB")
-                    return cache_mb
-    except Exception as e:
-        logger.error(f"Failed to parse cache size from {SQUID_CONF}: {e}")
-
-    return None
+    cache_mb = config.cache_dirs[0].size_mb
+    logger.debug(f"Configured cache size: {cache_mb} MB")
+    return cache_mb
 
 
 def validate_volume_writable(path: Path, volume_name: str, required: bool = True) -> bool:
@@ -178,7 +224,7 @@ def validate_volume_writable(path: Path, volume_name: str, required: bool = True
     return True
 
 
-def initialize_cache_directory(cache_dir: Path) -> None:
+async def initialize_cache_directory(cache_dir: Path) -> None:
     """
     Initialize Squid cache directory structure using 'squid -z'.
 
@@ -197,18 +243,15 @@ def initialize_cache_directory(cache_dir: Path) -> None:
 
     try:
         # Run squid -z to create cache structure
-        result = subprocess.run(
-            ["squid", "-z", "-f", str(SQUID_CONF)],
-            capture_output=True,
-            text=True,
-            check=False
+        returncode, stdout, stderr = await run_command(
+            ["squid", "-z", "-f", str(SQUID_CONF)]
         )
 
         # Filter out warnings (squid -z is verbose)
-        if result.returncode != 0:
-            logger.error(f"Cache initialization failed (exit code {result.returncode})")
-            logger.error(f"stdout: {result.stdout}")
-            logger.error(f"stderr: {result.stderr}")
+        if returncode != 0:
+            logger.error(f"Cache initialization failed (exit code {returncode})")
+            logger.error(f"stdout: {stdout}")
+            logger.error(f"stderr: {stderr}")
             sys.exit(1)
 
         logger.info("Cache initialization complete")
@@ -221,7 +264,184 @@ def initialize_cache_directory(cache_dir: Path) -> None:
         sys.exit(1)
 
 
-def initialize_ssl_database(ssl_db_dir: Path) -> None:
+def cache_dir_initialized(cache_dir: CacheDir) -> bool:
+    """
+    Whether a cache_dir already has its on-disk structure.
+
+    ufs-style directories are complete once "00" exists: it is the first
+    directory squid -z creates and the last one create_swap_directories
+    creates. A rock cache_dir is complete once its database file exists.
+    """
+    if cache_dir.store_type in UFS_STORE_TYPES:
+        return (cache_dir.path / "00").exists()
+    if cache_dir.store_type == 'rock':
+        return (cache_dir.path / "rock").exists()
+    return False
+
+
+def create_l1_directory(path: Path, l2: int) -> int:
+    """
+    Create one L1 swap directory and its L2 subdirectories.
+
+    Blocking; meant for a worker thread. Existing directories are kept, so an
+    interrupted initialization can simply be repeated.
+
+    Args:
+        path: L1 directory (<cache_dir>/<XX>)
+        l2: Number of L2 subdirectories
+
+    Returns:
+        Number of directories (L1 and L2) now present
+
+    Raises:
+        OSError: If a directory cannot be created
+    """
+    try:
+        os.mkdir(path, SWAP_DIR_MODE)
+    except FileExistsError:
+        pass
+    for j in range(l2):
+        try:
+            os.mkdir(path / f"{j:02X}", SWAP_DIR_MODE)
+        except FileExistsError:
+            pass
+    return l2 + 1
+
+
+class CacheInitProgress:
+    """
+    Counts created swap directories and logs progress periodically.
+
+    Args:
+        total: Directories to create
+        interval: Minimum seconds between progress messages
+    """
+
+    def __init__(self, total: int, interval: float = PROGRESS_INTERVAL):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def add(self, count: int) -> None:
+        self.done += count
+        now = time.monotonic()
+        if now - self._last_report >= self.interval and self.done < self.total:
+            self._last_report = now
+            logger.info(f"Cache initialization: {self.done}/{self.total} directories "
+                        f"({self.done / self.total:.0%}, {now - self.started:.1f}s)")
+
+
+async def create_swap_directories(cache_dirs: List[CacheDir],
+                                  workers: int = CACHE_INIT_WORKERS) -> None:
+    """
+    Create the L1/L2 swap directory trees of ufs-style cache_dirs in parallel.
+
+    Every L1 directory of every cache_dir is one job for a thread pool, so
+    several disks are initialized at once. Each cache_dir's "00" tree is
+    created after all its other L1 directories, keeping "00" a marker of a
+    complete structure.
+
+    Args:
+        cache_dirs: ufs, aufs or diskd cache_dir entries
+        workers: Thread pool size
+
+    Raises:
+        SystemExit: If a directory cannot be created.
+    """
+    layouts = [(cache_dir, *swap_layout(cache_dir)) for cache_dir in cache_dirs]
+    progress = CacheInitProgress(sum(l1 * (l2 + 1) for _, l1, l2 in layouts))
+    logger.info(f"Creating {progress.total} swap directories in {len(layouts)} cache_dir(s) "
+                f"with {workers} threads")
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-init')
+
+    async def create(path: Path, l2: int) -> None:
+        progress.add(await loop.run_in_executor(executor, create_l1_directory, path, l2))
+
+    async def create_cache_dir(cache_dir: CacheDir, l1: int, l2: int) -> None:
+        start = time.monotonic()
+        await asyncio.gather(*(create(cache_dir.path / f"{i:02X}", l2) for i in range(1, l1)))
+        await create(cache_dir.path / "00", l2)
+        logger.info(f"Initialized cache_dir {cache_dir.path} ({l1}x{l2}) "
+                    f"in {time.monotonic() - start:.2f}s")
+
+    try:
+        await asyncio.gather(*(create_cache_dir(*layout) for layout in layouts))
+    except OSError as e:
+        logger.error(f"Cache initialization failed: {e}")
+        sys.exit(1)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"Cache initialization complete: {progress.done} directories "
+                f"in {time.monotonic() - progress.started:.2f}s")
+
+
+async def verify_cache_directories(cache_dirs: List[CacheDir]) -> None:
+    """
+    Check initialized ufs-style cache_dirs and repair missing swap directories.
+
+    Every cache_dir is verified in its own thread (see verify_cache_dir). The
+    expected store rebuild time is logged and exported as metrics; missing
+    L1/L2 directories, which would make Squid refuse to start, are recreated.
+
+    Args:
+        cache_dirs: Initialized ufs, aufs or diskd cache_dir entries
+
+    Raises:
+        SystemExit: If a missing directory cannot be created.
+    """
+    reports = await asyncio.gather(*(asyncio.to_thread(verify_cache_dir, cache_dir)
+                                     for cache_dir in cache_dirs))
+    for report in reports:
+        for problem in report.problems:
+            logger.warning(f"cache_dir {report.path}: {problem}")
+        logger.info(report.summary())
+        record_metrics(report)
+
+    damaged = [cache_dir for cache_dir, report in zip(cache_dirs, reports) if report.missing]
+    if damaged:
+        logger.warning(f"Recreating missing swap directories in {', '.join(str(c.path) for c in damaged)}")
+        await create_swap_directories(damaged)
+
+
+async def initialize_cache_directories(cache_dirs: List[CacheDir]) -> None:
+    """
+    Initialize every cache_dir that has no on-disk structure yet.
+
+    ufs, aufs and diskd trees are created natively in parallel; if other
+    store types (rock) need initialization, squid -z runs afterwards.
+    Already initialized ufs-style trees are verified first.
+
+    Args:
+        cache_dirs: All configured cache_dir entries
+
+    Raises:
+        SystemExit: If cache initialization fails.
+    """
+    pending = [cache_dir for cache_dir in cache_dirs if not cache_dir_initialized(cache_dir)]
+    existing = [cache_dir for cache_dir in cache_dirs
+                if cache_dir not in pending and cache_dir.store_type in UFS_STORE_TYPES]
+    if existing:
+        await verify_cache_directories(existing)
+    if not pending:
+        logger.info("Cache already initialized")
+        return
+
+    native = [cache_dir for cache_dir in pending if cache_dir.store_type in UFS_STORE_TYPES]
+    if native:
+        await create_swap_directories(native)
+
+    others = [cache_dir for cache_dir in pending if cache_dir.store_type not in UFS_STORE_TYPES]
+    if others:
+        logger.info(f"Running squid -z for {', '.join(str(c.path) for c in others)}")
+        await initialize_cache_directory(others[0].path)
+
+
+async def initialize_ssl_database(ssl_db_dir: Path) -> None:
     """
     Initialize SSL certificate database for SSL-bump support.
 
@@ -256,40 +476,31 @@ def initialize_ssl_database(ssl_db_dir: Path) -> None:
         # -s: database location
         # -M: memory cache size
 
-        # Try both Gentoo/RHEL path (/usr/libexec/squid) and Debian path (/usr/lib/squid)
-        certgen_candidates = [
-            Path("/usr/lib/squid/security_file_certgen"),      # Debian/Ubuntu
-            Path("/usr/libexec/squid/security_file_certgen"),  # Gentoo/RHEL/CentOS
-        ]
-
         certgen_path = None
-        for candidate in certgen_candidates:
+        for candidate in CERTGEN_CANDIDATES:
             if candidate.exists():
                 certgen_path = candidate
                 logger.info(f"Found security_file_certgen at {certgen_path}")
                 break
 
         if not certgen_path:
-            logger.error(f"security_file_certgen not found in: {[str(c) for c in certgen_candidates]}")
+            logger.error(f"security_file_certgen not found in: {[str(c) for c in CERTGEN_CANDIDATES]}")
             logger.error("SSL-bump support not available")
             sys.exit(1)
 
-        result = subprocess.run(
+        returncode, stdout, stderr = await run_command(
             [
                 str(certgen_path),
                 "-c",
                 "-s", str(ssl_db_dir),
                 "-M", "4MB"
-            ],
-            capture_output=True,
-            text=True,
-            check=False
+            ]
         )
 
-        if result.returncode != 0:
-            logger.error(f"SSL database initialization failed (exit code {result.returncode})")
-            logger.error(f"stdout: {result.stdout}")
-            logger.error(f"stderr: {result.stderr}")
+        if returncode != 0:
+            logger.error(f"SSL database initialization failed (exit code {returncode})")
+            logger.error(f"stdout: {stdout}")
+            logger.error(f"stderr: {stderr}")
             logger.error(f"Current UID: {CURRENT_UID}, /var/lib/squid permissions:")
 
             # Show permissions for debugging
@@ -325,7 +536,7 @@ def initialize_ssl_database(ssl_db_dir: Path) -> None:
         sys.exit(1)
 
 
-def validate_cache_size(cache_dir: Path) -> None:
+def validate_cache_size(cache_dir: Path, configured_mb: Optional[int] = None) -> None:
     """
     Validate that configured cache size fits within available disk space.
 
@@ -335,8 +546,11 @@ def validate_cache_size(cache_dir: Path) -> None:
 
     Args:
         cache_dir: Path to cache directory
+        configured_mb: Cache size on this filesystem (default: the first
+                       cache_dir's size)
     """
-    configured_mb = get_cache_size_from_config()
+    if configured_mb is None:
+        configured_mb = get_cache_size_from_config()
     if not configured_mb:
         logger.debug("No cache_dir size configured, skipping validation")
         return
@@ -367,51 +581,120 @@ def validate_cache_size(cache_dir: Path) -> None:
         logger.warning(f"Failed to validate cache size: {e}")
 
 
-def main() -> int:
+async def check_cache_sizing(cache_dirs: List[CacheDir]) -> None:
     """
-    Main initialization logic.
+    Log the sizing advisor's warnings and recommended cache_dir lines.
 
-    Returns:
-        0 on success, 1 on failure.
+    Unlike validate_cache_size, which only runs when the advisor is disabled
+    (CACHE_ADVISOR_SAMPLE=0), the advisor (see cache_advisor) accounts for
+    free inodes, sampled object sizes, every cache_dir on a filesystem and
+    cache_mem. It only reports; `python3 cache_advisor.py --apply` rewrites
+    the configuration.
+
+    Args:
+        cache_dirs: All configured cache_dir entries
     """
-    logger.info(f"Starting Squid initialization (UID {CURRENT_UID})")
+    config = load_config()
+    cache_mem = cache_mem_mb(config) if config is not None else DEFAULT_CACHE_MEM_MB
+    try:
+        report = await asyncio.to_thread(advise, cache_dirs, cache_mem, memory_limit_mb())
+    except OSError as e:
+        logger.warning(f"Cache sizing advisor failed: {e}")
+        return
+
+    for warning in report.warnings:
+        logger.warning(warning)
+    for recommendation in report.recommendations:
+        logger.info(f"Cache sizing: recommended {recommendation.directive} "
+                    f"({recommendation.limited_by}-bound, ~{recommendation.objects:,} objects)")
 
-    # ============================================================================
-    # Cache Directory Setup (FR-005: Parse squid.conf to determine required volumes)
-    # ============================================================================
 
-    cache_dir = parse_cache_dir_from_config()
+async def setup_cache() -> None:
+    """
+    Validate and initialize all cache directories (FR-005).
+
+    Raises:
+        SystemExit: If a cache_dir is configured but unusable.
+    """
+    cache_dirs = parse_cache_dirs_from_config()
 
-    if cache_dir:
-        # cache_dir directive found - volume MUST be writable (FR-005: fail if missing)
-        # User explicitly configured caching, so we must honor that intent
-        validate_volume_writable(cache_dir, "Cache", required=True)
-        logger.info(f"Using persistent cache: {cache_dir}")
-        initialize_cache_directory(cache_dir)
-        validate_cache_size(cache_dir)
-    else:
+    if not cache_dirs:
         # No cache_dir directive - pure proxy mode, skip cache initialization entirely
         logger.info("No cache_dir directive found - running in pure proxy mode (no caching)")
+        return
+
+    # cache_dir directive found - volume MUST be writable (FR-005: fail if missing)
+    # User explicitly configured caching, so we must honor that intent
+    for cache_dir in cache_dirs:
+        validate_volume_writable(cache_dir.path, "Cache", required=True)
+        logger.info(f"Using persistent cache: {cache_dir.path}")
+    await initialize_cache_directories(cache_dirs)
+
+    if CACHE_ADVISOR_SAMPLE > 0:
+        await check_cache_sizing(cache_dirs)
+        return
 
-    # ============================================================================
-    # SSL Database Initialization (FR-005: Detect SSL-bump from config)
-    # ============================================================================
+    # Advisor disabled: check the configured sizes against the disk size only.
+    # cache_dirs sharing a filesystem share its space
+    filesystems: Dict[int, Tuple[Path, int]] = {}
+    for cache_dir in cache_dirs:
+        device = cache_dir.path.stat().st_dev
+        path, total_mb = filesystems.get(device, (cache_dir.path, 0))
+        filesystems[device] = (path, total_mb + (cache_dir.size_mb or 0))
+    for path, total_mb in filesystems.values():
+        validate_cache_size(path, total_mb)
 
+
+async def setup_ssl_database() -> None:
+    """
+    Initialize the SSL certificate database if SSL-bump is configured (FR-005).
+
+    Raises:
+        SystemExit: If SSL-bump is enabled but the database cannot be created.
+    """
     if check_ssl_bump_enabled():
         # Ensure parent directory exists and is writable
         ssl_db_parent = DEFAULT_SSL_DB_DIR.parent
         validate_volume_writable(ssl_db_parent, "SSL database parent", required=True)
-        initialize_ssl_database(DEFAULT_SSL_DB_DIR)
+        await initialize_ssl_database(DEFAULT_SSL_DB_DIR)
 
-    # ============================================================================
-    # Log Directory Validation (FR-005: Permissions check)
-    # ============================================================================
 
+async def initialize() -> int:
+    """
+    Async initialization entry point, importable by entrypoint.py.
+
+    Cache directory setup (squid -z) and SSL database creation
+    (security_file_certgen) are independent, so both subprocesses run
+    concurrently.
+
+    Returns:
+        0 on success.
+
+    Raises:
+        SystemExit: On any fatal initialization error.
+    """
+    logger.info(f"Starting Squid initialization (UID {CURRENT_UID})")
+
+    await asyncio.gather(setup_cache(), setup_ssl_database())
+
+    # Log Directory Validation (FR-005: Permissions check)
     validate_volume_writable(LOG_DIR, "Log", required=False)
 
     logger.info("Initialization complete")
     return 0
 
 
+def main() -> int:
+    """
+    Main initialization logic (standalone script mode).
+
+    Returns:
+        0 on success, 1 on failure.
+    """
+    return asyncio.run(initialize())
+
+
 if __name__ == "__main__":
+    # Configure logging (FR-007: INFO level, timestamps to stdout; LOG_FORMAT=json for JSON lines)
+    setup_logging('INFO', source='init-squid')
     sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Minimal inotify bindings for asyncio (ctypes, no external dependencies).
+
+Wraps inotify_init1/inotify_add_watch from libc and integrates the
+inotify file descriptor with the running event loop via add_reader(), so
+callers can await filesystem events instead of polling.
+"""
+
+import asyncio
+import ctypes
+import errno
+import os
+import struct
+from typing import List, NamedTuple, Optional
+
+
+# Event masks (linux/inotify.h)
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+
+# inotify_init1 flags
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+_libc: Optional[ctypes.CDLL] = None
+
+
+class InotifyEvent(NamedTuple):
+    """A single inotify event (name is empty for events on the watch itself)."""
+
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+def _get_libc() -> ctypes.CDLL:
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    return _libc
+
+
+def inotify_available() -> bool:
+    """Return True if libc exposes inotify (Linux)."""
+    try:
+        libc = _get_libc()
+        return hasattr(libc, 'inotify_init1') and hasattr(libc, 'inotify_add_watch')
+    except OSError:
+        return False
+
+
+def parse_events(buf: bytes) -> List[InotifyEvent]:
+    """Decode a buffer of packed struct inotify_event records."""
+    events = []
+    offset = 0
+    while offset + _EVENT_HEADER.size <= len(buf):
+        wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+        offset += _EVENT_HEADER.size
+        name = buf[offset:offset + length].rstrip(b'\0').decode('utf-8', errors='replace')
+        offset += length
+        events.append(InotifyEvent(wd, mask, cookie, name))
+    return events
+
+
+class Inotify:
+    """
+    Non-blocking inotify instance usable from asyncio.
+
+    Example:
+        with Inotify() as watcher:
+            watcher.add_watch(Path('/var/run/squid'), IN_CREATE | IN_MOVED_TO)
+            events = await watcher.wait()
+    """
+
+    def __init__(self):
+        libc = _get_libc()
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self.fd = fd
+
+    def add_watch(self, path, mask: int) -> int:
+        """
+        Watch a path for the given event mask.
+
+        Returns:
+            Watch descriptor
+
+        Raises:
+            OSError: If the watch cannot be added (e.g. path missing)
+        """
+        wd = _get_libc().inotify_add_watch(self.fd, os.fsencode(str(path)), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch({path}) failed: {os.strerror(err)}")
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        """Remove a watch (errors for already-removed watches are ignored)."""
+        _get_libc().inotify_rm_watch(self.fd, ctypes.c_int(wd))
+
+    def read_events(self) -> List[InotifyEvent]:
+        """Read all pending events without blocking ([] if none)."""
+        try:
+            buf = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                return []
+            raise
+        return parse_events(buf)
+
+    async def wait(self) -> List[InotifyEvent]:
+        """Wait until at least one event is available and return the batch."""
+        events = self.read_events()
+        if events:
+            return events
+
+        loop = asyncio.get_running_loop()
+        while True:
+            ready = loop.create_future()
+            loop.add_reader(self.fd, lambda: ready.done() or ready.set_result(None))
+            try:
+                await ready
+            finally:
+                loop.remove_reader(self.fd)
+
+            events = self.read_events()
+            if events:
+                return events
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self) -> 'Inotify':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
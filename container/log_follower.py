@@ -0,0 +1,193 @@
+"""
+Asyncio 'tail -F' for log files written by Squid.
+
+LogFollower reads appended data in large chunks and hands complete lines to
+a callback. The log directory is watched with inotify (falling back to
+polling), so new data, rotation (the path now names a different inode) and
+truncation (copytruncate) are noticed immediately:
+
+- rotation: the old file is read to EOF, then the new file is followed from
+  its start
+- truncation: reading restarts at offset 0
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional
+
+from inotify_watch import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MODIFY,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    Inotify,
+    inotify_available,
+)
+
+
+READ_SIZE = 256 * 1024
+
+# Longest line kept while waiting for its newline; longer ones are dropped
+MAX_LINE_BYTES = 64 * 1024
+
+# Safety-net re-check interval (and poll interval without inotify)
+POLL_INTERVAL = 1.0
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+
+
+class LineSplitter:
+    """
+    Split a byte stream into lines across read boundaries.
+
+    Each chunk is split once with bytes.split(); only the trailing partial
+    line is carried over (and joined to the first line of the next chunk),
+    so the stream is never re-buffered as a whole.
+    """
+
+    def __init__(self, max_line: int = MAX_LINE_BYTES):
+        self.max_line = max_line
+        self.dropped = 0
+        self._partial = b''
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Return the complete lines in chunk (without newlines)."""
+        lines = chunk.split(b'\n')
+        if self._partial:
+            lines[0] = self._partial + lines[0]
+        self._partial = lines.pop()
+        if len(self._partial) > self.max_line:
+            self._partial = b''
+            self.dropped += 1
+        return lines
+
+    def flush(self) -> bytes:
+        """Return and clear the trailing partial line (end of stream)."""
+        partial, self._partial = self._partial, b''
+        return partial
+
+    def reset(self) -> None:
+        """Forget any partial line (file switched or truncated)."""
+        self._partial = b''
+
+
+class LogFollower:
+    """
+    Follow a log file across rotation and truncation.
+
+    Args:
+        path: Log file to follow (may not exist yet)
+        on_lines: Called with each batch of complete lines
+        from_end: Skip content already present when following starts
+        poll_interval: Re-check interval when no inotify event arrives
+    """
+
+    def __init__(self, path: Path, on_lines: Callable[[List[bytes]], None],
+                 from_end: bool = True, poll_interval: float = POLL_INTERVAL,
+                 read_size: int = READ_SIZE):
+        self.path = Path(path)
+        self.on_lines = on_lines
+        self.from_end = from_end
+        self.poll_interval = poll_interval
+        self.read_size = read_size
+        self.rotations = 0
+        self.truncations = 0
+        self.bytes_read = 0
+        self._splitter = LineSplitter()
+        self._file: Optional[BinaryIO] = None
+
+    def _open(self, from_end: bool) -> None:
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        if from_end:
+            self._file.seek(0, os.SEEK_END)
+        self._splitter.reset()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def drain(self) -> None:
+        """Read everything appended since the last call."""
+        if self._file is None:
+            # Only the file present at startup is skipped; later ones are new
+            self._open(self.from_end)
+            self.from_end = False
+            if self._file is None:
+                return
+
+        while True:
+            await self._read_to_eof()
+
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return  # rotated away, new file not created yet
+
+            if st.st_ino != os.fstat(self._file.fileno()).st_ino:
+                self.rotations += 1
+                self.close()
+                self._open(from_end=False)
+                if self._file is None:
+                    return
+                continue
+
+            if st.st_size < self._file.tell():
+                self.truncations += 1
+                self._file.seek(0)
+                self._splitter.reset()
+                continue
+
+            return
+
+    async def _read_to_eof(self) -> None:
+        while True:
+            chunk = self._file.read(self.read_size)
+            if not chunk:
+                return
+            self.bytes_read += len(chunk)
+            lines = self._splitter.feed(chunk)
+            if lines:
+                self.on_lines(lines)
+            # Keep the event loop responsive during large backlogs
+            await asyncio.sleep(0)
+
+    async def run(self) -> None:
+        """Follow the file until cancelled."""
+        watcher = None
+        if inotify_available():
+            try:
+                watcher = Inotify()
+                watcher.add_watch(self.path.parent, WATCH_MASK)
+            except OSError as e:
+                logging.debug(f"inotify unavailable for {self.path.parent}: {e}")
+                if watcher:
+                    watcher.close()
+                watcher = None
+
+        try:
+            while True:
+                try:
+                    await self.drain()
+                except OSError as e:
+                    logging.warning(f"Error reading {self.path}: {e}")
+                    self.close()
+
+                if watcher:
+                    try:
+                        await asyncio.wait_for(watcher.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            if watcher:
+                watcher.close()
+            self.close()
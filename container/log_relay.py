@@ -0,0 +1,217 @@
+"""
+Non-blocking relay of subprocess output into Python logging.
+
+Squid's stdout/stderr are read in large chunks and split into lines in the
+event loop; each chunk's lines go onto a queue as one batch, and a
+QueueListener thread turns them into log records and performs the actual
+(blocking) writes to the root logger's handlers. A debug burst from Squid
+therefore costs the event loop one split and one enqueue per read, never a
+write to stdout or even the creation of a LogRecord.
+
+The queue is bounded by the number of lines waiting to be written. When it
+is full the relay yields briefly to let the writer catch up (backpressure),
+then drops lines that still do not fit. Drops are counted, exported as
+squid_log_relay_dropped_lines_total and reported with a rate-limited
+warning once the queue has room (or on stop), so a slow log consumer can
+never stall Squid's pipes or the entrypoint's signal handling.
+"""
+
+import asyncio
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+from log_follower import LineSplitter
+from metrics import REGISTRY, Metric, Registry
+
+
+# Maximum lines waiting for the writer thread
+QUEUE_SIZE = int(os.getenv('LOG_RELAY_QUEUE_SIZE', '10000'))
+
+READ_SIZE = 64 * 1024
+
+# Pause before dropping when the queue is full
+BACKPRESSURE_DELAY = 0.005
+
+# Minimum seconds between "lines dropped" warnings
+DROP_REPORT_INTERVAL = 5.0
+
+
+class _Batch(NamedTuple):
+    """Lines from one read, formatted into records on the writer thread."""
+
+    prefix: str
+    lines: List[bytes]
+
+
+class _BatchListener(logging.handlers.QueueListener):
+    """QueueListener that expands line batches into INFO records."""
+
+    def __init__(self, relay: 'LogRelay', *handlers: logging.Handler):
+        super().__init__(relay.queue, *handlers, respect_handler_level=True)
+        self.relay = relay
+
+    def handle(self, item) -> None:
+        if not isinstance(item, _Batch):
+            super().handle(item)
+            return
+
+        logger = self.relay.logger
+        name = logger.name
+        for line in item.lines:
+            text = line.rstrip().decode('utf-8', errors='replace')
+            if text:
+                record = logger.makeRecord(
+                    name, logging.INFO, __file__, 0, f'{item.prefix}: {text}', None, None
+                )
+                record.source_pid = self.relay.pid
+                super().handle(record)
+        self.relay._written(len(item.lines))
+
+
+class LogRelay:
+    """
+    Relays subprocess streams to logging through a bounded queue.
+
+    Args:
+        name: Logger name for relayed records
+        queue_size: Maximum lines waiting for the writer thread
+        registry: Registry to publish relay counters into
+        pid: PID of the process being relayed (reported in JSON logs)
+
+    Example:
+        relay = LogRelay()
+        relay.start()
+        asyncio.create_task(relay.relay(process.stderr, "Squid"))
+        ...
+        relay.stop()
+    """
+
+    def __init__(self, name: str = 'squid', queue_size: int = QUEUE_SIZE,
+                 registry: Registry = REGISTRY, pid: Optional[int] = None):
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(name)
+        self.pid = pid
+        self.lines = 0
+        self.dropped = 0
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._reported_drops = 0
+        self._last_report = 0.0
+        self._listener: Optional[_BatchListener] = None
+        registry.register_collector(self.metrics)
+
+    @property
+    def pending(self) -> int:
+        """Lines queued but not yet written."""
+        return self._pending
+
+    def start(self, *handlers: logging.Handler) -> None:
+        """
+        Start the writer thread.
+
+        Args:
+            handlers: Handlers that perform the writes (default: the root
+                      logger's handlers, as configured by setup_logging)
+        """
+        if self._listener is None:
+            targets = handlers or tuple(logging.getLogger().handlers)
+            self._listener = _BatchListener(self, *targets)
+            self._listener.start()
+
+    def stop(self) -> None:
+        """Flush queued lines and stop the writer thread."""
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.stop()
+            # The writer thread is gone; report outstanding drops directly
+            record = self._drop_record()
+            if record is not None:
+                listener.handle(record)
+
+    async def relay(self, stream: asyncio.StreamReader, prefix: str,
+                    ready_event: Optional[asyncio.Event] = None,
+                    ready_marker: Optional[bytes] = None) -> None:
+        """
+        Relay stream until EOF.
+
+        Args:
+            stream: Subprocess stdout/stderr stream
+            prefix: Log line prefix
+            ready_event: Optional event set when a line contains ready_marker
+            ready_marker: Byte string that signals readiness
+        """
+        splitter = LineSplitter()
+        watch = ready_event is not None and ready_marker is not None
+
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                break
+            lines = splitter.feed(chunk)
+            if watch and any(ready_marker in line for line in lines):
+                ready_event.set()
+                watch = False
+            if lines:
+                await self._enqueue(lines, prefix)
+
+        tail = splitter.flush()
+        if tail:
+            await self._enqueue([tail], prefix)
+
+    async def _enqueue(self, lines: List[bytes], prefix: str) -> None:
+        self.lines += len(lines)
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+
+        if self._pending + len(lines) > self.queue_size:
+            await asyncio.sleep(BACKPRESSURE_DELAY)
+
+        with self._pending_lock:
+            room = max(self.queue_size - self._pending, 0)
+            if room < len(lines):
+                self.dropped += len(lines) - room
+                lines = lines[:room]
+            self._pending += len(lines)
+
+        if lines:
+            self.queue.put_nowait(_Batch(prefix, lines))
+        self._report_drops()
+
+    def _written(self, count: int) -> None:
+        with self._pending_lock:
+            self._pending -= count
+
+    def _drop_record(self) -> Optional[logging.LogRecord]:
+        dropped = self.dropped - self._reported_drops
+        if not dropped:
+            return None
+        self._reported_drops += dropped
+        self._last_report = time.monotonic()
+        return self.logger.makeRecord(
+            self.logger.name, logging.WARNING, __file__, 0,
+            f'Log relay dropped {dropped} lines (queue full)', None, None
+        )
+
+    def _report_drops(self) -> None:
+        if self.dropped == self._reported_drops:
+            return
+        if time.monotonic() - self._last_report < DROP_REPORT_INTERVAL or self._pending >= self.queue_size:
+            return  # Retried on a later batch, or reported by stop()
+        self.queue.put_nowait(self._drop_record())
+
+    def metrics(self) -> List[Metric]:
+        """Relay counters."""
+        lines = Metric('squid_log_relay_lines_total', 'Squid output lines read by the log relay.', 'counter')
+        lines.set(self.lines)
+        dropped = Metric('squid_log_relay_dropped_lines_total',
+                         'Squid output lines dropped because the log queue was full.', 'counter')
+        dropped.set(self.dropped)
+        depth = Metric('squid_log_relay_queue_depth', 'Lines waiting for the log writer thread.')
+        depth.set(self._pending)
+        return [lines, dropped, depth]
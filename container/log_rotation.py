@@ -0,0 +1,496 @@
+"""
+Size- and time-based rotation of Squid's log files.
+
+Nothing rotates /var/log/squid inside the container, so on busy pods
+access.log grows until the volume is full and Squid stalls on writes.
+LogRotator checks the active log files every CHECK_INTERVAL seconds and
+rotates when one reaches LOG_ROTATE_SIZE_MB or LOG_ROTATE_INTERVAL has
+passed:
+
+1. squid -k rotate makes Squid reopen its logs. With logfile_rotate N > 0
+   (Squid's default is 10) Squid itself renames access.log to access.log.0
+   first; with logfile_rotate 0 the file is renamed before signalling
+2. the rotated file is renamed to <log>.<UTC timestamp>, so Squid's own
+   numbering never touches archived files
+3. archives are compressed (streaming gzip, or zstd if the zstandard module
+   is installed) in a thread pool, and the oldest archives are deleted
+   while they exceed the LOG_RETENTION_MB budget
+
+Only the renames and the squid -k rotate subprocess run on the event loop;
+compression and retention run in worker threads.
+
+Exported metrics:
+    squid_log_rotations_total{reason}        size, time
+    squid_log_rotation_failures_total        squid -k rotate failed or timed out
+    squid_log_last_rotation_seconds          trigger -> Squid writing new files
+    squid_log_rotation_seconds_total         summed over rotations
+    squid_log_compression_seconds_total      worker time spent compressing
+    squid_log_archive_bytes                  rotated files kept
+    squid_log_archive_deleted_files_total    deleted for the retention budget
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Set, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used without it
+    zstandard = None
+
+from metrics import REGISTRY, Registry
+from squid_config import SQUID_CONF, SquidConfig, load_squid_config
+
+
+LOG_DIR = Path('/var/log/squid')
+
+# Rotate when an active log reaches this size (0 disables)
+ROTATE_SIZE = int(float(os.getenv('LOG_ROTATE_SIZE_MB', '100')) * 1024 * 1024)
+
+# Rotate at least this often, in seconds (0 disables)
+ROTATE_INTERVAL = float(os.getenv('LOG_ROTATE_INTERVAL', '86400'))
+
+# Total size of rotated files kept
+RETENTION_BYTES = int(float(os.getenv('LOG_RETENTION_MB', '1024')) * 1024 * 1024)
+
+COMPRESSION = os.getenv('LOG_COMPRESSION', 'gzip').lower()
+
+# Archive suffix per compression method
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+
+COMPRESS_WORKERS = 2
+COPY_BLOCK = 1024 * 1024
+
+CHECK_INTERVAL = 10.0
+
+# Wait for Squid to reopen its logs after squid -k rotate
+ROTATE_TIMEOUT = 10.0
+ROTATE_POLL = 0.05
+
+SQUID_BINARY = '/usr/sbin/squid'
+
+# Squid's logfile_rotate default
+DEFAULT_LOGFILE_ROTATE = 10
+
+
+def log_files(config: SquidConfig) -> List[Path]:
+    """
+    Local files Squid writes its access and cache logs to.
+
+    Args:
+        config: Parsed configuration
+
+    Returns:
+        access_log files (Squid's default if none is configured) and the
+        cache_log file
+    """
+    files = [log.path for log in config.access_logs
+             if log.module in ('stdio', 'daemon') and log.path is not None]
+    if not config.get('access_log'):
+        files.append(LOG_DIR / 'access.log')
+    if config.cache_log is None:
+        files.append(LOG_DIR / 'cache.log')
+    elif config.cache_log.module == 'stdio' and config.cache_log.path is not None:
+        files.append(config.cache_log.path)
+    return list(dict.fromkeys(files))
+
+
+def logfile_rotate(config: SquidConfig) -> int:
+    """Number of numbered copies Squid keeps itself (logfile_rotate)."""
+    for directive in reversed(config.get('logfile_rotate')):
+        try:
+            return int(directive.args[0])
+        except (IndexError, ValueError):
+            continue
+    return DEFAULT_LOGFILE_ROTATE
+
+
+def compression_method(name: str) -> str:
+    """
+    Validate a LOG_COMPRESSION value.
+
+    Args:
+        name: 'gzip', 'zstd' or 'none'
+
+    Returns:
+        The method to use ('gzip' if zstd is requested but unavailable)
+
+    Raises:
+        ValueError: If the method is unknown
+    """
+    if name not in SUFFIXES:
+        raise ValueError(f"Unknown LOG_COMPRESSION: {name}")
+    if name == 'zstd' and zstandard is None:
+        logging.warning("LOG_COMPRESSION=zstd but the zstandard module is not installed, using gzip")
+        return 'gzip'
+    return name
+
+
+def compress_file(path: Path, method: str) -> Path:
+    """
+    Compress a file in streaming fashion and remove the original.
+
+    Blocking; meant for a worker thread.
+
+    Args:
+        path: File to compress
+        method: 'gzip' or 'zstd'
+
+    Returns:
+        Path of the compressed file
+
+    Raises:
+        OSError: If reading or writing fails (the original is kept)
+    """
+    output = path.with_name(path.name + SUFFIXES[method])
+    tmp = output.with_name(output.name + '.tmp')
+    try:
+        with open(path, 'rb') as src, open(tmp, 'wb') as raw:
+            if method == 'zstd':
+                with zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False) as dst:
+                    shutil.copyfileobj(src, dst, COPY_BLOCK)
+            else:
+                with gzip.GzipFile(filename=path.name, mode='wb', fileobj=raw, compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, COPY_BLOCK)
+        shutil.copystat(path, tmp)
+        os.replace(tmp, output)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    path.unlink()
+    return output
+
+
+def archives(logs: List[Path]) -> List[Path]:
+    """Rotated files of the given logs (<log>.<anything>), oldest first."""
+    found = []
+    for log in logs:
+        try:
+            entries = list(log.parent.iterdir())
+        except OSError:
+            continue
+        prefix = log.name + '.'
+        found.extend(p for p in entries if p.name.startswith(prefix) and not p.name.endswith('.tmp'))
+
+    def mtime(path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return 0.0
+    return sorted(found, key=mtime)
+
+
+def enforce_retention(logs: List[Path], budget: int, busy: Set[Path] = frozenset()) -> Tuple[int, List[Path]]:
+    """
+    Delete the oldest rotated files until they fit in the budget.
+
+    Blocking; meant for a worker thread.
+
+    Args:
+        logs: Active log files whose archives count against the budget
+        budget: Bytes of archives to keep
+        busy: Archives being compressed, never deleted
+
+    Returns:
+        (bytes kept, deleted files)
+    """
+    sized = []
+    for path in archives(logs):
+        try:
+            sized.append((path, path.stat().st_size))
+        except OSError:
+            continue
+    total = sum(size for _, size in sized)
+
+    deleted = []
+    for path, size in sized:
+        if total <= budget:
+            break
+        if path in busy:
+            continue
+        try:
+            path.unlink()
+        except OSError as e:
+            logging.warning(f"Cannot delete rotated log {path}: {e}")
+            continue
+        total -= size
+        deleted.append(path)
+    return total, deleted
+
+
+class LogRotator:
+    """
+    Rotates, compresses and expires Squid's log files.
+
+    Args:
+        config_file: Configuration Squid runs with (for squid -k rotate)
+        rotate_size: Rotate when an active log reaches this many bytes (0: never)
+        rotate_interval: Rotate after this many seconds (0: never)
+        retention_bytes: Bytes of rotated files to keep
+        compression: 'gzip', 'zstd' or 'none'
+        squid_binary: Squid executable used for -k rotate
+        registry: Registry to publish rotation metrics into
+        clock: Monotonic time source (for tests)
+
+    Raises:
+        ValueError: If compression is unknown
+    """
+
+    def __init__(self, config_file: Path = SQUID_CONF, rotate_size: int = ROTATE_SIZE,
+                 rotate_interval: float = ROTATE_INTERVAL, retention_bytes: int = RETENTION_BYTES,
+                 compression: str = COMPRESSION, squid_binary: str = SQUID_BINARY,
+                 registry: Registry = REGISTRY, clock: Callable[[], float] = time.monotonic):
+        self.config_file = Path(config_file)
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.retention_bytes = retention_bytes
+        self.compression = compression_method(compression)
+        self.squid_binary = squid_binary
+        self.clock = clock
+        self._last_rotation = clock()
+        self._lock = asyncio.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._busy: Set[Path] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.rotations = registry.counter('squid_log_rotations_total', 'Log rotations by trigger.',
+                                          ('reason',))
+        self.failures = registry.counter('squid_log_rotation_failures_total',
+                                         'Log rotations where squid -k rotate failed or timed out.')
+        self.last_duration = registry.gauge(
+            'squid_log_last_rotation_seconds', 'Time from rotation trigger to Squid writing new log files.')
+        self.duration_total = registry.counter(
+            'squid_log_rotation_seconds_total', 'Time from rotation trigger to Squid writing new log '
+            'files, summed over rotations.')
+        self.compression_total = registry.counter(
+            'squid_log_compression_seconds_total', 'Worker thread time spent compressing rotated logs.')
+        self.archive_bytes = registry.gauge('squid_log_archive_bytes', 'Bytes of rotated log files kept.')
+        self.deleted = registry.counter('squid_log_archive_deleted_files_total',
+                                        'Rotated log files deleted to stay within the retention budget.')
+
+    @property
+    def enabled(self) -> bool:
+        return self.rotate_size > 0 or self.rotate_interval > 0
+
+    def _config(self) -> Optional[SquidConfig]:
+        try:
+            return load_squid_config(self.config_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cannot read Squid configuration for log rotation: {e}")
+            return None
+
+    def due(self, logs: List[Path]) -> Optional[str]:
+        """
+        Whether a rotation is due.
+
+        Args:
+            logs: Active log files
+
+        Returns:
+            'size' or 'time', or None if no rotation is due
+        """
+        if self.rotate_size > 0:
+            for log in logs:
+                try:
+                    if log.stat().st_size >= self.rotate_size:
+                        return 'size'
+                except OSError:
+                    continue
+        if self.rotate_interval > 0 and self.clock() - self._last_rotation >= self.rotate_interval:
+            return 'time'
+        return None
+
+    async def rotate(self, reason: str) -> bool:
+        """
+        Rotate the logs now; compression continues in the background.
+
+        Args:
+            reason: Trigger reported in squid_log_rotations_total
+
+        Returns:
+            True if Squid reopened its logs
+        """
+        config = self._config()
+        if config is None:
+            return False
+
+        async with self._lock:
+            start = self.clock()
+            self._last_rotation = start
+            logs = log_files(config)
+            rotated = await self._rotate(logs, logfile_rotate(config) > 0)
+            if rotated is None:
+                self.failures.inc()
+                return False
+
+            elapsed = self.clock() - start
+            self.rotations.inc(reason=reason)
+            self.last_duration.set(elapsed)
+            self.duration_total.inc(elapsed)
+            logging.info(f"Rotated {len(rotated)} Squid log file(s) ({reason}) in {elapsed:.2f}s")
+
+        self._spawn(self._archive(logs, rotated))
+        return True
+
+    async def _rotate(self, logs: List[Path], squid_renames: bool) -> Optional[List[Path]]:
+        """Rename the active logs and have Squid reopen them; None on failure."""
+        inodes = {}
+        for log in logs:
+            try:
+                st = log.stat()
+            except OSError:
+                continue
+            if st.st_size:
+                inodes[log] = st.st_ino
+
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+        renamed = {}
+        if not squid_renames:
+            for log in inodes:
+                renamed[log] = self._rename(log, log, stamp)
+
+        if not await self._signal():
+            # Squid still writes to the renamed files; put them back
+            for log, archive in renamed.items():
+                try:
+                    os.rename(archive, log)
+                except OSError as e:
+                    logging.warning(f"Cannot restore {log} after failed rotation: {e}")
+            return None
+
+        # Wait until Squid renamed (logfile_rotate > 0) or reopened the files;
+        # only then is nothing writing to the archived copy any more
+        deadline = self.clock() + ROTATE_TIMEOUT
+        pending = dict(inodes)
+        rotated: List[Path] = []
+        while pending:
+            for log, inode in list(pending.items()):
+                if squid_renames:
+                    numbered = log.with_name(log.name + '.0')
+                    try:
+                        if numbered.stat().st_ino == inode:
+                            rotated.append(self._rename(numbered, log, stamp))
+                            del pending[log]
+                    except OSError:
+                        pass
+                elif log.exists():
+                    rotated.append(renamed[log])
+                    del pending[log]
+            if not pending:
+                break
+            if self.clock() >= deadline:
+                logging.warning(f"Squid did not reopen {', '.join(map(str, pending))} "
+                                f"within {ROTATE_TIMEOUT:.0f}s of squid -k rotate")
+                return rotated or None
+            await asyncio.sleep(ROTATE_POLL)
+        return rotated
+
+    @staticmethod
+    def _rename(path: Path, log: Path, stamp: str) -> Path:
+        target = log.with_name(f'{log.name}.{stamp}')
+        n = 1
+        while target.exists() or target.with_name(target.name + '.gz').exists() \
+                or target.with_name(target.name + '.zst').exists():
+            target = log.with_name(f'{log.name}.{stamp}-{n}')
+            n += 1
+        os.rename(path, target)
+        return target
+
+    async def _signal(self) -> bool:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.squid_binary, '-k', 'rotate', '-f', str(self.config_file),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await asyncio.wait_for(process.communicate(), ROTATE_TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as e:
+            logging.error(f"squid -k rotate failed: {e or 'timed out'}")
+            return False
+
+        if process.returncode != 0:
+            output = (stderr or stdout).decode('utf-8', errors='replace').strip()
+            logging.error(f"squid -k rotate exited with code {process.returncode}: {output}")
+            return False
+        return True
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(COMPRESS_WORKERS, thread_name_prefix='log-compress')
+        return self._pool
+
+    async def _compress(self, path: Path) -> None:
+        loop = asyncio.get_running_loop()
+        self._busy.add(path)
+        start = time.monotonic()
+        try:
+            output = await loop.run_in_executor(self._executor(), compress_file, path, self.compression)
+        except OSError as e:
+            logging.warning(f"Cannot compress rotated log {path}: {e}")
+            return
+        finally:
+            self._busy.discard(path)
+        self.compression_total.inc(time.monotonic() - start)
+        logging.debug(f"Compressed {path} to {output.name}")
+
+    async def _archive(self, logs: List[Path], rotated: List[Path]) -> None:
+        """Compress rotated files, then apply the retention budget."""
+        if self.compression != 'none':
+            await asyncio.gather(*(self._compress(path) for path in rotated))
+        await self.expire(logs)
+
+    async def expire(self, logs: List[Path]) -> None:
+        """Apply the retention budget in a worker thread."""
+        loop = asyncio.get_running_loop()
+        kept, deleted = await loop.run_in_executor(
+            self._executor(), enforce_retention, logs, self.retention_bytes, set(self._busy))
+        self.archive_bytes.set(kept)
+        if deleted:
+            self.deleted.inc(len(deleted))
+            logging.info(f"Deleted {len(deleted)} rotated log file(s) to stay within "
+                         f"{self.retention_bytes // (1024 * 1024)} MB")
+
+    def _leftovers(self, logs: List[Path]) -> List[Path]:
+        """Archives left uncompressed (interrupted runs, Squid's numbered copies)."""
+        compressed = tuple(suffix for suffix in SUFFIXES.values() if suffix)
+        return [path for path in archives(logs) if not path.name.endswith(compressed)]
+
+    async def run(self) -> None:
+        """Check the logs every CHECK_INTERVAL seconds until cancelled."""
+        config = self._config()
+        if config is not None:
+            logs = log_files(config)
+            leftovers = self._leftovers(logs) if self.compression != 'none' else []
+            self._spawn(self._archive(logs, leftovers))
+
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL)
+            config = self._config()
+            if config is None:
+                continue
+            reason = self.due(log_files(config))
+            if reason:
+                await self.rotate(reason)
+
+    async def wait_idle(self) -> None:
+        """Wait for background compression and retention to finish."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        """Stop background compression (unfinished archives are redone on the next start)."""
+        for task in self._tasks:
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -3,27 +3,229 @@ Python logging configuration for entrypoint script.
 
 Provides structured logging with timestamps and log levels matching
 the format used by the bash entrypoint.
+
+LOG_FORMAT=json switches to JSON lines for log shippers: one object per
+record with ts, level, source (entrypoint, squid, init-squid, health),
+phase, pid and msg fields, so no line has to be parsed with a regex.
+
+LOG_RATE_LIMIT caps records per second for each source. Records beyond the
+limit (and its burst allowance) are sampled: LOG_SAMPLE_RATE of them are
+still written, the rest are counted and the next record written for that
+source reports how many were suppressed. A Squid error storm therefore
+cannot flood the log pipeline or crowd out the entrypoint's own messages.
 """
 
+import contextvars
+import json
 import logging
+import os
 import sys
+import threading
+import time
+from typing import Dict, Optional
+
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+
+# Records per second per source (0 = unlimited) and the burst allowance
+RATE_LIMIT = float(os.getenv('LOG_RATE_LIMIT', '0'))
+RATE_BURST = float(os.getenv('LOG_RATE_BURST', '0')) or 2 * RATE_LIMIT
+
+# Fraction of over-limit records that are still written
+SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+
+# Logger names and modules that identify a record's source; anything else is
+# attributed to the process's own source (see setup_logging)
+LOGGER_SOURCES = {
+    'squid': 'squid',
+    'init_squid': 'init-squid',
+}
+MODULE_SOURCES = {
+    'health_server': 'health',
+    'health_checks': 'health',
+    'healthcheck': 'health',
+}
 
+_phase: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('log_phase', default=None)
+_process_phase = 'initializing'
 
-def setup_logging(level: str = "INFO") -> None:
+
+def set_phase(phase: str, task_local: bool = False) -> None:
+    """
+    Set the phase reported in JSON log records.
+
+    Args:
+        phase: Phase name (a startup phase, 'running', 'shutting_down', ...)
+        task_local: Only set it for the current asyncio task (and the tasks it
+                    creates), e.g. for concurrently running startup phases
+    """
+    global _process_phase
+    if task_local:
+        _phase.set(phase)
+    else:
+        _process_phase = phase
+
+
+def current_phase() -> str:
+    """The phase of the calling task, falling back to the process phase."""
+    return _phase.get() or _process_phase
+
+
+def record_source(record: logging.LogRecord, default: str) -> str:
+    """
+    Source a log record is attributed to.
+
+    Args:
+        record: Log record
+        default: Source for records not matched by logger name or module
+
+    Returns:
+        Explicit record.source (logging extra), else a LOGGER_SOURCES or
+        MODULE_SOURCES match, else default
+    """
+    source = getattr(record, 'source', None)
+    if source:
+        return source
+    return LOGGER_SOURCES.get(record.name) or MODULE_SOURCES.get(record.module) or default
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+
+    Args:
+        source: Default source for records of this process
+    """
+
+    def __init__(self, source: str = 'entrypoint'):
+        super().__init__()
+        self.source = source
+        self._pid = os.getpid()
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'),
+                                        check_circular=False, default=str).encode
+        self._second = -1
+        self._second_text = ''
+
+    def _timestamp(self, created: float) -> str:
+        # strftime only once per second; records within it share the prefix
+        second = int(created)
+        if second != self._second:
+            self._second_text = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self._second = second
+        return f'{self._second_text}.{int((created - second) * 1000):03d}Z'
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self._timestamp(record.created),
+            'level': record.levelname,
+            'source': record_source(record, self.source),
+            'phase': getattr(record, 'phase', None) or current_phase(),
+            'pid': getattr(record, 'source_pid', None) or self._pid,
+            'msg': record.getMessage(),
+        }
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return self._encode(entry)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain-text format; notes records suppressed by rate limiting."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f' [{suppressed} earlier records suppressed by rate limit]'
+        return text
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated', 'suppressed', 'excess')
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.suppressed = 0
+        self.excess = 0
+
+
+class SourceRateLimiter(logging.Filter):
+    """
+    Token-bucket rate limit per record source, with sampling of the excess.
+
+    Args:
+        rate: Records per second allowed for each source
+        burst: Records a source may write at once after being idle
+        sample_rate: Fraction of over-limit records written anyway
+        default_source: Source for records not otherwise attributed
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(self, rate: float, burst: float = 0, sample_rate: float = SAMPLE_RATE,
+                 default_source: str = 'entrypoint', clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(burst, rate, 1.0)
+        self.sample_every = round(1 / sample_rate) if sample_rate > 0 else 0
+        self.default_source = default_source
+        self.clock = clock
+        self.suppressed_total: Dict[str, int] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        source = record_source(record, self.default_source)
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(source)
+            if bucket is None:
+                bucket = self._buckets[source] = _Bucket(self.burst, now)
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+            else:
+                bucket.excess += 1
+                if not self.sample_every or bucket.excess % self.sample_every:
+                    bucket.suppressed += 1
+                    self.suppressed_total[source] = self.suppressed_total.get(source, 0) + 1
+                    return False
+
+            if bucket.suppressed:
+                record.suppressed = bucket.suppressed
+                bucket.suppressed = 0
+        return True
+
+
+def setup_logging(level: str = "INFO", log_format: Optional[str] = None,
+                  source: str = 'entrypoint') -> None:
     """
     Configure Python logging for entrypoint.
 
     Args:
         level: Log level (DEBUG, INFO, WARN, ERROR)
+        log_format: 'text' or 'json' (default: LOG_FORMAT)
+        source: Source reported for this process's own records
 
     Log Format:
-        YYYY-MM-DD HH:MM:SS [LEVEL] Message
+        text: YYYY-MM-DD HH:MM:SS [LEVEL] Message
+        json: {"ts":"...Z","level":"INFO","source":"entrypoint","phase":"running","pid":1,"msg":"..."}
     """
     log_level = getattr(logging, level.upper(), logging.INFO)
+    log_format = (log_format or LOG_FORMAT).lower()
+
+    handler = logging.StreamHandler(sys.stdout)
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter(source))
+    else:
+        handler.setFormatter(TextFormatter('%(asctime)s [%(levelname)s] %(message)s',
+                                           datefmt='%Y-%m-%d %H:%M:%S'))
+    if RATE_LIMIT > 0:
+        handler.addFilter(SourceRateLimiter(RATE_LIMIT, RATE_BURST, SAMPLE_RATE, source))
 
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s [%(levelname)s] %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-        stream=sys.stdout
-    )
+    logging.basicConfig(level=log_level, handlers=[handler])
@@ -0,0 +1,174 @@
+"""
+Minimal Prometheus metrics registry and text exposition (format 0.0.4).
+
+No client library is available in the distroless image, so this module
+implements the small subset CephaloProxy needs: labelled gauges and counters
+held in memory, plus collectors that publish whole metric families sampled
+in the background. Rendering only reads memory, so a scrape never touches
+/proc or Squid.
+
+Example:
+    requests = REGISTRY.counter('cephaloproxy_reloads_total', 'Reloads', ('result',))
+    requests.inc(result='ok')
+    body = REGISTRY.render()
+"""
+
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """
+    A metric family: one name, type and help text, many labelled samples.
+
+    Args:
+        name: Metric name (counters should end in _total)
+        documentation: HELP text
+        metric_type: 'gauge' or 'counter'
+        labelnames: Names of the labels every sample carries
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str = 'gauge',
+                 labelnames: Iterable[str] = ()):
+        if metric_type not in ('gauge', 'counter'):
+            raise ValueError(f"Unsupported metric type: {metric_type}")
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def set(self, value: float, **labels) -> None:
+        """Set the sample for labels to value."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Add amount to the sample for labels."""
+        if self.metric_type == 'counter' and amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> Optional[float]:
+        """Current sample for labels, or None if never set."""
+        return self._values.get(self._key(labels))
+
+    def clear(self) -> None:
+        """Remove all samples."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        """Exposition lines for this family (empty if it has no samples)."""
+        with self._lock:
+            samples = sorted(self._values.items())
+        if not samples:
+            return []
+
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        for key, value in samples:
+            if key:
+                labels = ','.join(
+                    f'{name}="{_escape_label(label)}"' for name, label in zip(self.labelnames, key)
+                )
+                lines.append(f'{self.name}{{{labels}}} {_format_value(value)}')
+            else:
+                lines.append(f'{self.name} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    """
+    Collection of metric families rendered together for /metrics.
+
+    Families are either owned by the registry (gauge()/counter(), updated
+    in place by instrumented code) or supplied by collectors: callables that
+    return the families they last sampled.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, documentation: str, metric_type: str,
+                       labelnames: Iterable[str]) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Metric(name, documentation, metric_type, labelnames)
+                self._metrics[name] = metric
+            elif metric.metric_type != metric_type or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different schema")
+            return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+        """Return the gauge called name, creating it on first use."""
+        return self._get_or_create(name, documentation, 'gauge', labelnames)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+        """Return the counter called name, creating it on first use."""
+        return self._get_or_create(name, documentation, 'counter', labelnames)
+
+    def register_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """Add a callable returning pre-sampled metric families."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def unregister_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """Remove a collector added with register_collector()."""
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self) -> bytes:
+        """Render every family in Prometheus text format."""
+        with self._lock:
+            families = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for collector in collectors:
+            families.extend(collector())
+
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        return ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+
+
+# Process-wide default registry served by /metrics
+REGISTRY = Registry()
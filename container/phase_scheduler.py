@@ -0,0 +1,143 @@
+"""
+Startup phase scheduling module.
+
+Runs entrypoint startup phases as an asyncio dependency graph: each phase
+starts as soon as the phases it depends on have finished, so independent
+phases (directory validation, health server bind, config validation, cache
+initialization) overlap instead of running strictly in sequence.
+
+Per-phase wall-clock durations are recorded for logging and metrics.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from logging_config import set_phase
+
+
+@dataclass
+class Phase:
+    """A named startup step and the phases that must finish before it."""
+
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+
+
+class PhaseScheduler:
+    """
+    Dependency-aware concurrent runner for startup phases.
+
+    Example:
+        scheduler = PhaseScheduler()
+        scheduler.add('config', validate_configuration)
+        scheduler.add('dirs', validate_runtime_directories)
+        scheduler.add('squid', start_squid, depends_on=('config', 'dirs'))
+        results = await scheduler.run()
+        squid_process = results['squid']
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Phase] = {}
+        self.timings: Dict[str, float] = {}
+        self.total_time: float = 0.0
+
+    def add(self, name: str, run: Callable[[], Awaitable[Any]],
+            depends_on: Tuple[str, ...] = ()) -> None:
+        """
+        Register a phase.
+
+        Args:
+            name: Unique phase name
+            run: Zero-argument coroutine function executing the phase
+            depends_on: Names of phases that must complete first
+
+        Raises:
+            ValueError: If a phase with this name is already registered
+        """
+        if name in self.phases:
+            raise ValueError(f"Duplicate startup phase: {name}")
+        self.phases[name] = Phase(name, run, tuple(depends_on))
+
+    def order(self) -> List[str]:
+        """
+        Return phase names in a valid dependency order.
+
+        Raises:
+            ValueError: On unknown dependencies or dependency cycles
+        """
+        ordered: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str, chain: Tuple[str, ...]) -> None:
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                cycle = ' -> '.join(chain + (name,))
+                raise ValueError(f"Startup phase dependency cycle: {cycle}")
+
+            state[name] = 'visiting'
+            for dep in self.phases[name].depends_on:
+                if dep not in self.phases:
+                    raise ValueError(f"Startup phase '{name}' depends on unknown phase '{dep}'")
+                visit(dep, chain + (name,))
+            state[name] = 'done'
+            ordered.append(name)
+
+        for name in self.phases:
+            visit(name, ())
+        return ordered
+
+    async def _run_phase(self, phase: Phase, tasks: Dict[str, asyncio.Task]) -> Any:
+        if phase.depends_on:
+            await asyncio.gather(*(tasks[dep] for dep in phase.depends_on))
+
+        # Each phase runs in its own task, so this only tags its own records
+        set_phase(phase.name, task_local=True)
+        logging.debug(f"Startup phase '{phase.name}' started")
+        start = time.monotonic()
+        try:
+            return await phase.run()
+        finally:
+            self.timings[phase.name] = time.monotonic() - start
+            logging.debug(f"Startup phase '{phase.name}' finished in {self.timings[phase.name]:.3f}s")
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run all phases, each as soon as its dependencies complete.
+
+        Fail-fast: the first phase to raise cancels every phase still
+        pending and its exception is re-raised.
+
+        Returns:
+            Mapping of phase name to the value its coroutine returned
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        start = time.monotonic()
+
+        for name in self.order():
+            tasks[name] = asyncio.create_task(
+                self._run_phase(self.phases[name], tasks), name=f"phase:{name}"
+            )
+
+        try:
+            done, pending = await asyncio.wait(
+                tasks.values(), return_when=asyncio.FIRST_EXCEPTION
+            )
+            failed = [t for t in done if not t.cancelled() and t.exception() is not None]
+            if failed:
+                raise failed[0].exception()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            self.total_time = time.monotonic() - start
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def summary(self) -> str:
+        """One-line human-readable timing summary."""
+        parts = [f"{name}={self.timings[name]:.3f}s" for name in self.order() if name in self.timings]
+        return f"{self.total_time:.3f}s total ({', '.join(parts)})"
@@ -5,8 +5,29 @@ This module provides functions to check process existence and parse process
 information from the /proc filesystem without external dependencies (no psutil).
 """
 
+import asyncio
+import os
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Dict, List, Optional, Union
+
+
+# Fields of /proc/[pid]/stat after the ')' closing comm, see proc(5).
+# Index 0 is field 3 (state).
+_STAT_FIELDS = {
+    'state': 0,
+    'ppid': 1,
+    'minflt': 7,
+    'majflt': 9,
+    'utime': 11,
+    'stime': 12,
+    'num_threads': 17,
+    'starttime': 19,
+    'vsize': 20,
+    'rss': 21,
+}
+
+# Kernel clock ticks per second (utime/stime/starttime units)
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
 
 
 def check_process_running(pid: int) -> bool:
@@ -22,6 +43,37 @@ def check_process_running(pid: int) -> bool:
     return Path(f"/proc/{pid}").exists()
 
 
+async def wait_for_exit(pid: int) -> None:
+    """
+    Wait until a process exits, without polling.
+
+    A pidfd (Linux 5.3+) becomes readable when the process terminates; it is
+    registered with the event loop, so the caller wakes exactly once, as soon
+    as the process is gone. The process is not reaped.
+
+    Args:
+        pid: Process ID to wait for
+
+    Raises:
+        OSError: If pidfds are not supported (old kernel, seccomp policy)
+    """
+    if not hasattr(os, 'pidfd_open'):
+        raise OSError("os.pidfd_open is not available")
+    try:
+        pidfd = os.pidfd_open(pid)
+    except ProcessLookupError:
+        return  # Already gone (and reaped)
+
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+
+
 def parse_proc_status(pid: int) -> Optional[Dict[str, str]]:
     """
     Parse /proc/[pid]/status into a key-value dictionary.
@@ -51,3 +103,107 @@ def parse_proc_status(pid: int) -> Optional[Dict[str, str]]:
         return None
 
     return info
+
+
+def parse_proc_stat(pid: int) -> Optional[Dict[str, Union[str, int]]]:
+    """
+    Parse /proc/[pid]/stat into a dictionary of selected fields.
+
+    The command name is taken from between the first '(' and the last ')',
+    since it may itself contain spaces or parentheses.
+
+    Args:
+        pid: Process ID to parse
+
+    Returns:
+        Dictionary with 'comm', 'state' and integer fields ('ppid', 'utime',
+        'stime', 'num_threads', 'starttime', ...), or None if the process
+        doesn't exist
+
+    Example:
+        {'comm': 'squid', 'state': 'S', 'ppid': 1, 'utime': 42, ...}
+    """
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            data = f.read()
+    except (IOError, PermissionError):
+        return None
+
+    open_paren = data.find('(')
+    close_paren = data.rfind(')')
+    if open_paren < 0 or close_paren < open_paren:
+        return None
+
+    fields = data[close_paren + 2:].split()
+    info: Dict[str, Union[str, int]] = {'comm': data[open_paren + 1:close_paren]}
+    try:
+        for name, index in _STAT_FIELDS.items():
+            info[name] = fields[index] if name == 'state' else int(fields[index])
+    except (IndexError, ValueError):
+        return None
+
+    return info
+
+
+def count_open_fds(pid: int) -> Optional[int]:
+    """
+    Count open file descriptors of a process via /proc/[pid]/fd.
+
+    Args:
+        pid: Process ID to inspect
+
+    Returns:
+        Number of open descriptors, or None if the process doesn't exist or
+        its fd directory is not readable
+    """
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except (FileNotFoundError, PermissionError, ProcessLookupError):
+        return None
+
+
+def find_descendants(pid: int) -> List[int]:
+    """
+    Find all descendants (children, grandchildren, ...) of a process.
+
+    Scans /proc once and follows parent links, so helpers spawned by Squid
+    (e.g. security_file_certgen, log daemons) are found without relying on
+    /proc/[pid]/task/*/children, which needs CONFIG_PROC_CHILDREN.
+
+    Args:
+        pid: Root process ID
+
+    Returns:
+        Descendant PIDs in breadth-first order (root not included)
+    """
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        stat = parse_proc_stat(int(entry))
+        if stat is not None:
+            children.setdefault(stat['ppid'], []).append(int(entry))
+
+    descendants = []
+    queue = children.get(pid, [])
+    while queue:
+        child = queue.pop(0)
+        descendants.append(child)
+        queue.extend(children.get(child, []))
+    return descendants
+
+
+def read_pid_file(pid_file: Path) -> Optional[int]:
+    """
+    Read a PID from a PID file.
+
+    Args:
+        pid_file: Path to the PID file
+
+    Returns:
+        PID, or None if the file is missing or malformed
+    """
+    try:
+        return int(Path(pid_file).read_text().strip())
+    except (FileNotFoundError, PermissionError, ValueError):
+        return None
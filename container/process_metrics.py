@@ -0,0 +1,207 @@
+"""
+Squid process resource metrics sampled from /proc.
+
+ProcessCollector samples the Squid main process and every descendant it
+spawned (helpers such as security_file_certgen, log daemons, diskd) on a
+fixed interval and publishes the result as metric families. Scrapes render
+the last sample from memory; they never read /proc themselves.
+
+Samples are summed per process role rather than labelled by PID, so helpers
+being respawned do not grow the number of series without bound. The role is
+'squid' for the main process, the kid name Squid gives its SMP workers
+('squid-1', 'squid-coord-3', ...) and the command name for helpers. The CPU
+and context switch counters keep the last values of exited processes, so
+they do not go backwards when a helper exits.
+
+Exported per role (label: process):
+    squid_process_resident_memory_bytes       VmRSS
+    squid_process_resident_memory_peak_bytes  VmHWM (sum of per-process peaks)
+    squid_process_threads                     Threads
+    squid_process_open_fds                    entries in /proc/<pid>/fd
+    squid_process_context_switches_total      voluntary/involuntary (label: type)
+    squid_process_cpu_seconds_total           user/system (label: mode)
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY, Metric, Registry
+from proc_utils import (
+    CLOCK_TICKS,
+    count_open_fds,
+    find_descendants,
+    parse_proc_stat,
+    parse_proc_status,
+    read_pid_file,
+)
+
+
+PID_FILE = Path('/var/run/squid/squid.pid')
+
+# Seconds between /proc samples
+COLLECT_INTERVAL = float(os.getenv('METRICS_COLLECT_INTERVAL', '5'))
+
+# Squid renames SMP kids to '(squid-1)', '(squid-coord-3)', ...
+_KID_NAME = re.compile(rb'^\((squid-[\w-]+)\)')
+
+
+def _status_kb(status: Dict[str, str], key: str) -> Optional[int]:
+    """Convert a '1234 kB' /proc/<pid>/status value to bytes."""
+    value = status.get(key)
+    if not value:
+        return None
+    try:
+        return int(value.split()[0]) * 1024
+    except (ValueError, IndexError):
+        return None
+
+
+def process_role(pid: int, comm: str, root: int) -> str:
+    """
+    Name the role of a process in the Squid tree.
+
+    Args:
+        pid: Process ID
+        comm: Command name from /proc/<pid>/stat
+        root: PID of the Squid main process
+
+    Returns:
+        'squid' for the main process, the kid name for SMP workers, or comm
+    """
+    if pid == root:
+        return 'squid'
+    try:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            match = _KID_NAME.match(f.read(256))
+    except OSError:
+        match = None
+    return match.group(1).decode() if match else comm
+
+
+class ProcessCollector:
+    """
+    Background sampler of Squid process tree resource usage.
+
+    Args:
+        pid_source: Callable returning the Squid main PID (None if not
+                    running); defaults to reading the Squid PID file
+        interval: Seconds between samples
+        registry: Registry to publish into
+    """
+
+    def __init__(self, pid_source: Optional[Callable[[], Optional[int]]] = None,
+                 interval: float = COLLECT_INTERVAL, registry: Registry = REGISTRY):
+        self.pid_source = pid_source or (lambda: read_pid_file(PID_FILE))
+        self.interval = interval
+        self.registry = registry
+        self._families: List[Metric] = []
+        # Counter values of live processes by (pid, start time), and the
+        # totals of exited ones by role, so per-role sums stay monotonic
+        self._counters: Dict[Tuple[int, int], Tuple[str, Dict[Tuple[str, str], float]]] = {}
+        self._retired: Dict[Tuple[str, str, str], float] = {}
+        self._thread: Optional[threading.Thread] = None
+        registry.register_collector(self.families)
+
+    def families(self) -> List[Metric]:
+        """Families from the most recent sample."""
+        return self._families
+
+    def collect(self) -> List[Metric]:
+        """Sample /proc now and publish the result."""
+        started = time.monotonic()
+
+        rss = Metric('squid_process_resident_memory_bytes',
+                     'Resident set size of Squid processes, by role.', 'gauge', ('process',))
+        hwm = Metric('squid_process_resident_memory_peak_bytes',
+                     'Sum of peak resident set sizes (VmHWM) of Squid processes, by role.', 'gauge',
+                     ('process',))
+        threads = Metric('squid_process_threads',
+                         'Number of threads in Squid processes, by role.', 'gauge', ('process',))
+        fds = Metric('squid_process_open_fds',
+                     'Open file descriptors of Squid processes, by role.', 'gauge', ('process',))
+        ctxt = Metric('squid_process_context_switches_total',
+                      'Context switches of Squid processes, by role.', 'counter', ('process', 'type'))
+        cpu = Metric('squid_process_cpu_seconds_total',
+                     'CPU time consumed by Squid processes, by role.', 'counter', ('process', 'mode'))
+        count = Metric('squid_processes',
+                       'Number of processes in the Squid process tree.', 'gauge')
+        duration = Metric('cephaloproxy_process_metrics_collect_seconds',
+                          'Time spent sampling /proc for process metrics.', 'gauge')
+
+        root = self.pid_source()
+        pids = [root] + find_descendants(root) if root else []
+        sampled = 0
+        counters: Dict[Tuple[int, int], Tuple[str, Dict[Tuple[str, str], float]]] = {}
+
+        for pid in pids:
+            stat = parse_proc_stat(pid)
+            status = parse_proc_status(pid)
+            if stat is None or status is None:
+                continue  # exited while sampling
+            sampled += 1
+            role = process_role(pid, stat['comm'], root)
+
+            for metric, value in ((rss, _status_kb(status, 'VmRSS')),
+                                  (hwm, _status_kb(status, 'VmHWM')),
+                                  (fds, count_open_fds(pid))):
+                if value is not None:
+                    metric.inc(value, process=role)
+            threads.inc(stat['num_threads'], process=role)
+
+            values = {('mode', 'user'): stat['utime'] / CLOCK_TICKS,
+                      ('mode', 'system'): stat['stime'] / CLOCK_TICKS}
+            for kind, key in (('voluntary', 'voluntary_ctxt_switches'),
+                              ('involuntary', 'nonvoluntary_ctxt_switches')):
+                if key in status:
+                    values[('type', kind)] = int(status[key])
+            counters[(pid, stat['starttime'])] = (role, values)
+
+        # Fold the last sample of processes that exited into their role's total
+        for key, (role, values) in self._counters.items():
+            if key not in counters:
+                for (label, kind), value in values.items():
+                    retired = (role, label, kind)
+                    self._retired[retired] = self._retired.get(retired, 0.0) + value
+        self._counters = counters
+
+        for (role, label, kind), value in self._retired.items():
+            (cpu if label == 'mode' else ctxt).inc(value, process=role, **{label: kind})
+        for role, values in counters.values():
+            for (label, kind), value in values.items():
+                (cpu if label == 'mode' else ctxt).inc(value, process=role, **{label: kind})
+
+        count.set(sampled)
+        duration.set(time.monotonic() - started)
+
+        self._families = [count, rss, hwm, threads, fds, ctxt, cpu, duration]
+        return self._families
+
+    async def run(self) -> None:
+        """Sample every interval in a worker thread (asyncio mode)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.collect)
+            except Exception as e:
+                logging.warning(f"Process metrics collection failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start_thread(self) -> None:
+        """Sample every interval in a daemon thread (http.server mode)."""
+        def loop():
+            while True:
+                try:
+                    self.collect()
+                except Exception as e:
+                    logging.warning(f"Process metrics collection failed: {e}")
+                time.sleep(self.interval)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=loop, name='process-metrics', daemon=True)
+            self._thread.start()
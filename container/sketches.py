@@ -0,0 +1,120 @@
+"""
+Bounded-memory streaming summaries.
+
+QuantileSketch is a DDSketch-style histogram with logarithmically sized
+buckets: every quantile estimate is within a fixed relative error of the
+true value, memory grows with log(max/min) rather than with the number of
+samples, and sketches merge by adding bucket counts.
+
+SpaceSaving keeps approximate heavy hitters (top-k by weight) in a fixed
+number of counters. Summaries merge by adding counts, which is how rolling
+windows combine their per-bucket summaries.
+"""
+
+import math
+from typing import Dict, Hashable, List, Tuple
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch for non-negative values.
+
+    Args:
+        relative_accuracy: Maximum relative error of quantile estimates
+    """
+
+    __slots__ = ('relative_accuracy', 'gamma', '_log_gamma', 'bins', 'zero_count', 'count')
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Record value (values <= 0 are counted as zero)."""
+        self.count += weight
+        if value <= 0:
+            self.zero_count += weight
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        bins = self.bins
+        bins[index] = bins.get(index, 0) + weight
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Add other's samples to this sketch (same accuracy required)."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        bins = self.bins
+        for index, count in other.bins.items():
+            bins[index] = bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-quantile (0 <= q <= 1).
+
+        Returns:
+            Estimated value, or NaN if the sketch is empty
+        """
+        if self.count == 0:
+            return math.nan
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class SpaceSaving:
+    """
+    Approximate top-k by weight (Metwally et al. Space-Saving).
+
+    Keeps at most capacity counters. When a new key arrives and the summary
+    is full, the smallest counter is reassigned to the new key and keeps its
+    weight, so estimates never undercount and overcount by at most the
+    smallest tracked weight.
+
+    Args:
+        capacity: Number of counters to keep
+    """
+
+    __slots__ = ('capacity', 'counts')
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+
+    def add(self, key: Hashable, weight: float = 1) -> None:
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+        elif len(counts) < self.capacity:
+            counts[key] = weight
+        else:
+            victim = min(counts, key=counts.__getitem__)
+            counts[key] = counts.pop(victim) + weight
+
+    def merge(self, other: 'SpaceSaving') -> None:
+        """Add other's counters, then trim back to capacity."""
+        counts = self.counts
+        for key, weight in other.counts.items():
+            counts[key] = counts.get(key, 0) + weight
+        if len(counts) > self.capacity:
+            self.counts = dict(self.top(self.capacity))
+
+    def top(self, n: int) -> List[Tuple[Hashable, float]]:
+        """The n heaviest keys with their (over-)estimated weights."""
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
@@ -0,0 +1,81 @@
+"""
+Listening socket handoff (systemd socket-activation style).
+
+The entrypoint binds the health check port itself and hands the already
+listening socket to the health server, either by file descriptor to a child
+process (HEALTH_LISTEN_FD) or directly as a socket object when the server
+runs in-process. Connections are queued by the kernel from the moment of
+bind, so probes never race the server's startup.
+
+The standard systemd protocol (LISTEN_FDS/LISTEN_PID, first fd 3) is also
+honored, so the health server can be socket-activated by systemd directly.
+"""
+
+import os
+import socket
+from typing import Dict, Optional
+
+
+HEALTH_LISTEN_FD_ENV = 'HEALTH_LISTEN_FD'
+
+# sd_listen_fds(3): passed descriptors start at fd 3
+SD_LISTEN_FDS_START = 3
+
+LISTEN_BACKLOG = 128
+
+
+def bind_listen_socket(port: int, host: str = '') -> socket.socket:
+    """
+    Create a bound, listening TCP socket.
+
+    Args:
+        port: Port to bind
+        host: Address to bind ('' for all IPv4 interfaces)
+
+    Returns:
+        Listening socket
+
+    Raises:
+        OSError: If the port cannot be bound (e.g. already in use)
+    """
+    return socket.create_server((host, port), backlog=LISTEN_BACKLOG, reuse_port=False)
+
+
+def handoff_env(sock: socket.socket) -> Dict[str, str]:
+    """Environment variables announcing sock to a child process."""
+    return {
+        HEALTH_LISTEN_FD_ENV: str(sock.fileno()),
+        'LISTEN_FDNAMES': 'health',
+    }
+
+
+def inherited_listen_socket() -> Optional[socket.socket]:
+    """
+    Return the listening socket handed over by the parent, if any.
+
+    Checks HEALTH_LISTEN_FD first, then the systemd LISTEN_FDS protocol
+    (only if LISTEN_PID is unset or matches this process).
+
+    Returns:
+        Socket object wrapping the inherited descriptor, or None
+    """
+    fd_text = os.environ.pop(HEALTH_LISTEN_FD_ENV, None)
+
+    if fd_text is None and os.environ.get('LISTEN_FDS'):
+        listen_pid = os.environ.get('LISTEN_PID')
+        if listen_pid is None or listen_pid == str(os.getpid()):
+            fd_text = str(SD_LISTEN_FDS_START)
+        for name in ('LISTEN_FDS', 'LISTEN_PID', 'LISTEN_FDNAMES'):
+            os.environ.pop(name, None)
+
+    if fd_text is None:
+        return None
+
+    try:
+        fd = int(fd_text)
+    except ValueError:
+        return None
+
+    sock = socket.socket(fileno=fd)
+    sock.set_inheritable(False)
+    return sock
@@ -0,0 +1,431 @@
+"""
+Squid configuration parsing module.
+
+Parses squid.conf into a typed SquidConfig model in a single streaming pass.
+The parser follows 'include' directives (with glob patterns) and joins
+backslash line continuations, so every consumer (entrypoint, init-squid,
+health server) sees the same view of the configuration.
+
+Parsed configurations are cached per process and keyed by the stat
+fingerprint (inode, mtime, size) of every file that was read, so repeated
+lookups cost a handful of stat() calls instead of a full re-parse.
+"""
+
+import glob
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+SQUID_CONF = Path('/etc/squid/squid.conf')
+
+# Squid refuses to nest includes deeper than this (MAX_INCLUDE_DEPTH)
+MAX_INCLUDE_DEPTH = 16
+
+
+@dataclass
+class Directive:
+    """A single logical configuration line (continuations joined)."""
+
+    name: str
+    args: List[str]
+    source: Path
+    line: int
+
+
+@dataclass
+class CacheDir:
+    """
+    cache_dir directive.
+
+    Format: cache_dir <type> <directory> <mbytes> [<L1> <L2>] [options]
+    Example: cache_dir ufs /var/spool/squid 1000 16 256
+    """
+
+    store_type: str
+    path: Path
+    size_mb: Optional[int] = None
+    l1: Optional[int] = None
+    l2: Optional[int] = None
+    options: List[str] = field(default_factory=list)
+
+
+@dataclass
+class HttpPort:
+    """http_port / https_port directive."""
+
+    port: int
+    address: Optional[str] = None
+    options: List[str] = field(default_factory=list)
+
+    @property
+    def ssl_bump(self) -> bool:
+        return 'ssl-bump' in self.options
+
+
+@dataclass
+class Acl:
+    """One acl line: acl <name> <type> [-flags] <values or "file">..."""
+
+    name: str
+    acl_type: str
+    values: List[str] = field(default_factory=list)
+    files: List[Path] = field(default_factory=list)
+    flags: List[str] = field(default_factory=list)
+
+
+@dataclass
+class LogDestination:
+    """access_log / cache_log destination (e.g. stdio:/var/log/squid/access.log)."""
+
+    module: str
+    path: Optional[Path]
+    options: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SquidConfig:
+    """Typed view of a squid.conf file and everything it includes."""
+
+    path: Path
+    files: List[Path] = field(default_factory=list)
+    directives: List[Directive] = field(default_factory=list)
+    cache_dirs: List[CacheDir] = field(default_factory=list)
+    http_ports: List[HttpPort] = field(default_factory=list)
+    https_ports: List[HttpPort] = field(default_factory=list)
+    acls: List[Acl] = field(default_factory=list)
+    access_logs: List[LogDestination] = field(default_factory=list)
+    cache_log: Optional[LogDestination] = None
+    pid_filename: Optional[Path] = None
+    ssl_bump_rules: List[List[str]] = field(default_factory=list)
+    sslcrtd_program: Optional[List[str]] = None
+    include_patterns: List[str] = field(default_factory=list)
+
+    @property
+    def ssl_bump_enabled(self) -> bool:
+        """True if any port is ssl-bump enabled or ssl_bump rules exist."""
+        return bool(self.ssl_bump_rules) or any(
+            p.ssl_bump for p in self.http_ports + self.https_ports
+        )
+
+    @property
+    def acl_files(self) -> List[Path]:
+        """All external files referenced by acl directives, in config order."""
+        files: List[Path] = []
+        for acl in self.acls:
+            for path in acl.files:
+                if path not in files:
+                    files.append(path)
+        return files
+
+    def get(self, name: str) -> List[Directive]:
+        """Return all directives with the given name, in config order."""
+        return [d for d in self.directives if d.name == name]
+
+
+def _logical_lines(path: Path) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (line_number, text) for each logical line of a config file.
+
+    Comment and blank lines are skipped before continuation handling, which
+    matches Squid's own parser: a commented-out line ending in a backslash
+    does not swallow the following line. Like Squid, only a '#' at the start
+    of a line begins a comment; elsewhere it is part of the arguments.
+    """
+    pending: List[str] = []
+    start = 0
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for lineno, raw in enumerate(f, 1):
+            stripped = raw.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+
+            if not pending:
+                start = lineno
+
+            if stripped.endswith('\\'):
+                pending.append(stripped[:-1].strip())
+                continue
+
+            pending.append(stripped)
+            text = ' '.join(pending).strip()
+            pending = []
+            if text:
+                yield start, text
+
+    if pending:
+        text = ' '.join(pending).strip()
+        if text:
+            yield start, text
+
+
+def _parse_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _parse_port(args: List[str]) -> Optional[HttpPort]:
+    """Parse http_port arguments: [address:]port [mode] [options]."""
+    if not args:
+        return None
+
+    spec = args[0]
+    address = None
+    if spec.startswith('['):
+        # IPv6: [::1]:3128
+        host, _, port_text = spec[1:].partition(']:')
+        address = host
+    elif ':' in spec:
+        address, _, port_text = spec.rpartition(':')
+    else:
+        port_text = spec
+
+    port = _parse_int(port_text)
+    if port is None:
+        return None
+
+    return HttpPort(port=port, address=address, options=args[1:])
+
+
+def _parse_cache_dir(args: List[str]) -> Optional[CacheDir]:
+    """Parse cache_dir arguments: <type> <directory> <mbytes> [L1 L2] [options]."""
+    if len(args) < 2:
+        return None
+
+    cache_dir = CacheDir(store_type=args[0], path=Path(args[1]))
+    rest = args[2:]
+
+    numbers: List[int] = []
+    while rest and len(numbers) < 3:
+        value = _parse_int(rest[0])
+        if value is None:
+            break
+        numbers.append(value)
+        rest = rest[1:]
+
+    if numbers:
+        cache_dir.size_mb = numbers[0]
+    if len(numbers) == 3:
+        cache_dir.l1, cache_dir.l2 = numbers[1], numbers[2]
+    cache_dir.options = rest
+    return cache_dir
+
+
+def _parse_acl(args: List[str], base_dir: Path) -> Optional[Acl]:
+    """Parse acl arguments, collecting quoted "file" references."""
+    if len(args) < 2:
+        return None
+
+    acl = Acl(name=args[0], acl_type=args[1])
+    for value in args[2:]:
+        if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+            file_path = Path(value[1:-1])
+            if not file_path.is_absolute():
+                file_path = base_dir / file_path
+            acl.files.append(file_path)
+        elif value.startswith('-') and not acl.values and not acl.files:
+            acl.flags.append(value)
+        else:
+            acl.values.append(value)
+    return acl
+
+
+def _parse_log(args: List[str]) -> Optional[LogDestination]:
+    """Parse a log destination: [module:]path [format] [options]."""
+    if not args or args[0] == 'none':
+        return None
+
+    module, sep, target = args[0].partition(':')
+    if not sep:
+        # Legacy form without module prefix
+        module, target = 'stdio', args[0]
+
+    path = Path(target) if target.startswith('/') else None
+    return LogDestination(module=module, path=path, options=args[1:])
+
+
+class _Parser:
+    """Single-pass parser state shared across included files."""
+
+    def __init__(self, path: Path):
+        self.config = SquidConfig(path=path)
+        self.include_patterns = self.config.include_patterns
+
+    def parse_file(self, path: Path, depth: int = 0) -> None:
+        if depth > MAX_INCLUDE_DEPTH:
+            raise ValueError(f"Include depth exceeded {MAX_INCLUDE_DEPTH} at {path}")
+
+        self.config.files.append(path)
+
+        for lineno, text in _logical_lines(path):
+            name, *args = text.split()
+
+            if name == 'include':
+                for pattern in args:
+                    self._include(pattern, path, depth)
+                continue
+
+            self.config.directives.append(Directive(name, args, path, lineno))
+            self._apply(name, args, path)
+
+    def _include(self, pattern: str, parent: Path, depth: int) -> None:
+        if not os.path.isabs(pattern):
+            pattern = str(parent.parent / pattern)
+
+        self.include_patterns.append(pattern)
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            logging.warning(f"{parent}: include {pattern} matched no files")
+            return
+
+        for match in matches:
+            self.parse_file(Path(match), depth + 1)
+
+    def _apply(self, name: str, args: List[str], source: Path) -> None:
+        config = self.config
+
+        if name == 'cache_dir':
+            cache_dir = _parse_cache_dir(args)
+            if cache_dir:
+                config.cache_dirs.append(cache_dir)
+        elif name == 'http_port':
+            port = _parse_port(args)
+            if port:
+                config.http_ports.append(port)
+        elif name == 'https_port':
+            port = _parse_port(args)
+            if port:
+                config.https_ports.append(port)
+        elif name == 'acl':
+            acl = _parse_acl(args, source.parent)
+            if acl:
+                config.acls.append(acl)
+        elif name == 'access_log':
+            log = _parse_log(args)
+            if log:
+                config.access_logs.append(log)
+        elif name == 'cache_log':
+            config.cache_log = _parse_log(args)
+        elif name == 'pid_filename':
+            if args and args[0] != 'none':
+                config.pid_filename = Path(args[0])
+        elif name == 'ssl_bump':
+            config.ssl_bump_rules.append(args)
+        elif name in ('sslcrtd_program', 'ssl_crtd'):
+            config.sslcrtd_program = args
+
+
+def parse_squid_config(config_file: Path = SQUID_CONF) -> SquidConfig:
+    """
+    Parse squid.conf (and all included files) into a SquidConfig.
+
+    Args:
+        config_file: Path to squid.conf file
+
+    Returns:
+        Parsed SquidConfig
+
+    Raises:
+        OSError: If the main configuration file cannot be read
+        ValueError: If includes are nested too deeply
+    """
+    config, _ = _parse_with_patterns(config_file)
+    return config
+
+
+def _parse_with_patterns(config_file: Path) -> Tuple[SquidConfig, List[str]]:
+    parser = _Parser(config_file)
+    parser.parse_file(config_file)
+    return parser.config, parser.include_patterns
+
+
+# Cache: config path -> (fingerprint, parsed config)
+_Fingerprint = Tuple[Tuple, ...]
+_config_cache: Dict[Path, Tuple[_Fingerprint, List[str], SquidConfig]] = {}
+
+
+def _fingerprint(files: List[Path], include_patterns: List[str]) -> Optional[_Fingerprint]:
+    """Stat-based fingerprint of every file read plus current include matches."""
+    entries = []
+    try:
+        for path in files:
+            st = os.stat(path)
+            entries.append((str(path), st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size))
+    except OSError:
+        return None
+
+    for pattern in include_patterns:
+        entries.append((pattern, tuple(sorted(glob.glob(pattern)))))
+
+    return tuple(entries)
+
+
+def load_squid_config(config_file: Path = SQUID_CONF) -> SquidConfig:
+    """
+    Return the parsed configuration, re-parsing only when a file changed.
+
+    The cache key covers the main file, every included file and the current
+    matches of every include glob, so edits, ConfigMap symlink swaps and
+    newly added conf.d files all invalidate the cached entry.
+
+    Args:
+        config_file: Path to squid.conf file
+
+    Returns:
+        Parsed SquidConfig (shared instance; treat as read-only)
+
+    Raises:
+        OSError: If the main configuration file cannot be read
+    """
+    key = Path(config_file)
+    cached = _config_cache.get(key)
+    if cached:
+        fingerprint, patterns, config = cached
+        if _fingerprint(config.files, patterns) == fingerprint:
+            return config
+
+    config, patterns = _parse_with_patterns(key)
+    fingerprint = _fingerprint(config.files, patterns)
+    if fingerprint is not None:
+        _config_cache[key] = (fingerprint, patterns, config)
+    logging.debug(f"Parsed {key}: {len(config.directives)} directives from {len(config.files)} file(s)")
+    return config
+
+
+def config_digest(config: SquidConfig) -> str:
+    """
+    Content hash of a configuration and every file it depends on.
+
+    Covers squid.conf, every included file and every file referenced by an
+    acl, so a matching digest means squid -k parse would see exactly the
+    same input. Unlike the stat fingerprint it survives a container restart
+    and ignores touch-only changes.
+
+    Args:
+        config: Parsed configuration
+
+    Returns:
+        Hex SHA-256 digest (missing files hash as absent)
+    """
+    digest = hashlib.sha256()
+    for path in config.files + config.acl_files:
+        digest.update(str(path).encode() + b'\0')
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        except OSError:
+            digest.update(b'<missing>')
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def clear_config_cache() -> None:
+    """Drop all cached configurations (used by tests and hot reload)."""
+    _config_cache.clear()
@@ -0,0 +1,197 @@
+"""
+Event-driven Squid startup readiness detection.
+
+Replaces fixed sleeps and PID-file polling with real readiness signals:
+
+- inotify on the PID file directory (PID file created/renamed into place)
+- the "Accepting HTTP Socket connections" line on Squid's output streams
+- a TCP connect probe against the configured http_port
+
+Squid is considered ready when its output reports the listening socket or
+the TCP probe connects, so the container is only marked ready once the
+proxy port actually accepts connections. PID file creation wakes the TCP
+probe immediately instead of waiting for its next backoff tick; when no
+http_port is configured, the PID file itself is the readiness signal.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+from inotify_watch import IN_CREATE, IN_MOVED_TO, Inotify, inotify_available
+from squid_config import SQUID_CONF, load_squid_config
+
+
+ACCEPTING_MARKER = b'Accepting HTTP Socket connections'
+
+# TCP probe backoff (seconds)
+PROBE_INITIAL_DELAY = 0.01
+PROBE_MAX_DELAY = 0.25
+
+# Fallback poll interval when inotify is unavailable
+PID_POLL_INTERVAL = 0.1
+
+# Squid's default http_port, used when the configuration has none
+DEFAULT_PROXY_ADDRESS = ('127.0.0.1', 3128)
+
+
+def probe_address(address: Optional[str], port: int) -> Tuple[str, int]:
+    """
+    Map an http_port listen address to a connectable probe address.
+
+    Wildcard listeners are probed on loopback.
+    """
+    if not address or address in ('0.0.0.0', '*'):
+        return '127.0.0.1', port
+    if address == '::':
+        return '::1', port
+    return address, port
+
+
+def proxy_address(config_file: Path = SQUID_CONF) -> Tuple[str, int]:
+    """
+    Connectable address of the first http_port in the Squid configuration.
+
+    Args:
+        config_file: Path to squid.conf
+
+    Returns:
+        (host, port) tuple; DEFAULT_PROXY_ADDRESS if none is configured
+    """
+    try:
+        ports = load_squid_config(config_file).http_ports
+    except OSError:
+        ports = []
+    if not ports:
+        return DEFAULT_PROXY_ADDRESS
+    return probe_address(ports[0].address, ports[0].port)
+
+
+async def wait_for_pid_file(pid_file: Path) -> None:
+    """
+    Wait until pid_file exists, using inotify on its parent directory.
+
+    Falls back to polling every PID_POLL_INTERVAL seconds when inotify is
+    unavailable or the directory cannot be watched.
+    """
+    if pid_file.exists():
+        return
+
+    watcher = None
+    if inotify_available():
+        try:
+            watcher = Inotify()
+            watcher.add_watch(pid_file.parent, IN_CREATE | IN_MOVED_TO)
+        except OSError as e:
+            logging.debug(f"inotify unavailable for {pid_file.parent}: {e}")
+            if watcher:
+                watcher.close()
+            watcher = None
+
+    try:
+        # Re-check after the watch is armed to close the creation race
+        while not pid_file.exists():
+            if watcher:
+                await watcher.wait()
+            else:
+                await asyncio.sleep(PID_POLL_INTERVAL)
+    finally:
+        if watcher:
+            watcher.close()
+
+
+async def wait_for_tcp(host: str, port: int, wake: Optional[asyncio.Event] = None) -> None:
+    """
+    Retry a TCP connect to host:port with exponential backoff until it succeeds.
+
+    Args:
+        host: Address to connect to
+        port: Port to connect to
+        wake: Optional event that triggers an immediate retry when set
+    """
+    delay = PROBE_INITIAL_DELAY
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return
+        except OSError:
+            pass
+
+        if wake is not None:
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=delay)
+                delay = PROBE_INITIAL_DELAY
+                continue
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(delay)
+        delay = min(delay * 2, PROBE_MAX_DELAY)
+
+
+async def wait_for_squid_ready(process: asyncio.subprocess.Process,
+                               pid_file: Path,
+                               listen: Optional[Tuple[str, int]],
+                               accepting: asyncio.Event,
+                               timeout: float) -> str:
+    """
+    Wait for the first readiness signal from a starting Squid process.
+
+    Args:
+        process: Squid process
+        pid_file: Configured pid_filename
+        listen: (host, port) to TCP-probe, or None if no http_port is known
+        accepting: Event set when Squid logs ACCEPTING_MARKER
+        timeout: Fallback deadline in seconds
+
+    Returns:
+        Name of the winning signal: 'stderr', 'tcp_connect', 'pid_file'
+        (only when listen is None) or 'exited' if Squid died first
+
+    Raises:
+        asyncio.TimeoutError: If no signal fired within timeout
+    """
+    wake = asyncio.Event()
+
+    async def pid_signal() -> str:
+        await wait_for_pid_file(pid_file)
+        wake.set()
+        if listen is not None:
+            # Only a hint for the TCP probe; keep this task from winning
+            await asyncio.Event().wait()
+        return 'pid_file'
+
+    async def stderr_signal() -> str:
+        await accepting.wait()
+        return 'stderr'
+
+    async def tcp_signal() -> str:
+        await wait_for_tcp(listen[0], listen[1], wake)
+        return 'tcp_connect'
+
+    async def exit_signal() -> str:
+        await process.wait()
+        return 'exited'
+
+    signals = [pid_signal(), stderr_signal(), exit_signal()]
+    if listen is not None:
+        signals.append(tcp_signal())
+    tasks = [asyncio.create_task(s) for s in signals]
+
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            raise asyncio.TimeoutError()
+        winners = [task.result() for task in done]
+        return 'exited' if 'exited' in winners else winners[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,153 @@
+"""
+In-container restart policy for Squid.
+
+By default the entrypoint exits when Squid dies and the orchestrator
+restarts the whole pod. With SQUID_RESTART_POLICY=on-failure the entrypoint
+restarts Squid in place instead: the interpreter, the health server, the
+initialized cache directories and (when the configuration digest is
+unchanged) the previous squid -k parse result are all reused, so recovery
+takes seconds.
+
+Restarts back off exponentially. If Squid exits more than max_restarts
+times within the crash-loop window the supervisor gives up and the
+entrypoint exits, leaving the crash loop to the orchestrator.
+
+Exported metrics:
+    squid_restarts_total                 in-place restarts
+    squid_recovery_seconds_total         exit detected -> Squid ready again
+    squid_last_recovery_seconds          duration of the latest recovery
+    squid_restart_backoff_seconds        delay before the pending restart
+"""
+
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Optional
+
+from metrics import REGISTRY, Registry
+
+
+RESTART_POLICY = os.getenv('SQUID_RESTART_POLICY', 'never').lower()
+
+
+@dataclass
+class RestartPolicy:
+    """
+    Restart limits and backoff.
+
+    Attributes:
+        max_restarts: Restarts allowed within window before giving up
+        window: Crash-loop window in seconds
+        backoff_initial: Delay before the first restart in the window
+        backoff_max: Upper bound for the delay
+        multiplier: Growth factor per restart already in the window
+    """
+
+    max_restarts: int = 5
+    window: float = 300.0
+    backoff_initial: float = 1.0
+    backoff_max: float = 30.0
+    multiplier: float = 2.0
+
+    @classmethod
+    def from_env(cls) -> Optional['RestartPolicy']:
+        """
+        Policy configured by SQUID_RESTART_* variables.
+
+        Returns:
+            RestartPolicy, or None when SQUID_RESTART_POLICY is 'never'
+
+        Raises:
+            ValueError: If SQUID_RESTART_POLICY is not 'never' or 'on-failure'
+        """
+        if RESTART_POLICY == 'never':
+            return None
+        if RESTART_POLICY != 'on-failure':
+            raise ValueError(f"Unknown SQUID_RESTART_POLICY: {RESTART_POLICY}")
+        return cls(
+            max_restarts=int(os.getenv('SQUID_RESTART_MAX', '5')),
+            window=float(os.getenv('SQUID_RESTART_WINDOW', '300')),
+            backoff_initial=float(os.getenv('SQUID_RESTART_BACKOFF', '1')),
+            backoff_max=float(os.getenv('SQUID_RESTART_BACKOFF_MAX', '30')),
+        )
+
+
+class SquidSupervisor:
+    """
+    Decides whether and when to restart Squid, and records recoveries.
+
+    Args:
+        policy: Restart limits and backoff
+        registry: Registry to publish restart metrics into
+        clock: Monotonic time source (for tests)
+
+    Example:
+        delay = supervisor.record_exit(returncode)
+        if delay is None:
+            sys.exit(1)  # crash loop
+        await asyncio.sleep(delay)
+        process = await start_squid()
+        supervisor.record_recovery()
+    """
+
+    def __init__(self, policy: RestartPolicy, registry: Registry = REGISTRY,
+                 clock: Callable[[], float] = time.monotonic):
+        self.policy = policy
+        self.clock = clock
+        self._exits: Deque[float] = deque()
+        self._exit_time: Optional[float] = None
+        self.restarts = registry.counter('squid_restarts_total', 'In-place Squid restarts.')
+        self.recovery_total = registry.counter(
+            'squid_recovery_seconds_total', 'Time from Squid exit to ready again, summed over restarts.')
+        self.last_recovery = registry.gauge(
+            'squid_last_recovery_seconds', 'Time from Squid exit to ready again for the latest restart.')
+        self.backoff = registry.gauge(
+            'squid_restart_backoff_seconds', 'Delay before the pending Squid restart (0 when none).')
+        self.backoff.set(0)
+
+    def record_exit(self, returncode: Optional[int]) -> Optional[float]:
+        """
+        Account an unexpected Squid exit.
+
+        Args:
+            returncode: Squid's exit code
+
+        Returns:
+            Seconds to wait before restarting, or None if Squid is crash
+            looping (max_restarts exits within window) and should not be
+            restarted
+        """
+        now = self.clock()
+        self._exit_time = now
+        while self._exits and now - self._exits[0] > self.policy.window:
+            self._exits.popleft()
+
+        if len(self._exits) >= self.policy.max_restarts:
+            return None
+
+        delay = min(self.policy.backoff_initial * self.policy.multiplier ** len(self._exits),
+                    self.policy.backoff_max)
+        self._exits.append(now)
+        self.backoff.set(delay)
+        return delay
+
+    def record_recovery(self) -> float:
+        """
+        Account a completed restart (Squid is ready again).
+
+        Returns:
+            Seconds since the exit was recorded
+        """
+        elapsed = self.clock() - self._exit_time if self._exit_time is not None else 0.0
+        self._exit_time = None
+        self.restarts.inc()
+        self.recovery_total.inc(elapsed)
+        self.last_recovery.set(elapsed)
+        self.backoff.set(0)
+        return elapsed
+
+    @property
+    def recent_exits(self) -> int:
+        """Exits counted in the current crash-loop window."""
+        return len(self._exits)
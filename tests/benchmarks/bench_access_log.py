@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Access log analytics throughput benchmark.
+
+Feeds synthetic native-format access.log data through the same path the
+entrypoint uses (LineSplitter chunks -> RollingAccessStats.add_lines) and
+reports sustained lines per second on one core. The pipeline must keep up
+with 50,000 lines/s.
+
+Usage:
+    python3 tests/benchmarks/bench_access_log.py [--lines N] [--domains N]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from access_log import RollingAccessStats
+from log_follower import READ_SIZE, LineSplitter
+
+TARGET_LINES_PER_SECOND = 50_000
+
+RESULTS = [b'TCP_MISS/200', b'TCP_HIT/200', b'TCP_MEM_HIT/200', b'TCP_TUNNEL/200',
+           b'TCP_REFRESH_UNMODIFIED/304', b'TCP_DENIED/403', b'TCP_MISS/404', b'TCP_MISS/503']
+
+
+def generate(lines: int, domains: int) -> bytes:
+    """Build a realistic log body with a skewed domain distribution."""
+    rng = random.Random(42)
+    hosts = [f'host{i}.example.com'.encode() for i in range(domains)]
+    out = []
+    now = 1700000000.0
+    for i in range(lines):
+        host = hosts[min(int(rng.paretovariate(1.2)) - 1, domains - 1)]
+        result = rng.choice(RESULTS)
+        if result.startswith(b'TCP_TUNNEL'):
+            method, url = b'CONNECT', host + b':443'
+        else:
+            method, url = b'GET', b'http://' + host + b'/path/' + str(i % 997).encode()
+        out.append(b'%.3f %6d 10.0.%d.%d %s %d %s %s - HIER_DIRECT/192.0.2.1 text/html\n' % (
+            now + i / 1000, rng.randint(0, 2000), i % 255, i % 253, result,
+            rng.randint(200, 200000), method, url))
+    return b''.join(out)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=500_000)
+    parser.add_argument('--domains', type=int, default=5_000)
+    args = parser.parse_args()
+
+    data = generate(args.lines, args.domains)
+    stats = RollingAccessStats()
+    splitter = LineSplitter()
+
+    start = time.perf_counter()
+    for offset in range(0, len(data), READ_SIZE):
+        stats.add_lines(splitter.feed(data[offset:offset + READ_SIZE]))
+    elapsed = time.perf_counter() - start
+
+    snapshot_start = time.perf_counter()
+    snapshot = stats.snapshot()
+    snapshot_time = time.perf_counter() - snapshot_start
+
+    rate = stats.lines_total / elapsed
+    print(f"access.log analytics ({stats.lines_total:,} lines, {len(data) / 1e6:.1f} MB, "
+          f"{args.domains:,} domains)")
+    print(f"  ingest    {elapsed:8.3f} s   {rate:12,.0f} lines/s   {len(data) / elapsed / 1e6:6.1f} MB/s")
+    print(f"  snapshot  {snapshot_time * 1000:8.2f} ms")
+    print(f"  p50/p95/p99 latency: {snapshot['latency_seconds']}")
+    print(f"  target {TARGET_LINES_PER_SECOND:,} lines/s: "
+          f"{'PASS' if rate >= TARGET_LINES_PER_SECOND else 'FAIL'}")
+    return 0 if rate >= TARGET_LINES_PER_SECOND else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Access log to stdout benchmark: named pipe forwarder vs file plus tail.
+
+A writer process emits native-format access.log lines at --rate requests
+per second, one write() per line like Squid with buffered_logs off, and a
+forwarder process ships them to its stdout, which this script reads like a
+container runtime would:
+
+- file: the writer appends to access.log and the forwarder follows it
+  (LogFollower, one stdout write per read)
+- pipe: the writer writes to the FIFO and the forwarder is
+  AccessLogForwarder (batched writes from a bounded buffer); --format json
+  applies to this mode only and its delays are not measured
+
+Reported per mode: lines delivered and dropped, forwarder CPU time, stdout
+writes, bytes that went through the file system, and the delay from the
+writer's timestamp to the line arriving on stdout.
+
+Usage:
+    python3 tests/benchmarks/bench_access_log_pipe.py [--rate N] [--seconds N] [--format raw|json]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from access_log_pipe import AccessLogForwarder
+from log_follower import LogFollower
+from metrics import Registry
+
+TICK = 0.005
+
+
+def generate(path: Path, rate: int, seconds: float) -> None:
+    """Writer role: one write per line, paced in TICK slices."""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    per_tick = max(int(rate * TICK), 1)
+    start = time.monotonic()
+    ticks = int(seconds / TICK)
+    for tick in range(ticks):
+        for i in range(per_tick):
+            os.write(fd, (f'{time.time():.6f}     45 10.0.{i % 256}.{tick % 256} TCP_MISS/200 4821 GET '
+                          f'http://site{i % 500}.example.com/{tick}/{i} - HIER_DIRECT/93.184.216.34 '
+                          f'text/html\n').encode())
+        delay = start + (tick + 1) * TICK - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    os.close(fd)
+
+
+def forward(mode: str, path: Path, log_format: str) -> None:
+    """Forwarder role: ship path to stdout until SIGTERM, then report counters on stderr."""
+
+    async def run():
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        if mode == 'pipe':
+            forwarder = AccessLogForwarder(path, output=1, log_format=log_format,
+                                           lock=threading.Lock(), registry=Registry())
+            forwarder.start()
+            await stop.wait()
+            forwarder.stop()
+            print(f'{forwarder.writes} {forwarder.dropped}', file=sys.stderr)
+        else:
+            writes = 0
+
+            def on_lines(lines):
+                nonlocal writes
+                os.write(1, b'\n'.join(lines) + b'\n')
+                writes += 1
+
+            follower = LogFollower(path, on_lines, from_end=False)
+            task = asyncio.create_task(follower.run())
+            await stop.wait()
+            await follower.drain()
+            task.cancel()
+            print(f'{writes} 0', file=sys.stderr)
+
+    asyncio.run(run())
+
+
+def measure(mode: str, args, workdir: Path) -> dict:
+    path = workdir / ('access.pipe' if mode == 'pipe' else 'access.log')
+    script = str(Path(__file__).resolve())
+    if mode == 'file':
+        path.touch()
+    forwarder = subprocess.Popen([sys.executable, script, '--role', 'forward', '--mode', mode,
+                                  '--path', str(path), '--format', args.format],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    delays = []
+    lines = 0
+
+    def read_stdout():
+        nonlocal lines
+        for line in forwarder.stdout:
+            now = time.time()
+            lines += 1
+            if line.startswith(b'{'):
+                continue  # JSON timestamps only have millisecond precision
+            delays.append(now - float(line.split(b' ', 1)[0]))
+
+    reader = threading.Thread(target=read_stdout)
+    reader.start()
+    # Let the forwarder create the FIFO (pipe) or open the file
+    while not path.exists():
+        time.sleep(0.01)
+    time.sleep(0.5)
+
+    writer = subprocess.Popen([sys.executable, script, '--role', 'generate', '--path', str(path),
+                               '--rate', str(args.rate), '--seconds', str(args.seconds)])
+    writer.wait()
+    time.sleep(0.5)
+    disk_bytes = path.stat().st_size if mode == 'file' else 0
+    forwarder.send_signal(signal.SIGTERM)
+    _, _, usage = os.wait4(forwarder.pid, 0)
+    reader.join()
+    writes, dropped = map(int, forwarder.stderr.read().split())
+    return {
+        'lines': lines, 'dropped': dropped, 'writes': writes, 'disk': disk_bytes,
+        'cpu': usage.ru_utime + usage.ru_stime, 'delays': sorted(delays),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rate', type=int, default=20000)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--format', default='raw', choices=('raw', 'json'))
+    parser.add_argument('--role', choices=('bench', 'generate', 'forward'), default='bench',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    parser.add_argument('--path', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'generate':
+        generate(args.path, args.rate, args.seconds)
+        return 0
+    if args.role == 'forward':
+        forward(args.mode, args.path, args.format)
+        return 0
+
+    print(f"{args.rate:,} requests/s for {args.seconds:.0f}s ({args.format})")
+    print(f"{'mode':<6} {'lines':>10} {'dropped':>8} {'cpu s':>7} {'writes':>8} "
+          f"{'fs bytes':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in ('file', 'pipe'):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = measure(mode, args, Path(tmp))
+        delays = result['delays'] or [float('nan')]
+        p99 = delays[int(len(delays) * 0.99) - 1] if len(delays) > 1 else delays[0]
+        print(f"{mode:<6} {result['lines']:>10,} {result['dropped']:>8,} {result['cpu']:>7.2f} "
+              f"{result['writes']:>8,} {result['disk']:>12,} {statistics.median(delays) * 1000:>8.1f} "
+              f"{p99 * 1000:>8.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
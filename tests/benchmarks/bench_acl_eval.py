@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Offline http_access evaluation benchmark.
+
+Replays a synthetic access.log through a rule chain shaped like
+squid.conf.default plus a large dstdomain block list and a URL regex acl,
+once per request (batch size 1) and with the default batch size, and
+prints the replay rate and the resulting report.
+
+Usage:
+    python3 tests/benchmarks/bench_acl_eval.py [--requests N] [--domains N]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from acl_eval import BATCH_SIZE, AccessEvaluator, format_report
+from squid_config import load_squid_config
+
+CONFIG = '''
+acl localnet src 10.0.0.0/8 172.16.0.0/12 192.168.0.0/16 fc00::/7
+acl SSL_ports port 443
+acl Safe_ports port 80 21 443 70 210 1025-65535 280 488 591 777
+acl CONNECT method CONNECT
+acl ads url_regex -i /ads/ /banner /pixel\\.gif doubleclick
+acl blocked dstdomain "{blocked}"
+http_access deny !Safe_ports
+http_access deny CONNECT !SSL_ports
+http_access allow localhost manager
+http_access deny manager
+http_access deny ads
+http_access deny blocked
+http_access allow localnet
+http_access allow localhost
+http_access deny all
+'''
+
+
+def generate_lines(count: int, domains: int, seed: int = 1):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        site = f'site{int(rng.paretovariate(1.2)) % domains}.com'
+        client = f'10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.randrange(256)}'
+        if rng.random() < 0.3:
+            method, url = b'CONNECT', f'{site}:443'
+        else:
+            method, url = b'GET', f'http://www.{site}/{rng.choice(["", "ads/", "img/"])}{i % 100}'
+        lines.append(b'%.3f     45 %s TCP_MISS/200 1234 %s %s - HIER_DIRECT/93.184.216.34 text/html\n'
+                     % (1700000000 + i / 1000, client.encode(), method, url.encode()))
+    return lines
+
+
+def replay(config, lines, batch_size: int) -> AccessEvaluator:
+    evaluator = AccessEvaluator(config)
+    evaluator.replay(lines, batch_size)
+    return evaluator
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=1_000_000)
+    parser.add_argument('--domains', type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        blocked = Path(tmp) / 'blocked.acl'
+        blocked.write_text(''.join(f'.site{i}.com\n' for i in range(0, args.domains, 3)))
+        conf = Path(tmp) / 'squid.conf'
+        conf.write_text(CONFIG.format(blocked=blocked))
+        config = load_squid_config(conf)
+
+        start = time.perf_counter()
+        lines = generate_lines(args.requests, args.domains)
+        print(f"generated {len(lines):,} lines in {time.perf_counter() - start:.1f}s")
+
+        sample = lines[:min(len(lines), 100_000)]
+        single = replay(config, sample, 1)
+        print(f"batch size 1:    {single.requests / single.seconds:>12,.0f} requests/s "
+              f"({len(sample):,} requests)")
+        batched = replay(config, lines, BATCH_SIZE)
+        print(f"batch size {BATCH_SIZE}: {batched.requests / batched.seconds:>12,.0f} requests/s "
+              f"({len(lines):,} requests in {batched.seconds:.2f}s)")
+        print()
+        print(format_report(batched))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+ACL optimizer benchmark.
+
+Generates a synthetic dstdomain block list shaped like public aggregated
+lists (wildcards plus many hosts below them, duplicates, mixed case,
+trailing dots) and a src network list of overlapping IPv4/IPv6 prefixes,
+and reports how long acl_optimizer takes and how much it removes. If a
+Squid binary is available, squid -k parse is timed with the original and
+the optimized lists to show the load time saved.
+
+Usage:
+    python3 tests/benchmarks/bench_acl_optimizer.py [--entries N] [--networks N] [--squid PATH]
+"""
+
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from acl_optimizer import optimize_domain_file, optimize_network_file
+
+TLDS = ['com', 'net', 'org', 'io', 'de', 'co.uk', 'info']
+HOSTS = ['www', 'ads', 'cdn', 'track', 'pixel', 'static', 'img', 'api']
+
+
+def generate(path: Path, entries: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    domains = [f'site{i}.{rng.choice(TLDS)}' for i in range(max(entries // 8, 1))]
+    with open(path, 'w') as f:
+        for i in range(entries):
+            domain = rng.choice(domains)
+            kind = rng.random()
+            if kind < 0.15:
+                entry = '.' + domain
+            elif kind < 0.75:
+                entry = f'{rng.choice(HOSTS)}{rng.randrange(50)}.{domain}'
+            else:
+                entry = domain
+            if i % 20 == 0:
+                entry = entry.upper() + '.'
+            f.write(entry + '\n')
+
+
+def generate_networks(path: Path, entries: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for _ in range(entries):
+            if rng.random() < 0.9:
+                prefix = rng.randrange(16, 33)
+                address = rng.randrange(0x0A000000, 0x0A400000)
+                f.write(f'{address >> 24}.{address >> 16 & 255}.{address >> 8 & 255}.{address & 255}/{prefix}\n')
+            else:
+                f.write(f'2001:db8:{rng.randrange(4096):x}:{rng.randrange(65536):x}::/{rng.randrange(48, 65)}\n')
+
+
+def report(label: str, stats) -> None:
+    print(f"{label}")
+    print(f"  entries in:     {stats.entries_in:>12,}")
+    print(f"  entries out:    {stats.entries_out:>12,}  ({stats.reduction:.1%} removed)")
+    print(f"  duplicates:     {stats.duplicates:>12,}")
+    print(f"  covered:        {stats.covered:>12,}")
+    print(f"  optimize time:  {stats.seconds:>12.2f} s "
+          f"({stats.entries_in / stats.seconds:,.0f} entries/s)")
+
+
+def squid_parse_seconds(squid: str, acl_type: str, acl_file: Path, workdir: Path) -> float:
+    conf = workdir / 'squid.conf'
+    conf.write_text(f'acl blocked {acl_type} "{acl_file}"\n'
+                    'http_access deny blocked\nhttp_access allow all\nhttp_port 3128\n')
+    start = time.perf_counter()
+    subprocess.run([squid, '-k', 'parse', '-f', str(conf)],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--entries', type=int, default=2_000_000)
+    parser.add_argument('--networks', type=int, default=1_000_000)
+    parser.add_argument('--squid', default='/usr/sbin/squid')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        source = workdir / 'blocked.acl'
+        generate(source, args.entries)
+
+        networks = workdir / 'networks.txt'
+        generate_networks(networks, args.networks)
+
+        lists = [
+            ('dstdomain', source, optimize_domain_file(source, workdir / 'cache')),
+            ('src', networks, optimize_network_file(networks, workdir / 'cache')),
+        ]
+        for acl_type, path, stats in lists:
+            report(f"{acl_type} list", stats)
+
+        start = time.perf_counter()
+        optimize_domain_file(source, workdir / 'cache')
+        print(f"cached lookup:    {time.perf_counter() - start:>12.3f} s")
+
+        if not Path(args.squid).exists():
+            print(f"squid -k parse:   skipped ({args.squid} not found)")
+            return 0
+        for acl_type, path, stats in lists:
+            original = squid_parse_seconds(args.squid, acl_type, path, workdir)
+            optimized = squid_parse_seconds(args.squid, acl_type, stats.output, workdir)
+            print(f"squid -k parse ({acl_type}): {original:.2f} s original, {optimized:.2f} s optimized "
+                  f"({1 - optimized / original:.1%} faster)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
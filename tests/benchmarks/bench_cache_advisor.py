@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Cache sizing advisor sampling benchmark.
+
+Fills a ufs swap directory tree under a tmpfs directory (/dev/shm by
+default) with N objects of log-normally distributed sizes and compares the
+advisor's bounded, parallel sample against a full walk that stats every
+file (the baseline): time taken, and the error of the estimated object
+count and mean object size. On tmpfs the numbers measure syscall and Python
+overhead; point --root at a real disk to include its latency.
+
+Usage:
+    python3 tests/benchmarks/bench_cache_advisor.py [--objects N] [--sample N] [--l1 N] [--l2 N] [--root DIR]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from cache_advisor import sample_objects
+from squid_config import CacheDir
+
+
+def fixture(root: Path, objects: int, l1: int, l2: int) -> CacheDir:
+    rng = random.Random(1)
+    for i in range(l1):
+        for j in range(l2):
+            (root / f'{i:02X}' / f'{j:02X}').mkdir(parents=True)
+    for n in range(objects):
+        # Squid spreads swap files over the directories by file number
+        path = root / f'{n // l2 // 256 % l1:02X}' / f'{n // 256 % l2:02X}' / f'{n:08X}'
+        with open(path, 'wb') as f:
+            f.truncate(min(int(rng.lognormvariate(9, 1.5)), 16 * 1024 * 1024))
+    return CacheDir('ufs', root, 100000, l1, l2)
+
+
+def full_walk(root: Path):
+    files = total = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            files += 1
+            total += os.stat(os.path.join(directory, name)).st_size
+    return files, total / files
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--objects', type=int, default=200_000)
+    parser.add_argument('--sample', type=int, default=20_000)
+    parser.add_argument('--l1', type=int, default=16)
+    parser.add_argument('--l2', type=int, default=256)
+    parser.add_argument('--root', type=Path, default=Path('/dev/shm'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.root) as tmp:
+        cache_dir = fixture(Path(tmp), args.objects, args.l1, args.l2)
+        print(f"{args.objects:,} objects in {args.l1}x{args.l2} swap directories under {args.root}")
+
+        start = time.perf_counter()
+        files, mean = full_walk(cache_dir.path)
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sample = sample_objects(cache_dir, args.sample)
+        sampled = time.perf_counter() - start
+
+        print(f"{'full walk':<22} {baseline:>8.3f} s  {files:>10,} objects  mean {mean / 1024:>7.1f} KB")
+        print(f"{'sample_objects':<22} {sampled:>8.3f} s  {sample.estimated_objects:>10,} objects  "
+              f"mean {sample.mean_size / 1024:>7.1f} KB  ({len(sample.sizes):,} sampled, "
+              f"{sample.dirs_visited:,}/{sample.dirs_total:,} dirs)")
+        print(f"{'speedup':<22} {baseline / sampled:>8.1f}x")
+        print(f"{'error':<22} {'':>10} {sample.estimated_objects / files - 1:>+10.1%} objects  "
+              f"mean {sample.mean_size / mean - 1:>+7.1%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cache directory initialization benchmark.
+
+Creates the L1/L2 swap directory trees of several ufs cache_dirs under a
+tmpfs directory (/dev/shm by default) with init-squid's native creation,
+once with a single worker thread (the sequential baseline) and once with
+the thread pool. If a Squid binary is available, squid -z is timed on the
+same layout. On tmpfs the numbers measure syscall and Python overhead;
+point --root at directories on real disks to include their latency.
+
+Usage:
+    python3 tests/benchmarks/bench_cache_init.py [--cache-dirs N] [--l1 N] [--l2 N] [--root DIR] [--squid PATH]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import logging
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CONTAINER_DIR = Path(__file__).parent.parent.parent / 'container'
+
+sys.path.insert(0, str(CONTAINER_DIR))
+
+from squid_config import CacheDir
+
+
+def load_module():
+    spec = importlib.util.spec_from_file_location("init_squid", CONTAINER_DIR / 'init-squid.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["init_squid"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def fixture(root: Path, count: int, l1: int, l2: int):
+    cache_dirs = []
+    for i in range(count):
+        path = root / f'disk{i}'
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir()
+        cache_dirs.append(CacheDir('ufs', path, 1000, l1, l2))
+    return cache_dirs
+
+
+def time_native(init_squid, cache_dirs, workers: int) -> float:
+    start = time.perf_counter()
+    asyncio.run(init_squid.create_swap_directories(cache_dirs, workers))
+    return time.perf_counter() - start
+
+
+def time_squid_z(squid: str, root: Path, cache_dirs) -> float:
+    conf = root / 'squid.conf'
+    conf.write_text(''.join(f'cache_dir ufs {c.path} 1000 {c.l1} {c.l2}\n' for c in cache_dirs)
+                    + f'http_port 3128\npid_filename {root}/squid.pid\ncache_log {root}/cache.log\n')
+    start = time.perf_counter()
+    subprocess.run([squid, '-z', '-N', '-f', str(conf)],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cache-dirs', type=int, default=4)
+    parser.add_argument('--l1', type=int, default=64)
+    parser.add_argument('--l2', type=int, default=256)
+    parser.add_argument('--root', type=Path, default=Path('/dev/shm'))
+    parser.add_argument('--squid', default='/usr/sbin/squid')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    init_squid = load_module()
+    directories = args.cache_dirs * args.l1 * (args.l2 + 1)
+    print(f"{args.cache_dirs} cache_dirs x {args.l1}x{args.l2} = {directories:,} directories under {args.root}")
+
+    with tempfile.TemporaryDirectory(dir=args.root) as tmp:
+        root = Path(tmp)
+        results = []
+        for label, workers in (('sequential (1 thread)', 1),
+                               (f'parallel ({init_squid.CACHE_INIT_WORKERS} threads)',
+                                init_squid.CACHE_INIT_WORKERS)):
+            seconds = time_native(init_squid, fixture(root, args.cache_dirs, args.l1, args.l2), workers)
+            results.append(seconds)
+            print(f"{label:<26} {seconds:>8.2f} s  ({directories / seconds:>10,.0f} dirs/s)")
+        print(f"{'speedup':<26} {results[0] / results[1]:>8.2f}x")
+
+        if Path(args.squid).exists():
+            seconds = time_squid_z(args.squid, root, fixture(root, args.cache_dirs, args.l1, args.l2))
+            print(f"{'squid -z':<26} {seconds:>8.2f} s  ({directories / seconds:>10,.0f} dirs/s)")
+        else:
+            print(f"squid -z: skipped ({args.squid} not found)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
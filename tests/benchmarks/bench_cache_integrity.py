@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Cache directory integrity check benchmark.
+
+Writes a synthetic swap.state with N records and a full L1/L2 tree under a
+tmpfs directory (/dev/shm by default) and times verify_cache_dir against a
+per-record struct.iter_unpack replay of the same journal (the baseline).
+The verification has to stay well below Squid's own clean rebuild time to
+be worth running on every start.
+
+Usage:
+    python3 tests/benchmarks/bench_cache_integrity.py [--records N] [--l1 N] [--l2 N] [--root DIR]
+"""
+
+import argparse
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from cache_integrity import RECORD_SIZE, REBUILD_RATES, missing_swap_dirs, verify_cache_dir
+from squid_config import CacheDir
+
+
+def write_swap_state(path: Path, records: int) -> None:
+    record = struct.Struct('=b3xi4qQHH16s4x')
+    with open(path, 'wb') as f:
+        f.write(struct.pack('=b3xii', 3, 2, RECORD_SIZE).ljust(RECORD_SIZE, b'\0'))
+        batch = []
+        for filen in range(records):
+            # One delete per ten adds, like a cache replacing objects
+            op = 2 if filen % 10 == 9 else 1
+            batch.append(record.pack(op, filen, 1700000000, 1700000000, -1, 1700000000,
+                                     4096, 1, 0, filen.to_bytes(16, 'big')))
+            if len(batch) == 65536:
+                f.write(b''.join(batch))
+                batch = []
+        f.write(b''.join(batch))
+
+
+def replay_baseline(path: Path) -> int:
+    """Count live entries by unpacking every record."""
+    live = set()
+    with open(path, 'rb') as f:
+        data = f.read()
+    for op, filen in struct.iter_unpack(f'=b3xi{RECORD_SIZE - 8}x', data[RECORD_SIZE:]):
+        if op == 1:
+            live.add(filen)
+        elif op == 2:
+            live.discard(filen)
+    return len(live)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=2_000_000)
+    parser.add_argument('--l1', type=int, default=16)
+    parser.add_argument('--l2', type=int, default=256)
+    parser.add_argument('--root', type=Path, default=Path('/dev/shm'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.root) as tmp:
+        cache_dir = CacheDir('ufs', Path(tmp), 10000, args.l1, args.l2)
+        for i in range(args.l1):
+            for j in range(args.l2):
+                (cache_dir.path / f'{i:02X}' / f'{j:02X}').mkdir(parents=True)
+        journal = cache_dir.path / 'swap.state'
+        write_swap_state(journal, args.records)
+        (cache_dir.path / 'swap.state.last-clean').touch()
+        size = journal.stat().st_size
+        print(f"swap.state: {args.records:,} records ({size / 2**20:.0f} MiB), "
+              f"{args.l1}x{args.l2} swap directories under {args.root}")
+
+        start = time.perf_counter()
+        missing_swap_dirs(cache_dir)
+        layout = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report = verify_cache_dir(cache_dir)
+        verify = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replay_baseline(journal)
+        baseline = time.perf_counter() - start
+
+        print(f"{'layout check':<26} {layout:>8.3f} s")
+        print(f"{'verify_cache_dir':<26} {verify:>8.3f} s  ({size / verify / 2**20:>8,.0f} MiB/s)")
+        print(f"{'per-record replay':<26} {baseline:>8.3f} s  ({size / baseline / 2**20:>8,.0f} MiB/s)")
+        print(f"{'speedup':<26} {baseline / verify:>8.1f}x")
+        print(f"expected Squid rebuild: {report.expected_seconds:.1f}s from {report.rebuild} "
+              f"(at {REBUILD_RATES[report.rebuild]:,.0f} entries/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
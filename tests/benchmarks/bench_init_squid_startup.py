@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Startup latency benchmark: init-squid as a subprocess vs in-process.
+
+Compares the old entrypoint path (spawn a second Python interpreter running
+init-squid.py) with the in-process path (load init-squid.py once and await
+its async initialize() API).
+
+Usage:
+    python3 tests/benchmarks/bench_init_squid_startup.py [--runs N]
+
+Without /etc/squid/squid.conf the script runs in pure proxy mode, so the
+numbers isolate interpreter start, imports and config handling.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import logging
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+CONTAINER_DIR = Path(__file__).parent.parent.parent / 'container'
+INIT_SQUID = CONTAINER_DIR / 'init-squid.py'
+
+sys.path.insert(0, str(CONTAINER_DIR))
+
+
+def run_subprocess() -> float:
+    """Time one init-squid.py run in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(INIT_SQUID)],
+        env={'PYTHONPATH': str(CONTAINER_DIR)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True
+    )
+    return time.perf_counter() - start
+
+
+def load_module():
+    spec = importlib.util.spec_from_file_location("init_squid", INIT_SQUID)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["init_squid"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_in_process(module) -> float:
+    """Time one in-process initialize() call."""
+    start = time.perf_counter()
+    asyncio.run(module.initialize())
+    return time.perf_counter() - start
+
+
+def report(name: str, samples) -> None:
+    ms = [s * 1000 for s in samples]
+    print(f"{name:<28} median {statistics.median(ms):8.2f} ms   "
+          f"min {min(ms):8.2f} ms   max {max(ms):8.2f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    subprocess_samples = [run_subprocess() for _ in range(args.runs)]
+
+    start = time.perf_counter()
+    module = load_module()
+    load_time = time.perf_counter() - start
+    in_process_samples = [run_in_process(module) for _ in range(args.runs)]
+
+    print(f"init-squid startup latency ({args.runs} runs)")
+    report("subprocess (python3 init)", subprocess_samples)
+    report("in-process (first load)", [load_time + in_process_samples[0]])
+    report("in-process (initialize)", in_process_samples)
+
+    speedup = statistics.median(subprocess_samples) / (load_time + in_process_samples[0])
+    print(f"cold in-process path is {speedup:.1f}x faster than spawning an interpreter")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
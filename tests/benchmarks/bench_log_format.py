@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Log formatter cost benchmark.
+
+Formats the same records with the plain-text and JSON formatters from
+logging_config, and runs them through SourceRateLimiter, reporting the
+cost per record in microseconds. Record creation is excluded, so the
+numbers are what each LOG_FORMAT / LOG_RATE_LIMIT choice adds to every
+log line.
+
+Usage:
+    python3 tests/benchmarks/bench_log_format.py [--records N]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from logging_config import JsonFormatter, SourceRateLimiter, TextFormatter
+
+MESSAGE = 'Squid: 2026/01/01 00:00:00 kid1| 5,3| comm.cc(553) commSetConnTimeout: conn%d timeout 86400'
+
+
+def make_records(count: int):
+    records = []
+    for i in range(count):
+        name = 'squid' if i % 4 else 'root'
+        record = logging.LogRecord(name, logging.INFO, __file__, 0, MESSAGE % i, None, None)
+        record.created = 1700000000 + i / 1000
+        records.append(record)
+    return records
+
+
+def per_record_us(func, records) -> float:
+    start = time.perf_counter()
+    for record in records:
+        func(record)
+    return (time.perf_counter() - start) / len(records) * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=200_000)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    text = TextFormatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    json_formatter = JsonFormatter()
+    # A clock that never advances: after the burst, every record is sampled
+    limiter = SourceRateLimiter(rate=100, burst=200, sample_rate=0.01, clock=lambda: 0.0)
+
+    results = [
+        ('text', per_record_us(text.format, records)),
+        ('json', per_record_us(json_formatter.format, records)),
+        ('rate limit filter', per_record_us(limiter.filter, records)),
+    ]
+
+    print(f"Log formatting ({args.records:,} records)")
+    for name, cost in results:
+        print(f"  {name:<18} {cost:6.2f} us/record   {1e6 / cost:12,.0f} records/s")
+    print(f"  suppressed by rate limit: {sum(limiter.suppressed_total.values()):,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
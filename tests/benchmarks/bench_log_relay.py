@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Squid output relay benchmark.
+
+Spawns a child process that writes a burst of Squid-like debug lines to its
+stdout and relays them to a log handler two ways:
+
+- readline: the former entrypoint.log_stream, one readline(), decode and
+  logging.info() call (a synchronous write) per line in the event loop
+- relay: LogRelay, chunked reads and a bounded queue drained by a writer
+  thread
+
+While the burst is relayed a ticker task sleeps TICK seconds in a loop and
+records how late it wakes up, which is the event-loop latency that signal
+handling and Squid monitoring would see. --sink-delay adds a per-record
+write delay to model a slow stdout consumer (a blocked container log pipe).
+
+Usage:
+    python3 tests/benchmarks/bench_log_relay.py [--lines N] [--sink-delay SECONDS]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from log_relay import QUEUE_SIZE, LogRelay
+from metrics import Registry
+
+TICK = 0.001
+
+WRITER = '''
+import sys
+line = b"2026/01/01 00:00:00.000 kid1| 5,3| comm.cc(553) commSetConnTimeout: conn%d timeout 86400\\n"
+out = sys.stdout.buffer
+for i in range(int(sys.argv[1])):
+    out.write(line % i)
+out.flush()
+'''
+
+
+class SinkHandler(logging.Handler):
+    """Writes records to /dev/null, optionally sleeping to model a slow consumer."""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.records = 0
+        self.stream = open(os.devnull, 'w')
+
+    def emit(self, record):
+        self.stream.write(self.format(record) + '\n')
+        self.records += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+
+async def readline_relay(stream, prefix, logger):
+    """The per-line relay LogRelay replaces."""
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        decoded = line.decode('utf-8').rstrip()
+        if decoded:
+            logger.info(f"{prefix}: {decoded}")
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(mode: str, lines: int, sink: SinkHandler):
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-c', WRITER, str(lines), stdout=asyncio.subprocess.PIPE
+    )
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+
+    relay = None
+    start = time.perf_counter()
+    if mode == 'readline':
+        logger = logging.getLogger('bench-readline')
+        logger.propagate = False
+        logger.handlers = [sink]
+        logger.setLevel(logging.INFO)
+        await readline_relay(process.stdout, 'Squid', logger)
+    else:
+        relay = LogRelay(name='bench-relay', registry=Registry())
+        relay.logger.setLevel(logging.INFO)
+        relay.start(sink)
+        await relay.relay(process.stdout, 'Squid')
+    relayed = time.perf_counter() - start
+
+    stop.set()
+    await tick_task
+    await process.wait()
+    if relay is not None:
+        relay.stop()
+    return relayed, lags, relay.dropped if relay else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=200_000)
+    parser.add_argument('--sink-delay', type=float, default=0.0,
+                        help='Seconds each log write blocks (models a slow consumer)')
+    args = parser.parse_args()
+
+    print(f"Squid output relay ({args.lines:,} lines, sink delay {args.sink_delay * 1e6:.0f} us, "
+          f"queue {QUEUE_SIZE:,} lines)")
+    print(f"  {'mode':<9} {'relay s':>8} {'lines/s':>12} {'lag p50':>9} {'lag p99':>9} "
+          f"{'lag max':>9} {'dropped':>8}")
+    for mode in ('readline', 'relay'):
+        sink = SinkHandler(args.sink_delay)
+        relayed, lags, dropped = asyncio.run(run(mode, args.lines, sink))
+        lags.sort()
+        p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+        print(f"  {mode:<9} {relayed:8.3f} {args.lines / relayed:12,.0f} "
+              f"{statistics.median(lags or [0]) * 1000:7.2f}ms {p99 * 1000:7.2f}ms "
+              f"{max(lags or [0]) * 1000:7.2f}ms {dropped:8,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
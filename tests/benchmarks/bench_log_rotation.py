@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Log rotation benchmark.
+
+Writes a synthetic access.log, rotates it with a stand-in squid binary and
+reports the rotation latency (trigger to Squid writing new files), the
+compression throughput and how far the event loop fell behind while the
+archive was compressed in the worker pool.
+
+Usage:
+    python3 tests/benchmarks/bench_log_rotation.py [--size-mb N] [--compression gzip|zstd|none]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from log_rotation import LogRotator
+from metrics import Registry
+
+RESULTS = ['TCP_MISS/200', 'TCP_HIT/200', 'TCP_MEM_HIT/200', 'TCP_TUNNEL/200', 'TCP_DENIED/403']
+
+
+def generate(path: Path, size: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    lines = [
+        f'{1700000000 + i * 0.01:.3f} {rng.randrange(1, 900):>6} 10.0.{rng.randrange(256)}.{rng.randrange(256)} '
+        f'{rng.choice(RESULTS)} {rng.randrange(200, 90000)} GET http://site{rng.randrange(500)}.example.com/'
+        f'{rng.randrange(10 ** 6)} - HIER_DIRECT/93.184.216.{rng.randrange(256)} text/html\n'
+        for i in range(10000)
+    ]
+    block = ''.join(lines).encode()
+    with open(path, 'wb') as f:
+        for _ in range(size // len(block) + 1):
+            f.write(block)
+
+
+async def max_loop_lag(until: asyncio.Future, interval: float = 0.005) -> float:
+    """Largest delay of a periodic timer while ``until`` is pending."""
+    lag = 0.0
+    while not until.done():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(lag, time.perf_counter() - start - interval)
+    return lag
+
+
+async def run(workdir: Path, size: int, compression: str) -> None:
+    log = workdir / 'access.log'
+    conf = workdir / 'squid.conf'
+    squid = workdir / 'squid'
+    conf.write_text(f'access_log stdio:{log} squid\ncache_log stdio:{workdir}/cache.log\n')
+    squid.write_text(f'#!/bin/sh\nmv {log} {log}.0\n: > {log}\n')
+    squid.chmod(0o755)
+    generate(log, size)
+    size = log.stat().st_size
+
+    registry = Registry()
+    rotator = LogRotator(conf, compression=compression, squid_binary=str(squid), registry=registry)
+    start = time.perf_counter()
+    rotated = await rotator.rotate('size')
+    rotation = time.perf_counter() - start
+
+    idle = asyncio.ensure_future(rotator.wait_idle())
+    lag = await max_loop_lag(idle)
+    total = time.perf_counter() - start
+    rotator.close()
+
+    archive = next(p for p in workdir.iterdir() if p.name.startswith('access.log.'))
+    print(f"log size:            {size / 2 ** 20:>10.1f} MiB")
+    print(f"rotated:             {rotated!s:>10}")
+    print(f"rotation latency:    {rotation * 1000:>10.1f} ms")
+    print(f"compression ({compression}): {total - rotation:>8.2f} s "
+          f"({size / 2 ** 20 / max(total - rotation, 1e-9):,.0f} MiB/s)")
+    print(f"archive size:        {archive.stat().st_size / 2 ** 20:>10.1f} MiB  ({archive.name})")
+    print(f"max event loop lag:  {lag * 1000:>10.1f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--compression', default='gzip')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp), args.size_mb * 2 ** 20, args.compression))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
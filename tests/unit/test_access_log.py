@@ -0,0 +1,181 @@
+"""
+Unit tests for streaming access.log analytics.
+
+Tests the access_log module native-format parsing, domain extraction,
+rolling-window aggregation and metric export.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from access_log import (
+    ACCESS_LOG,
+    AccessLogAnalytics,
+    RollingAccessStats,
+    access_log_path,
+    is_hit,
+    parse_line,
+    url_domain,
+)
+from metrics import Registry
+from squid_config import parse_squid_config
+
+LINE = (b'1700000000.123     45 10.0.0.1 TCP_MISS/200 1234 GET http://Example.com/index.html '
+        b'- HIER_DIRECT/93.184.216.34 text/html')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def log_line(result=b'TCP_MISS/200', size=100, elapsed=10, url=b'http://a.example/'):
+    return b'1700000000.000 %6d 10.0.0.1 %s %d GET %s - HIER_DIRECT/192.0.2.1 text/html' % (
+        elapsed, result, size, url)
+
+
+class TestParsing(unittest.TestCase):
+    """Tests for parse_line and url_domain."""
+
+    def test_parse_native_line(self):
+        record = parse_line(LINE)
+        self.assertEqual(record.timestamp, 1700000000.123)
+        self.assertEqual(record.elapsed_ms, 45)
+        self.assertEqual(record.result_code, b'TCP_MISS')
+        self.assertEqual(record.status, b'200')
+        self.assertEqual(record.size, 1234)
+        self.assertEqual(record.method, b'GET')
+        self.assertEqual(record.url, b'http://Example.com/index.html')
+
+    def test_parse_rejects_other_formats(self):
+        self.assertIsNone(parse_line(b'10.0.0.1 - - [14/Nov/2023:22:00:00 +0000] "GET / HTTP/1.1" 200'))
+        self.assertIsNone(parse_line(b'short line'))
+        self.assertIsNone(parse_line(b''))
+
+    def test_url_domain(self):
+        self.assertEqual(url_domain(b'http://Example.com/index.html'), b'example.com')
+        self.assertEqual(url_domain(b'https://user:pw@host.test:8443/x?y'), b'host.test')
+        self.assertEqual(url_domain(b'example.org:443'), b'example.org')
+        self.assertEqual(url_domain(b'http://[2001:db8::1]:8080/'), b'[2001:db8::1]')
+        self.assertEqual(url_domain(b'cache_object://localhost/info'), b'localhost')
+
+    def test_is_hit(self):
+        for code in ('TCP_HIT', 'TCP_MEM_HIT', 'TCP_IMS_HIT', 'TCP_REFRESH_UNMODIFIED'):
+            self.assertTrue(is_hit(code), code)
+        for code in ('TCP_MISS', 'TCP_TUNNEL', 'TCP_DENIED', 'TCP_REFRESH_MODIFIED'):
+            self.assertFalse(is_hit(code), code)
+
+
+class TestRollingAccessStats(unittest.TestCase):
+    """Tests for RollingAccessStats aggregation."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.stats = RollingAccessStats(window=60, bucket_seconds=5, clock=self.clock)
+
+    def test_aggregates(self):
+        self.stats.add_lines([
+            log_line(b'TCP_MISS/200', 1000, 100, b'http://big.example/'),
+            log_line(b'TCP_HIT/200', 500, 1, b'http://small.example/'),
+            log_line(b'TCP_MEM_HIT/200', 500, 1, b'http://small.example/'),
+            log_line(b'TCP_DENIED/403', 0, 0, b'blocked.example:443'),
+            b'garbage',
+            b'',
+        ])
+        self.clock.now += 10
+        snapshot = self.stats.snapshot()
+
+        self.assertEqual(snapshot['requests'], 4)
+        self.assertEqual(snapshot['requests_per_second'], 0.4)
+        self.assertEqual(snapshot['hit_ratio'], 0.5)
+        self.assertEqual(snapshot['results'], {'TCP_MISS': 1, 'TCP_HIT': 1, 'TCP_MEM_HIT': 1, 'TCP_DENIED': 1})
+        self.assertEqual(snapshot['statuses'], {'200': 3, '403': 1})
+        self.assertEqual(snapshot['top_domains'][0], {'domain': 'big.example', 'bytes': 1000})
+        self.assertEqual(snapshot['top_domains'][1], {'domain': 'small.example', 'bytes': 1000})
+        self.assertEqual(snapshot['lines_total'], 5)
+        self.assertEqual(snapshot['parse_errors_total'], 1)
+
+    def test_latency_quantiles(self):
+        self.stats.add_lines([log_line(elapsed=ms) for ms in range(1, 1001)])
+        latency = self.stats.snapshot()['latency_seconds']
+        self.assertAlmostEqual(latency['0.5'], 0.5, delta=0.01)
+        self.assertAlmostEqual(latency['0.99'], 0.99, delta=0.02)
+
+    def test_window_expiry(self):
+        """Test that buckets older than the window no longer count."""
+        self.stats.add_lines([log_line()] * 10)
+        self.clock.now += 30
+        self.stats.add_lines([log_line()] * 5)
+        self.assertEqual(self.stats.snapshot()['requests'], 15)
+
+        self.clock.now += 45
+        snapshot = self.stats.snapshot()
+        self.assertEqual(snapshot['requests'], 5)
+        self.assertEqual(snapshot['lines_total'], 15)
+
+        self.clock.now += 120
+        self.stats.add_lines([])
+        self.assertEqual(self.stats.snapshot()['requests'], 0)
+        self.assertIsNone(self.stats.snapshot()['hit_ratio'])
+
+    def test_bucket_count_bounded(self):
+        """Test that memory stays bounded over a long run."""
+        for _ in range(1000):
+            self.stats.add_lines([log_line()])
+            self.clock.now += 1
+        self.assertLessEqual(len(self.stats._buckets), 13)
+
+
+class TestAccessLogPath(unittest.TestCase):
+    """Tests for choosing the access_log to follow."""
+
+    def config(self, content):
+        with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as f:
+            f.write(content)
+        self.addCleanup(Path(f.name).unlink)
+        return parse_squid_config(Path(f.name))
+
+    def test_default_config(self):
+        config = self.config('access_log stdio:/var/log/squid/access.log squid\n')
+        self.assertEqual(access_log_path(config), Path('/var/log/squid/access.log'))
+
+    def test_implicit_default(self):
+        self.assertEqual(access_log_path(self.config('http_port 3128\n')), ACCESS_LOG)
+
+    def test_other_format_or_module(self):
+        config = self.config('access_log stdio:/var/log/squid/combined.log combined\n'
+                             'access_log syslog:daemon.info squid\n')
+        self.assertIsNone(access_log_path(config))
+
+    def test_disabled(self):
+        self.assertIsNone(access_log_path(self.config('access_log none\n')))
+
+
+class TestAccessLogAnalytics(unittest.TestCase):
+    """Tests for metric export."""
+
+    def test_metrics(self):
+        registry = Registry()
+        analytics = AccessLogAnalytics(Path('/nonexistent/access.log'), registry=registry)
+        analytics.stats.add_lines([log_line(b'TCP_HIT/200', 2048, 5, b'http://a.example/')])
+        body = registry.render().decode()
+
+        self.assertIn('squid_access_hit_ratio 1\n', body)
+        self.assertIn('squid_access_results{result_code="TCP_HIT"} 1\n', body)
+        self.assertIn('squid_access_responses{status="200"} 1\n', body)
+        self.assertIn('squid_access_top_domain_bytes{domain="a.example"} 2048\n', body)
+        self.assertIn('squid_access_latency_seconds{quantile="0.99"}', body)
+        self.assertIn('squid_access_log_lines_total 1\n', body)
+        self.assertEqual(analytics.snapshot()['rotations'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+"""
+Unit tests for forwarding the access log through a named pipe.
+
+Tests FIFO setup, batched forwarding across a writer reopening the pipe,
+JSON reformatting, the analytics hook and overflow accounting when the
+output cannot keep up.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from access_log_pipe import AccessLogForwarder, JsonLines, pipe_configured
+from metrics import Registry
+from squid_config import clear_config_cache, load_squid_config
+
+
+LINE = (b'1700000000.123     45 10.0.0.1 TCP_MISS/200 1234 GET http://example.com/ - '
+        b'HIER_DIRECT/93.184.216.34 text/html\n')
+
+
+class PipeTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        self.pipe = self.root / 'access.pipe'
+        self.output = self.root / 'stdout'
+        self.out_fd = os.open(self.output, os.O_WRONLY | os.O_CREAT)
+        self.addCleanup(os.close, self.out_fd)
+        self.registry = Registry()
+
+    def forwarder(self, **kwargs):
+        kwargs.setdefault('lock', threading.Lock())
+        return AccessLogForwarder(self.pipe, output=self.out_fd, flush_interval=0.01,
+                                  registry=self.registry, **kwargs)
+
+    def squid_write(self, *chunks):
+        """Open the FIFO like Squid does, write and close it."""
+        fd = os.open(self.pipe, os.O_WRONLY)
+        try:
+            for chunk in chunks:
+                os.write(fd, chunk)
+        finally:
+            os.close(fd)
+
+    def forward(self, forwarder, *writes):
+        async def run():
+            forwarder.start()
+            for chunks in writes:
+                self.squid_write(*chunks)
+                await asyncio.sleep(0.02)
+            forwarder.stop()
+        asyncio.run(run())
+        return self.output.read_bytes()
+
+
+class TestForwarder(PipeTestCase):
+    """Tests for AccessLogForwarder."""
+
+    def test_forwards_across_reopen(self):
+        """Test that Squid closing and reopening the pipe loses nothing."""
+        forwarder = self.forwarder()
+        output = self.forward(forwarder, [LINE * 10, LINE[:20]], [LINE[20:], LINE * 5])
+
+        self.assertEqual(output, LINE * 16)
+        self.assertEqual(forwarder.lines, 16)
+        self.assertLess(forwarder.writes, 16)
+        self.assertEqual(forwarder.dropped, 0)
+        self.assertTrue(self.pipe.is_fifo())
+
+        body = self.registry.render().decode()
+        self.assertIn('squid_access_log_forwarded_lines_total 16\n', body)
+        self.assertIn(f'squid_access_log_forwarded_bytes_total {len(LINE) * 16}\n', body)
+
+    def test_restart(self):
+        """Test that the forwarder can be started again after stop()."""
+        forwarder = self.forwarder()
+        self.forward(forwarder, [LINE])
+        self.assertEqual(self.forward(forwarder, [LINE * 2]), LINE * 3)
+
+    def test_analytics_hook(self):
+        forwarder = self.forwarder()
+        seen = []
+        forwarder.on_lines = seen.extend
+        self.forward(forwarder, [LINE * 3])
+        self.assertEqual(seen, [LINE.rstrip(b'\n')] * 3)
+
+    def test_overflow_drops_lines(self):
+        """Test that lines are dropped and counted while the output is blocked."""
+        lock = threading.Lock()
+        forwarder = self.forwarder(lock=lock, buffer_bytes=len(LINE) * 4)
+
+        async def run():
+            forwarder.start()
+            with lock:
+                for _ in range(3):
+                    self.squid_write(LINE * 3)
+                    await asyncio.sleep(0.05)
+            forwarder.stop()
+
+        with self.assertLogs(level='WARNING') as logs:
+            asyncio.run(run())
+        # The first batch is held by the blocked writer, the second is
+        # buffered and only one line of the third still fits
+        self.assertEqual((forwarder.lines, forwarder.dropped), (7, 2))
+        self.assertEqual(self.output.read_bytes(), LINE * 7)
+        self.assertIn('dropped', logs.output[0])
+        self.assertIn(f'squid_access_log_forward_dropped_lines_total {forwarder.dropped}\n',
+                      self.registry.render().decode())
+
+    def test_lock_released_between_chunks(self):
+        """Test that large batches are written in line-aligned chunks under the lock."""
+        offsets = []
+
+        class RecordingLock:
+            def __enter__(lock):
+                offsets.append(os.lseek(self.out_fd, 0, os.SEEK_CUR))
+
+            def __exit__(lock, *exc):
+                return False
+
+        forwarder = self.forwarder(lock=RecordingLock())
+        data = LINE * 2000
+        self.assertEqual(forwarder._write(data), len(data))
+        self.assertEqual(self.output.read_bytes(), data)
+        self.assertGreater(len(offsets), 1)
+        for offset in offsets[1:]:
+            self.assertEqual(offset % len(LINE), 0)
+
+    def test_json(self):
+        forwarder = self.forwarder(log_format='json')
+        output = self.forward(forwarder, [LINE + b'garbage\n'])
+        entries = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual(entries[0]['ts'], '2023-11-14T22:13:20.123Z')
+        self.assertEqual((entries[0]['status'], entries[0]['bytes'], entries[0]['peer']),
+                         (200, 1234, '93.184.216.34'))
+        self.assertIsNone(entries[0]['user'])
+        self.assertEqual(entries[1], {'source': 'squid-access', 'msg': 'garbage'})
+
+    def test_not_a_fifo(self):
+        self.pipe.write_text('')
+        with self.assertRaises(ValueError):
+            self.forwarder().open()
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.forwarder(log_format='xml')
+
+
+class TestHelpers(unittest.TestCase):
+    """Tests for pipe_configured and JsonLines."""
+
+    def test_pipe_configured(self):
+        clear_config_cache()
+        with tempfile.TemporaryDirectory() as tmp:
+            conf = Path(tmp) / 'squid.conf'
+            conf.write_text('access_log stdio:/var/run/squid/access.pipe squid\n')
+            self.assertTrue(pipe_configured(load_squid_config(conf), Path('/var/run/squid/access.pipe')))
+            clear_config_cache()
+            conf.write_text('access_log stdio:/var/log/squid/access.log squid\n')
+            self.assertFalse(pipe_configured(load_squid_config(conf), Path('/var/run/squid/access.pipe')))
+
+    def test_json_content_type(self):
+        entry = json.loads(JsonLines().line(LINE.replace(b'text/html', b'-').rstrip()))
+        self.assertIsNone(entry['content_type'])
+
+
+if __name__ == '__main__':
+    unittest.main()
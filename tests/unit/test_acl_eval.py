@@ -0,0 +1,194 @@
+"""
+Unit tests for offline http_access evaluation.
+
+Tests access.log field extraction, the acl matchers, rule order and the
+implicit default, batch size independence and the findings for
+unreachable, slow and misordered rules.
+"""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from acl_eval import AccessEvaluator, format_report, parse_request, url_path, url_port
+from squid_config import clear_config_cache, load_squid_config
+
+
+def log_line(url, client='10.0.0.1', method='GET', server='93.184.216.34', timestamp=1700000000.0):
+    return (f'{timestamp:.3f}     45 {client} TCP_MISS/200 1234 {method} {url} - '
+            f'HIER_DIRECT/{server} text/html\n').encode()
+
+
+class EvalTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        clear_config_cache()
+
+    def evaluator(self, config_text):
+        conf = self.root / 'squid.conf'
+        conf.write_text(config_text)
+        return AccessEvaluator(load_squid_config(conf))
+
+    def decide(self, evaluator, *lines):
+        return evaluator.evaluate([parse_request(line) for line in lines])
+
+
+class TestRequestFields(unittest.TestCase):
+    """Tests for parse_request, url_port and url_path."""
+
+    def test_parse_request(self):
+        request = parse_request(log_line('http://example.com/a'))
+        self.assertEqual((request.client, request.method, request.server),
+                         (b'10.0.0.1', b'GET', b'93.184.216.34'))
+        self.assertIsNone(parse_request(b'not an access log line\n'))
+
+    def test_url_port(self):
+        self.assertEqual(url_port(b'http://example.com/'), 80)
+        self.assertEqual(url_port(b'https://example.com:8443/x'), 8443)
+        self.assertEqual(url_port(b'example.com:443'), 443)
+        self.assertEqual(url_port(b'[2001:db8::1]:563'), 563)
+
+    def test_url_path(self):
+        self.assertEqual(url_path(b'http://example.com/a/b?c=d'), b'/a/b?c=d')
+        self.assertEqual(url_path(b'example.com:443'), b'')
+
+
+class TestMatchers(EvalTestCase):
+    """Tests for the acl types."""
+
+    def test_src_dst(self):
+        evaluator = self.evaluator('acl office src 10.0.0.0/8 2001:db8::/32\n'
+                                   'acl internal dst 192.168.0.0/16\n'
+                                   'http_access deny internal\nhttp_access allow office\n')
+        decisions = self.decide(evaluator,
+                                log_line('http://a/', client='10.1.2.3'),
+                                log_line('http://a/', client='2001:db8::5'),
+                                log_line('http://a/', client='172.16.0.1'),
+                                log_line('http://a/', server='192.168.1.1'))
+        self.assertEqual(decisions, ['allow', 'allow', 'deny', 'deny'])
+
+    def test_dstdomain_from_file(self):
+        blocked = self.root / 'blocked.acl'
+        blocked.write_text('.example.com\nexact.org\n')
+        evaluator = self.evaluator(f'acl blocked dstdomain "{blocked}"\n'
+                                   'http_access deny blocked\nhttp_access allow all\n')
+        decisions = self.decide(evaluator,
+                                log_line('http://example.com/'),
+                                log_line('http://ads.Example.com/'),
+                                log_line('http://exact.org/'),
+                                log_line('http://www.exact.org/'),
+                                log_line('http://notexample.com/'))
+        self.assertEqual(decisions, ['deny', 'deny', 'deny', 'allow', 'allow'])
+
+    def test_port_method(self):
+        evaluator = self.evaluator('acl SSL_ports port 443\nacl Safe_ports port 80 443 1025-65535\n'
+                                   'acl CONNECT method CONNECT\n'
+                                   'http_access deny !Safe_ports\nhttp_access deny CONNECT !SSL_ports\n'
+                                   'http_access allow all\n')
+        decisions = self.decide(evaluator,
+                                log_line('example.com:443', method='CONNECT'),
+                                log_line('example.com:8443', method='CONNECT'),
+                                log_line('http://example.com:25/'),
+                                log_line('http://example.com:8080/'))
+        self.assertEqual(decisions, ['allow', 'deny', 'deny', 'allow'])
+
+    def test_time(self):
+        monday_noon = time.mktime((2024, 1, 1, 12, 0, 0, 0, 0, -1))
+        evaluator = self.evaluator('acl work time MTWHF 09:00-17:00\n'
+                                   'http_access allow work\nhttp_access deny all\n')
+        decisions = self.decide(evaluator,
+                                log_line('http://a/', timestamp=monday_noon),
+                                log_line('http://a/', timestamp=monday_noon + 6 * 3600),
+                                log_line('http://a/', timestamp=monday_noon + 5 * 86400))
+        self.assertEqual(decisions, ['allow', 'deny', 'deny'])
+
+    def test_regex(self):
+        evaluator = self.evaluator('acl exe urlpath_regex -i \\.exe$\nacl ads dstdom_regex ^ads\\.\n'
+                                   'http_access deny exe\nhttp_access deny ads\nhttp_access allow all\n')
+        decisions = self.decide(evaluator,
+                                log_line('http://a.com/setup.EXE'),
+                                log_line('http://ads.a.com/'),
+                                log_line('http://a.com/ads.html'))
+        self.assertEqual(decisions, ['deny', 'deny', 'allow'])
+
+
+class TestRules(EvalTestCase):
+    """Tests for rule order, statistics and the implicit default."""
+
+    def test_implicit_default(self):
+        """Test that the opposite of the last rule applies when none matches."""
+        evaluator = self.evaluator('acl blocked dstdomain .example.com\nhttp_access deny blocked\n')
+        self.assertEqual(self.decide(evaluator, log_line('http://other.org/')), ['allow'])
+        self.assertEqual(evaluator.implicit, 1)
+
+        evaluator = self.evaluator('')
+        self.assertEqual(self.decide(evaluator, log_line('http://other.org/')), ['deny'])
+
+    def test_lazy_acl_checks(self):
+        """Test that acls after a non-matching one are not counted as checked."""
+        evaluator = self.evaluator('acl CONNECT method CONNECT\nacl SSL_ports port 443\n'
+                                   'http_access deny CONNECT !SSL_ports\nhttp_access allow all\n')
+        self.decide(evaluator, log_line('http://a/'), log_line('http://b/'),
+                    log_line('a:8443', method='CONNECT'))
+        rule = evaluator.rules[0]
+        self.assertEqual((rule.reached, rule.evaluations, rule.hits), (3, 4, 1))
+
+    def test_batch_size_independent(self):
+        lines = [log_line(f'http://h{i % 7}.example.com/', client=f'10.0.0.{i % 5}')
+                 for i in range(200)]
+        config = ('acl a dstdomain .h1.example.com h2.example.com\nacl b src 10.0.0.0/31\n'
+                  'http_access deny a\nhttp_access allow b\nhttp_access deny all\n')
+        results = []
+        for batch_size in (1, 16, 4096):
+            evaluator = self.evaluator(config)
+            evaluator.replay(lines, batch_size)
+            results.append((evaluator.allowed, [(r.reached, r.hits, r.evaluations) for r in evaluator.rules]))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+
+
+class TestFindings(EvalTestCase):
+    """Tests for AccessEvaluator.findings."""
+
+    def test_regex_before_cheap_domain_deny(self):
+        evaluator = self.evaluator('acl ads url_regex -i /ads/ /banner/ /track\n'
+                                   'acl blocked dstdomain .blocked.com\n'
+                                   'http_access deny ads\nhttp_access deny blocked\n'
+                                   'http_access allow all\n')
+        lines = [log_line(f'http://www.blocked.com/{i}') for i in range(90)]
+        lines += [log_line(f'http://ok.com/ads/{i}') for i in range(2)]
+        lines += [log_line(f'http://ok.com/{i}') for i in range(8)]
+        evaluator.replay(lines)
+
+        findings = '\n'.join(evaluator.findings())
+        self.assertIn('rule 1 (squid.conf:3) is slow', findings)
+        self.assertIn('moving it before rule 1 does not change any decision', findings)
+
+    def test_unreachable_and_undefined(self):
+        evaluator = self.evaluator('acl ident ident alice\nhttp_access allow all\n'
+                                   'http_access deny missing\nhttp_access allow ident\n')
+        evaluator.replay([log_line('http://a/')])
+
+        findings = evaluator.findings()
+        self.assertIn('acl missing is not defined (treated as not matching)', findings)
+        self.assertIn('acl ident: type ident is not supported (treated as not matching)', findings)
+        self.assertIn('rule 2 (squid.conf:3) is never reached: earlier rules decide every request',
+                      findings)
+
+    def test_report(self):
+        evaluator = self.evaluator('http_access allow all\n')
+        evaluator.replay([log_line('http://a/'), b'garbage\n'])
+        report = format_report(evaluator)
+        self.assertIn('1 allowed, 0 denied', report)
+        self.assertIn('Skipped 1 lines', report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+"""
+Unit tests for the dstdomain ACL optimizer.
+
+Tests entry normalization, wildcard coverage and deduplication, the content
+hash cache and the runtime configuration pointing at optimized lists.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+import ipaddress
+import random
+
+from acl_optimizer import (
+    merge_ranges,
+    minimize,
+    normalize_domain,
+    optimize_config,
+    optimize_domain_file,
+    optimize_network_file,
+    parse_network,
+    range_to_cidrs,
+    sort_key,
+)
+from squid_config import clear_config_cache, load_squid_config
+
+
+def minimal(entries):
+    keys = sorted(sort_key(normalize_domain(entry)) for entry in entries)
+    return minimize(keys)
+
+
+class TestNormalizeDomain(unittest.TestCase):
+    """Tests for normalize_domain."""
+
+    def test_case_and_trailing_dot(self):
+        self.assertEqual(normalize_domain('.Example.COM.'), '.example.com')
+        self.assertEqual(normalize_domain('www.example.com'), 'www.example.com')
+
+    def test_idna(self):
+        self.assertEqual(normalize_domain('.Bücher.de'), '.xn--bcher-kva.de')
+
+    def test_invalid(self):
+        for entry in ('.', 'foo..bar', 'http://example.com/', '-' * 70 + '.ü'):
+            self.assertIsNone(normalize_domain(entry), entry)
+
+
+class TestMinimize(unittest.TestCase):
+    """Tests for minimize."""
+
+    def test_wildcard_covers_subdomains_and_itself(self):
+        kept, duplicates, covered = minimal(
+            ['ads.example.com', 'example.com', '.example.com', 'a.b.example.com', '.cdn.example.com'])
+        self.assertEqual((kept, duplicates, covered), (['.example.com'], 0, 4))
+
+    def test_siblings_not_covered(self):
+        kept, _, covered = minimal(['.example.com', 'example-cdn.com', 'x.examplez.com', 'com'])
+        self.assertEqual(covered, 0)
+        self.assertEqual(sorted(kept), ['.example.com', 'com', 'example-cdn.com', 'x.examplez.com'])
+
+    def test_exact_name_does_not_cover(self):
+        kept, _, covered = minimal(['example.com', 'www.example.com'])
+        self.assertEqual(covered, 0)
+        self.assertEqual(len(kept), 2)
+
+    def test_duplicates(self):
+        kept, duplicates, _ = minimal(['example.com', 'EXAMPLE.com.', 'example.com'])
+        self.assertEqual((kept, duplicates), (['example.com'], 2))
+
+
+class TestParseNetwork(unittest.TestCase):
+    """Tests for parse_network."""
+
+    def test_forms(self):
+        self.assertEqual(parse_network('10.0.0.1'), (0, 0x0A000001, 0x0A000001))
+        self.assertEqual(parse_network('10.1.2.3/8'), (0, 0x0A000000, 0x0AFFFFFF))
+        self.assertEqual(parse_network('10.0.0.0/255.255.0.0'), (0, 0x0A000000, 0x0A00FFFF))
+        self.assertEqual(parse_network('10.0.0.1-10.0.0.9'), (0, 0x0A000001, 0x0A000009))
+        self.assertEqual(parse_network('fe80::/10')[:2], (1, 0xFE80 << 112))
+
+    def test_not_addresses(self):
+        for entry in ('all', 'www.example.com', '10.0.0.0/33', '10.0.0.0/255.0.255.0',
+                      '10.0.0.9-10.0.0.1', '10.0.0.1-::1'):
+            self.assertIsNone(parse_network(entry), entry)
+
+
+class TestMergeRanges(unittest.TestCase):
+    """Tests for merge_ranges and range_to_cidrs."""
+
+    def test_overlap_adjacent_nested(self):
+        merged, duplicates, covered = merge_ranges([(0, 9), (0, 9), (2, 3), (5, 12), (13, 20), (22, 30)])
+        self.assertEqual(merged, [(0, 20), (22, 30)])
+        self.assertEqual((duplicates, covered), (1, 3))
+
+    def test_range_to_cidrs(self):
+        self.assertEqual(list(range_to_cidrs(0, 2 ** 32 - 1, 32)), [(0, 0)])
+        self.assertEqual(list(range_to_cidrs(1, 6, 32)), [(1, 32), (2, 31), (4, 31), (6, 32)])
+
+    def test_matches_ipaddress_collapse(self):
+        rng = random.Random(7)
+        networks = [ipaddress.ip_network(f'10.{rng.randrange(4)}.{rng.randrange(256)}.0/{rng.randrange(18, 25)}',
+                                         strict=False) for _ in range(2000)]
+        ranges = sorted((int(n.network_address), int(n.broadcast_address)) for n in networks)
+        merged, _, _ = merge_ranges(ranges)
+        cidrs = [ipaddress.ip_network((address, prefix))
+                 for first, last in merged for address, prefix in range_to_cidrs(first, last, 32)]
+        self.assertEqual(cidrs, list(ipaddress.collapse_addresses(networks)))
+
+
+class OptimizerTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        self.cache = self.root / 'cache'
+        clear_config_cache()
+
+
+class TestOptimizeDomainFile(OptimizerTestCase):
+    """Tests for optimize_domain_file."""
+
+    def test_optimize_and_cache(self):
+        source = self.root / 'blocked.acl'
+        source.write_text('# blocked\n.example.com\nads.example.com  # tracker\n'
+                          'example.org\nexample.org\nbad..entry\n\n')
+
+        stats = optimize_domain_file(source, self.cache)
+        self.assertFalse(stats.cached)
+        self.assertEqual((stats.entries_in, stats.entries_out), (5, 2))
+        self.assertEqual((stats.duplicates, stats.covered, stats.invalid), (1, 1, 1))
+        lines = stats.output.read_text().splitlines()
+        self.assertEqual(lines[1:], ['.example.com', 'example.org'])
+
+        again = optimize_domain_file(source, self.cache)
+        self.assertTrue(again.cached)
+        self.assertEqual(again.output, stats.output)
+
+        source.write_text('.example.net\n')
+        self.assertNotEqual(optimize_domain_file(source, self.cache).output, stats.output)
+
+
+class TestOptimizeNetworkFile(OptimizerTestCase):
+    """Tests for optimize_network_file."""
+
+    def test_collapse(self):
+        source = self.root / 'localnet.txt'
+        source.write_text('10.0.0.0/9\n10.128.0.0/9\n10.1.2.0/24\n192.168.0.1\n192.168.0.1\n'
+                          'fc00::/8\nfd00::/8\nfe80::1\nproxy.internal\n')
+
+        stats = optimize_network_file(source, self.cache)
+        lines = stats.output.read_text().splitlines()[1:]
+        self.assertEqual(lines, ['proxy.internal', '10.0.0.0/8', '192.168.0.1', 'fc00::/7', 'fe80::1'])
+        self.assertEqual((stats.entries_in, stats.entries_out), (9, 5))
+        self.assertEqual((stats.duplicates, stats.covered, stats.unchanged), (1, 3, 1))
+        self.assertTrue(optimize_network_file(source, self.cache).cached)
+
+
+class TestOptimizeConfig(OptimizerTestCase):
+    """Tests for optimize_config."""
+
+    def test_runtime_config(self):
+        (self.root / 'conf.d').mkdir()
+        blocked = self.root / 'conf.d' / 'blocked.acl'
+        blocked.write_text('.example.com\nwww.example.com\n')
+        allowed = self.root / 'allowed.txt'
+        allowed.write_text('10.0.0.0/8\n')
+        (self.root / 'conf.d' / 'acls.conf').write_text(
+            'acl blocked dstdomain "blocked.acl" .example.org\n'
+            f'acl allowed src "{allowed}"\n')
+        conf = self.root / 'squid.conf'
+        conf.write_text(f'http_port 3128\ninclude {self.root}/conf.d/*.conf\n'
+                        'http_access deny blocked\n')
+
+        output = self.root / 'run' / 'squid.runtime.conf'
+        path, results = optimize_config(load_squid_config(conf), self.cache, output)
+
+        self.assertEqual(path, output)
+        self.assertEqual([stats.source for stats in results], [blocked, allowed])
+        runtime = load_squid_config(output)
+        self.assertEqual([d.name for d in runtime.directives], ['http_port', 'acl', 'acl', 'http_access'])
+        self.assertEqual(runtime.acls[0].files, [results[0].output])
+        self.assertEqual(runtime.acls[0].values, ['.example.org'])
+        self.assertEqual(runtime.acls[1].files, [results[1].output])
+
+    def test_same_file_for_src_and_dst(self):
+        networks = self.root / 'networks.txt'
+        networks.write_text('10.0.0.0/9\n10.128.0.0/9\n')
+        conf = self.root / 'squid.conf'
+        conf.write_text(f'acl a src "{networks}"\nacl b dst "{networks}"\n')
+
+        path, results = optimize_config(load_squid_config(conf), self.cache, self.root / 'rt.conf')
+        self.assertEqual(len(results), 1)
+        runtime = load_squid_config(path)
+        self.assertEqual(runtime.acls[0].files, runtime.acls[1].files)
+
+    def test_unreadable_list_left_alone(self):
+        conf = self.root / 'squid.conf'
+        conf.write_text(f'acl blocked dstdomain "{self.root}/missing.acl"\n')
+        output = self.root / 'squid.runtime.conf'
+
+        path, results = optimize_config(load_squid_config(conf), self.cache, output)
+        self.assertEqual(results, [])
+        self.assertIn(f'"{self.root}/missing.acl"', path.read_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
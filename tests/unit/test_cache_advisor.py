@@ -0,0 +1,218 @@
+"""
+Unit tests for the cache volume sizing advisor.
+
+Tests bounded object sampling, size parsing, the space-, inode- and
+object-count-bound recommendations, cache_dirs sharing a filesystem, the
+memory check and rewriting cache_dir lines.
+"""
+
+import errno
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+import cache_advisor
+from cache_advisor import (MB, FilesystemUsage, advise, apply_recommendations, cache_mem_mb,
+                           format_report, parse_size, sample_objects, swap_fanout)
+from squid_config import CacheDir, clear_config_cache, load_squid_config
+
+
+GB = 1024 * MB
+
+
+def filesystem(free_gb=100, total_gb=200, inodes_free=10_000_000, inodes_total=20_000_000, device=1):
+    return FilesystemUsage(device=device, total_bytes=total_gb * GB, free_bytes=free_gb * GB,
+                           block_size=4096, inodes_total=inodes_total, inodes_free=inodes_free)
+
+
+class AdvisorTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        clear_config_cache()
+
+    def cache_dir(self, name='cache', store_type='ufs', size_mb=1000, l1=2, l2=4, files=0, size=8192):
+        path = self.root / name
+        path.mkdir()
+        if store_type in cache_advisor.UFS_STORE_TYPES:
+            for i in range(l1):
+                for j in range(l2):
+                    (path / f'{i:02X}' / f'{j:02X}').mkdir(parents=True)
+        for n in range(files):
+            (path / f'{n % l1:02X}' / f'{n // l1 % l2:02X}' / f'{n:08X}').write_bytes(b'x' * size)
+        return CacheDir(store_type, path, size_mb, l1, l2)
+
+    def advise(self, cache_dirs, fs, **kwargs):
+        with patch.object(FilesystemUsage, 'from_path', return_value=fs):
+            return advise(cache_dirs, **kwargs)
+
+
+class TestSampling(AdvisorTestCase):
+    """Tests for sample_objects and the helpers."""
+
+    def test_sample_sizes_and_estimate(self):
+        cache_dir = self.cache_dir(files=64, size=10000)
+        sample = sample_objects(cache_dir, limit=1000)
+        self.assertEqual(len(sample.sizes), 64)
+        self.assertEqual(sample.estimated_objects, 64)
+        self.assertEqual(sample.mean_size, 10000)
+        self.assertGreaterEqual(sample.mean_disk_size, 10000)
+
+    def test_sample_is_bounded(self):
+        cache_dir = self.cache_dir(files=64)
+        sample = sample_objects(cache_dir, limit=16, workers=2)
+        self.assertLess(len(sample.sizes), 64)
+        self.assertLess(sample.dirs_visited, sample.dirs_total)
+        # Every directory holds 8 files, so the estimate stays exact
+        self.assertEqual(sample.estimated_objects, 64)
+
+    def test_directories_visited_are_capped(self):
+        """Test that a limit larger than the tree can hold still stops after max_dirs."""
+        cache_dir = self.cache_dir(l1=4, l2=16, files=128)
+        sample = sample_objects(cache_dir, limit=1000, workers=3, max_dirs=8)
+        self.assertEqual((sample.dirs_visited, sample.dirs_total), (8, 64))
+        self.assertEqual(len(sample.sizes), 16)
+        self.assertEqual(sample.estimated_objects, 128)
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size(['64', 'MB']), 64 * MB)
+        self.assertEqual(parse_size(['2', 'GB']), 2 * GB)
+        self.assertEqual(parse_size(['512', 'KB']), 512 * 1024)
+        self.assertEqual(parse_size(['100']), 100 * MB)
+        self.assertIsNone(parse_size(['lots']))
+
+    def test_cache_mem(self):
+        conf = self.root / 'squid.conf'
+        conf.write_text('cache_mem 64 MB\ncache_mem 1 GB\n')
+        self.assertEqual(cache_mem_mb(load_squid_config(conf)), 1024)
+        clear_config_cache()
+        conf.write_text('http_port 3128\n')
+        self.assertEqual(cache_mem_mb(load_squid_config(conf)), cache_advisor.DEFAULT_CACHE_MEM_MB)
+
+    def test_swap_fanout(self):
+        self.assertEqual(swap_fanout(1000), (16, 256))
+        self.assertEqual(swap_fanout(8_000_000), (123, 256))
+        self.assertEqual(swap_fanout(100_000_000), (256, 256))
+
+
+class TestAdvise(AdvisorTestCase):
+    """Tests for advise."""
+
+    def test_space_bound(self):
+        cache_dir = self.cache_dir(size_mb=500_000)
+        report = self.advise([cache_dir], filesystem(free_gb=50), sample_files=0)
+        recommendation = report.recommendations[0]
+        self.assertEqual(recommendation.limited_by, 'space')
+        # 50 GB free minus 5 GB headroom; 13 KB objects use 16 KB of blocks
+        self.assertEqual(recommendation.size_mb, 45 * 1024 * 13 // 16)
+        self.assertEqual(recommendation.store_type, 'aufs')
+        self.assertIn('500,000 MB configured', report.warnings[0])
+
+    def test_inode_bound_recommends_rock(self):
+        cache_dir = self.cache_dir(size_mb=40_000)
+        fs = filesystem(free_gb=100, inodes_free=1_200_000, inodes_total=2_000_000)
+        report = self.advise([cache_dir], fs, sample_files=0)
+        recommendation = report.recommendations[0]
+        self.assertEqual(recommendation.limited_by, 'inode')
+        self.assertEqual(recommendation.store_type, 'rock')
+        self.assertIsNone(recommendation.l1)
+        self.assertIn('inode-bound', recommendation.notes[0])
+        # 1.1M usable inodes of 13 KB objects is about 13.6 GB
+        self.assertIn('only 13,', report.warnings[0])
+        self.assertIn('inode-bound', report.warnings[0])
+
+    def test_existing_objects_count_as_available(self):
+        """Test that space and inodes used by the cache itself are not lost to it."""
+        cache_dir = self.cache_dir(size_mb=1000, files=64, size=16384)
+        fs = filesystem(free_gb=100, total_gb=200, inodes_free=0, inodes_total=100)
+        report = self.advise([cache_dir], fs)
+        recommendation = report.recommendations[0]
+        self.assertEqual(recommendation.sample.estimated_objects, 64)
+        self.assertEqual(recommendation.limited_by, 'inode')
+        # 64 objects + 0 free inodes - 5 headroom - 10 swap directories
+        self.assertIn('(inode-bound: 49 inodes free)', report.warnings[0])
+
+    def test_object_limit(self):
+        cache_dir = self.cache_dir(size_mb=100)
+        fs = filesystem(free_gb=1000, total_gb=1000, inodes_total=0, inodes_free=0)
+        with patch.object(cache_advisor, 'DEFAULT_OBJECT_SIZE', 4096):
+            recommendation = self.advise([cache_dir], fs, sample_files=0).recommendations[0]
+        self.assertEqual(recommendation.limited_by, 'object-count')
+        self.assertIn('split the remaining', recommendation.notes[0])
+
+    def test_shared_filesystem(self):
+        disks = [self.cache_dir('a', size_mb=1000), self.cache_dir('b', 'rock', size_mb=3000)]
+        report = self.advise(disks, filesystem(free_gb=45, total_gb=1000), sample_files=0)
+        sizes = [r.size_mb for r in report.recommendations]
+        self.assertAlmostEqual(sizes[1] / sizes[0], 3, places=2)
+        self.assertEqual(report.recommendations[1].store_type, 'rock')
+
+    def test_memory_limit(self):
+        cache_dir = self.cache_dir(size_mb=100_000)
+        report = self.advise([cache_dir], filesystem(), sample_files=0, cache_mem=512, memory_limit=1024)
+        self.assertGreater(report.index_mb, 1000)
+        self.assertIn('1024 MB memory limit', report.warnings[-1])
+        self.assertIn('store index', format_report(report))
+
+
+class TestApply(AdvisorTestCase):
+    """Tests for apply_recommendations."""
+
+    def test_rewrites_cache_dir_lines(self):
+        new = self.root / 'new'
+        new.mkdir()
+        used = self.cache_dir('used', size_mb=500_000, files=1)
+        conf = self.root / 'squid.conf'
+        conf.write_text(f'http_port 3128\n  cache_dir ufs {new} 1000 2 4\n'
+                        f'cache_dir ufs {used.path} 500000 2 4 max-size=1048576\n')
+        config = load_squid_config(conf)
+
+        report = self.advise(config.cache_dirs, filesystem(free_gb=50, total_gb=1000), sample_files=0)
+        rewritten = apply_recommendations(config, report)
+
+        lines = conf.read_text().splitlines()
+        self.assertEqual(len(rewritten), 2)
+        # The empty cache_dir gets the recommended type and layout
+        self.assertTrue(lines[1].startswith(f'  cache_dir aufs {new} '))
+        # The populated one only its size, keeping layout and options
+        self.assertRegex(lines[2], rf'^cache_dir ufs {used.path} \d+ 2 4 max-size=1048576$')
+        self.assertNotIn('500000', lines[2])
+
+    def test_keeps_file_mode(self):
+        cache_dir = self.cache_dir(size_mb=500_000)
+        conf = self.root / 'squid.conf'
+        conf.write_text(f'cache_dir ufs {cache_dir.path} 500000 2 4\n')
+        conf.chmod(0o640)
+        config = load_squid_config(conf)
+
+        report = self.advise(config.cache_dirs, filesystem(free_gb=50), sample_files=0)
+        self.assertEqual(len(apply_recommendations(config, report)), 1)
+        self.assertEqual(conf.stat().st_mode & 0o777, 0o640)
+
+    def test_main_reports_read_only_config(self):
+        """Test that a configuration that cannot be rewritten fails cleanly."""
+        cache_dir = self.cache_dir(size_mb=500_000)
+        conf = self.root / 'squid.conf'
+        conf.write_text(f'cache_dir ufs {cache_dir.path} 500000 2 4\n')
+        original = conf.read_bytes()
+
+        error = OSError(errno.EROFS, 'Read-only file system')
+        with patch.object(FilesystemUsage, 'from_path', return_value=filesystem(free_gb=50)), \
+                patch.object(cache_advisor.os, 'replace', side_effect=error), \
+                patch('sys.stdout', new_callable=io.StringIO), \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertEqual(cache_advisor.main(['--config', str(conf), '--sample', '0', '--apply']), 1)
+        self.assertIn('Read-only file system', stderr.getvalue())
+        self.assertEqual(conf.read_bytes(), original)
+        self.assertEqual(list(self.root.glob('*.tmp')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
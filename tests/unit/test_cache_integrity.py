@@ -0,0 +1,222 @@
+"""
+Unit tests for cache_dir integrity checks and the warm-store readiness gate.
+
+Tests swap.state header and size checks, clean/dirty shutdown detection,
+missing swap directories, the rebuild estimate and StoreRebuildMonitor's
+tracking of Squid's rebuild messages in cache.log.
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from cache_integrity import (CacheDirReport, StoreRebuildMonitor, estimate_cache_files, missing_swap_dirs,
+                             read_swap_state, record_metrics, verify_cache_dir)
+from metrics import Registry
+from squid_config import CacheDir, clear_config_cache
+
+
+RECORD = struct.Struct('=b3xi4qQHH16s4x')
+
+
+def swap_state(*ops, record_size=72, version=2):
+    header = struct.pack('=b3xii', 3, version, record_size).ljust(record_size, b'\0')
+    records = b''.join(RECORD.pack(op, filen, 1700000000, 1700000000, -1, 1700000000, 4096, 1, 0,
+                                   filen.to_bytes(16, 'big'))
+                       for filen, op in enumerate(ops))
+    return header + records
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        clear_config_cache()
+
+    def cache_dir(self, l1=2, l2=4):
+        path = self.root / 'cache'
+        for i in range(l1):
+            for j in range(l2):
+                (path / f'{i:02X}' / f'{j:02X}').mkdir(parents=True)
+        return CacheDir('ufs', path, 100, l1, l2)
+
+
+class TestSwapState(CacheTestCase):
+    """Tests for read_swap_state."""
+
+    def test_counts_records(self):
+        path = self.root / 'swap.state'
+        path.write_bytes(swap_state(1, 1, 1, 2))
+        state = read_swap_state(path)
+        self.assertTrue(state.usable)
+        self.assertEqual((state.records, state.adds, state.deletes), (4, 3, 1))
+
+    def test_truncated_record(self):
+        path = self.root / 'swap.state'
+        path.write_bytes(swap_state(1, 1)[:-10])
+        state = read_swap_state(path)
+        self.assertFalse(state.usable)
+        self.assertEqual(state.trailing_bytes, 62)
+        self.assertIn('62 trailing bytes', state.errors[0])
+
+    def test_bad_header(self):
+        path = self.root / 'swap.state'
+        path.write_bytes(swap_state(1, version=1))
+        self.assertIn('unsupported header', read_swap_state(path).errors[0])
+        path.write_bytes(swap_state(1, record_size=48))
+        self.assertIn('record size 48', read_swap_state(path).errors[0])
+        path.write_bytes(b'\x03')
+        self.assertEqual(read_swap_state(path).errors, ['header truncated'])
+
+    def test_invalid_op(self):
+        path = self.root / 'swap.state'
+        path.write_bytes(swap_state(1, 7, 2))
+        state = read_swap_state(path)
+        self.assertEqual(state.invalid, 1)
+        self.assertFalse(state.usable)
+
+
+class TestVerifyCacheDir(CacheTestCase):
+    """Tests for missing_swap_dirs and verify_cache_dir."""
+
+    def test_missing_swap_dirs(self):
+        cache_dir = self.cache_dir()
+        (cache_dir.path / '01' / '03').rmdir()
+        shutil.rmtree(cache_dir.path / '00')
+        cache_dir.l1 = 3
+        self.assertEqual(missing_swap_dirs(cache_dir),
+                         [cache_dir.path / '00', cache_dir.path / '01' / '03', cache_dir.path / '02'])
+
+    def test_clean_shutdown(self):
+        cache_dir = self.cache_dir()
+        (cache_dir.path / 'swap.state').write_bytes(swap_state(*[1] * 1000))
+        (cache_dir.path / 'swap.state.last-clean').touch()
+
+        report = verify_cache_dir(cache_dir)
+        self.assertEqual((report.rebuild, report.entries, report.problems), ('clean log', 1000, []))
+        self.assertGreater(report.expected_seconds, 0)
+
+    def test_dirty_shutdown(self):
+        cache_dir = self.cache_dir()
+        (cache_dir.path / 'swap.state.last-clean').touch()
+        (cache_dir.path / 'swap.state').write_bytes(swap_state(1, 1))
+        os.utime(cache_dir.path / 'swap.state.last-clean', (0, 0))
+
+        report = verify_cache_dir(cache_dir)
+        self.assertEqual(report.rebuild, 'dirty log')
+        self.assertIn('dirty shutdown', report.problems[0])
+
+        # An interrupted rebuild leaves swap.state.new behind
+        os.utime(cache_dir.path / 'swap.state.last-clean')
+        (cache_dir.path / 'swap.state.new').touch()
+        self.assertEqual(verify_cache_dir(cache_dir).rebuild, 'dirty log')
+
+    def test_unusable_swap_state_scans_files(self):
+        cache_dir = self.cache_dir()
+        for name in ('00000001', '00000002'):
+            (cache_dir.path / '01' / '02' / name).write_bytes(b'x')
+        (cache_dir.path / 'swap.state').write_bytes(b'\x03\x00')
+
+        report = verify_cache_dir(cache_dir)
+        self.assertEqual((report.rebuild, report.entries), ('no log', 2))
+        self.assertIn('swap.state: header truncated', report.problems)
+        self.assertIn('rebuild from no log, 2 entries', report.summary())
+
+    def test_estimate_cache_files_is_bounded(self):
+        cache_dir = self.cache_dir(l1=4, l2=8)
+        for i in range(4):
+            for j in range(8):
+                for n in range(3):
+                    (cache_dir.path / f'{i:02X}' / f'{j:02X}' / f'{n:08X}').write_bytes(b'x')
+        # Every directory holds 3 files, so 4 of 32 directories give the exact count
+        with patch('os.scandir', wraps=os.scandir) as scandir:
+            self.assertEqual(estimate_cache_files(cache_dir, max_dirs=4), 96)
+        self.assertEqual(scandir.call_count, 4)
+        self.assertEqual(estimate_cache_files(CacheDir('ufs', self.root / 'none', 100, 2, 2)), 0)
+
+    def test_record_metrics(self):
+        registry = Registry()
+        record_metrics(CacheDirReport(Path('/cache'), rebuild='dirty log', entries=10,
+                                      expected_seconds=2.5), registry)
+        output = registry.render().decode()
+        self.assertIn('squid_cache_dir_expected_rebuild_seconds{cache_dir="/cache"} 2.5', output)
+        self.assertIn('squid_cache_dir_dirty{cache_dir="/cache"} 1', output)
+
+
+class TestStoreRebuildMonitor(CacheTestCase):
+    """Tests for StoreRebuildMonitor."""
+
+    def monitor(self, config='cache_dir ufs /var/spool/squid 100 16 256\n', **kwargs):
+        conf = self.root / 'squid.conf'
+        conf.write_text(config)
+        self.clock = FakeClock()
+        monitor = StoreRebuildMonitor(conf, clock=self.clock, registry=Registry(), **kwargs)
+        monitor.following = True
+        return monitor
+
+    def test_holds_readiness_until_rebuilt(self):
+        monitor = self.monitor()
+        self.assertEqual(monitor.check(), ['Cache store rebuild not started'])
+
+        monitor.on_lines([b'2024/01/01 00:00:00 kid1| Rebuilding storage in /var/spool/squid (dirty log)'])
+        self.clock.now += 10
+        monitor.on_lines([b'2024/01/01 00:00:10 kid1| Store rebuilding is 25.00% complete'])
+        self.assertEqual(monitor.check(), ['Cache store rebuilding (25% complete, 10s, ~30s left)'])
+        self.assertEqual(monitor.sources, {'/var/spool/squid': 'dirty log'})
+
+        self.clock.now += 20
+        with self.assertLogs(level='INFO'):
+            monitor.on_lines([b'2024/01/01 00:00:30 kid1| Finished rebuilding storage from disk.'])
+        self.assertEqual(monitor.check(), [])
+        self.assertEqual(monitor.last_duration, 30)
+        self.assertFalse(monitor.snapshot()['rebuilding'])
+
+    def test_timeout(self):
+        monitor = self.monitor(timeout=60)
+        monitor.on_lines([b'Rebuilding storage in /var/spool/squid (no log)'])
+        self.assertEqual(len(monitor.check()), 1)
+        self.clock.now += 61
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(monitor.check(), [])
+
+    def test_grace_without_rebuild_messages(self):
+        """Test that readiness is released if no rebuild starts after Squid starts."""
+        monitor = self.monitor(grace=30)
+        self.assertEqual(monitor.check(), ['Cache store rebuild not started'])
+        self.clock.now += 100
+        monitor.on_lines([b'2024/01/01 00:00:00| Starting Squid Cache version 6.6 for x86_64-pc-linux-gnu...'])
+        self.assertEqual(monitor.check(), ['Cache store rebuild not started'])
+        self.clock.now += 31
+        with self.assertLogs(level='INFO'):
+            self.assertEqual(monitor.check(), [])
+
+    def test_no_gate_without_cache_dir(self):
+        self.assertEqual(self.monitor('http_port 3128\n').check(), [])
+
+    def test_cache_log_location(self):
+        monitor = self.monitor('cache_log stdio:/data/cache.log\n')
+        self.assertEqual(monitor.cache_log(), Path('/data/cache.log'))
+        clear_config_cache()
+        monitor = self.monitor('cache_log stdio:/dev/stderr\n')
+        self.assertIsNone(monitor.cache_log())
+
+
+if __name__ == '__main__':
+    unittest.main()
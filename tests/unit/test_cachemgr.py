@@ -0,0 +1,295 @@
+"""
+Unit tests for Squid cache manager polling and parsing.
+
+Parsers run against captured page output in tests/fixtures/cachemgr, so no
+live Squid is needed; the client is tested against a stand-in proxy.
+"""
+
+import socket
+import threading
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from cachemgr import (
+    CacheManagerClient,
+    CacheManagerError,
+    CacheManagerPoller,
+    build_stats,
+    parse_info,
+    parse_key_values,
+    stats_metrics,
+)
+from metrics import Registry
+
+FIXTURES = Path(__file__).parent.parent / 'fixtures' / 'cachemgr'
+
+
+def fixture(page):
+    return (FIXTURES / f'{page}.txt').read_text()
+
+
+def fixture_stats():
+    return build_stats(parse_info(fixture('info')), parse_key_values(fixture('counters')),
+                       parse_key_values(fixture('5min')))
+
+
+class TestParseKeyValues(unittest.TestCase):
+    """Tests for the mgr:counters / mgr:5min parser."""
+
+    def test_counters(self):
+        """Test integer counters and the sample_time date suffix."""
+        counters = parse_key_values(fixture('counters'))
+        self.assertEqual(counters['client_http.requests'], 18342)
+        self.assertEqual(counters['client_http.kbytes_out'], 912384)
+        self.assertEqual(counters['sample_time'], 1700002800.123456)
+        self.assertEqual(counters['wall_time'], -3600.012)
+
+    def test_five_min_units(self):
+        """Test that /sec, seconds and % units are stripped."""
+        five_min = parse_key_values(fixture('5min'))
+        self.assertEqual(five_min['client_http.requests'], 5.496667)
+        self.assertEqual(five_min['client_http.all_median_svc_time'], 0.04776)
+        self.assertEqual(five_min['average_select_fd_period'], 0.025826)
+        self.assertEqual(five_min['cpu_usage'], 1.419953)
+
+    def test_skips_non_numeric(self):
+        """Test that lines without a numeric value are ignored."""
+        self.assertEqual(parse_key_values('a = b\nno separator\nc = 1\n'), {'c': 1.0})
+
+
+class TestParseInfo(unittest.TestCase):
+    """Tests for the mgr:info parser."""
+
+    def setUp(self):
+        self.info = parse_info(fixture('info'))
+
+    def test_version(self):
+        self.assertEqual(self.info['version'], '5.7')
+
+    def test_window_percentages(self):
+        """Test that 5min/60min percentages become ratios."""
+        self.assertEqual(self.info['Hits as % of all requests'], {'5min': 0.234, '60min': 0.198})
+        self.assertEqual(self.info['Hits as % of bytes sent'], {'5min': 0.412, '60min': 0.375})
+
+    def test_sizes_and_capacity(self):
+        """Test that KB sizes are converted to bytes and capacity to a ratio."""
+        self.assertEqual(self.info['Storage Swap size'], 187264 * 1024)
+        self.assertAlmostEqual(self.info['Storage Swap capacity'], 0.732)
+        self.assertAlmostEqual(self.info['Mean Object Size'], 24.51 * 1024)
+
+    def test_median_service_times(self):
+        """Test the median service time table."""
+        times = self.info['median_service_times']
+        self.assertEqual(times['http_all'], {'5min': 0.04776, '60min': 0.05331})
+        self.assertEqual(times['cache_hits'], {'5min': 0.00091, '60min': 0.00091})
+        self.assertEqual(len(times), 7)
+
+    def test_file_descriptors(self):
+        self.assertEqual(self.info['Maximum number of file descriptors'], 65536)
+        self.assertEqual(self.info['Number of file desc currently in use'], 52)
+
+    def test_internal_data_structures(self):
+        self.assertEqual(self.info['StoreEntries'], 7785)
+        self.assertEqual(self.info['on-disk objects'], 7640)
+
+
+class TestStats(unittest.TestCase):
+    """Tests for build_stats and metric export."""
+
+    def test_build_stats(self):
+        stats = fixture_stats()
+        self.assertEqual(stats.requests_total, 18342)
+        self.assertEqual(stats.bytes_out_total, 912384 * 1024)
+        self.assertEqual(stats.request_rate, 5.496667)
+        self.assertEqual(stats.hit_ratio['5min'], 0.234)
+        self.assertEqual(stats.fd_in_use, 52)
+        self.assertEqual(stats.store_entries, 7785)
+        self.assertEqual(stats.uptime_seconds, 3600.012)
+
+    def test_missing_pages(self):
+        """Test that empty pages leave fields unset instead of failing."""
+        stats = build_stats(parse_info(''), {}, {})
+        self.assertIsNone(stats.requests_total)
+        self.assertEqual(stats.hit_ratio, {})
+        self.assertEqual(stats_metrics(stats), [])
+
+    def test_metrics(self):
+        registry = Registry()
+        families = stats_metrics(fixture_stats())
+        registry.register_collector(lambda: families)
+        body = registry.render().decode()
+
+        self.assertIn('squid_client_http_requests_total 18342\n', body)
+        self.assertIn('squid_hit_ratio{window="5min"} 0.234\n', body)
+        self.assertIn('squid_median_service_time_seconds{request_type="http_all",window="60min"} 0.05331\n',
+                      body)
+        self.assertIn('squid_file_descriptors{state="in_use"} 52\n', body)
+        self.assertIn('# TYPE squid_client_http_requests_total counter\n', body)
+
+
+class StandInManager:
+    """Stand-in proxy serving cache manager pages from the fixtures."""
+
+    def __init__(self, framing='length', status=200):
+        self.framing = framing
+        self.status = status
+        self.connections = 0
+        self.requests = []
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.address = self.sock.getsockname()[:2]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        reader = conn.makefile('rb')
+        with conn, reader:
+            while True:
+                request_line = reader.readline()
+                if not request_line:
+                    return
+                while reader.readline() not in (b'\r\n', b''):
+                    pass
+                target = request_line.split()[1].decode()
+                self.requests.append(target)
+                body = fixture(target.rsplit('/', 1)[1]).encode()
+                head = f'HTTP/1.1 {self.status} X\r\nContent-Type: text/plain\r\n'
+                if self.framing == 'length':
+                    conn.sendall(f'{head}Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+                elif self.framing == 'bad-length':
+                    conn.sendall(f'{head}Content-Length: lots\r\n\r\n'.encode() + body)
+                elif self.framing == 'bad-chunk':
+                    conn.sendall(f'{head}Transfer-Encoding: chunked\r\n\r\n'.encode() + b'zz\r\n' + body)
+                elif self.framing == 'chunked':
+                    half = len(body) // 2
+                    chunks = b''.join(b'%x\r\n%s\r\n' % (len(part), part)
+                                      for part in (body[:half], body[half:]))
+                    conn.sendall(f'{head}Transfer-Encoding: chunked\r\n\r\n'.encode() + chunks + b'0\r\n\r\n')
+                else:
+                    conn.sendall(f'{head}Connection: close\r\n\r\n'.encode() + body)
+                    return
+
+    def close(self):
+        # shutdown() wakes the blocked accept() so no new connections are served
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class TestCacheManagerClient(unittest.TestCase):
+    """Tests for CacheManagerClient connection reuse and framing."""
+
+    def manager(self, **kwargs):
+        manager = StandInManager(**kwargs)
+        self.addCleanup(manager.close)
+        client = CacheManagerClient(manager.address, timeout=2.0)
+        self.addCleanup(client.close)
+        return manager, client
+
+    def test_keep_alive_reuses_connection(self):
+        manager, client = self.manager()
+        for page in ('info', 'counters', '5min'):
+            self.assertEqual(client.fetch(page), fixture(page))
+        self.assertEqual(client.connections_opened, 1)
+        self.assertEqual(manager.requests[0], 'cache_object://localhost/info')
+
+    def test_chunked(self):
+        _, client = self.manager(framing='chunked')
+        self.assertEqual(client.fetch('counters'), fixture('counters'))
+        self.assertEqual(client.fetch('5min'), fixture('5min'))
+        self.assertEqual(client.connections_opened, 1)
+
+    def test_close_delimited(self):
+        """Test responses without framing read to EOF and reconnect next time."""
+        _, client = self.manager(framing='close')
+        self.assertEqual(client.fetch('info'), fixture('info'))
+        self.assertEqual(client.fetch('counters'), fixture('counters'))
+        self.assertEqual(client.connections_opened, 2)
+
+    def test_denied(self):
+        """Test that a non-200 status raises CacheManagerError."""
+        _, client = self.manager(status=403)
+        with self.assertRaisesRegex(CacheManagerError, '403'):
+            client.fetch('info')
+
+    def test_malformed_framing(self):
+        """Test that unparseable framing raises CacheManagerError and drops the connection."""
+        for framing in ('bad-length', 'bad-chunk'):
+            with self.subTest(framing=framing):
+                _, client = self.manager(framing=framing)
+                with self.assertRaisesRegex(CacheManagerError, 'malformed response framing'):
+                    client.fetch('info')
+                self.assertIsNone(client._sock)
+
+    def test_connection_refused(self):
+        manager, client = self.manager()
+        manager.close()
+        with self.assertRaises(CacheManagerError):
+            client.fetch('info')
+
+
+class TestCacheManagerPoller(unittest.TestCase):
+    """Tests for CacheManagerPoller."""
+
+    def test_poll_publishes_metrics(self):
+        manager = StandInManager()
+        self.addCleanup(manager.close)
+        registry = Registry()
+        poller = CacheManagerPoller(CacheManagerClient(manager.address), registry=registry)
+        self.addCleanup(poller.client.close)
+
+        stats = poller.poll()
+        self.assertEqual(stats.requests_total, 18342)
+        body = registry.render().decode()
+        self.assertIn('squid_up 1\n', body)
+        self.assertIn('squid_store_entries 7785\n', body)
+
+        snapshot = poller.snapshot()
+        self.assertTrue(snapshot['up'])
+        self.assertEqual(snapshot['stats']['fd_max'], 65536)
+
+    def test_poll_failure(self):
+        """Test that a failed poll reports squid_up 0 and keeps old stats."""
+        manager = StandInManager()
+        registry = Registry()
+        poller = CacheManagerPoller(CacheManagerClient(manager.address), registry=registry)
+        poller.poll()
+        manager.close()
+        poller.client.close()
+
+        self.assertIsNone(poller.poll())
+        self.assertIn('squid_up 0\n', registry.render().decode())
+        snapshot = poller.snapshot()
+        self.assertFalse(snapshot['up'])
+        self.assertIsNotNone(snapshot['error'])
+        self.assertEqual(snapshot['stats']['requests_total'], 18342)
+
+    def test_poll_malformed_response(self):
+        """Test that a response with broken framing reports squid_up 0."""
+        manager = StandInManager()
+        self.addCleanup(manager.close)
+        registry = Registry()
+        poller = CacheManagerPoller(CacheManagerClient(manager.address), registry=registry)
+        self.addCleanup(poller.client.close)
+        poller.poll()
+        manager.framing = 'bad-length'
+
+        self.assertIsNone(poller.poll())
+        self.assertIn('squid_up 0\n', registry.render().decode())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+"""
+Unit tests for configuration hot reload.
+
+Tests digest-based change detection, validation failures keeping the
+running configuration, watch directory discovery and inotify-driven
+reloads (including a ConfigMap-style symlink swap). squid -k parse is
+patched and squid -k reconfigure is a stand-in script.
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+import config_reload
+from config_reload import ConfigReloader
+from inotify_watch import inotify_available
+from metrics import Registry
+from squid_config import clear_config_cache, config_digest, load_squid_config
+
+
+class ReloadTestCase(unittest.TestCase):
+    """Temporary config directory and a stand-in squid binary."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        clear_config_cache()
+
+        self.calls = self.root / 'reconfigure.log'
+        self.squid = self.root / 'squid'
+        self.squid.write_text(f'#!/bin/sh\necho "$@" >> {self.calls}\n')
+        self.squid.chmod(0o755)
+
+        self.valid = True
+        validate = patch.object(config_reload, 'validate_squid_config', self.fake_validate)
+        validate.start()
+        self.addCleanup(validate.stop)
+
+        self.conf_dir = self.root / 'etc'
+        self.conf = self.write('squid.conf', 'http_port 3128\n')
+        self.registry = Registry()
+        self.applied = []
+
+    async def fake_validate(self, config_file):
+        return (True, '') if self.valid else (False, 'FATAL: Bungled squid.conf line 1')
+
+    def write(self, name, content):
+        path = self.conf_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        return path
+
+    def reloader(self, **kwargs):
+        digest = config_digest(load_squid_config(self.conf))
+        return ConfigReloader(self.conf, applied_digest=digest, on_applied=self.applied.append,
+                              squid_binary=str(self.squid), registry=self.registry, **kwargs)
+
+    def reconfigures(self):
+        return self.calls.read_text().splitlines() if self.calls.exists() else []
+
+
+class TestReload(ReloadTestCase):
+    """Tests for ConfigReloader.reload."""
+
+    def test_unchanged(self):
+        reloader = self.reloader()
+        self.assertEqual(asyncio.run(reloader.reload()), 'unchanged')
+        self.assertEqual(self.reconfigures(), [])
+
+    def test_changed_config_reconfigures(self):
+        reloader = self.reloader()
+        self.conf.write_text('http_port 3129\n')
+
+        self.assertEqual(asyncio.run(reloader.reload()), 'success')
+        self.assertEqual(self.reconfigures(), [f'-k reconfigure -f {self.conf}'])
+        self.assertEqual(self.applied, [reloader.applied_digest])
+
+        body = self.registry.render().decode()
+        self.assertIn('squid_config_reloads_total{result="success"} 1\n', body)
+        self.assertIn('squid_config_last_reload_seconds ', body)
+
+    def test_acl_file_change(self):
+        domains = self.write('blocked.txt', '.example.com\n')
+        self.conf.write_text(f'acl blocked dstdomain "{domains}"\n')
+        reloader = self.reloader()
+
+        domains.write_text('.example.org\n')
+        self.assertEqual(asyncio.run(reloader.reload()), 'success')
+
+    def test_invalid_config_keeps_running_one(self):
+        reloader = self.reloader()
+        before = reloader.applied_digest
+        self.conf.write_text('http_port nonsense\n')
+        self.valid = False
+
+        self.assertEqual(asyncio.run(reloader.reload()), 'invalid')
+        self.assertEqual(self.reconfigures(), [])
+        self.assertEqual(reloader.applied_digest, before)
+        # The same broken config is not validated again on every event
+        self.assertEqual(asyncio.run(reloader.reload()), 'unchanged')
+        self.assertIn('squid_config_reloads_total{result="invalid"} 1\n', self.registry.render().decode())
+
+    def test_force(self):
+        """Test that SIGHUP-style forced reloads run without a change."""
+        reloader = self.reloader()
+        self.assertEqual(asyncio.run(reloader.reload(force=True)), 'success')
+        self.assertEqual(len(self.reconfigures()), 1)
+
+    def prepared_reloader(self, prepared):
+        runtime = self.root / 'squid.runtime.conf'
+        runtime.write_text('# running\nhttp_port 3128\n')
+
+        def prepare(config, output):
+            prepared.append((config.http_ports[0].port, output))
+            output.write_text(self.conf.read_text())
+
+        return runtime, self.reloader(prepare=prepare, runtime_file=runtime)
+
+    def test_prepare_hook(self):
+        """Test that the prepared scratch copy is validated, installed and reconfigured."""
+        prepared = []
+        runtime, reloader = self.prepared_reloader(prepared)
+        self.conf.write_text('http_port 3129\n')
+
+        validated = []
+        original = self.fake_validate
+
+        async def validate(config_file):
+            validated.append(config_file)
+            return await original(config_file)
+
+        with patch.object(config_reload, 'validate_squid_config', validate):
+            self.assertEqual(asyncio.run(reloader.reload()), 'success')
+        scratch = runtime.with_name('squid.runtime.conf.new')
+        self.assertEqual(prepared, [(3129, scratch)])
+        self.assertEqual(validated, [scratch])
+        self.assertEqual(runtime.read_text(), 'http_port 3129\n')
+        self.assertFalse(scratch.exists())
+        self.assertEqual(self.reconfigures(), [f'-k reconfigure -f {runtime}'])
+
+    def test_invalid_prepared_config_keeps_runtime_file(self):
+        """Test that a rejected change leaves the file Squid runs from untouched."""
+        runtime, reloader = self.prepared_reloader([])
+        before = runtime.read_bytes()
+        self.conf.write_text('http_port 3129\nbogus_directive on\n')
+        self.valid = False
+
+        self.assertEqual(asyncio.run(reloader.reload()), 'invalid')
+        self.assertEqual(runtime.read_bytes(), before)
+        self.assertFalse(runtime.with_name('squid.runtime.conf.new').exists())
+        self.assertEqual(self.reconfigures(), [])
+
+    def test_reconfigure_failure(self):
+        self.squid.write_text('#!/bin/sh\necho "No running copy" >&2\nexit 1\n')
+        reloader = self.reloader()
+        before = reloader.applied_digest
+        self.conf.write_text('http_port 3129\n')
+
+        self.assertEqual(asyncio.run(reloader.reload()), 'failed')
+        self.assertEqual(reloader.applied_digest, before)
+        self.assertEqual(self.applied, [])
+
+
+class TestWatch(ReloadTestCase):
+    """Tests for watch directories and the inotify loop."""
+
+    def test_watch_dirs(self):
+        domains = self.write('acls/blocked.txt', '.example.com\n')
+        (self.conf_dir / 'conf.d').mkdir()
+        self.conf.write_text(f'include {self.conf_dir}/conf.d/*.conf\n'
+                             f'acl blocked dstdomain "{domains}"\n')
+        dirs = self.reloader().watch_dirs()
+        self.assertEqual(dirs, {self.conf_dir, self.conf_dir / 'acls', self.conf_dir / 'conf.d'})
+
+    @unittest.skipUnless(inotify_available(), "inotify not available")
+    def test_configmap_symlink_swap(self):
+        """Test that swapping the ..data symlink triggers exactly one reload."""
+        for version in ('v1', 'v2'):
+            port = 3128 if version == 'v1' else 3129
+            self.write(f'..{version}/squid.conf', f'http_port {port}\n')
+        self.conf.unlink()
+        os.symlink('..v1', self.conf_dir / '..data')
+        os.symlink('..data/squid.conf', self.conf)
+        reloader = self.reloader(debounce=0.05)
+
+        async def run():
+            task = asyncio.create_task(reloader.run())
+            await asyncio.sleep(0.1)
+            # Kubelet's atomic update: new symlink renamed over ..data
+            os.symlink('..v2', self.conf_dir / '..data_tmp')
+            os.rename(self.conf_dir / '..data_tmp', self.conf_dir / '..data')
+            for _ in range(100):
+                if self.applied:
+                    break
+                await asyncio.sleep(0.02)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(len(self.applied), 1)
+        self.assertEqual(load_squid_config(self.conf).http_ports[0].port, 3129)
+        self.assertEqual(len(self.reconfigures()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
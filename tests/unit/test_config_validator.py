@@ -1,20 +1,29 @@
 """
 Unit tests for Squid configuration validation.
 
-Tests the config_validator module for squid -k parse wrapper
-and SSL-bump detection.
+Tests the config_validator module for squid -k parse wrapper, the
+fingerprint cache that skips it on warm restarts, and SSL-bump detection.
 """
 
+import json
 import unittest
 import asyncio
 from pathlib import Path
+from unittest.mock import patch
 import tempfile
 import sys
 
 # Add container directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
 
-from config_validator import validate_squid_config, detect_ssl_bump
+import config_validator
+from config_validator import (
+    detect_ssl_bump,
+    port_files,
+    validate_squid_config,
+    validate_squid_config_cached,
+)
+from squid_config import clear_config_cache, parse_squid_config
 
 
 class TestConfigValidation(unittest.TestCase):
@@ -81,6 +90,87 @@ http_port 3128
             config_path.unlink()
 
 
+class TestCachedValidation(unittest.TestCase):
+    """Tests for validate_squid_config_cached."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        clear_config_cache()
+
+        self.cert = self.root / 'squid-ca.pem'
+        self.cert.write_text('CERT 1')
+        self.acl = self.root / 'blocked.txt'
+        self.acl.write_text('.example.com\n')
+        self.config = self.root / 'squid.conf'
+        self.config.write_text(f'http_port 3128 ssl-bump tls-cert={self.cert}\n'
+                               f'acl blocked dstdomain "{self.acl}"\n')
+        self.cache = self.root / '.config-validated'
+
+        # Stand-in squid binary answering -v
+        self.squid = self.root / 'squid'
+        self.squid.write_text('#!/bin/sh\necho "Squid Cache: Version 6.10"\n')
+        self.squid.chmod(0o755)
+
+        self.parses = 0
+        self.result = (True, '')
+        validate = patch.object(config_validator, 'validate_squid_config', self.fake_validate)
+        validate.start()
+        self.addCleanup(validate.stop)
+
+    async def fake_validate(self, config_file):
+        self.parses += 1
+        return self.result
+
+    def validate(self, force=False):
+        return asyncio.run(validate_squid_config_cached(self.config, self.cache, force, str(self.squid)))
+
+    def test_skips_unchanged(self):
+        self.assertEqual(self.validate(), (True, ''))
+        self.assertEqual(self.validate(), (True, ''))
+        self.assertEqual(self.parses, 1)
+        self.assertIn('fingerprint', json.loads(self.cache.read_text()))
+
+    def test_force(self):
+        self.validate()
+        self.validate(force=True)
+        self.assertEqual(self.parses, 2)
+
+    def test_changes_invalidate(self):
+        """Test that config, acl file, certificate and version changes all re-validate."""
+        self.validate()
+        for change in (lambda: self.acl.write_text('.example.org\n'),
+                       lambda: self.cert.write_text('CERT 2'),
+                       lambda: self.squid.write_text('#!/bin/sh\necho "Squid Cache: Version 6.11"\n'),
+                       lambda: self.config.write_text('http_port 3129\n')):
+            parses = self.parses
+            change()
+            self.validate()
+            self.assertEqual(self.parses, parses + 1)
+
+    def test_failures_not_cached(self):
+        self.result = (False, 'FATAL: Bungled squid.conf')
+        self.assertFalse(self.validate()[0])
+        self.assertFalse(self.validate()[0])
+        self.assertEqual(self.parses, 2)
+        self.assertFalse(self.cache.exists())
+
+    def test_unwritable_cache(self):
+        """Test that a read-only volume only costs the skip, not the validation."""
+        self.cache = self.root / 'missing-dir' / '.config-validated'
+        self.assertEqual(self.validate(), (True, ''))
+        self.assertEqual(self.validate(), (True, ''))
+        self.assertEqual(self.parses, 2)
+
+    def test_port_files(self):
+        config = self.root / 'ports.conf'
+        config.write_text('http_port 3128 tls-cert=/a.pem tls-key=/a.key\n'
+                          'https_port 3129 tls-cert=/a.pem tls-dh=prime256v1:/dh.pem\n')
+        self.assertEqual(port_files(parse_squid_config(config)),
+                         [Path('/a.pem'), Path('/a.key'), Path('/dh.pem')])
+
+
 class TestSSLBumpDetection(unittest.TestCase):
     """Tests for detect_ssl_bump function."""
 
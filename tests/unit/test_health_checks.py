@@ -0,0 +1,188 @@
+"""
+Unit tests for shared health check probe logic.
+
+Tests the health_checks module for ProbeCache TTL, age and staleness, and
+the rate-limited DataPathProbe against a stand-in proxy.
+"""
+
+import asyncio
+import socket
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from health_checks import DataPathProbe, ProbeCache, probe_data_path
+
+
+class StandInProxy:
+    """One-thread TCP server answering each connection with a fixed response."""
+
+    def __init__(self, response=b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n', delay=0.0):
+        self.response = response
+        self.delay = delay
+        self.requests = []
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.address = self.sock.getsockname()[:2]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                self.requests.append(conn.recv(1024))
+                time.sleep(self.delay)
+                conn.sendall(self.response)
+
+    def close(self):
+        self.sock.close()
+
+
+@patch('health_checks.readiness_errors', return_value=[])
+@patch('health_checks.is_squid_running', return_value=True)
+class TestProbeCache(unittest.TestCase):
+    """Tests for ProbeCache."""
+
+    def test_first_snapshot_probes(self, running, _):
+        """Test that a snapshot before any refresh probes synchronously."""
+        result = ProbeCache().snapshot()
+        self.assertTrue(result.alive)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(running.call_count, 1)
+
+    def test_snapshot_is_cached(self, running, _):
+        """Test that snapshots reuse the last refresh."""
+        probes = ProbeCache()
+        probes.refresh()
+        for _ in range(100):
+            probes.snapshot()
+        self.assertEqual(running.call_count, 1)
+
+    def test_stale_result_not_ready(self, running, _):
+        """Test that results older than max_age fail readiness but keep liveness."""
+        probes = ProbeCache(max_age=0.01)
+        probes.refresh()
+        time.sleep(0.02)
+
+        result = probes.snapshot()
+        self.assertTrue(result.alive)
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn('stale', result.errors[0])
+        self.assertGreaterEqual(result.age, 0.02)
+
+    def test_added_checks_fail_readiness(self, running, _):
+        """Test that errors from added checks are reported on refresh."""
+        probes = ProbeCache()
+        probes.add_check(lambda: ['Cache store rebuilding'])
+        result = probes.refresh()
+        self.assertTrue(result.alive)
+        self.assertEqual(result.errors, ['Cache store rebuilding'])
+
+    def test_run_refreshes_every_ttl(self, running, _):
+        """Test that the asyncio refresher probes once per TTL."""
+        async def runner():
+            probes = ProbeCache(ttl=0.02)
+            task = asyncio.create_task(probes.run())
+            await asyncio.sleep(0.15)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(runner())
+        self.assertGreaterEqual(running.call_count, 3)
+        self.assertLessEqual(running.call_count, 9)
+
+    def test_refresh_failure_keeps_running(self, running, _):
+        """Test that a failing probe does not stop the refresher."""
+        running.side_effect = [OSError('boom'), True, True, True, True, True, True, True, True, True]
+
+        async def runner():
+            probes = ProbeCache(ttl=0.01)
+            task = asyncio.create_task(probes.run())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return probes.snapshot()
+
+        self.assertTrue(asyncio.run(runner()).alive)
+
+
+
+class TestDataPathProbe(unittest.TestCase):
+    """Tests for the deep data-path check."""
+
+    def serve(self, **kwargs):
+        proxy = StandInProxy(**kwargs)
+        self.addCleanup(proxy.close)
+        return proxy
+
+    def test_healthy_proxy(self):
+        """Test a fast 200 response passes and sends a cache manager request."""
+        proxy = self.serve()
+        success, message, latency_ms = probe_data_path(proxy.address, timeout=1.0)
+        self.assertTrue(success, message)
+        self.assertLess(latency_ms, 1000)
+        self.assertTrue(proxy.requests[0].startswith(b'GET cache_object://localhost/info'))
+
+    def test_denied_manager_still_healthy(self):
+        """Test that a 403 (manager access denied) proves the data path works."""
+        proxy = self.serve(response=b'HTTP/1.1 403 Forbidden\r\n\r\n')
+        self.assertTrue(probe_data_path(proxy.address, timeout=1.0)[0])
+
+    def test_server_error(self):
+        """Test that a 5xx response fails the check."""
+        proxy = self.serve(response=b'HTTP/1.1 503 Service Unavailable\r\n\r\n')
+        success, message, _ = probe_data_path(proxy.address, timeout=1.0)
+        self.assertFalse(success)
+        self.assertIn('503', message)
+
+    def test_connection_refused(self):
+        """Test that an unreachable proxy fails the check."""
+        proxy = self.serve()
+        proxy.close()
+        self.assertFalse(probe_data_path(proxy.address, timeout=1.0)[0])
+
+    def test_timeout(self):
+        """Test that a wedged proxy fails within the timeout."""
+        proxy = self.serve(delay=0.5)
+        success, _, latency_ms = probe_data_path(proxy.address, timeout=0.1)
+        self.assertFalse(success)
+        self.assertLess(latency_ms, 400)
+
+    def test_latency_threshold(self):
+        """Test that a slow but answering proxy is reported unready."""
+        proxy = self.serve(delay=0.05)
+        errors = DataPathProbe(threshold_ms=10, address=proxy.address).check()
+        self.assertEqual(len(errors), 1)
+        self.assertIn('slow', errors[0])
+
+    def test_rate_limited(self):
+        """Test that checks within the interval reuse the previous outcome."""
+        proxy = self.serve()
+        probe = DataPathProbe(interval=60, address=proxy.address)
+        for _ in range(5):
+            self.assertEqual(probe.check(), [])
+        self.assertEqual(len(proxy.requests), 1)
+        self.assertIsNotNone(probe.latency_ms)
+
+    @patch('health_checks.readiness_errors', return_value=[])
+    @patch('health_checks.is_squid_running', return_value=True)
+    def test_probe_cache_includes_deep_errors(self, *_):
+        """Test that deep check failures make readiness fail but not liveness."""
+        proxy = self.serve(response=b'garbage\r\n')
+        probes = ProbeCache(deep=DataPathProbe(address=proxy.address))
+        result = probes.refresh()
+        self.assertTrue(result.alive)
+        self.assertEqual(result.errors, ['Data path check failed: no HTTP response from proxy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+"""
+Unit tests for the asyncio health check server.
+
+Tests the health_server module for the /health and /ready contract,
+HTTP/1.1 keep-alive, concurrency with slow clients and read timeouts.
+"""
+
+import asyncio
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from health_checks import ProbeCache
+from health_server import HealthServer, metrics_handler
+from metrics import Registry
+from socket_activation import bind_listen_socket
+
+
+async def read_response(reader):
+    """Read one HTTP response; returns (status, headers, body)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', '0')))
+    return status, headers, body
+
+
+class HealthServerTestCase(unittest.TestCase):
+    """Runs each test coroutine against a server on an ephemeral port."""
+
+    read_timeout = 1.0
+
+    def run_with_server(self, test):
+        async def runner():
+            server = HealthServer(sock=bind_listen_socket(0, '127.0.0.1'),
+                                  read_timeout=self.read_timeout)
+            await server.start()
+            try:
+                return await test(*server.address)
+            finally:
+                await server.close()
+
+        return asyncio.run(runner())
+
+    async def request(self, host, port, raw):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(raw)
+        await writer.drain()
+        response = await read_response(reader)
+        writer.close()
+        return response
+
+
+class TestHealthContract(HealthServerTestCase):
+    """Tests for the /health and /ready endpoint contract."""
+
+    @patch('health_checks.is_squid_running', return_value=True)
+    def test_health_ok(self, _):
+        async def test(host, port):
+            return await self.request(host, port, b'GET /health HTTP/1.1\r\nHost: x\r\n\r\n')
+
+        status, headers, body = self.run_with_server(test)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'OK\n')
+        self.assertEqual(headers['content-type'], 'text/plain')
+        self.assertLess(float(headers['x-probe-age']), 1.0)
+
+    @patch('health_checks.is_squid_running', return_value=False)
+    def test_health_unavailable(self, _):
+        async def test(host, port):
+            return await self.request(host, port, b'GET /health HTTP/1.0\r\n\r\n')
+
+        status, headers, body = self.run_with_server(test)
+        self.assertEqual(status, 503)
+        self.assertEqual(body, b'Service Unavailable: Squid not running\n')
+        self.assertEqual(headers['connection'], 'close')
+
+    @patch('health_checks.readiness_errors', return_value=['Squid process not running'])
+    def test_ready_lists_errors(self, _):
+        async def test(host, port):
+            return await self.request(host, port, b'GET /ready HTTP/1.1\r\n\r\n')
+
+        status, _, body = self.run_with_server(test)
+        self.assertEqual(status, 503)
+        self.assertEqual(body, b'Service Unavailable:\n  - Squid process not running\n')
+
+    def test_unknown_path(self):
+        async def test(host, port):
+            return await self.request(host, port, b'GET /nope HTTP/1.1\r\n\r\n')
+
+        status, _, body = self.run_with_server(test)
+        self.assertEqual(status, 404)
+        self.assertIn(b'/health', body)
+
+    def test_method_not_allowed(self):
+        async def test(host, port):
+            return await self.request(host, port, b'POST /health HTTP/1.1\r\nContent-Length: 2\r\n\r\nhi')
+
+        status, _, _ = self.run_with_server(test)
+        self.assertEqual(status, 405)
+
+
+class TestProbeCaching(HealthServerTestCase):
+    """Tests for answering probes from the background-refreshed cache."""
+
+    def test_requests_do_not_reprobe(self):
+        """Test that many requests within the TTL share one probe run."""
+        async def test(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            for _ in range(20):
+                writer.write(b'GET /ready HTTP/1.1\r\n\r\n')
+                await read_response(reader)
+            writer.close()
+
+        with patch('health_checks.is_squid_running', return_value=True) as probe:
+            self.run_with_server(test)
+        # Initial refresh (plus at most one synchronous first snapshot)
+        self.assertLessEqual(probe.call_count, 2)
+
+    def test_stale_cache_fails_readiness(self):
+        """Test that /ready fails when the refresher has stalled."""
+        async def runner():
+            probes = ProbeCache(ttl=60.0, max_age=0.05)
+            server = HealthServer(sock=bind_listen_socket(0, '127.0.0.1'), probes=probes)
+            await server.start()
+            try:
+                await asyncio.sleep(0.1)
+                return await self.request(*server.address, b'GET /ready HTTP/1.1\r\n\r\n')
+            finally:
+                await server.close()
+
+        with patch('health_checks.readiness_errors', return_value=[]):
+            status, headers, body = asyncio.run(runner())
+        self.assertEqual(status, 503)
+        self.assertIn(b'Probe data stale', body)
+        self.assertGreaterEqual(float(headers['x-probe-age']), 0.05)
+
+
+class TestConnectionHandling(HealthServerTestCase):
+    """Tests for keep-alive, concurrency and timeouts."""
+
+    read_timeout = 0.2
+
+    @patch('health_checks.is_squid_running', return_value=True)
+    def test_keep_alive(self, _):
+        """Test several requests on one HTTP/1.1 connection."""
+        async def test(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            statuses = []
+            for _ in range(3):
+                writer.write(b'GET /health HTTP/1.1\r\n\r\n')
+                status, headers, _ = await read_response(reader)
+                statuses.append((status, headers['connection']))
+            writer.close()
+            return statuses
+
+        self.assertEqual(self.run_with_server(test), [(200, 'keep-alive')] * 3)
+
+    @patch('health_checks.is_squid_running', return_value=True)
+    def test_slow_client_does_not_block(self, _):
+        """Test that a client stalled mid-request does not delay other probes."""
+        async def test(host, port):
+            _, slow_writer = await asyncio.open_connection(host, port)
+            slow_writer.write(b'GET /health HTTP/1.1\r\n')  # never finishes
+            await slow_writer.drain()
+
+            status, _, _ = await asyncio.wait_for(
+                self.request(host, port, b'GET /health HTTP/1.1\r\n\r\n'), timeout=0.1
+            )
+            slow_writer.close()
+            return status
+
+        self.assertEqual(self.run_with_server(test), 200)
+
+    def test_idle_connection_closed_after_timeout(self):
+        """Test that the bounded read timeout closes idle connections."""
+        async def test(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            data = await asyncio.wait_for(reader.read(), timeout=1.0)
+            writer.close()
+            return data
+
+        self.assertEqual(self.run_with_server(test), b'')
+
+    def test_custom_route(self):
+        """Test registering an additional endpoint."""
+        async def metrics():
+            return 200, 'text/plain', b'up 1\n'
+
+        async def runner():
+            server = HealthServer(sock=bind_listen_socket(0, '127.0.0.1'))
+            server.add_route('/metrics', metrics)
+            await server.start()
+            try:
+                return await self.request(*server.address, b'GET /metrics?x=1 HTTP/1.1\r\n\r\n')
+            finally:
+                await server.close()
+
+        status, _, body = asyncio.run(runner())
+        self.assertEqual((status, body), (200, b'up 1\n'))
+
+    def test_metrics_route(self):
+        """Test serving a registry in Prometheus text format."""
+        registry = Registry()
+        registry.gauge('squid_processes', 'Processes.').set(3)
+
+        async def runner():
+            server = HealthServer(sock=bind_listen_socket(0, '127.0.0.1'))
+            server.add_route('/metrics', metrics_handler(registry))
+            await server.start()
+            try:
+                return await self.request(*server.address, b'GET /metrics HTTP/1.1\r\n\r\n')
+            finally:
+                await server.close()
+
+        status, headers, body = asyncio.run(runner())
+        self.assertEqual(status, 200)
+        self.assertTrue(headers['content-type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'squid_processes 3\n', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,27 +14,50 @@ Requirements:
 - Mock subprocess calls and filesystem operations
 """
 
+import asyncio
 import os
-import subprocess
 import sys
+import tempfile
 import unittest
 from pathlib import Path
-from unittest.mock import Mock, MagicMock, patch, mock_open, call
+from unittest.mock import AsyncMock, Mock, MagicMock, patch, call
 
 # Add container directory to path to import init-squid module
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
 
 # Import the module under test (rename to avoid dash in module name)
 import importlib.util
+from cache_advisor import DEFAULT_CACHE_MEM_MB, Recommendation, SizingReport
+from squid_config import CacheDir, clear_config_cache
+
 spec = importlib.util.spec_from_file_location(
     "init_squid",
     Path(__file__).parent.parent.parent / "container" / "init-squid.py"
 )
 init_squid = importlib.util.module_from_spec(spec)
+sys.modules["init_squid"] = init_squid
 spec.loader.exec_module(init_squid)
 
 
-class TestCacheDirParsing(unittest.TestCase):
+class ConfigFileTestCase(unittest.TestCase):
+    """Base class writing squid.conf content to a temporary file."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        clear_config_cache()
+
+    def use_config(self, content):
+        """Point init_squid.SQUID_CONF at a temp file with the given content."""
+        config_path = Path(self.tmpdir.name) / "squid.conf"
+        config_path.write_text(content)
+        patcher = patch.object(init_squid, 'SQUID_CONF', config_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return config_path
+
+
+class TestCacheDirParsing(ConfigFileTestCase):
     """Test squid.conf parsing for cache_dir directive."""
 
     def test_parse_cache_dir_found(self):
@@ -44,20 +67,18 @@ class TestCacheDirParsing(unittest.TestCase):
 cache_dir ufs /var/spool/squid 1000 16 256
 http_port 3128
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.parse_cache_dir_from_config()
-                self.assertEqual(result, Path("/var/spool/squid"))
+        self.use_config(config_content)
+        result = init_squid.parse_cache_dir_from_config()
+        self.assertEqual(result, Path("/var/spool/squid"))
 
     def test_parse_cache_dir_custom_path(self):
         """Test parsing custom cache_dir path."""
         config_content = """
 cache_dir ufs /custom/cache/path 5000 32 512
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.parse_cache_dir_from_config()
-                self.assertEqual(result, Path("/custom/cache/path"))
+        self.use_config(config_content)
+        result = init_squid.parse_cache_dir_from_config()
+        self.assertEqual(result, Path("/custom/cache/path"))
 
     def test_parse_cache_dir_commented_out(self):
         """Test that commented cache_dir directive is ignored."""
@@ -65,14 +86,13 @@ cache_dir ufs /custom/cache/path 5000 32 512
 # cache_dir ufs /var/spool/squid 1000 16 256
 http_port 3128
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.parse_cache_dir_from_config()
-                self.assertIsNone(result)
+        self.use_config(config_content)
+        result = init_squid.parse_cache_dir_from_config()
+        self.assertIsNone(result)
 
     def test_parse_cache_dir_missing_config(self):
         """Test behavior when squid.conf doesn't exist."""
-        with patch.object(init_squid.SQUID_CONF, 'exists', return_value=False):
+        with patch.object(init_squid, 'SQUID_CONF', Path(self.tmpdir.name) / "missing.conf"):
             result = init_squid.parse_cache_dir_from_config()
             self.assertIsNone(result)
 
@@ -82,13 +102,25 @@ http_port 3128
 cache_dir ufs /first/cache 1000 16 256
 cache_dir ufs /second/cache 2000 16 256
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.parse_cache_dir_from_config()
-                self.assertEqual(result, Path("/first/cache"))
+        self.use_config(config_content)
+        result = init_squid.parse_cache_dir_from_config()
+        self.assertEqual(result, Path("/first/cache"))
+
 
+    def test_parse_all_cache_dirs(self):
+        """Test that every cache_dir directive is discovered."""
+        self.use_config("""
+cache_dir aufs /disk1/cache 1000 16 256
+cache_dir ufs /disk2/cache 2000 32 128
+cache_dir rock /disk3/rock 4000
+""")
+        result = init_squid.parse_cache_dirs_from_config()
+        self.assertEqual([(c.store_type, c.path) for c in result], [
+            ('aufs', Path('/disk1/cache')), ('ufs', Path('/disk2/cache')), ('rock', Path('/disk3/rock')),
+        ])
 
-class TestSSLBumpDetection(unittest.TestCase):
+
+class TestSSLBumpDetection(ConfigFileTestCase):
     """Test SSL-bump detection from squid.conf."""
 
     def test_ssl_bump_enabled_sslcrtd_program(self):
@@ -96,10 +128,9 @@ class TestSSLBumpDetection(unittest.TestCase):
         config_content = """
 sslcrtd_program /usr/libexec/squid/security_file_certgen -s /var/lib/squid/ssl_db -M 4MB
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.check_ssl_bump_enabled()
-                self.assertTrue(result)
+        self.use_config(config_content)
+        result = init_squid.check_ssl_bump_enabled()
+        self.assertTrue(result)
 
     def test_ssl_bump_disabled(self):
         """Test when SSL-bump is not configured."""
@@ -107,10 +138,9 @@ sslcrtd_program /usr/libexec/squid/security_file_certgen -s /var/lib/squid/ssl_d
 http_port 3128
 cache_dir ufs /var/spool/squid 1000 16 256
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.check_ssl_bump_enabled()
-                self.assertFalse(result)
+        self.use_config(config_content)
+        result = init_squid.check_ssl_bump_enabled()
+        self.assertFalse(result)
 
     def test_ssl_bump_commented_out(self):
         """Test that commented SSL directives are ignored."""
@@ -118,13 +148,12 @@ cache_dir ufs /var/spool/squid 1000 16 256
 # sslcrtd_program /usr/libexec/squid/security_file_certgen -s /var/lib/squid/ssl_db -M 4MB
 http_port 3128
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.check_ssl_bump_enabled()
-                self.assertFalse(result)
+        self.use_config(config_content)
+        result = init_squid.check_ssl_bump_enabled()
+        self.assertFalse(result)
 
 
-class TestCacheSizeParsing(unittest.TestCase):
+class TestCacheSizeParsing(ConfigFileTestCase):
     """Test cache size extraction from squid.conf."""
 
     def test_get_cache_size_found(self):
@@ -132,20 +161,18 @@ class TestCacheSizeParsing(unittest.TestCase):
         config_content = """
 cache_dir ufs /var/spool/squid 5000 32 512
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.get_cache_size_from_config()
-                self.assertEqual(result, 5000)
+        self.use_config(config_content)
+        result = init_squid.get_cache_size_from_config()
+        self.assertEqual(result, 5000)
 
     def test_get_cache_size_not_found(self):
         """Test when no cache_dir directive present."""
         config_content = """
 http_port 3128
 """
-        with patch('builtins.open', mock_open(read_data=config_content)):
-            with patch.object(init_squid.SQUID_CONF, 'exists', return_value=True):
-                result = init_squid.get_cache_size_from_config()
-                self.assertIsNone(result)
+        self.use_config(config_content)
+        result = init_squid.get_cache_size_from_config()
+        self.assertIsNone(result)
 
 
 class TestVolumeValidation(unittest.TestCase):
@@ -220,22 +247,30 @@ class TestVolumeValidation(unittest.TestCase):
         self.assertFalse(result)
 
 
+def mock_process(returncode=0, stdout=b"", stderr=b""):
+    """Build a mock asyncio subprocess with the given result."""
+    process = Mock()
+    process.returncode = returncode
+    process.communicate = AsyncMock(return_value=(stdout, stderr))
+    return process
+
+
 class TestCacheInitialization(unittest.TestCase):
     """Test cache directory initialization."""
 
-    @patch('subprocess.run')
+    @patch('asyncio.create_subprocess_exec')
     @patch.object(Path, 'exists')
     def test_cache_already_initialized(self, mock_exists, mock_subprocess):
         """Test that already initialized cache is skipped."""
         # Cache directory 00 exists - already initialized
         mock_exists.return_value = True
 
-        init_squid.initialize_cache_directory(Path("/var/spool/squid"))
+        asyncio.run(init_squid.initialize_cache_directory(Path("/var/spool/squid")))
 
         # subprocess should not be called
         mock_subprocess.assert_not_called()
 
-    @patch('subprocess.run')
+    @patch('asyncio.create_subprocess_exec')
     @patch.object(Path, 'exists')
     def test_cache_initialization_success(self, mock_exists, mock_subprocess):
         """Test successful cache initialization."""
@@ -243,38 +278,32 @@ class TestCacheInitialization(unittest.TestCase):
         mock_exists.return_value = False
 
         # Mock successful squid -z
-        mock_result = Mock()
-        mock_result.returncode = 0
-        mock_result.stdout = ""
-        mock_result.stderr = ""
-        mock_subprocess.return_value = mock_result
+        mock_subprocess.return_value = mock_process(returncode=0)
 
-        init_squid.initialize_cache_directory(Path("/var/spool/squid"))
+        asyncio.run(init_squid.initialize_cache_directory(Path("/var/spool/squid")))
 
         # Verify squid -z was called
         mock_subprocess.assert_called_once()
         call_args = mock_subprocess.call_args
-        self.assertEqual(call_args[0][0][0], "squid")
-        self.assertEqual(call_args[0][0][1], "-z")
+        self.assertEqual(call_args[0][0], "squid")
+        self.assertEqual(call_args[0][1], "-z")
 
-    @patch('subprocess.run')
+    @patch('asyncio.create_subprocess_exec')
     @patch.object(Path, 'exists')
     def test_cache_initialization_failure(self, mock_exists, mock_subprocess):
         """Test cache initialization failure causes exit."""
         mock_exists.return_value = False
 
         # Mock failed squid -z
-        mock_result = Mock()
-        mock_result.returncode = 1
-        mock_result.stdout = ""
-        mock_result.stderr = "Error: Permission denied"
-        mock_subprocess.return_value = mock_result
+        mock_subprocess.return_value = mock_process(
+            returncode=1, stderr=b"Error: Permission denied"
+        )
 
         with self.assertRaises(SystemExit) as cm:
-            init_squid.initialize_cache_directory(Path("/var/spool/squid"))
+            asyncio.run(init_squid.initialize_cache_directory(Path("/var/spool/squid")))
         self.assertEqual(cm.exception.code, 1)
 
-    @patch('subprocess.run')
+    @patch('asyncio.create_subprocess_exec')
     @patch.object(Path, 'exists')
     def test_cache_initialization_squid_not_found(self, mock_exists, mock_subprocess):
         """Test that missing squid binary causes exit."""
@@ -282,108 +311,148 @@ class TestCacheInitialization(unittest.TestCase):
         mock_subprocess.side_effect = FileNotFoundError("squid not found")
 
         with self.assertRaises(SystemExit) as cm:
-            init_squid.initialize_cache_directory(Path("/var/spool/squid"))
+            asyncio.run(init_squid.initialize_cache_directory(Path("/var/spool/squid")))
+        self.assertEqual(cm.exception.code, 1)
+
+
+class TestSwapDirectories(unittest.TestCase):
+    """Test native parallel creation of L1/L2 swap directories."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name)
+
+    def cache_dir(self, name, store_type='ufs', l1=4, l2=8):
+        path = self.root / name
+        path.mkdir()
+        return CacheDir(store_type, path, 100, l1, l2)
+
+    def test_creates_all_cache_dirs(self):
+        disks = [self.cache_dir('disk1'), self.cache_dir('disk2', 'aufs', l1=16, l2=256)]
+        with self.assertLogs(init_squid.logger, level='INFO') as logs:
+            asyncio.run(init_squid.initialize_cache_directories(disks))
+
+        self.assertEqual(sorted(p.name for p in disks[0].path.iterdir()), ['00', '01', '02', '03'])
+        self.assertEqual(sorted(p.name for p in (disks[0].path / '03').iterdir()),
+                         [f'{j:02X}' for j in range(8)])
+        self.assertTrue((disks[1].path / '0F' / 'FF').is_dir())
+        self.assertTrue(all(init_squid.cache_dir_initialized(d) for d in disks))
+        self.assertIn('Cache initialization complete: 4148 directories', '\n'.join(logs.output))
+
+    def test_already_initialized(self):
+        disk = self.cache_dir('disk1')
+        for i in range(4):
+            for j in range(8):
+                (disk.path / f'{i:02X}' / f'{j:02X}').mkdir(parents=True)
+        with patch.object(init_squid, 'create_swap_directories') as mock_create:
+            asyncio.run(init_squid.initialize_cache_directories([disk]))
+        mock_create.assert_not_called()
+
+    def test_repairs_missing_swap_directories(self):
+        """Test that an initialized tree with missing L1/L2 directories is completed."""
+        disk = self.cache_dir('disk1')
+        (disk.path / '00').mkdir()
+        (disk.path / '01' / '03').mkdir(parents=True)
+        with self.assertLogs(init_squid.logger, level='INFO') as logs:
+            asyncio.run(init_squid.initialize_cache_directories([disk]))
+        self.assertTrue((disk.path / '03' / '07').is_dir())
+        self.assertTrue((disk.path / '00' / '00').is_dir())
+        output = '\n'.join(logs.output)
+        self.assertIn('swap directories missing', output)
+        self.assertIn('swap.state missing', output)
+
+    def test_resumes_interrupted_initialization(self):
+        """Test that a partial tree without "00" is completed."""
+        disk = self.cache_dir('disk1')
+        (disk.path / '02' / '05').mkdir(parents=True)
+        asyncio.run(init_squid.initialize_cache_directories([disk]))
+        self.assertTrue((disk.path / '02' / '07').is_dir())
+        self.assertTrue((disk.path / '00' / '07').is_dir())
+
+    def test_default_layout(self):
+        disk = CacheDir('ufs', self.root, 100)
+        self.assertEqual(init_squid.swap_layout(disk), (16, 256))
+
+    def test_rock_uses_squid_z(self):
+        disks = [self.cache_dir('disk1'), self.cache_dir('rock', 'rock')]
+        with patch.object(init_squid, 'initialize_cache_directory') as mock_squid_z:
+            asyncio.run(init_squid.initialize_cache_directories(disks))
+        mock_squid_z.assert_called_once_with(disks[1].path)
+        self.assertTrue((disks[0].path / '00').is_dir())
+
+    def test_mkdir_failure_exits(self):
+        disk = self.cache_dir('disk1')
+        (disk.path / '01').write_text('')  # A file where an L1 directory belongs
+        with self.assertRaises(SystemExit) as cm:
+            asyncio.run(init_squid.initialize_cache_directories([disk]))
         self.assertEqual(cm.exception.code, 1)
+        self.assertFalse((disk.path / '00').exists())
 
 
 class TestSSLDatabaseInitialization(unittest.TestCase):
     """Test SSL certificate database initialization."""
 
-    @patch.object(Path, 'exists')
-    def test_ssl_db_already_initialized(self, mock_exists):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.ssl_db_dir = Path(self.tmpdir.name) / "ssl_db"
+
+        # Fake security_file_certgen binary
+        self.certgen = Path(self.tmpdir.name) / "security_file_certgen"
+        self.certgen.touch()
+        patcher = patch.object(init_squid, 'CERTGEN_CANDIDATES', [self.certgen])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('asyncio.create_subprocess_exec')
+    def test_ssl_db_already_initialized(self, mock_subprocess):
         """Test that already initialized SSL DB is skipped."""
-        # Mock /var/lib/squid/ssl_db/certs exists
-        def exists_side_effect(path):
-            if 'certs' in str(path):
-                return True
-            return False
-
-        with patch.object(Path, 'exists', side_effect=exists_side_effect):
-            with patch('subprocess.run') as mock_subprocess:
-                init_squid.initialize_ssl_database(Path("/var/lib/squid/ssl_db"))
-                mock_subprocess.assert_not_called()
-
-    @patch('subprocess.run')
-    @patch('shutil.rmtree')
-    @patch.object(Path, 'exists')
-    @patch.object(Path, 'rmdir')
-    def test_ssl_db_initialization_success(self, mock_rmdir, mock_exists, mock_rmtree, mock_subprocess):
+        (self.ssl_db_dir / "certs").mkdir(parents=True)
+
+        asyncio.run(init_squid.initialize_ssl_database(self.ssl_db_dir))
+        mock_subprocess.assert_not_called()
+
+    @patch('asyncio.create_subprocess_exec')
+    def test_ssl_db_initialization_success(self, mock_subprocess):
         """Test successful SSL database initialization."""
-        # Mock directory doesn't exist initially, then exists after creation
-        call_count = [0]
-
-        def exists_side_effect(path=None):
-            call_count[0] += 1
-            # certs dir doesn't exist, parent dir exists, certgen exists
-            if 'certs' in str(path):
-                return False
-            if 'security_file_certgen' in str(path):
-                return True
-            if call_count[0] > 5:  # After creation
-                return True
-            return False
-
-        mock_exists.side_effect = exists_side_effect
-
-        # Mock successful security_file_certgen
-        mock_result = Mock()
-        mock_result.returncode = 0
-        mock_result.stdout = ""
-        mock_result.stderr = ""
-        mock_subprocess.return_value = mock_result
-
-        # Mock os.walk for permission setting
-        with patch('os.walk', return_value=[]):
-            init_squid.initialize_ssl_database(Path("/var/lib/squid/ssl_db"))
+        # Broken leftover directory must be removed before creation
+        self.ssl_db_dir.mkdir()
+        (self.ssl_db_dir / "index.txt").touch()
+
+        mock_subprocess.return_value = mock_process(returncode=0)
+
+        asyncio.run(init_squid.initialize_ssl_database(self.ssl_db_dir))
 
         # Verify security_file_certgen was called
         mock_subprocess.assert_called_once()
-        call_args = mock_subprocess.call_args[0][0]
+        call_args = mock_subprocess.call_args[0]
         self.assertIn("security_file_certgen", call_args[0])
         self.assertIn("-c", call_args)
         self.assertIn("-s", call_args)
+        self.assertFalse(self.ssl_db_dir.exists())
 
-    @patch('subprocess.run')
-    @patch.object(Path, 'exists')
-    def test_ssl_db_initialization_certgen_not_found(self, mock_exists, mock_subprocess):
+    @patch('asyncio.create_subprocess_exec')
+    def test_ssl_db_initialization_certgen_not_found(self, mock_subprocess):
         """Test that missing security_file_certgen causes exit."""
-        def exists_side_effect(path=None):
-            if 'certs' in str(path):
-                return False
-            if 'security_file_certgen' in str(path):
-                return False  # Certgen not found
-            return True
-
-        mock_exists.side_effect = exists_side_effect
+        self.certgen.unlink()
 
         with self.assertRaises(SystemExit) as cm:
-            init_squid.initialize_ssl_database(Path("/var/lib/squid/ssl_db"))
+            asyncio.run(init_squid.initialize_ssl_database(self.ssl_db_dir))
         self.assertEqual(cm.exception.code, 1)
+        mock_subprocess.assert_not_called()
 
-    @patch('subprocess.run')
-    @patch.object(Path, 'exists')
-    def test_ssl_db_initialization_failure(self, mock_exists, mock_subprocess):
+    @patch('asyncio.create_subprocess_exec')
+    def test_ssl_db_initialization_failure(self, mock_subprocess):
         """Test SSL database initialization failure causes exit."""
-        def exists_side_effect(path=None):
-            if 'certs' in str(path):
-                return False
-            if 'security_file_certgen' in str(path):
-                return True
-            return True
-
-        mock_exists.side_effect = exists_side_effect
-
         # Mock failed security_file_certgen
-        mock_result = Mock()
-        mock_result.returncode = 1
-        mock_result.stdout = ""
-        mock_result.stderr = "Error: Permission denied"
-        mock_subprocess.return_value = mock_result
+        mock_subprocess.return_value = mock_process(
+            returncode=1, stderr=b"Error: Permission denied"
+        )
 
-        with patch.object(Path, 'stat'):
-            with self.assertRaises(SystemExit) as cm:
-                init_squid.initialize_ssl_database(Path("/var/lib/squid/ssl_db"))
-            self.assertEqual(cm.exception.code, 1)
+        with self.assertRaises(SystemExit) as cm:
+            asyncio.run(init_squid.initialize_ssl_database(self.ssl_db_dir))
+        self.assertEqual(cm.exception.code, 1)
 
 
 class TestCacheSizeValidation(unittest.TestCase):
@@ -447,39 +516,89 @@ class TestCacheSizeValidation(unittest.TestCase):
         init_squid.validate_cache_size(Path("/var/spool/squid"))
 
 
+class TestCacheSizing(unittest.TestCase):
+    """Test the sizing advisor run from setup_cache."""
+
+    @patch('init_squid.load_config', return_value=None)
+    def test_logs_warnings_and_recommendations(self, _):
+        cache_dir = CacheDir('ufs', Path('/var/spool/squid'), 40000, 16, 256)
+        report = SizingReport([Recommendation(cache_dir, 'rock', 30000, limited_by='inode')],
+                              warnings=['cache_dir /var/spool/squid: inode-bound'])
+        with patch('init_squid.advise', return_value=report) as mock_advise:
+            with self.assertLogs(init_squid.logger, level='INFO') as logs:
+                asyncio.run(init_squid.check_cache_sizing([cache_dir]))
+
+        self.assertEqual(mock_advise.call_args.args[:2], ([cache_dir], DEFAULT_CACHE_MEM_MB))
+        output = '\n'.join(logs.output)
+        self.assertIn('WARNING:init_squid:cache_dir /var/spool/squid: inode-bound', output)
+        self.assertIn('recommended cache_dir rock /var/spool/squid 30000 (inode-bound', output)
+
+    @patch('init_squid.advise', side_effect=PermissionError('denied'))
+    def test_advisor_failure_is_not_fatal(self, _):
+        with self.assertLogs(init_squid.logger, level='WARNING'):
+            asyncio.run(init_squid.check_cache_sizing([]))
+
+
 class TestMainFlow(unittest.TestCase):
     """Test main initialization flow and edge cases."""
 
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache_dirs = [
+            CacheDir('ufs', Path(self.tmpdir.name), 1000, 16, 256),
+            CacheDir('aufs', Path(self.tmpdir.name), 2000, 16, 256),
+        ]
+
     @patch('init_squid.validate_volume_writable')
     @patch('init_squid.check_ssl_bump_enabled')
+    @patch('init_squid.check_cache_sizing')
     @patch('init_squid.validate_cache_size')
-    @patch('init_squid.initialize_cache_directory')
-    @patch('init_squid.parse_cache_dir_from_config')
-    def test_main_with_cache_dir(self, mock_parse, mock_init_cache, mock_validate_size,
+    @patch('init_squid.initialize_cache_directories')
+    @patch('init_squid.parse_cache_dirs_from_config')
+    def test_main_with_cache_dir(self, mock_parse, mock_init_cache, mock_validate_size, mock_sizing,
                                    mock_ssl_check, mock_validate_vol):
-        """Test main flow with cache_dir configured."""
-        mock_parse.return_value = Path("/var/spool/squid")
+        """Test main flow with cache_dirs configured."""
+        mock_parse.return_value = self.cache_dirs
         mock_ssl_check.return_value = False
         mock_validate_vol.return_value = True
 
         result = init_squid.main()
 
         self.assertEqual(result, 0)
-        mock_validate_vol.assert_called()
-        mock_init_cache.assert_called_once()
-        mock_validate_size.assert_called_once()
+        self.assertEqual(mock_validate_vol.call_count, 3)  # Both cache_dirs and the log dir
+        mock_init_cache.assert_called_once_with(self.cache_dirs)
+        # The sizing advisor replaces the disk size check
+        mock_validate_size.assert_not_called()
+        mock_sizing.assert_called_once_with(self.cache_dirs)
+
+    @patch('init_squid.CACHE_ADVISOR_SAMPLE', 0)
+    @patch('init_squid.validate_volume_writable', return_value=True)
+    @patch('init_squid.check_ssl_bump_enabled', return_value=False)
+    @patch('init_squid.check_cache_sizing')
+    @patch('init_squid.validate_cache_size')
+    @patch('init_squid.initialize_cache_directories')
+    @patch('init_squid.parse_cache_dirs_from_config')
+    def test_main_without_advisor(self, mock_parse, mock_init_cache, mock_validate_size, mock_sizing, *_):
+        """Test that the disk size check runs when the sizing advisor is disabled."""
+        mock_parse.return_value = self.cache_dirs
+
+        self.assertEqual(init_squid.main(), 0)
+        mock_sizing.assert_not_called()
+        # cache_dirs on one filesystem are validated against its size together
+        mock_validate_size.assert_called_once_with(Path(self.tmpdir.name), 3000)
 
     @patch('init_squid.validate_volume_writable')
     @patch('init_squid.initialize_ssl_database')
     @patch('init_squid.check_ssl_bump_enabled')
-    @patch('init_squid.parse_cache_dir_from_config')
+    @patch('init_squid.parse_cache_dirs_from_config')
     def test_main_with_ssl_bump(self, mock_parse, mock_ssl_check, mock_init_ssl, mock_validate_vol):
         """Test main flow with SSL-bump enabled."""
-        mock_parse.return_value = Path("/var/spool/squid")
+        mock_parse.return_value = self.cache_dirs
         mock_ssl_check.return_value = True
         mock_validate_vol.return_value = True
 
-        with patch('init_squid.initialize_cache_directory'):
+        with patch('init_squid.initialize_cache_directories'):
             with patch('init_squid.validate_cache_size'):
                 result = init_squid.main()
 
@@ -487,18 +606,31 @@ class TestMainFlow(unittest.TestCase):
         mock_init_ssl.assert_called_once()
 
     @patch('init_squid.check_ssl_bump_enabled')
-    @patch('init_squid.parse_cache_dir_from_config')
+    @patch('init_squid.parse_cache_dirs_from_config')
     def test_main_no_cache_dir_configured(self, mock_parse, mock_ssl_check):
         """Test main flow when no cache_dir directive in config."""
-        mock_parse.return_value = None
+        mock_parse.return_value = []
         mock_ssl_check.return_value = False
 
-        with patch.object(init_squid.DEFAULT_CACHE_DIR, 'exists', return_value=False):
+        with patch('init_squid.initialize_cache_directories') as mock_init_cache:
             with patch('init_squid.validate_volume_writable') as mock_validate:
                 mock_validate.return_value = False
                 result = init_squid.main()
 
         self.assertEqual(result, 0)
+        mock_init_cache.assert_not_called()
+
+    @patch('init_squid.validate_volume_writable')
+    @patch('init_squid.setup_ssl_database')
+    @patch('init_squid.setup_cache')
+    def test_initialize_async_api(self, mock_cache, mock_ssl, mock_validate_vol):
+        """Test that initialize() can be awaited from an existing event loop."""
+        async def run_test():
+            return await init_squid.initialize()
+
+        self.assertEqual(asyncio.run(run_test()), 0)
+        mock_cache.assert_awaited_once()
+        mock_ssl.assert_awaited_once()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+"""
+Unit tests for the asyncio log follower.
+
+Tests the log_follower module line splitting across reads and following a
+real file through appends, rotation and truncation.
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from log_follower import LineSplitter, LogFollower
+
+
+class TestLineSplitter(unittest.TestCase):
+    """Tests for LineSplitter."""
+
+    def test_partial_lines_carried_over(self):
+        splitter = LineSplitter()
+        self.assertEqual(splitter.feed(b'one\ntw'), [b'one'])
+        self.assertEqual(splitter.feed(b'o\nthr'), [b'two'])
+        self.assertEqual(splitter.feed(b'ee\n'), [b'three'])
+        self.assertEqual(splitter.feed(b''), [])
+
+    def test_overlong_line_dropped(self):
+        splitter = LineSplitter(max_line=8)
+        self.assertEqual(splitter.feed(b'x' * 20), [])
+        self.assertEqual(splitter.feed(b'tail\nok\n'), [b'tail', b'ok'])
+        self.assertEqual(splitter.dropped, 1)
+
+    def test_reset(self):
+        splitter = LineSplitter()
+        splitter.feed(b'stale')
+        splitter.reset()
+        self.assertEqual(splitter.feed(b'fresh\n'), [b'fresh'])
+
+
+class TestLogFollower(unittest.TestCase):
+    """Tests for LogFollower against a temporary log directory."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / 'access.log'
+        self.lines = []
+
+    def append(self, data, path=None):
+        with open(path or self.path, 'ab') as f:
+            f.write(data)
+
+    def follow(self, scenario, **kwargs):
+        """Run the follower while scenario() mutates the log."""
+        async def runner():
+            follower = LogFollower(self.path, self.lines.extend, poll_interval=0.05, **kwargs)
+            task = asyncio.create_task(follower.run())
+            await asyncio.sleep(0.05)
+            try:
+                await scenario()
+                await asyncio.sleep(0.15)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            return follower
+
+        return asyncio.run(runner())
+
+    def test_skips_existing_content(self):
+        """Test that history present at startup is not replayed."""
+        self.append(b'old\n')
+
+        async def scenario():
+            self.append(b'new\n')
+
+        self.follow(scenario)
+        self.assertEqual(self.lines, [b'new'])
+
+    def test_file_created_later(self):
+        """Test that a log created after startup is read from its start."""
+        async def scenario():
+            self.append(b'first\n')
+
+        self.follow(scenario)
+        self.assertEqual(self.lines, [b'first'])
+
+    def test_rotation(self):
+        """Test that rotation drains the old file, then follows the new one."""
+        self.append(b'')
+
+        async def scenario():
+            self.append(b'a\n')
+            await asyncio.sleep(0.1)
+            self.append(b'b\n')
+            os.rename(self.path, str(self.path) + '.0')
+            self.append(b'c\n', str(self.path) + '.0')  # late write to the old fd
+            await asyncio.sleep(0.1)
+            self.append(b'd\n')
+
+        follower = self.follow(scenario)
+        self.assertEqual(self.lines, [b'a', b'b', b'c', b'd'])
+        self.assertEqual(follower.rotations, 1)
+
+    def test_truncation(self):
+        """Test that copytruncate-style truncation restarts at offset 0."""
+        self.append(b'')
+
+        async def scenario():
+            self.append(b'before truncation\n')
+            await asyncio.sleep(0.1)
+            os.truncate(self.path, 0)
+            self.append(b'x\n')
+
+        follower = self.follow(scenario)
+        self.assertEqual(self.lines, [b'before truncation', b'x'])
+        self.assertEqual(follower.truncations, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Unit tests for the subprocess log relay.
+
+Tests the log_relay module chunked line relaying, readiness marker
+detection, queue overflow accounting and flushing on stop.
+"""
+
+import asyncio
+import logging
+import threading
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from log_relay import LogRelay
+from metrics import Registry
+
+
+class ListHandler(logging.Handler):
+    """Collects formatted messages; can be blocked to simulate a slow sink."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def emit(self, record):
+        self.gate.wait()
+        self.messages.append((record.levelno, record.getMessage()))
+
+
+async def relay_chunks(relay, chunks, *args):
+    """Relay chunks through a StreamReader created on the running loop."""
+    reader = asyncio.StreamReader()
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    reader.feed_eof()
+    await relay.relay(reader, 'Squid', *args)
+
+
+class TestLogRelay(unittest.TestCase):
+    """Tests for LogRelay."""
+
+    def setUp(self):
+        self.handler = ListHandler()
+        self.registry = Registry()
+
+    def relay(self, queue_size=100):
+        relay = LogRelay(name=f'test-relay-{id(self)}', queue_size=queue_size, registry=self.registry)
+        relay.logger.setLevel(logging.INFO)
+        relay.start(self.handler)
+        self.addCleanup(relay.stop)
+        return relay
+
+    def test_relays_lines_across_chunks(self):
+        relay = self.relay()
+        asyncio.run(relay_chunks(relay, [b'first li', b'ne\nsecond\r\n\n', b'unterminated']))
+        relay.stop()
+
+        self.assertEqual(self.handler.messages, [
+            (logging.INFO, 'Squid: first line'),
+            (logging.INFO, 'Squid: second'),
+            (logging.INFO, 'Squid: unterminated'),
+        ])
+
+    def test_invalid_utf8_replaced(self):
+        relay = self.relay()
+        asyncio.run(relay_chunks(relay, [b'bad \xff byte\n']))
+        relay.stop()
+        self.assertEqual(self.handler.messages, [(logging.INFO, 'Squid: bad � byte')])
+
+    def test_ready_marker(self):
+        relay = self.relay()
+
+        async def run():
+            ready = asyncio.Event()
+            chunks = [b'starting\n', b'Accepting HTTP Socket connections at conn3\n']
+            await relay_chunks(relay, chunks, ready, b'Accepting HTTP Socket connections')
+            return ready.is_set()
+
+        self.assertTrue(asyncio.run(run()))
+
+    def test_overflow_drops_and_reports(self):
+        """Test that a stalled writer causes counted drops, not blocking."""
+        relay = self.relay(queue_size=10)
+        self.handler.gate.clear()  # writer thread stalls on the first record
+
+        lines = b''.join(b'line %d\n' % i for i in range(100))
+        asyncio.run(asyncio.wait_for(relay_chunks(relay, [lines]), timeout=2.0))
+
+        self.assertGreater(relay.dropped, 0)
+        self.handler.gate.set()
+        relay.stop()
+
+        relayed = [m for level, m in self.handler.messages if level == logging.INFO]
+        warnings = [m for level, m in self.handler.messages if level == logging.WARNING]
+        self.assertEqual(len(relayed) + relay.dropped, 100)
+        self.assertEqual(warnings, [f'Log relay dropped {relay.dropped} lines (queue full)'])
+
+        body = self.registry.render().decode()
+        self.assertIn('squid_log_relay_lines_total 100\n', body)
+        self.assertIn(f'squid_log_relay_dropped_lines_total {relay.dropped}\n', body)
+
+    def test_writes_happen_off_loop(self):
+        """Test that handler emit runs on the listener thread."""
+        threads = []
+        self.handler.emit = lambda record: threads.append(threading.current_thread())
+        relay = self.relay()
+        asyncio.run(relay_chunks(relay, [b'x\n']))
+        relay.stop()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+Unit tests for Squid log rotation.
+
+Tests log discovery, streaming compression, the retention budget, rotation
+triggers and both rotation modes (Squid renaming to .0 itself and
+logfile_rotate 0) against a stand-in squid binary.
+"""
+
+import asyncio
+import gzip
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+import log_rotation
+from log_rotation import LogRotator, compress_file, enforce_retention, log_files, logfile_rotate
+from metrics import Registry
+from squid_config import clear_config_cache, load_squid_config
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RotationTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        self.logs = self.root / 'log'
+        self.logs.mkdir()
+        self.access = self.logs / 'access.log'
+        self.cache = self.logs / 'cache.log'
+        self.calls = self.root / 'calls'
+        self.squid = self.root / 'squid'
+        self.conf = self.root / 'squid.conf'
+        self.registry = Registry()
+        clear_config_cache()
+
+    def configure(self, rotate=None, script=''):
+        lines = [f'access_log stdio:{self.access} squid', f'cache_log stdio:{self.cache}']
+        if rotate is not None:
+            lines.append(f'logfile_rotate {rotate}')
+        self.conf.write_text('\n'.join(lines) + '\n')
+        self.squid.write_text(f'#!/bin/sh\necho "$@" >> {self.calls}\n{script}')
+        self.squid.chmod(0o755)
+
+    def rotator(self, **kwargs):
+        kwargs.setdefault('compression', 'gzip')
+        return LogRotator(self.conf, squid_binary=str(self.squid), registry=self.registry, **kwargs)
+
+    def run_rotation(self, rotator):
+        async def run():
+            result = await rotator.rotate('size')
+            await rotator.wait_idle()
+            rotator.close()
+            return result
+        return asyncio.run(run())
+
+    def archived(self, log):
+        return sorted(p.name[len(log.name) + 1:] for p in self.logs.iterdir()
+                      if p.name.startswith(log.name + '.'))
+
+
+class TestHelpers(RotationTestCase):
+    """Tests for log_files, logfile_rotate, compress_file and enforce_retention."""
+
+    def test_log_files(self):
+        self.configure(rotate=0)
+        config = load_squid_config(self.conf)
+        self.assertEqual(log_files(config), [self.access, self.cache])
+        self.assertEqual(logfile_rotate(config), 0)
+
+    def test_defaults(self):
+        self.conf.write_text('http_port 3128\n')
+        config = load_squid_config(self.conf)
+        self.assertEqual(log_files(config), [log_rotation.LOG_DIR / 'access.log',
+                                             log_rotation.LOG_DIR / 'cache.log'])
+        self.assertEqual(logfile_rotate(config), 10)
+
+    def test_compress_file(self):
+        path = self.logs / 'access.log.20240101-000000'
+        data = b'1700000000.000 45 10.0.0.1 TCP_MISS/200 1234 GET http://a/ - HIER_NONE/- -\n' * 5000
+        path.write_bytes(data)
+
+        output = compress_file(path, 'gzip')
+        self.assertEqual(output.name, 'access.log.20240101-000000.gz')
+        self.assertFalse(path.exists())
+        self.assertEqual(gzip.decompress(output.read_bytes()), data)
+
+    def test_retention_deletes_oldest(self):
+        for i, name in enumerate(('access.log.1.gz', 'access.log.2.gz', 'access.log.3.gz')):
+            path = self.logs / name
+            path.write_bytes(b'x' * 100)
+            os.utime(path, (1000 + i, 1000 + i))
+        self.access.write_bytes(b'x' * 1000)
+
+        kept, deleted = enforce_retention([self.access], 250)
+        self.assertEqual(kept, 200)
+        self.assertEqual([p.name for p in deleted], ['access.log.1.gz'])
+        self.assertTrue(self.access.exists())
+
+
+class TestRotate(RotationTestCase):
+    """Tests for LogRotator.rotate and due."""
+
+    def test_squid_renames(self):
+        """Test logfile_rotate > 0: Squid moves the log to .0, which is archived."""
+        self.configure(script=f'mv {self.access} {self.access}.0\n: > {self.access}\n'
+                              f'mv {self.cache} {self.cache}.0\n: > {self.cache}\n')
+        self.access.write_text('request\n')
+        self.cache.write_text('startup\n')
+
+        self.assertTrue(self.run_rotation(self.rotator()))
+        self.assertEqual(self.calls.read_text(), f'-k rotate -f {self.conf}\n')
+        archived = self.archived(self.access)
+        self.assertEqual(len(archived), 1)
+        self.assertTrue(archived[0].endswith('.gz'))
+        self.assertEqual(gzip.decompress((self.logs / f'access.log.{archived[0]}').read_bytes()),
+                         b'request\n')
+        self.assertEqual(self.access.read_text(), '')
+
+        body = self.registry.render().decode()
+        self.assertIn('squid_log_rotations_total{reason="size"} 1\n', body)
+        self.assertIn('squid_log_last_rotation_seconds ', body)
+        self.assertIn('squid_log_compression_seconds_total ', body)
+
+    def test_rename_before_signal(self):
+        """Test logfile_rotate 0: the log is renamed first and Squid reopens it."""
+        self.configure(rotate=0, script=f': > {self.access}\n: > {self.cache}\n')
+        self.access.write_text('request\n')
+
+        self.assertTrue(self.run_rotation(self.rotator(compression='none')))
+        archived = self.archived(self.access)
+        self.assertEqual(len(archived), 1)
+        self.assertEqual((self.logs / f'access.log.{archived[0]}').read_text(), 'request\n')
+        # Empty logs are not rotated
+        self.assertEqual(self.archived(self.cache), [])
+
+    def test_failed_signal_restores_log(self):
+        self.configure(rotate=0, script='echo "No running copy" >&2\nexit 1\n')
+        self.access.write_text('request\n')
+
+        self.assertFalse(self.run_rotation(self.rotator()))
+        self.assertEqual(self.access.read_text(), 'request\n')
+        self.assertEqual(self.archived(self.access), [])
+        self.assertIn('squid_log_rotation_failures_total 1\n', self.registry.render().decode())
+
+    def test_retention_after_rotation(self):
+        self.configure(rotate=0, script=f': > {self.access}\n')
+        old = self.logs / 'access.log.20000101-000000.gz'
+        old.write_bytes(b'x' * 4096)
+        os.utime(old, (1000, 1000))
+        self.access.write_text('request\n')
+
+        self.run_rotation(self.rotator(retention_bytes=1024))
+        self.assertFalse(old.exists())
+        self.assertEqual(len(self.archived(self.access)), 1)
+        self.assertIn('squid_log_archive_deleted_files_total 1\n', self.registry.render().decode())
+
+    def test_due(self):
+        self.configure()
+        clock = FakeClock()
+        rotator = self.rotator(rotate_size=100, rotate_interval=3600, clock=clock)
+        self.access.write_bytes(b'x' * 99)
+        self.assertIsNone(rotator.due([self.access]))
+        self.access.write_bytes(b'x' * 100)
+        self.assertEqual(rotator.due([self.access]), 'size')
+        self.access.write_bytes(b'')
+        clock.now += 3600
+        self.assertEqual(rotator.due([self.access]), 'time')
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            self.rotator(compression='bzip2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Unit tests for logging configuration.
+
+Tests the JSON lines formatter, source attribution, phase tagging and
+per-source rate limiting with sampling.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+import logging_config
+from logging_config import (
+    JsonFormatter,
+    SourceRateLimiter,
+    TextFormatter,
+    current_phase,
+    record_source,
+    set_phase,
+)
+
+
+def make_record(msg='hello', name='root', level=logging.INFO, args=None, **attrs):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.created = 1700000000.25
+    for key, value in attrs.items():
+        setattr(record, key, value)
+    return record
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestJsonFormatter(unittest.TestCase):
+    """Tests for JsonFormatter."""
+
+    def setUp(self):
+        self.addCleanup(set_phase, logging_config._process_phase)
+        set_phase('running')
+
+    def test_fields(self):
+        entry = json.loads(JsonFormatter().format(make_record('count=%d', args=(3,))))
+        self.assertEqual(entry, {
+            'ts': '2023-11-14T22:13:20.250Z',
+            'level': 'INFO',
+            'source': 'entrypoint',
+            'phase': 'running',
+            'pid': entry['pid'],
+            'msg': 'count=3',
+        })
+
+    def test_single_line_and_unicode(self):
+        line = JsonFormatter().format(make_record('multi\nline "quoted" é'))
+        self.assertNotIn('\n', line)
+        self.assertEqual(json.loads(line)['msg'], 'multi\nline "quoted" é')
+        self.assertIn('é', line)
+
+    def test_relayed_squid_record(self):
+        """Test that relay records report source squid and Squid's pid."""
+        entry = json.loads(JsonFormatter().format(make_record('Squid: x', name='squid', source_pid=42)))
+        self.assertEqual(entry['source'], 'squid')
+        self.assertEqual(entry['pid'], 42)
+
+    def test_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = make_record(level=logging.ERROR)
+            record.exc_info = sys.exc_info()
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertIn('ValueError: boom', entry['exc'])
+
+    def test_suppressed_count(self):
+        entry = json.loads(JsonFormatter().format(make_record(suppressed=5)))
+        self.assertEqual(entry['suppressed'], 5)
+        self.assertIn('[5 earlier records suppressed', TextFormatter().format(make_record(suppressed=5)))
+
+
+class TestSources(unittest.TestCase):
+    """Tests for record_source and phase tagging."""
+
+    def test_record_source(self):
+        self.assertEqual(record_source(make_record(name='squid'), 'entrypoint'), 'squid')
+        self.assertEqual(record_source(make_record(name='init_squid'), 'entrypoint'), 'init-squid')
+        self.assertEqual(record_source(make_record(source='custom'), 'entrypoint'), 'custom')
+        self.assertEqual(record_source(make_record(), 'init-squid'), 'init-squid')
+
+        record = make_record()
+        record.module = 'health_server'
+        self.assertEqual(record_source(record, 'entrypoint'), 'health')
+
+    def test_task_local_phase(self):
+        """Test that concurrently running tasks each report their own phase."""
+        self.addCleanup(set_phase, logging_config._process_phase)
+        set_phase('initializing')
+
+        async def phase(name):
+            set_phase(name, task_local=True)
+            await asyncio.sleep(0)
+            return current_phase()
+
+        async def run():
+            return await asyncio.gather(phase('init_squid'), phase('health_server'))
+
+        self.assertEqual(asyncio.run(run()), ['init_squid', 'health_server'])
+        self.assertEqual(current_phase(), 'initializing')
+
+
+class TestSourceRateLimiter(unittest.TestCase):
+    """Tests for SourceRateLimiter."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def limiter(self, **kwargs):
+        return SourceRateLimiter(rate=10, burst=10, clock=self.clock, **kwargs)
+
+    def test_burst_then_sampling(self):
+        limiter = self.limiter(sample_rate=0.1)
+        passed = [limiter.filter(make_record(name='squid')) for _ in range(110)]
+        # 10 burst records, then every 10th of the 100 excess records
+        self.assertEqual(sum(passed), 20)
+        self.assertEqual(limiter.suppressed_total, {'squid': 90})
+
+    def test_sources_are_independent(self):
+        """Test that a Squid storm does not suppress entrypoint records."""
+        limiter = self.limiter(sample_rate=0)
+        for _ in range(100):
+            limiter.filter(make_record(name='squid'))
+        self.assertTrue(limiter.filter(make_record(name='root')))
+        self.assertFalse(limiter.filter(make_record(name='squid')))
+
+    def test_refill_reports_suppressed(self):
+        limiter = self.limiter(sample_rate=0)
+        for _ in range(15):
+            limiter.filter(make_record(name='squid'))
+
+        self.clock.now += 1.0
+        record = make_record(name='squid')
+        self.assertTrue(limiter.filter(record))
+        self.assertEqual(record.suppressed, 5)
+
+        record = make_record(name='squid')
+        self.assertTrue(limiter.filter(record))
+        self.assertFalse(hasattr(record, 'suppressed'))
+
+    def test_on_handler(self):
+        """Test the limiter as a handler filter in front of JsonFormatter."""
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(self.limiter(sample_rate=0))
+        logger = logging.getLogger('squid')
+        saved = logger.handlers, logger.propagate, logger.level
+        self.addCleanup(lambda: (setattr(logger, 'handlers', saved[0]),
+                                 setattr(logger, 'propagate', saved[1]), logger.setLevel(saved[2])))
+        logger.handlers, logger.propagate = [handler], False
+        logger.setLevel(logging.INFO)
+
+        for i in range(50):
+            logger.info('line %d', i)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(json.loads(lines[-1])['msg'], 'line 9')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+Unit tests for the Prometheus metrics registry and process collector.
+
+Tests the metrics module text exposition and the process_metrics sampler
+against the test process itself.
+"""
+
+import os
+import subprocess
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+import process_metrics
+from metrics import Metric, Registry
+from process_metrics import ProcessCollector
+
+
+class TestMetric(unittest.TestCase):
+    """Tests for Metric sample handling and rendering."""
+
+    def test_render_gauge(self):
+        """Test HELP/TYPE lines and labelled samples."""
+        metric = Metric('squid_up', 'Whether Squid is up.', 'gauge', ('pid',))
+        metric.set(1, pid=42)
+        self.assertEqual(metric.render(), [
+            '# HELP squid_up Whether Squid is up.',
+            '# TYPE squid_up gauge',
+            'squid_up{pid="42"} 1',
+        ])
+
+    def test_render_unlabelled_float(self):
+        """Test that non-integral values keep their precision."""
+        metric = Metric('collect_seconds', 'Collect time.')
+        metric.set(0.125)
+        self.assertEqual(metric.render()[-1], 'collect_seconds 0.125')
+
+    def test_label_escaping(self):
+        """Test that quotes, backslashes and newlines are escaped."""
+        metric = Metric('m', 'h', 'gauge', ('process',))
+        metric.set(1, process='a"b\\c\nd')
+        self.assertEqual(metric.render()[-1], 'm{process="a\\"b\\\\c\\nd"} 1')
+
+    def test_counter_inc(self):
+        """Test counters accumulate and refuse to decrease."""
+        metric = Metric('reloads_total', 'Reloads.', 'counter', ('result',))
+        metric.inc(result='ok')
+        metric.inc(2, result='ok')
+        self.assertEqual(metric.value(result='ok'), 3)
+        with self.assertRaises(ValueError):
+            metric.inc(-1, result='ok')
+
+    def test_wrong_labels(self):
+        """Test that samples must carry exactly the declared labels."""
+        metric = Metric('m', 'h', 'gauge', ('pid',))
+        with self.assertRaises(ValueError):
+            metric.set(1)
+
+    def test_empty_family_not_rendered(self):
+        """Test that a family without samples renders nothing."""
+        self.assertEqual(Metric('m', 'h').render(), [])
+
+
+class TestRegistry(unittest.TestCase):
+    """Tests for Registry families and collectors."""
+
+    def test_get_or_create(self):
+        """Test that the same name returns the same family."""
+        registry = Registry()
+        self.assertIs(registry.gauge('g', 'h'), registry.gauge('g', 'h'))
+        with self.assertRaises(ValueError):
+            registry.counter('g', 'h')
+
+    def test_render_with_collector(self):
+        """Test owned families and collector families render together."""
+        registry = Registry()
+        registry.counter('a_total', 'A.').inc()
+        sampled = Metric('b', 'B.')
+        sampled.set(2)
+        registry.register_collector(lambda: [sampled])
+
+        self.assertEqual(
+            registry.render(),
+            b'# HELP a_total A.\n# TYPE a_total counter\na_total 1\n'
+            b'# HELP b B.\n# TYPE b gauge\nb 2\n'
+        )
+
+    def test_render_empty(self):
+        """Test that an empty registry renders an empty body."""
+        self.assertEqual(Registry().render(), b'')
+
+
+class TestProcessCollector(unittest.TestCase):
+    """Tests for ProcessCollector sampling."""
+
+    def test_collect_process_tree(self):
+        """Test that the root process and its children are sampled."""
+        child = subprocess.Popen(['sleep', '5'])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+
+        registry = Registry()
+        collector = ProcessCollector(os.getpid, registry=registry)
+        families = {family.name: family for family in collector.collect()}
+
+        self.assertGreaterEqual(families['squid_processes'].value(), 2)
+        rss = families['squid_process_resident_memory_bytes']
+        self.assertGreater(rss.value(process='squid'), 0)
+        self.assertGreater(rss.value(process='sleep'), 0)
+        self.assertIsNotNone(families['squid_process_open_fds'].value(process='sleep'))
+        self.assertIsNotNone(families['squid_process_cpu_seconds_total'].value(process='sleep', mode='user'))
+
+        body = registry.render().decode()
+        self.assertIn('squid_process_threads{process="sleep"} 1', body)
+        self.assertIn('squid_process_context_switches_total{', body)
+        self.assertNotIn('pid=', body)
+
+    def test_aggregates_by_role(self):
+        """Test that helpers are summed and exited ones keep their CPU time."""
+        tree = {1: ('squid', 100), 2: ('helper', 200), 3: ('helper', 300)}
+
+        def stat(pid):
+            comm, ticks = tree[pid]
+            return {'comm': comm, 'num_threads': 1, 'utime': ticks, 'stime': 0, 'starttime': pid}
+
+        registry = Registry()
+        collector = ProcessCollector(lambda: 1, registry=registry)
+        with patch.multiple(process_metrics, find_descendants=lambda pid: sorted(tree)[1:],
+                            parse_proc_stat=stat, parse_proc_status=lambda pid: {'VmRSS': '4 kB'},
+                            count_open_fds=lambda pid: 3):
+            families = {family.name: family for family in collector.collect()}
+            self.assertEqual(families['squid_process_threads'].value(process='helper'), 2)
+            self.assertEqual(families['squid_process_resident_memory_bytes'].value(process='squid'), 4096)
+            cpu = families['squid_process_cpu_seconds_total']
+            self.assertEqual(cpu.value(process='helper', mode='user'), 500 / process_metrics.CLOCK_TICKS)
+
+            # Helper 3 exits and is respawned as 4
+            del tree[3]
+            tree[4] = ('helper', 50)
+            families = {family.name: family for family in collector.collect()}
+            self.assertEqual(families['squid_process_threads'].value(process='helper'), 2)
+            cpu = families['squid_process_cpu_seconds_total']
+            self.assertEqual(cpu.value(process='helper', mode='user'), 550 / process_metrics.CLOCK_TICKS)
+
+    def test_process_role(self):
+        """Test that SMP kids are named by the title Squid gives them."""
+        kid = subprocess.Popen(['(squid-coord-3)', '5'], executable='sleep')
+        self.addCleanup(kid.wait)
+        self.addCleanup(kid.kill)
+        # Wait for the exec, until then the child still carries our cmdline
+        cmdline = Path(f'/proc/{kid.pid}/cmdline')
+        while not cmdline.read_bytes().startswith(b'(squid'):
+            time.sleep(0.001)
+        self.assertEqual(process_metrics.process_role(kid.pid, 'squid', os.getpid()), 'squid-coord-3')
+        self.assertEqual(process_metrics.process_role(os.getpid(), 'python', os.getpid()), 'squid')
+        self.assertEqual(process_metrics.process_role(kid.pid, 'sleep', 1), 'squid-coord-3')
+
+    def test_no_squid(self):
+        """Test that a missing PID publishes a zero process count only."""
+        registry = Registry()
+        collector = ProcessCollector(lambda: None, registry=registry)
+        collector.collect()
+        body = registry.render().decode()
+        self.assertIn('squid_processes 0', body)
+        self.assertNotIn('squid_process_threads', body)
+
+    def test_scrape_uses_last_sample(self):
+        """Test that rendering does not resample /proc."""
+        calls = []
+        registry = Registry()
+        collector = ProcessCollector(lambda: calls.append(1), registry=registry)
+        collector.collect()
+        registry.render()
+        registry.render()
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
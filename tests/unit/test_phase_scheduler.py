@@ -0,0 +1,116 @@
+"""
+Unit tests for the startup phase scheduler.
+
+Tests the phase_scheduler module for dependency ordering, concurrency,
+fail-fast cancellation and timing collection.
+"""
+
+import asyncio
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from phase_scheduler import PhaseScheduler
+
+
+class TestPhaseOrdering(unittest.TestCase):
+    """Tests for dependency graph validation."""
+
+    def test_order_respects_dependencies(self):
+        """Test that dependencies always come before dependents."""
+        scheduler = PhaseScheduler()
+        scheduler.add('squid', asyncio.sleep, depends_on=('config', 'dirs'))
+        scheduler.add('config', asyncio.sleep)
+        scheduler.add('dirs', asyncio.sleep)
+
+        order = scheduler.order()
+        self.assertLess(order.index('config'), order.index('squid'))
+        self.assertLess(order.index('dirs'), order.index('squid'))
+
+    def test_unknown_dependency(self):
+        """Test that a dependency on an unregistered phase is rejected."""
+        scheduler = PhaseScheduler()
+        scheduler.add('squid', asyncio.sleep, depends_on=('missing',))
+        with self.assertRaises(ValueError):
+            scheduler.order()
+
+    def test_cycle_detected(self):
+        """Test that dependency cycles are rejected."""
+        scheduler = PhaseScheduler()
+        scheduler.add('a', asyncio.sleep, depends_on=('b',))
+        scheduler.add('b', asyncio.sleep, depends_on=('a',))
+        with self.assertRaises(ValueError):
+            scheduler.order()
+
+    def test_duplicate_phase(self):
+        """Test that registering the same phase twice is rejected."""
+        scheduler = PhaseScheduler()
+        scheduler.add('a', asyncio.sleep)
+        with self.assertRaises(ValueError):
+            scheduler.add('a', asyncio.sleep)
+
+
+class TestPhaseExecution(unittest.TestCase):
+    """Tests for concurrent execution."""
+
+    def test_independent_phases_overlap(self):
+        """Test that independent phases run concurrently."""
+        events = []
+
+        def phase(name, delay):
+            async def run():
+                events.append(f"start:{name}")
+                await asyncio.sleep(delay)
+                events.append(f"end:{name}")
+                return name
+            return run
+
+        async def run_test():
+            scheduler = PhaseScheduler()
+            scheduler.add('a', phase('a', 0.05))
+            scheduler.add('b', phase('b', 0.05))
+            scheduler.add('c', phase('c', 0), depends_on=('a', 'b'))
+            results = await scheduler.run()
+            return scheduler, results
+
+        scheduler, results = asyncio.run(run_test())
+
+        self.assertEqual(results, {'a': 'a', 'b': 'b', 'c': 'c'})
+        # Both a and b started before either finished
+        self.assertEqual(set(events[:2]), {'start:a', 'start:b'})
+        self.assertEqual(events[-2:], ['start:c', 'end:c'])
+        # Overlapping phases: total well below the sequential sum
+        self.assertLess(scheduler.total_time, 0.095)
+        self.assertEqual(set(scheduler.timings), {'a', 'b', 'c'})
+
+    def test_failure_cancels_pending_phases(self):
+        """Test fail-fast behavior when a phase raises."""
+        reached = []
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def slow():
+            await asyncio.sleep(10)
+            reached.append('slow')
+
+        async def dependent():
+            reached.append('dependent')
+
+        async def run_test():
+            scheduler = PhaseScheduler()
+            scheduler.add('fail', fail)
+            scheduler.add('slow', slow)
+            scheduler.add('dependent', dependent, depends_on=('fail',))
+            await scheduler.run()
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_test())
+        self.assertEqual(reached, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,32 @@
 """
 Unit tests for /proc filesystem parsing utilities.
 
-Tests the proc_utils module functions for process existence checking
-and /proc/[pid]/status parsing.
+Tests the proc_utils module functions for process existence checking,
+/proc/[pid]/status and /proc/[pid]/stat parsing, and process tree discovery.
 """
 
+import asyncio
 import os
+import subprocess
+import tempfile
+import time
 import unittest
+from unittest.mock import mock_open, patch
 from pathlib import Path
 import sys
 
 # Add container directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
 
-from proc_utils import check_process_running, parse_proc_status
+from proc_utils import (
+    check_process_running,
+    count_open_fds,
+    find_descendants,
+    parse_proc_stat,
+    parse_proc_status,
+    read_pid_file,
+    wait_for_exit,
+)
 
 
 class TestProcessRunningCheck(unittest.TestCase):
@@ -71,5 +84,106 @@ class TestProcStatusParsing(unittest.TestCase):
         self.assertEqual(int(info['Pid']), 1)
 
 
+
+class TestProcStatParsing(unittest.TestCase):
+    """Tests for parse_proc_stat function."""
+
+    def test_parse_proc_stat_self(self):
+        """Test parsing /proc/self/stat."""
+        info = parse_proc_stat(os.getpid())
+
+        self.assertIsNotNone(info)
+        self.assertEqual(info['ppid'], os.getppid())
+        self.assertGreaterEqual(info['num_threads'], 1)
+        self.assertIsInstance(info['utime'], int)
+        self.assertIn(info['state'], ['R', 'S', 'D'])
+
+    def test_parse_proc_stat_comm_with_spaces(self):
+        """Test that a command name containing ') (' is parsed correctly."""
+        fields = ' '.join(['S', '7'] + ['0'] * 9 + ['11', '22'] + ['0'] * 4 + ['3', '0', '99', '0', '0'])
+        with patch('builtins.open', mock_open(read_data=f'42 (evil) (name) {fields}\n')):
+            info = parse_proc_stat(42)
+
+        self.assertEqual(info['comm'], 'evil) (name')
+        self.assertEqual(info['ppid'], 7)
+        self.assertEqual((info['utime'], info['stime']), (11, 22))
+        self.assertEqual(info['num_threads'], 3)
+        self.assertEqual(info['starttime'], 99)
+
+    def test_parse_proc_stat_nonexistent(self):
+        """Test parsing non-existent PID returns None."""
+        self.assertIsNone(parse_proc_stat(999999))
+
+
+class TestProcessTree(unittest.TestCase):
+    """Tests for open fd counting, descendant discovery and PID files."""
+
+    def test_count_open_fds(self):
+        """Test that opening a file increases the fd count."""
+        before = count_open_fds(os.getpid())
+        with open(__file__):
+            self.assertEqual(count_open_fds(os.getpid()), before + 1)
+
+    def test_count_open_fds_nonexistent(self):
+        """Test counting fds of a non-existent PID returns None."""
+        self.assertIsNone(count_open_fds(999999))
+
+    def test_find_descendants(self):
+        """Test that children and grandchildren are found."""
+        child = subprocess.Popen(['sh', '-c', 'sleep 5 & wait'])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+
+        for _ in range(100):
+            descendants = find_descendants(os.getpid())
+            if len(descendants) >= 2:
+                break
+            time.sleep(0.01)
+
+        self.assertIn(child.pid, descendants)
+        grandchildren = [pid for pid in descendants if parse_proc_stat(pid)['ppid'] == child.pid]
+        self.assertEqual(len(grandchildren), 1)
+        os.kill(grandchildren[0], 9)
+
+    def test_read_pid_file(self):
+        """Test reading valid, malformed and missing PID files."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pid_file = Path(tmpdir) / 'squid.pid'
+            pid_file.write_text('1234\n')
+            self.assertEqual(read_pid_file(pid_file), 1234)
+
+            pid_file.write_text('garbage')
+            self.assertIsNone(read_pid_file(pid_file))
+
+            self.assertIsNone(read_pid_file(Path(tmpdir) / 'missing.pid'))
+
+
+class TestWaitForExit(unittest.TestCase):
+    """Tests for pidfd-based wait_for_exit."""
+
+    def test_wakes_on_exit(self):
+        child = subprocess.Popen(['sleep', '0.2'])
+        self.addCleanup(child.wait)
+
+        start = time.monotonic()
+        asyncio.run(asyncio.wait_for(wait_for_exit(child.pid), timeout=5.0))
+        self.assertLess(time.monotonic() - start, 2.0)
+        # Not reaped by wait_for_exit
+        self.assertEqual(child.wait(timeout=1.0), 0)
+
+    def test_running_process_does_not_wake(self):
+        child = subprocess.Popen(['sleep', '5'])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(wait_for_exit(child.pid), timeout=0.2))
+
+    def test_already_gone(self):
+        child = subprocess.Popen(['true'])
+        child.wait()
+        asyncio.run(asyncio.wait_for(wait_for_exit(child.pid), timeout=1.0))
+
+
 if __name__ == '__main__':
     unittest.main()
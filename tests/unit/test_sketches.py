@@ -0,0 +1,99 @@
+"""
+Unit tests for bounded-memory streaming summaries.
+
+Tests the sketches module QuantileSketch accuracy and merging, and
+SpaceSaving heavy-hitter tracking.
+"""
+
+import math
+import random
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from sketches import QuantileSketch, SpaceSaving
+
+
+class TestQuantileSketch(unittest.TestCase):
+    """Tests for QuantileSketch."""
+
+    def test_relative_accuracy(self):
+        """Test quantiles stay within the relative error on skewed data."""
+        rng = random.Random(1)
+        values = sorted(rng.lognormvariate(3, 1.5) for _ in range(20000))
+        sketch = QuantileSketch(0.01)
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.9, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.0101)
+
+    def test_bounded_size(self):
+        """Test that bucket count grows with the value range, not the sample count."""
+        sketch = QuantileSketch(0.01)
+        for i in range(100000):
+            sketch.add(1 + i % 1000)
+        self.assertLess(len(sketch.bins), 400)
+        self.assertEqual(sketch.count, 100000)
+
+    def test_zero_values(self):
+        sketch = QuantileSketch()
+        for value in (0, 0, 0, 10):
+            sketch.add(value)
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertAlmostEqual(sketch.quantile(1.0), 10, delta=0.1)
+
+    def test_empty(self):
+        self.assertTrue(math.isnan(QuantileSketch().quantile(0.5)))
+
+    def test_merge(self):
+        """Test that merging equals sketching the union."""
+        a, b, union = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for value in range(1, 1001):
+            (a if value % 2 else b).add(value)
+            union.add(value)
+        a.merge(b)
+        self.assertEqual(a.count, union.count)
+        self.assertEqual(a.quantile(0.95), union.quantile(0.95))
+
+    def test_merge_different_accuracy(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+class TestSpaceSaving(unittest.TestCase):
+    """Tests for SpaceSaving."""
+
+    def test_exact_under_capacity(self):
+        summary = SpaceSaving(4)
+        for key, weight in (('a', 5), ('b', 1), ('a', 2), ('c', 3)):
+            summary.add(key, weight)
+        self.assertEqual(summary.top(2), [('a', 7), ('c', 3)])
+
+    def test_heavy_hitters_survive(self):
+        """Test that heavy keys are kept despite a long tail of unique keys."""
+        summary = SpaceSaving(16)
+        for i in range(5000):
+            summary.add('heavy', 10)
+            summary.add(f'tail{i}', 1)
+        top_key, top_weight = summary.top(1)[0]
+        self.assertEqual(top_key, 'heavy')
+        self.assertGreaterEqual(top_weight, 50000)
+        self.assertEqual(len(summary.counts), 16)
+
+    def test_merge_trims_to_capacity(self):
+        a, b = SpaceSaving(3), SpaceSaving(3)
+        for key in 'abc':
+            a.add(key, 1)
+        for key, weight in (('c', 5), ('d', 4), ('e', 3)):
+            b.add(key, weight)
+        a.merge(b)
+        self.assertEqual(a.top(3), [('c', 6), ('d', 4), ('e', 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Unit tests for health check listening socket handoff.
+
+Tests the socket_activation module and healthcheck.create_server with a
+pre-bound socket, both in-process and passed by file descriptor to a child.
+"""
+
+import os
+import subprocess
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+CONTAINER_DIR = Path(__file__).parent.parent.parent / 'container'
+
+# Add container directory to path for imports
+sys.path.insert(0, str(CONTAINER_DIR))
+
+import healthcheck
+from socket_activation import (
+    HEALTH_LISTEN_FD_ENV,
+    bind_listen_socket,
+    handoff_env,
+    inherited_listen_socket,
+)
+
+
+def get_status(port, path='/health'):
+    """Return the HTTP status code for a GET on localhost."""
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+class TestInheritedSocket(unittest.TestCase):
+    """Tests for inherited_listen_socket environment handling."""
+
+    def test_no_handoff(self):
+        """Test that no socket is returned without handoff variables."""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(inherited_listen_socket())
+
+    def test_explicit_fd(self):
+        """Test adopting a descriptor named by HEALTH_LISTEN_FD."""
+        sock = bind_listen_socket(0, '127.0.0.1')
+        fd = os.dup(sock.fileno())
+        sock.close()
+
+        with patch.dict(os.environ, {HEALTH_LISTEN_FD_ENV: str(fd)}, clear=True):
+            inherited = inherited_listen_socket()
+            # Consumed so grandchildren do not see it
+            self.assertNotIn(HEALTH_LISTEN_FD_ENV, os.environ)
+
+        self.assertEqual(inherited.fileno(), fd)
+        inherited.close()
+
+    def test_systemd_other_pid_ignored(self):
+        """Test that LISTEN_FDS meant for another process is ignored."""
+        env = {'LISTEN_FDS': '1', 'LISTEN_PID': str(os.getpid() + 1)}
+        with patch.dict(os.environ, env, clear=True):
+            self.assertIsNone(inherited_listen_socket())
+
+
+class TestHealthServerHandoff(unittest.TestCase):
+    """Tests for serving health checks on a pre-bound socket."""
+
+    def test_in_process_handoff(self):
+        """Test that an in-process server serves on the handed-over socket."""
+        sock = bind_listen_socket(0, '127.0.0.1')
+        port = sock.getsockname()[1]
+        server = healthcheck.create_server(sock)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            # No Squid in the test environment: liveness reports 503
+            self.assertEqual(get_status(port), 503)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_subprocess_handoff_accepts_immediately(self):
+        """Test that probes succeed right after spawning, with no startup sleep."""
+        sock = bind_listen_socket(0, '127.0.0.1')
+        port = sock.getsockname()[1]
+        env = {**os.environ, **handoff_env(sock), 'PYTHONPATH': str(CONTAINER_DIR)}
+        process = subprocess.Popen(
+            [sys.executable, str(CONTAINER_DIR / 'healthcheck.py')],
+            pass_fds=(sock.fileno(),),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        sock.close()
+        try:
+            self.assertEqual(get_status(port, '/missing'), 404)
+        finally:
+            process.terminate()
+            process.wait(timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Unit tests for the shared squid.conf parser.
+
+Tests the squid_config module for directive extraction, include handling,
+line continuations and the stat-fingerprint cache.
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from squid_config import (
+    clear_config_cache,
+    config_digest,
+    load_squid_config,
+    parse_squid_config,
+)
+
+
+class SquidConfigTestCase(unittest.TestCase):
+    """Base class providing a temporary config directory."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name)
+        clear_config_cache()
+
+    def write(self, name, content):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        return path
+
+
+class TestDirectiveParsing(SquidConfigTestCase):
+    """Tests for typed directive extraction."""
+
+    def test_default_config(self):
+        """Test parsing the shipped squid.conf.default."""
+        default = Path(__file__).parent.parent.parent / 'container' / 'squid.conf.default'
+        config = parse_squid_config(default)
+
+        self.assertEqual(len(config.cache_dirs), 1)
+        cache_dir = config.cache_dirs[0]
+        self.assertEqual(cache_dir.store_type, 'ufs')
+        self.assertEqual(cache_dir.path, Path('/var/spool/squid'))
+        self.assertEqual((cache_dir.size_mb, cache_dir.l1, cache_dir.l2), (250, 16, 256))
+
+        self.assertEqual([p.port for p in config.http_ports], [3128])
+        self.assertEqual(config.pid_filename, Path('/var/run/squid/squid.pid'))
+        self.assertEqual(config.access_logs[0].path, Path('/var/log/squid/access.log'))
+        self.assertEqual(config.cache_log.path, Path('/var/log/squid/cache.log'))
+        # Commented-out ssl-bump block (with continuations) must be ignored
+        self.assertFalse(config.ssl_bump_enabled)
+        self.assertIsNone(config.sslcrtd_program)
+
+    def test_hash_inside_arguments(self):
+        """Test that only a '#' at the start of a line begins a comment, as in Squid."""
+        config = parse_squid_config(self.write('squid.conf', (
+            "acl fragment url_regex -i example\\.com/ #top\n"
+            "  # indented comment\n"
+            "logformat tagged %ts #%>a\n")))
+        self.assertEqual(config.acls[0].values, ['example\\.com/', '#top'])
+        self.assertEqual(config.get('logformat')[0].args, ['tagged', '%ts', '#%>a'])
+        self.assertEqual(len(config.directives), 2)
+
+    def test_multiple_cache_dirs_and_rock(self):
+        """Test that all cache_dir lines are collected, including rock stores."""
+        config = parse_squid_config(self.write('squid.conf', """
+cache_dir ufs /cache1 1000 16 256
+cache_dir rock /cache2 2000 max-size=32768
+"""))
+        self.assertEqual([c.path for c in config.cache_dirs], [Path('/cache1'), Path('/cache2')])
+        rock = config.cache_dirs[1]
+        self.assertEqual(rock.size_mb, 2000)
+        self.assertIsNone(rock.l1)
+        self.assertEqual(rock.options, ['max-size=32768'])
+
+    def test_port_forms(self):
+        """Test http_port with address, IPv6 and options."""
+        config = parse_squid_config(self.write('squid.conf', """
+http_port 127.0.0.1:3128
+http_port [::1]:3129 ssl-bump cert=/x.pem
+"""))
+        self.assertEqual(config.http_ports[0].address, '127.0.0.1')
+        self.assertEqual(config.http_ports[0].port, 3128)
+        self.assertEqual(config.http_ports[1].address, '::1')
+        self.assertTrue(config.http_ports[1].ssl_bump)
+        self.assertTrue(config.ssl_bump_enabled)
+
+    def test_acl_file_references(self):
+        """Test that quoted ACL file references are collected."""
+        config = parse_squid_config(self.write('squid.conf', """
+acl blocked dstdomain "/etc/squid/blocked.acl"
+acl nets src -n "/etc/squid/nets.acl" 10.0.0.0/8
+"""))
+        self.assertEqual(config.acl_files, [Path('/etc/squid/blocked.acl'), Path('/etc/squid/nets.acl')])
+        self.assertEqual(config.acls[1].flags, ['-n'])
+        self.assertEqual(config.acls[1].values, ['10.0.0.0/8'])
+
+
+class TestContinuationsAndIncludes(SquidConfigTestCase):
+    """Tests for line continuations and include directives."""
+
+    def test_line_continuation(self):
+        """Test that backslash continuations are joined into one directive."""
+        config = parse_squid_config(self.write('squid.conf', """
+http_port 3128 ssl-bump \\
+  cert=/var/lib/squid/squid-ca.pem \\
+  generate-host-certificates=on
+"""))
+        self.assertEqual(len(config.directives), 1)
+        self.assertEqual(config.http_ports[0].options,
+                         ['ssl-bump', 'cert=/var/lib/squid/squid-ca.pem', 'generate-host-certificates=on'])
+        self.assertEqual(config.directives[0].line, 2)
+
+    def test_include_glob(self):
+        """Test that include globs are followed in sorted order."""
+        self.write('conf.d/20-cache.conf', "cache_dir ufs /cache-b 100 16 256\n")
+        self.write('conf.d/10-cache.conf', "cache_dir ufs /cache-a 100 16 256\n")
+        main = self.write('squid.conf', f"http_port 3128\ninclude {self.root}/conf.d/*.conf\n")
+
+        config = parse_squid_config(main)
+        self.assertEqual([c.path for c in config.cache_dirs], [Path('/cache-a'), Path('/cache-b')])
+        self.assertEqual(len(config.files), 3)
+
+    def test_include_depth_limit(self):
+        """Test that recursive includes are rejected."""
+        main = self.write('squid.conf', f"include {self.root}/squid.conf\n")
+        with self.assertRaises(ValueError):
+            parse_squid_config(main)
+
+
+class TestConfigCache(SquidConfigTestCase):
+    """Tests for the stat-fingerprint configuration cache."""
+
+    def test_cache_hit(self):
+        """Test that unchanged files return the same parsed instance."""
+        main = self.write('squid.conf', "http_port 3128\n")
+        self.assertIs(load_squid_config(main), load_squid_config(main))
+
+    def test_cache_invalidated_on_change(self):
+        """Test that modifying an included file triggers a re-parse."""
+        included = self.write('extra.conf', "http_port 3128\n")
+        main = self.write('squid.conf', f"include {included}\n")
+        first = load_squid_config(main)
+
+        included.write_text("http_port 3129\n")
+        os.utime(included, ns=(0, 1))
+        second = load_squid_config(main)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.http_ports[0].port, 3129)
+
+    def test_cache_invalidated_on_new_include_match(self):
+        """Test that a new file matching an include glob triggers a re-parse."""
+        self.write('conf.d/a.conf', "http_port 3128\n")
+        main = self.write('squid.conf', f"include {self.root}/conf.d/*.conf\n")
+        self.assertEqual(len(load_squid_config(main).http_ports), 1)
+
+        self.write('conf.d/b.conf', "http_port 3129\n")
+        self.assertEqual(len(load_squid_config(main).http_ports), 2)
+
+
+class TestConfigDigest(SquidConfigTestCase):
+    """Tests for the content digest of a configuration."""
+
+    def test_stable_across_touch(self):
+        main = self.write('squid.conf', "http_port 3128\n")
+        before = config_digest(parse_squid_config(main))
+        os.utime(main, ns=(0, 1))
+        self.assertEqual(config_digest(parse_squid_config(main)), before)
+
+    def test_covers_includes_and_acl_files(self):
+        included = self.write('extra.conf', "http_port 3128\n")
+        domains = self.write('domains.txt', ".example.com\n")
+        main = self.write('squid.conf', f"include {included}\nacl blocked dstdomain \"{domains}\"\n")
+        before = config_digest(parse_squid_config(main))
+
+        domains.write_text(".example.org\n")
+        after_acl = config_digest(parse_squid_config(main))
+        self.assertNotEqual(after_acl, before)
+
+        included.write_text("http_port 3129\n")
+        self.assertNotEqual(config_digest(parse_squid_config(main)), after_acl)
+
+
+if __name__ == '__main__':
+    unittest.main()
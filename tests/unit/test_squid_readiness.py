@@ -0,0 +1,176 @@
+"""
+Unit tests for event-driven Squid readiness detection.
+
+Tests the squid_readiness and inotify_watch modules: PID file watching,
+TCP connect probing and first-signal-wins selection.
+"""
+
+import asyncio
+import socket
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+from inotify_watch import IN_CREATE, inotify_available, parse_events
+from squid_readiness import (
+    probe_address,
+    wait_for_pid_file,
+    wait_for_squid_ready,
+    wait_for_tcp,
+)
+
+
+def running_process():
+    """Mock Squid process that never exits."""
+    process = Mock()
+    process.wait = lambda: asyncio.Event().wait()
+    return process
+
+
+class TestInotifyParsing(unittest.TestCase):
+    """Tests for struct inotify_event decoding."""
+
+    def test_parse_events(self):
+        """Test decoding of packed events with padded names."""
+        buf = struct.pack('iIII', 1, IN_CREATE, 0, 16) + b'squid.pid'.ljust(16, b'\0')
+        buf += struct.pack('iIII', 2, IN_CREATE, 0, 0)
+        events = parse_events(buf)
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0].name, 'squid.pid')
+        self.assertEqual(events[1].wd, 2)
+        self.assertEqual(events[1].name, '')
+
+
+class TestProbeAddress(unittest.TestCase):
+    """Tests for mapping listen addresses to probe targets."""
+
+    def test_wildcards_map_to_loopback(self):
+        self.assertEqual(probe_address(None, 3128), ('127.0.0.1', 3128))
+        self.assertEqual(probe_address('0.0.0.0', 3128), ('127.0.0.1', 3128))
+        self.assertEqual(probe_address('::', 3128), ('::1', 3128))
+
+    def test_explicit_address_kept(self):
+        self.assertEqual(probe_address('10.1.2.3', 8080), ('10.1.2.3', 8080))
+
+
+class TestPidFileWatch(unittest.TestCase):
+    """Tests for wait_for_pid_file."""
+
+    @unittest.skipUnless(inotify_available(), "inotify not available")
+    def test_pid_file_created(self):
+        """Test that creating the PID file wakes the waiter."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pid_file = Path(tmpdir) / 'squid.pid'
+
+            async def run_test():
+                waiter = asyncio.create_task(wait_for_pid_file(pid_file))
+                await asyncio.sleep(0.01)
+                self.assertFalse(waiter.done())
+                pid_file.write_text('123\n')
+                await asyncio.wait_for(waiter, timeout=1.0)
+
+            asyncio.run(run_test())
+
+    def test_pid_file_already_exists(self):
+        """Test immediate return when the PID file is already present."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pid_file = Path(tmpdir) / 'squid.pid'
+            pid_file.write_text('123\n')
+            asyncio.run(asyncio.wait_for(wait_for_pid_file(pid_file), timeout=0.5))
+
+
+class TestReadinessSignals(unittest.TestCase):
+    """Tests for wait_for_squid_ready signal selection."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.pid_file = Path(self.tmpdir.name) / 'squid.pid'
+
+    def test_tcp_probe_wins(self):
+        """Test readiness once the port accepts connections."""
+        async def run_test():
+            server = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await wait_for_squid_ready(
+                    running_process(), self.pid_file, ('127.0.0.1', port),
+                    asyncio.Event(), timeout=2.0
+                )
+
+        self.assertEqual(asyncio.run(run_test()), 'tcp_connect')
+
+    def test_stderr_marker_wins(self):
+        """Test readiness from the accepting-connections log line."""
+        async def run_test():
+            accepting = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.01, accepting.set)
+            return await wait_for_squid_ready(
+                running_process(), self.pid_file, None, accepting, timeout=2.0
+            )
+
+        self.assertEqual(asyncio.run(run_test()), 'stderr')
+
+    def test_pid_file_does_not_win_when_port_known(self):
+        """Test that the PID file alone never marks Squid ready if a port is configured."""
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()  # nothing listens on this port
+        self.pid_file.write_text('123\n')
+
+        async def run_test():
+            return await wait_for_squid_ready(
+                running_process(), self.pid_file, ('127.0.0.1', port),
+                asyncio.Event(), timeout=0.2
+            )
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(run_test())
+
+    def test_process_exit_reported(self):
+        """Test that Squid dying during startup is reported as 'exited'."""
+        process = Mock()
+
+        async def exited():
+            return 1
+        process.wait = exited
+
+        async def run_test():
+            return await wait_for_squid_ready(
+                process, self.pid_file, None, asyncio.Event(), timeout=2.0
+            )
+
+        self.assertEqual(asyncio.run(run_test()), 'exited')
+
+
+class TestTcpProbe(unittest.TestCase):
+    """Tests for wait_for_tcp."""
+
+    def test_wake_triggers_immediate_retry(self):
+        """Test that setting the wake event retries without waiting for backoff."""
+        async def run_test():
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+            wake = asyncio.Event()
+            probe = asyncio.create_task(wait_for_tcp('127.0.0.1', port, wake))
+            await asyncio.sleep(0.05)
+
+            sock.listen()
+            sock.setblocking(False)
+            wake.set()
+            await asyncio.wait_for(probe, timeout=0.5)
+            sock.close()
+
+        asyncio.run(run_test())
+
+
+if __name__ == '__main__':
+    unittest.main()
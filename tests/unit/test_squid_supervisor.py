@@ -0,0 +1,94 @@
+"""
+Unit tests for the in-container Squid restart policy.
+
+Tests backoff growth, crash-loop detection, window expiry and the recovery
+metrics recorded by SquidSupervisor.
+"""
+
+import os
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add container directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'container'))
+
+import squid_supervisor
+from metrics import Registry
+from squid_supervisor import RestartPolicy, SquidSupervisor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRestartPolicy(unittest.TestCase):
+    """Tests for RestartPolicy.from_env."""
+
+    def test_never(self):
+        with patch.object(squid_supervisor, 'RESTART_POLICY', 'never'):
+            self.assertIsNone(RestartPolicy.from_env())
+
+    def test_on_failure(self):
+        env = {'SQUID_RESTART_MAX': '3', 'SQUID_RESTART_WINDOW': '60', 'SQUID_RESTART_BACKOFF': '0.5'}
+        with patch.object(squid_supervisor, 'RESTART_POLICY', 'on-failure'), \
+                patch.dict(os.environ, env):
+            policy = RestartPolicy.from_env()
+        self.assertEqual((policy.max_restarts, policy.window, policy.backoff_initial), (3, 60.0, 0.5))
+
+    def test_unknown(self):
+        with patch.object(squid_supervisor, 'RESTART_POLICY', 'sometimes'):
+            with self.assertRaises(ValueError):
+                RestartPolicy.from_env()
+
+
+class TestSquidSupervisor(unittest.TestCase):
+    """Tests for SquidSupervisor."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.registry = Registry()
+        policy = RestartPolicy(max_restarts=3, window=60, backoff_initial=1, backoff_max=3)
+        self.supervisor = SquidSupervisor(policy, self.registry, self.clock)
+
+    def test_exponential_backoff_capped(self):
+        delays = []
+        for _ in range(3):
+            delays.append(self.supervisor.record_exit(1))
+            self.clock.now += 1
+        self.assertEqual(delays, [1, 2, 3])
+
+    def test_crash_loop_gives_up(self):
+        for _ in range(3):
+            self.assertIsNotNone(self.supervisor.record_exit(1))
+        self.assertIsNone(self.supervisor.record_exit(1))
+
+    def test_window_expiry_resets_backoff(self):
+        for _ in range(3):
+            self.supervisor.record_exit(1)
+        self.clock.now += 61
+        self.assertEqual(self.supervisor.record_exit(1), 1)
+        self.assertEqual(self.supervisor.recent_exits, 1)
+
+    def test_recovery_metrics(self):
+        self.supervisor.record_exit(1)
+        body = self.registry.render().decode()
+        self.assertIn('squid_restart_backoff_seconds 1\n', body)
+
+        self.clock.now += 2.5
+        self.assertEqual(self.supervisor.record_recovery(), 2.5)
+
+        body = self.registry.render().decode()
+        self.assertIn('squid_restarts_total 1\n', body)
+        self.assertIn('squid_last_recovery_seconds 2.5\n', body)
+        self.assertIn('squid_recovery_seconds_total 2.5\n', body)
+        self.assertIn('squid_restart_backoff_seconds 0\n', body)
+
+
+if __name__ == '__main__':
+    unittest.main()